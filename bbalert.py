@@ -9,6 +9,10 @@ from telegram.ext import Application, ApplicationBuilder, CommandHandler, Messag
 from telegram.constants import ParseMode
 from utils.logger import logger
 from utils.file_manager import cargar_usuarios, guardar_usuarios, add_log_line
+from utils.write_behind import flush_all, install_signal_flush
+from utils import users_db
+from utils.market_data import close_market_data
+from utils.symbol_index import symbol_index_loop
 from core.btc_loop import btc_monitor_loop, set_btc_sender
 from handlers.btc_handlers import btc_handlers_list, graf_from_btc_callback
 from core.config import TOKEN_TELEGRAM, ADMIN_CHAT_IDS, VERSION, PID, PYTHON_VERSION, STATE
@@ -23,7 +27,7 @@ from core.weather_loop_v2 import weather_alerts_loop, weather_daily_summary_loop
 from core.global_disasters_loop import global_disasters_loop
 from core.i18n import _ 
 from handlers.general import start, myid, ver, help_command
-from handlers.admin import users, logs_command, set_admin_util, set_logs_util, ms_conversation_handler, ad_command
+from handlers.admin import users, logs_command, set_admin_util, set_logs_util, ms_conversation_handler, ad_command, cmc_command, perf_command
 from handlers.year_handlers import year_command, year_sub_callback
 from core.year_loop import year_progress_loop
 
@@ -137,6 +141,21 @@ async def post_init(app: Application):
     asyncio.create_task(sp_monitor_loop(app.bot))
     logger.info("✅ Bucle SmartSignals (/sp) iniciado.")
 
+    # Índice local de pares por exchange (validación de símbolos sin red)
+    asyncio.create_task(symbol_index_loop())
+
+
+async def post_shutdown(app: Application):
+    """
+    Se ejecuta al detener el bot (Ctrl+C, SIGTERM, stop de systemd).
+    Vuelca las escrituras diferidas pendientes, cierra la base de usuarios
+    y la sesión HTTP de datos de mercado.
+    """
+    flush_all()
+    users_db.close_users_db()
+    await close_market_data()
+    logger.info("💾 Escrituras pendientes volcadas a disco. Bot detenido.")
+
 
 def main():
     """Inicia el bot y configura todos los handlers."""
@@ -257,6 +276,8 @@ def main():
     app.add_handler(CommandHandler("users", users))
     app.add_handler(CommandHandler("logs", logs_command))
     app.add_handler(CommandHandler("ad", ad_command))
+    app.add_handler(CommandHandler("cmc", cmc_command))
+    app.add_handler(CommandHandler("perf", perf_command))
     
     # ============================================
     # Comandos de Trading/Cripto
@@ -349,8 +370,10 @@ def main():
     # Callbacks de Pago
     app.add_handler(CallbackQueryHandler(shop_callback, pattern="^buy_"))
     
-    # 4. Asignar la función post_init
+    # 4. Asignar la función post_init (y el volcado de estado al apagar)
     app.post_init = post_init
+    app.post_shutdown = post_shutdown
+    install_signal_flush()
     
     # 5. Iniciar el polling
     print("✅ BitBread iniciado. Esperando mensajes...")
@@ -7,6 +7,10 @@ from core.config import CMC_API_KEY_ALERTA, CMC_API_KEY_CONTROL, SCREENSHOT_API_
 from datetime import datetime, timedelta
 from utils.file_manager import load_hbd_thresholds
 from core.i18n import _ 
+from utils.cmc_budget import (
+    cmc_budget, creditos_quotes, save_usage,
+    PRIORIDAD_ALERTA, PRIORIDAD_CONTROL, PRIORIDAD_CONSULTA
+)
 # No se necesitan imports de file_manager aquí
 
 
@@ -93,40 +97,128 @@ def generar_alerta(precios_actuales, precio_anterior_hbd, user_id: int | None):
     return msg_final, log_msg
 
 # === FUNCIONES DE API DE COINMARKETCAP ===
-def _obtener_precios(monedas, api_key):
-    """Función genérica y síncrona para obtener precios de CMC."""
+CMC_QUOTES_URL = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
+
+
+def _cmc_quotes(params, api_key, label, prioridad, coste=1):
+    """
+    GET quotes/latest con contabilidad de créditos (utils/cmc_budget).
+    Devuelve el dict 'data' o None si el presupuesto lo deniega o CMC falla;
+    en ambos casos el llamador degrada a CryptoCompare.
+    """
+    budget = cmc_budget(api_key, label)
+    if not budget.acquire(coste, prioridad):
+        save_usage()
+        return None
+
     headers = {
         "X-CMC_PRO_API_KEY": api_key,
         "Accept": "application/json"
     }
+    try:
+        response = requests.get(CMC_QUOTES_URL, headers=headers, params=params, timeout=10)
+        body = response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        budget.refund(coste)
+        save_usage()
+        return None
+
+    status = body.get("status") or {}
+    if response.status_code != 200:
+        # CMC no cobra las llamadas con error; si es por límite, se respeta hasta el reinicio
+        budget.refund(coste)
+        budget.penalize(status.get("error_code"))
+        save_usage()
+        return None
+
+    budget.settle(coste, status.get("credit_count"))
+    save_usage()
+    return body.get("data") or {}
+
+
+def _obtener_precios_cryptocompare(monedas, lote=50):
+    """Precios USD desde CryptoCompare (fallback sin créditos). None si falla la API."""
+    monedas = list(monedas)
+    precios = {}
+    for i in range(0, len(monedas), lote):
+        parte = monedas[i:i + lote]
+        try:
+            response = requests.get(
+                "https://min-api.cryptocompare.com/data/pricemulti",
+                params={"fsyms": ",".join(m.upper() for m in parte), "tsyms": "USD"},
+                timeout=5
+            )
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+        if data.get("Response") == "Error":
+            # Ningún símbolo válido en el lote: se omiten, como hace CMC con skip_invalid
+            continue
+        for m in parte:
+            price = (data.get(m.upper()) or {}).get("USD")
+            if price:
+                precios[m] = float(price)
+    return precios
+
+
+def _obtener_precios(monedas, api_key, label, prioridad):
+    """Función genérica y síncrona para obtener precios de CMC (fallback: CryptoCompare)."""
     params = {
         "symbol": ",".join(monedas),
         "convert": "USD"
     }
-    precios = {}
-    try:
-        response = requests.get("https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest", headers=headers, params=params, timeout=10)
-        response.raise_for_status() 
-        data = response.json()
-        
-        if not data or "data" not in data:
-            return None if len(monedas) == 3 else {} 
-        
-        for m in monedas:
-            if m in data["data"]:
-                precios[m] = data["data"][m]["quote"]["USD"]["price"]
-        
+    data = _cmc_quotes(params, api_key, label, prioridad, creditos_quotes(len(monedas)))
+    if data is None:
+        precios = _obtener_precios_cryptocompare(monedas)
+        if precios is None:
+            return None if len(monedas) == 3 else {}
         return precios
-        
-    except requests.exceptions.RequestException as e:
-        
-        return None if len(monedas) == 3 else {}
+
+    precios = {}
+    for m in monedas:
+        if m in data:
+            precios[m] = data[m]["quote"]["USD"]["price"]
+    return precios
 
 def obtener_precios_alerta():
-    return _obtener_precios(["BTC", "TON", "HIVE", "HBD"], CMC_API_KEY_ALERTA)
+    return _obtener_precios(["BTC", "TON", "HIVE", "HBD"], CMC_API_KEY_ALERTA, "alerta", PRIORIDAD_ALERTA)
+
+def obtener_precios_control(monedas, prioridad=PRIORIDAD_CONTROL):
+    return _obtener_precios(monedas, CMC_API_KEY_CONTROL, "control", prioridad)
+
+
+def obtener_precios_control_lote(monedas, lote: int = 100):
+    """
+    Precios USD de muchas monedas con las mínimas llamadas a quotes/latest
+    (trozos de `lote` símbolos). Usa skip_invalid para que un símbolo que CMC
+    no reconoce no tumbe la consulta del resto. Los trozos que el presupuesto
+    deniega se piden a CryptoCompare.
+    Devuelve {moneda: precio} o None si falló alguna llamada.
+    """
+    monedas = sorted({m.upper() for m in monedas})
+    precios = {}
+    for i in range(0, len(monedas), lote):
+        parte = monedas[i:i + lote]
+        params = {
+            "symbol": ",".join(parte),
+            "convert": "USD",
+            "skip_invalid": "true"
+        }
+        data = _cmc_quotes(params, CMC_API_KEY_CONTROL, "control", PRIORIDAD_CONTROL,
+                           creditos_quotes(len(parte)))
+        if data is None:
+            fallback = _obtener_precios_cryptocompare(parte)
+            if fallback is None:
+                return None
+            precios.update(fallback)
+            continue
 
-def obtener_precios_control(monedas):
-    return _obtener_precios(monedas, CMC_API_KEY_CONTROL)
+        for m in parte:
+            try:
+                precios[m] = data[m]["quote"]["USD"]["price"]
+            except (KeyError, TypeError):
+                continue
+    return precios
 
 
 
@@ -241,65 +333,66 @@ def _obtener_datos_cryptocompare(moneda):
         return None
 
 
+def obtener_quote_cmc(moneda, tasas=None):
+    """
+    Cotización de CMC sin high/low 24h. `tasas` = {'ETH': usd, 'BTC': usd} ya
+    conocidas (caché); si no se pasan se piden en la misma llamada.
+    Devuelve (datos, tasas) o (None, None) si CMC no responde o no hay cupo.
+    """
+    symbol = moneda.upper()
+    pedir = [symbol] if tasas else [symbol, "ETH", "BTC"]
+    params = {
+        "symbol": ",".join(dict.fromkeys(pedir)),
+        "convert": "USD"
+    }
+    try:
+        # Consulta interactiva: la primera en ceder créditos cuando el cupo aprieta
+        full_data = _cmc_quotes(params, CMC_API_KEY_CONTROL, "control", PRIORIDAD_CONSULTA) or {}
+        if symbol not in full_data:
+            return None, None
+        if not tasas:
+            if 'ETH' not in full_data or 'BTC' not in full_data:
+                return None, None
+            tasas = {
+                'ETH': full_data['ETH']['quote']['USD']['price'],
+                'BTC': full_data['BTC']['quote']['USD']['price'],
+            }
+
+        data_moneda = full_data[symbol]
+        quote_usd_moneda = data_moneda['quote']['USD']
+        price_usd_eth = tasas['ETH']
+        price_usd_btc = tasas['BTC']
+
+        price_in_eth = quote_usd_moneda['price'] / price_usd_eth if price_usd_eth else 0
+        price_in_btc = quote_usd_moneda['price'] / price_usd_btc if price_usd_btc else 0
+
+        return {
+            'symbol': data_moneda['symbol'],
+            'price': quote_usd_moneda['price'],
+            'price_eth': price_in_eth,
+            'price_btc': price_in_btc,
+            'percent_change_1h': quote_usd_moneda['percent_change_1h'],
+            'percent_change_24h': quote_usd_moneda['percent_change_24h'],
+            'percent_change_7d': quote_usd_moneda['percent_change_7d'],
+            'market_cap_rank': data_moneda['cmc_rank'],
+            'market_cap': quote_usd_moneda['market_cap'],
+            'volume_24h': quote_usd_moneda['volume_24h']
+        }, tasas
+    except Exception as e:
+        print(f"CMC falló para {symbol}: {e}")
+        return None, None
+
+
 def obtener_datos_moneda(moneda):
     """Obtiene datos detallados de una moneda. Intenta CMC primero, fallback a CryptoCompare."""
     symbol = moneda.upper()
     
     # === INTENTO 1: CoinMarketCap (datos más completos) ===
-    try:
-        headers = {
-            "X-CMC_PRO_API_KEY": CMC_API_KEY_CONTROL,
-            "Accept": "application/json"
-        }
-        
-        params = {
-            "symbol": f"{symbol},ETH,BTC", 
-            "convert": "USD" 
-        }
-        
-        response = requests.get(
-            "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest", 
-            headers=headers, 
-            params=params, 
-            timeout=10
-        )
-        response.raise_for_status()
-        
-        full_data = response.json()['data']
-        
-        # Verificar que tenemos todos los datos necesarios
-        if symbol in full_data and 'ETH' in full_data and 'BTC' in full_data:
-            data_moneda = full_data[symbol]
-            data_eth = full_data['ETH']
-            data_btc = full_data['BTC']
-            
-            quote_usd_moneda = data_moneda['quote']['USD']
-            price_usd_eth = data_eth['quote']['USD']['price']
-            price_usd_btc = data_btc['quote']['USD']['price']
-
-            price_in_eth = quote_usd_moneda['price'] / price_usd_eth if price_usd_eth != 0 else 0
-            price_in_btc = quote_usd_moneda['price'] / price_usd_btc if price_usd_btc != 0 else 0
-
-            # Obtener high/low de Binance/CryptoCompare
-            hl_high, hl_low = obtener_high_low_24h(symbol)
-
-            return {
-                'symbol': data_moneda['symbol'],
-                'price': quote_usd_moneda['price'],
-                'price_eth': price_in_eth,
-                'price_btc': price_in_btc,
-                'high_24h': hl_high,
-                'low_24h': hl_low,
-                'percent_change_1h': quote_usd_moneda['percent_change_1h'],
-                'percent_change_24h': quote_usd_moneda['percent_change_24h'],
-                'percent_change_7d': quote_usd_moneda['percent_change_7d'],
-                'market_cap_rank': data_moneda['cmc_rank'],
-                'market_cap': quote_usd_moneda['market_cap'],
-                'volume_24h': quote_usd_moneda['volume_24h']
-            }
-            
-    except Exception as e:
-        print(f"CMC falló para {symbol}, intentando fallback: {e}")
+    datos, _tasas = obtener_quote_cmc(symbol)
+    if datos:
+        # Obtener high/low de Binance/CryptoCompare
+        datos['high_24h'], datos['low_24h'] = obtener_high_low_24h(symbol)
+        return datos
     
     # === INTENTO 2: CryptoCompare (fallback universal) ===
     print(f"Usando fallback CryptoCompare para {symbol}")
@@ -1,18 +1,33 @@
 # core/btc_advanced_analysis.py
 
+import math
 import numpy as np
 import pandas as pd
 import pandas_ta as ta
 from typing import Dict, Tuple, List
 
+from utils.indicator_stream import BTCIndicators, indicator_streams
+from utils.analysis_memo import analysis_memo
+
+# Versión de la lógica de niveles/momentum: invalida el memo por vela cerrada al cambiarla
+ANALYSIS_VERSION = "adv-1"
+
 class BTCAdvancedAnalyzer:
     """
     Análisis técnico PROFESIONAL (Nivel TradingView) para BTC.
     Versión ROBUSTA: Maneja errores de datos nulos y estandariza nombres.
     """
     
-    def __init__(self, dataframe: pd.DataFrame):
+    def __init__(self, dataframe: pd.DataFrame, stream_key: tuple | None = None):
+        """
+        stream_key=(symbol, interval, fuente): los bucles que analizan la misma
+        serie en cada ciclo mantienen los indicadores de forma incremental
+        (utils/indicator_stream.py) en vez de recalcularlos sobre todo el df.
+        La fuente (el bucle que descarga las velas) separa el estado de series
+        con el mismo par y temporalidad pero precios de otro exchange.
+        """
         self.df = dataframe.copy()
+        self.stream_key = stream_key
         # Asegurar índices correctos
         if not isinstance(self.df.index, pd.DatetimeIndex):
             if 'time' in self.df.columns:
@@ -26,7 +41,10 @@ class BTCAdvancedAnalyzer:
     
     def calculate_indicators(self):
         """Calcula indicadores y RENOMBRA las columnas para evitar errores de clave."""
-        
+        if self.stream_key is not None and len(self.df) > 1 and 'open_time' in self.df.columns:
+            self._calculate_indicators_stream()
+            return
+
         # 1. EMAs (Medias Móviles Exponenciales)
         # Si no hay suficientes datos para EMA 200, rellenamos con el precio de cierre para no romper el código
         for length in [9, 20, 50, 200]:
@@ -92,6 +110,26 @@ class BTCAdvancedAnalyzer:
         else:
             self.df['KIJUN_SEN'] = self.df['close']
 
+    def _calculate_indicators_stream(self):
+        """
+        Variante incremental: las velas cerradas avanzan el estado guardado por
+        stream_key y la vela en curso (última fila) se evalúa de forma provisional.
+        Solo la última fila lleva indicadores: es la única que se lee.
+        """
+        values = stream_values(self.df, self.stream_key)
+        n = len(self.df)
+        for col, val in values.items():
+            column = np.zeros(n)
+            column[-1] = val
+            self.df[col] = column
+
+        # Misma columna que ta.ichimoku()[0].iloc[:, 1] en la última fila:
+        # punto medio de 52 velas desplazado 26
+        column = np.full(n, np.nan)
+        if n >= 78:
+            column[-1] = (self.df['high'].iloc[-78:-26].max() + self.df['low'].iloc[-78:-26].min()) / 2
+        self.df['KIJUN_SEN'] = column
+
     def get_current_values(self):
         """Devuelve la última fila como diccionario asegurando tipos nativos (no numpy)."""
         last_row = self.df.iloc[-1].to_dict()
@@ -109,99 +147,7 @@ class BTCAdvancedAnalyzer:
         Algoritmo de Puntuación Compuesto (Estilo TradingView).
         """
         # Obtenemos valores asegurados (sin NaNs)
-        curr = self.get_current_values()
-        price = curr.get('close', 0)
-        
-        buy_score = 0
-        sell_score = 0
-        reasons = []
-        
-        # --- GRUPO 1: TENDENCIA (Moving Averages) ---
-        mas = [9, 20, 50, 200]
-        ma_bullish_count = 0
-        
-        for ma in mas:
-            val = curr.get(f'EMA_{ma}', 0)
-            if val > 0: # Solo si existe un valor válido
-                if price > val:
-                    buy_score += 1
-                    ma_bullish_count += 1
-                else:
-                    sell_score += 1
-        
-        if ma_bullish_count == 4:
-            reasons.append("Tendencia Alcista (Sobre todas las EMAs)")
-        elif ma_bullish_count == 0:
-            reasons.append("Tendencia Bajista (Bajo todas las EMAs)")
-            
-        # --- GRUPO 2: OSCILADORES (Momentum) ---
-        
-        # RSI (14)
-        rsi = curr.get('RSI', 50)
-        if rsi < 30: 
-            buy_score += 1
-            reasons.append("RSI Sobrevendido (Oportunidad)")
-        elif rsi > 70:
-            sell_score += 1
-            reasons.append("RSI Sobrecomprado (Cuidado)")
-        elif 50 < rsi < 70:
-            buy_score += 1
-        elif 30 < rsi < 50:
-            sell_score += 1
-            
-        # CCI
-        cci = curr.get('CCI', 0)
-        if cci < -100: buy_score += 1
-        elif cci > 100: sell_score += 1
-            
-        # Stochastic
-        k = curr.get('STOCH_K', 50)
-        if k < 20:
-            buy_score += 1
-            reasons.append("Estocástico Sobrevendido")
-        elif k > 80:
-            sell_score += 1
-            
-        # Awesome Oscillator
-        ao = curr.get('AO', 0)
-        if ao > 0: buy_score += 1
-        else: sell_score += 1
-            
-        # MACD
-        hist = curr.get('MACD_HIST', 0)
-        if hist > 0: buy_score += 1
-        else: sell_score += 1
-
-        # --- GRUPO 3: FUERZA (ADX) ---
-        adx = curr.get('ADX', 0)
-        if adx > 25:
-            if ma_bullish_count >= 3:
-                buy_score += 2
-                reasons.append(f"ADX Fuerte ({adx:.1f}) confirma Alza")
-            elif ma_bullish_count <= 1:
-                sell_score += 2
-                reasons.append(f"ADX Fuerte ({adx:.1f}) confirma Baja")
-
-        # --- CÁLCULO FINAL DE SEÑAL ---
-        net_score = buy_score - sell_score
-        
-        if net_score >= 6:
-            signal = "COMPRA FUERTE"
-            emoji = "🚀"
-        elif net_score >= 2:
-            signal = "COMPRA"
-            emoji = "📈"
-        elif net_score >= -2:
-            signal = "NEUTRAL"
-            emoji = "⚖️"
-        elif net_score >= -6:
-            signal = "VENTA"
-            emoji = "📉"
-        else:
-            signal = "VENTA FUERTE"
-            emoji = "🐻"
-            
-        return (signal, emoji, (buy_score, sell_score), reasons)
+        return score_momentum(self.get_current_values())
     
 
     #   --- esta es la actual   ---
@@ -264,14 +210,7 @@ class BTCAdvancedAnalyzer:
         # Usamos el precio de la vela actual (vela abierta)
         price = float(self.df.iloc[-1]['close'])
         
-        if price > p and price > kijun:
-            status_zone = "🐂 ALCISTA (Sólido)"
-        elif price < p and price < kijun:
-            status_zone = "🐻 BAJISTA (Débil)"
-        elif price > p and price < kijun:
-             status_zone = "⚠️ TRAMPA ALCISTA"
-        else:
-            status_zone = "⚖️ NEUTRAL / RANGO"
+        status_zone = zone_status(price, p, kijun)
 
         return {
             'current_price': price,
@@ -291,4 +230,169 @@ class BTCAdvancedAnalyzer:
        
     # Añadido para que btc_loop.py no falle si llama a esta función
     def detect_rsi_divergence(self, lookback=5):
-        return None
\ No newline at end of file
+        return None
+
+
+# ─── FUNCIONES AUXILIARES ─────────────────────────────────────────────────────
+
+def stream_values(df: pd.DataFrame, stream_key: tuple) -> Dict[str, float]:
+    """
+    Indicadores de la vela en curso (última fila) con el estado incremental de
+    stream_key: las velas cerradas avanzan el estado y la vela abierta se evalúa
+    de forma provisional (peek). NaN → mismos valores por defecto que la ruta
+    pandas_ta (EMA → cierre, resto → 0).
+    """
+    ind = indicator_streams.sync((*stream_key, "btc"), df.iloc[:-1], BTCIndicators)
+    last = df.iloc[-1]
+    values = ind.peek(float(last['high']), float(last['low']), float(last['close']), float(last['volume']))
+    for col, val in values.items():
+        if math.isnan(val):
+            values[col] = float(last['close']) if col.startswith('EMA_') else 0.0
+    return values
+
+
+def zone_status(price: float, p: float, kijun: float) -> str:
+    """Estado de la zona según el precio frente al Pivot y la Kijun."""
+    if price > p and price > kijun:
+        return "🐂 ALCISTA (Sólido)"
+    elif price < p and price < kijun:
+        return "🐻 BAJISTA (Débil)"
+    elif price > p and price < kijun:
+        return "⚠️ TRAMPA ALCISTA"
+    return "⚖️ NEUTRAL / RANGO"
+
+
+def score_momentum(curr: dict) -> Tuple[str, str, Tuple[int, int], List[str]]:
+    """
+    Algoritmo de Puntuación Compuesto (Estilo TradingView) sobre un dict de
+    valores (EMA_n, RSI, CCI, STOCH_K, AO, MACD_HIST, ADX y close).
+    """
+    price = curr.get('close', 0)
+
+    buy_score = 0
+    sell_score = 0
+    reasons = []
+
+    # --- GRUPO 1: TENDENCIA (Moving Averages) ---
+    mas = [9, 20, 50, 200]
+    ma_bullish_count = 0
+
+    for ma in mas:
+        val = curr.get(f'EMA_{ma}', 0)
+        if val > 0: # Solo si existe un valor válido
+            if price > val:
+                buy_score += 1
+                ma_bullish_count += 1
+            else:
+                sell_score += 1
+
+    if ma_bullish_count == 4:
+        reasons.append("Tendencia Alcista (Sobre todas las EMAs)")
+    elif ma_bullish_count == 0:
+        reasons.append("Tendencia Bajista (Bajo todas las EMAs)")
+
+    # --- GRUPO 2: OSCILADORES (Momentum) ---
+
+    # RSI (14)
+    rsi = curr.get('RSI', 50)
+    if rsi < 30: 
+        buy_score += 1
+        reasons.append("RSI Sobrevendido (Oportunidad)")
+    elif rsi > 70:
+        sell_score += 1
+        reasons.append("RSI Sobrecomprado (Cuidado)")
+    elif 50 < rsi < 70:
+        buy_score += 1
+    elif 30 < rsi < 50:
+        sell_score += 1
+
+    # CCI
+    cci = curr.get('CCI', 0)
+    if cci < -100: buy_score += 1
+    elif cci > 100: sell_score += 1
+
+    # Stochastic
+    k = curr.get('STOCH_K', 50)
+    if k < 20:
+        buy_score += 1
+        reasons.append("Estocástico Sobrevendido")
+    elif k > 80:
+        sell_score += 1
+
+    # Awesome Oscillator
+    ao = curr.get('AO', 0)
+    if ao > 0: buy_score += 1
+    else: sell_score += 1
+
+    # MACD
+    hist = curr.get('MACD_HIST', 0)
+    if hist > 0: buy_score += 1
+    else: sell_score += 1
+
+    # --- GRUPO 3: FUERZA (ADX) ---
+    adx = curr.get('ADX', 0)
+    if adx > 25:
+        if ma_bullish_count >= 3:
+            buy_score += 2
+            reasons.append(f"ADX Fuerte ({adx:.1f}) confirma Alza")
+        elif ma_bullish_count <= 1:
+            sell_score += 2
+            reasons.append(f"ADX Fuerte ({adx:.1f}) confirma Baja")
+
+    # --- CÁLCULO FINAL DE SEÑAL ---
+    net_score = buy_score - sell_score
+
+    if net_score >= 6:
+        signal = "COMPRA FUERTE"
+        emoji = "🚀"
+    elif net_score >= 2:
+        signal = "COMPRA"
+        emoji = "📈"
+    elif net_score >= -2:
+        signal = "NEUTRAL"
+        emoji = "⚖️"
+    elif net_score >= -6:
+        signal = "VENTA"
+        emoji = "📉"
+    else:
+        signal = "VENTA FUERTE"
+        emoji = "🐻"
+
+    return (signal, emoji, (buy_score, sell_score), reasons)
+
+
+def analyze_live(df: pd.DataFrame, interval: str, stream_key: tuple):
+    """
+    Niveles, momentum y divergencia para un bucle que reanaliza la misma serie
+    en cada ciclo. Los niveles (Pivot, Fibonacci, Kijun) solo dependen de velas
+    cerradas: se memorizan por stream_key y open_time de la última vela
+    cerrada. Con el memo vigente solo se recalcula lo que depende del precio en
+    vivo: precio y estado de zona de los niveles, y la puntuación de momentum
+    con los indicadores provisionales de la vela abierta.
+    Devuelve (levels, (signal, emoji, (buy, sell), reasons), divergence).
+    """
+    if len(df) < 2 or 'open_time' not in df.columns:
+        analyzer = BTCAdvancedAnalyzer(df, stream_key=stream_key)
+        return (analyzer.get_support_resistance_dynamic(interval=interval),
+                analyzer.get_momentum_signal(),
+                analyzer.detect_rsi_divergence(lookback=5))
+
+    memo_key = (*stream_key, "adv")
+    closed_ot = int(df['open_time'].iloc[-2])
+    part = analysis_memo.get(memo_key, closed_ot, ANALYSIS_VERSION)
+    if part is None:
+        analyzer = BTCAdvancedAnalyzer(df, stream_key=stream_key)
+        levels = analyzer.get_support_resistance_dynamic(interval=interval)
+        divergence = analyzer.detect_rsi_divergence(lookback=5)
+        analysis_memo.put(memo_key, closed_ot, ANALYSIS_VERSION,
+                          {'levels': levels, 'divergence': divergence})
+        return levels, analyzer.get_momentum_signal(), divergence
+
+    price = float(df['close'].iloc[-1])
+    values = stream_values(df, stream_key)
+    levels = dict(part['levels'])
+    if levels:
+        levels['current_price'] = price
+        levels['status_zone'] = zone_status(price, levels['P'], levels['KIJUN'])
+        levels['atr'] = values['ATR']
+    return levels, score_momentum({**values, 'close': price}), part['divergence']
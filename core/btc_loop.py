@@ -1,17 +1,19 @@
 # core/btc_loop.py
 
 import asyncio
-import requests
-import pandas as pd
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Bot
 from telegram.constants import ParseMode
 
 from utils.file_manager import add_log_line
+from utils.kline_buffer import get_klines_incremental
+from utils.kline_resample import KlineResampler
 from utils.btc_manager import get_btc_subscribers, load_btc_state, save_btc_state
 from utils.ads_manager import get_random_ad_text
 from core.i18n import _
 from core.btc_advanced_analysis import BTCAdvancedAnalyzer
 from utils.year_manager import get_simple_year_string
+from utils.candle_scheduler import CandleScheduler
+from core.config import BTC_RESAMPLE_ENABLED, SCHED_CLOSE_OFFSET, BTC_MAX_IDLE_S
 
 # Variable para la función de envío (inyectada)
 _enviar_msg_func = None
@@ -20,68 +22,56 @@ def set_btc_sender(func):
     global _enviar_msg_func
     _enviar_msg_func = func
 
-def get_btc_klines(interval="1d", limit=1000): 
+# Binance US primero: es la fuente histórica de los niveles guardados en btc_state
+_BTC_ENDPOINTS = (
+    "https://api.binance.us/api/v3/klines",
+    "https://api.binance.com/api/v3/klines",
+    "https://api1.binance.com/api/v3/klines",
+)
+
+# Remuestreo local (utils/kline_resample.py): una serie base por familia y el
+# resto de temporalidades agregadas a partir de ella. 1w sale de 1d y no de 1h:
+# 1000 velas semanales serían 168.000 horarias.
+_BTC_RESAMPLERS = (
+    KlineResampler("BTCUSDT", "1h", ("1h", "2h", "4h", "8h", "12h"), endpoints=_BTC_ENDPOINTS),
+    KlineResampler("BTCUSDT", "1d", ("1d", "1w"), endpoints=_BTC_ENDPOINTS),
+)
+_BTC_RESAMPLED = {tf: r for r in _BTC_RESAMPLERS for tf in r.targets}
+
+
+def btc_resample_stats() -> list[dict]:
+    """Métricas de las series base agregadas en local (/perf)."""
+    return [r.stats() for r in _BTC_RESAMPLERS]
+
+async def get_btc_klines(interval="1d", limit=1000):
     """
     Obtiene velas de BTC/USDT con intervalo dinámico.
-    CORREGIDO: Mantiene 'open_time' (int) y crea 'time' (datetime).
+    DataFrame normalizado de utils.market_data: 'open_time' (int) + índice 'time'.
+    Servido desde un ring buffer incremental (utils/kline_buffer.py); las
+    temporalidades de _BTC_RESAMPLED se agregan en local desde su serie base.
     """
-    endpoints = [
-        "https://api.binance.us/api/v3/klines",
-        "https://api.binance.com/api/v3/klines",
-        "https://api1.binance.com/api/v3/klines"
-    ]
-    
     try:
         safe_limit = int(limit)
     except Exception:
         safe_limit = 1000
 
-    params = {"symbol": "BTCUSDT", "interval": interval, "limit": safe_limit}
-    
-    for url in endpoints:
-        try:
-            r = requests.get(url, params=params, timeout=5)
-            if r.status_code != 200:
-                continue
-            
-            data = r.json()
-            if not data or not isinstance(data, list):
-                continue
-                
-            # 1. DEFINICIÓN DE COLUMNAS (Usamos nombres estándar de Binance)
-            # Antes tenías 'time' aquí, ahora ponemos 'open_time' para evitar el KeyError
-            df = pd.DataFrame(data, columns=[
-                'open_time', 'open', 'high', 'low', 'close', 'volume', 
-                'close_time', 'quote_asset_volume', 'number_of_trades', 
-                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-            ])
-            
-            # 2. CONVERSIÓN DE TIPOS
-            df['open_time'] = df['open_time'].astype(int) # Mantenemos el int original
-            df['close'] = df['close'].astype(float)
-            df['high'] = df['high'].astype(float)
-            df['low'] = df['low'].astype(float)
-            df['open'] = df['open'].astype(float)
-            df['volume'] = df['volume'].astype(float)
-            
-            # 3. CREAR COLUMNA 'time' (DATETIME)
-            # Necesaria para el BTCAdvancedAnalyzer y para gráficos
-            df['time'] = pd.to_datetime(df['open_time'], unit='ms')
-            
+    resampler = _BTC_RESAMPLED.get(interval) if BTC_RESAMPLE_ENABLED else None
+    if resampler is not None:
+        df = await resampler.get(interval, safe_limit)
+        if df is not None:
             return df
-            
-        except Exception as e:
-            print(f"⚠️ Error conectando con {url}: {e}")
-            continue
 
-    print("❌ Error crítico: No se pudo obtener datos de ningún endpoint de Binance.")
-    return None
+    # Ring buffer: tras la siembra solo se piden las velas nuevas + la vela en curso
+    df = await get_klines_incremental("BTCUSDT", interval, safe_limit, endpoints=_BTC_ENDPOINTS)
+    if df is None:
+        print("❌ Error crítico: No se pudo obtener datos de ningún endpoint de Binance.")
+    return df
 
-def get_btc_candle_data(interval="1d"):
+async def get_btc_candle_data(interval="1d"):
     """
     Obtiene la última vela cerrada del intervalo especificado.
     """
-    df = get_btc_klines(interval=interval, limit=1000)
+    df = await get_btc_klines(interval=interval, limit=1000)
     
     if df is None or len(df) < 2:
         return None
@@ -107,23 +97,31 @@ async def btc_monitor_loop(bot: Bot):
     """
     add_log_line("🦁 Iniciando Monitor BTC PRO (Smart Logic + Rich Alerts)...")
     
-    # Definimos las temporalidades a monitorear
+    # Definimos las temporalidades a monitorear (1h-12h se agregan desde la
+    # serie 1h y 1d/1w desde la 1d, ver get_btc_klines)
     TIMEFRAMES = ["1h", "2h", "4h", "8h", "12h", "1d", "1w"]
+    # Cada TF despierta tras el cierre de su vela y cada BTC_MAX_IDLE_S entre cierres
+    scheduler = CandleScheduler("btc", close_offset_s=SCHED_CLOSE_OFFSET, max_idle_s=BTC_MAX_IDLE_S)
     
     while True:
         try:
+            scheduler.sync_pairs(("BTCUSDT", tf) for tf in TIMEFRAMES if get_btc_subscribers(tf))
+            due = {pair[1] for pair, _kind in await scheduler.wait()}
+            if not due:
+                continue
+
             # Cargamos estado GLOBAL
             global_state = load_btc_state()
             state_changed = False
 
-            for interval in TIMEFRAMES:
+            for interval in (tf for tf in TIMEFRAMES if tf in due):
                 # 1. Validación de Suscriptores
                 subs = get_btc_subscribers(interval)
                 if not subs:
                     continue 
 
                 # 2. Obtención de Datos
-                df = get_btc_klines(interval=interval, limit=1000)
+                df = await get_btc_klines(interval=interval, limit=1000)
                 if df is None or len(df) < 200:
                     continue
 
@@ -133,7 +131,7 @@ async def btc_monitor_loop(bot: Bot):
                 current_price = float(df.iloc[-1]['close'])
 
                 # 3. Análisis Técnico
-                analyzer = BTCAdvancedAnalyzer(df)
+                analyzer = BTCAdvancedAnalyzer(df, stream_key=("BTCUSDT", interval, "btc_loop"))
                 levels_fib = analyzer.get_support_resistance_dynamic(interval=interval)
                 momentum_signal, mom_emoji, (buy, sell), reasons = analyzer.get_momentum_signal()
                 
@@ -416,5 +414,4 @@ async def btc_monitor_loop(bot: Bot):
             add_log_line(f"❌ Error en BTC Monitor Loop: {e}")
             import traceback
             traceback.print_exc()
-        
-        await asyncio.sleep(60)
\ No newline at end of file
+            await asyncio.sleep(60)
\ No newline at end of file
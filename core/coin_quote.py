@@ -0,0 +1,141 @@
+# core/coin_quote.py
+# Cotización compuesta de /p, asíncrona y con cachés cortas.
+#
+# obtener_datos_moneda() es síncrona y encadena CMC → Binance (USDT, USDC) →
+# CryptoCompare: varios segundos con el bot bloqueado en cada /p. Aquí:
+#   - la cotización CMC (en el executor, con su contabilidad de créditos) y el
+#     high/low 24h (aiohttp, pares Binance en paralelo) se piden a la vez,
+#   - las tasas ETH/BTC en USD y el high/low por símbolo se cachean con TTL corto,
+#   - la cotización completa también, de modo que el botón 🔄 Actualizar pulsado
+#     varias veces seguidas (o por varios usuarios) no vuelve a la red,
+#   - peticiones simultáneas del mismo símbolo comparten el cálculo (single-flight).
+
+import asyncio
+import time
+
+from core.api_client import _obtener_datos_cryptocompare, obtener_quote_cmc
+from core.config import COIN_HL_TTL, COIN_QUOTE_TTL, COIN_RATES_TTL
+from utils.endpoint_health import endpoint_health
+from utils.market_data import BINANCE_ENDPOINTS, market_data
+from utils.single_flight import single_flight
+
+CRYPTOCOMPARE_FULL_URL = "https://min-api.cryptocompare.com/data/pricemultifull"
+
+
+class _TTLCache:
+    """{clave: (valor, caduca_en)} con TTL fijo."""
+
+    def __init__(self, ttl: float):
+        self.ttl = float(ttl)
+        self._data: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None or item[1] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value) -> None:
+        if self.ttl > 0:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+        # Poda perezosa de lo caducado
+        if len(self._data) > 512:
+            now = time.monotonic()
+            self._data = {k: v for k, v in self._data.items() if v[1] > now}
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+_QUOTES = _TTLCache(COIN_QUOTE_TTL)
+_RATES = _TTLCache(COIN_RATES_TTL)
+_HIGH_LOW = _TTLCache(COIN_HL_TTL)
+_QUOTE_FLIGHT = single_flight("coin_quote")
+
+
+# ─── HIGH / LOW 24H ───────────────────────────────────────────────────────────
+
+_TICKER_ENDPOINTS = tuple(url.replace("/klines", "/ticker/24hr") for url in BINANCE_ENDPOINTS)
+
+
+async def _binance_high_low(pair: str):
+    # Mirrors de más a menos sano, como binance_klines, pero los globales antes:
+    # binance.us lista menos pares y sus precios son los de su propio mercado
+    mirrors = sorted(endpoint_health.order(_TICKER_ENDPOINTS), key=lambda url: "binance.us" in url)
+    for url in mirrors:
+        data = await market_data.get_json(url, {"symbol": pair}, timeout=2)
+        if isinstance(data, dict) and "highPrice" in data:
+            try:
+                high, low = float(data.get("highPrice", 0)), float(data.get("lowPrice", 0))
+            except (TypeError, ValueError):
+                continue
+            return (high, low) if high > 0 else None
+    return None
+
+
+async def _high_low_24h(symbol: str) -> tuple[float, float]:
+    """High/low 24h: Binance USDT y USDC a la vez, CryptoCompare si ninguno existe."""
+    cached = _HIGH_LOW.get(symbol)
+    if cached is not None:
+        return cached
+    usdt, usdc = await asyncio.gather(
+        _binance_high_low(f"{symbol}USDT"), _binance_high_low(f"{symbol}USDC")
+    )
+    result = usdt or usdc
+    if result is None:
+        data = await market_data.get_json(CRYPTOCOMPARE_FULL_URL,
+                                          {"fsyms": symbol, "tsyms": "USD"}, timeout=3)
+        raw = ((data or {}).get("RAW") or {}).get(symbol, {}).get("USD", {})
+        try:
+            result = (float(raw.get("HIGH24HOUR", 0)), float(raw.get("LOW24HOUR", 0)))
+        except (TypeError, ValueError):
+            result = (0.0, 0.0)
+    if result[0] > 0:
+        _HIGH_LOW.put(symbol, result)
+    return result
+
+
+# ─── COTIZACIÓN COMPUESTA ─────────────────────────────────────────────────────
+
+async def _build_quote(symbol: str) -> dict | None:
+    loop = asyncio.get_running_loop()
+    tasas = _RATES.get("ETH_BTC")
+    (datos, tasas_usadas), (high, low) = await asyncio.gather(
+        loop.run_in_executor(None, obtener_quote_cmc, symbol, tasas),
+        _high_low_24h(symbol),
+    )
+    if datos:
+        if tasas_usadas and tasas_usadas is not tasas:
+            _RATES.put("ETH_BTC", tasas_usadas)
+        datos['high_24h'], datos['low_24h'] = high, low
+    else:
+        # Fallback universal (ya trae su propio high/low)
+        datos = await loop.run_in_executor(None, _obtener_datos_cryptocompare, symbol)
+        if not datos:
+            return None
+        if high > 0:
+            datos['high_24h'], datos['low_24h'] = high, low
+    _QUOTES.put(symbol, datos)
+    return datos
+
+
+async def get_coin_quote(moneda: str) -> dict | None:
+    """Mismo dict que obtener_datos_moneda(), sin bloquear el loop. Copia por llamada."""
+    symbol = moneda.upper()
+    datos = _QUOTES.get(symbol)
+    if datos is None:
+        datos = await _QUOTE_FLIGHT.do(symbol, _build_quote, symbol)
+    return dict(datos) if datos else None
+
+
+def coin_quote_stats() -> dict:
+    return {
+        "quotes": _QUOTES.stats(),
+        "rates": _RATES.stats(),
+        "high_low": _HIGH_LOW.stats(),
+        "in_flight": _QUOTE_FLIGHT.stats(),
+    }
@@ -23,7 +23,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 # Construye las rutas a los archivos dentro de la carpeta /data
 DATA_DIR = os.path.join(BASE_DIR, "data")
-USUARIOS_PATH = os.path.join(DATA_DIR, "users.json")
+USUARIOS_PATH = os.path.join(DATA_DIR, "users.json")  # Legacy: solo origen de la migración a SQLite
+USUARIOS_DB_PATH = os.path.join(DATA_DIR, "users.db")
 PRICE_ALERTS_PATH = os.path.join(DATA_DIR, "price_alerts.json")
 HBD_HISTORY_PATH = os.path.join(DATA_DIR, "hbd_price_history.json")
 CUSTOM_ALERT_HISTORY_PATH = os.path.join(DATA_DIR, "custom_alert_history.json")
@@ -37,6 +38,9 @@ WEATHER_LAST_ALERTS_PATH = os.path.join(DATA_DIR, "weather_last_alerts.json")
 YEAR_QUOTES_PATH = os.path.join(DATA_DIR, "year_quotes.json")
 YEAR_SUBS_PATH = os.path.join(DATA_DIR, "year_subs.json")
 EVENTS_LOG_PATH = os.path.join(DATA_DIR, "events_log.json")
+CMC_USAGE_PATH = os.path.join(DATA_DIR, "cmc_usage.json")
+SYMBOL_INDEX_PATH = os.path.join(DATA_DIR, "symbol_index.json")
+CANDLE_ARCHIVE_DIR = os.path.join(DATA_DIR, "candles")
 # --- Configuración de la Aplicación ---
 PID = os.getpid()
 STATE = "RUNNING"
@@ -46,6 +50,63 @@ LOG_MAX = 45
 LOG_LINES = []
 INTERVALO_ALERTA = 300
 INTERVALO_CONTROL = 480
+# Ventana (segundos) en la que se agrupan escrituras repetidas del mismo JSON
+WRITE_BEHIND_WINDOW = float(os.environ.get("WRITE_BEHIND_WINDOW", "2.0"))
+# Caché OHLCV compartida: edad máxima de una entrada (la vela en curso sigue
+# moviéndose aunque no haya cerrado) y memoria máxima antes de expulsar (LRU)
+OHLCV_CACHE_MAX_AGE = float(os.environ.get("OHLCV_CACHE_MAX_AGE", "30"))
+OHLCV_CACHE_MAX_MB = float(os.environ.get("OHLCV_CACHE_MAX_MB", "64"))
+# SmartSignals por WebSocket (modo opcional; por defecto sigue el sondeo REST)
+SP_STREAM_ENABLED = os.environ.get("SP_STREAM_ENABLED", "0").lower() in ("1", "true", "yes")
+SP_STREAM_URL = os.environ.get("SP_STREAM_URL", "wss://stream.binance.com:9443/stream")
+# Base REST alternativa para siembra/backfill (p.ej. el servidor de replay local)
+SP_STREAM_REST_URL = os.environ.get("SP_STREAM_REST_URL", "")
+# Segundos mínimos entre análisis de la misma vela en curso
+SP_STREAM_THROTTLE = float(os.environ.get("SP_STREAM_THROTTLE", "5"))
+# /graf: segundos de espera antes de lanzar en paralelo el siguiente exchange (hedging)
+MARKET_HEDGE_DELAY = float(os.environ.get("MARKET_HEDGE_DELAY", "0.8"))
+# Circuit breakers de endpoints/mirrors: fallos seguidos para abrir y cooldown (s)
+ENDPOINT_FAILURE_THRESHOLD = int(os.environ.get("ENDPOINT_FAILURE_THRESHOLD", "3"))
+ENDPOINT_COOLDOWN = float(os.environ.get("ENDPOINT_COOLDOWN", "30"))
+ENDPOINT_MAX_COOLDOWN = float(os.environ.get("ENDPOINT_MAX_COOLDOWN", "600"))
+# /p: TTL (s) de la cotización completa (sirve los 🔄 Actualizar), de las tasas
+# ETH/BTC en USD y del high/low 24h por símbolo
+COIN_QUOTE_TTL = float(os.environ.get("COIN_QUOTE_TTL", "15"))
+COIN_RATES_TTL = float(os.environ.get("COIN_RATES_TTL", "60"))
+COIN_HL_TTL = float(os.environ.get("COIN_HL_TTL", "60"))
+# Índice local de pares por exchange (exchangeInfo): cada cuánto se refresca (s)
+SYMBOL_INDEX_REFRESH = float(os.environ.get("SYMBOL_INDEX_REFRESH", str(6 * 3600)))
+# Snapshot de cotizaciones CMC compartido por las alertas periódicas de usuario:
+# edad máxima de un precio servido y ventana de anticipación (los jobs que vencen
+# dentro de la ventana entran en la misma llamada por lotes; se limita a la edad máxima)
+QUOTE_SNAPSHOT_MAX_AGE = float(os.environ.get("QUOTE_SNAPSHOT_MAX_AGE", "180"))
+QUOTE_SNAPSHOT_WINDOW = float(os.environ.get("QUOTE_SNAPSHOT_WINDOW", "180"))
+# Presupuesto de créditos CMC por API key (plan Basic: 10.000/mes, 30 llamadas/min).
+# CMC_DAILY_CREDITS = 0 → el cupo diario se planifica repartiendo lo que queda del mes.
+CMC_MONTHLY_CREDITS = int(os.environ.get("CMC_MONTHLY_CREDITS", "10000"))
+CMC_DAILY_CREDITS = int(os.environ.get("CMC_DAILY_CREDITS", "0"))
+CMC_RATE_PER_MIN = int(os.environ.get("CMC_RATE_PER_MIN", "30"))
+# Archivo local de velas: pausa (s) entre páginas de 1000 velas al descargar
+CANDLE_ARCHIVE_PAGE_DELAY = float(os.environ.get("CANDLE_ARCHIVE_PAGE_DELAY", "0.2"))
+# Monitor BTC: temporalidades altas agregadas en local desde 1h y 1d
+# (0 → se vuelve a pedir cada una al exchange). VALIDATE compara cada vela
+# cerrada con la del exchange y registra las diferencias.
+BTC_RESAMPLE_ENABLED = os.environ.get("BTC_RESAMPLE_ENABLED", "1").lower() in ("1", "true", "yes")
+BTC_RESAMPLE_VALIDATE = os.environ.get("BTC_RESAMPLE_VALIDATE", "0").lower() in ("1", "true", "yes")
+# Planificador por cierre de vela (SmartSignals, Valerts, BTC): segundos tras el
+# cierre a los que se analiza, peso de Binance por minuto para escalonar las
+# descargas (el límite por IP es 6000; se deja margen al resto del bot) y
+# comprobación periódica máxima entre cierres (0 = solo cierre y pre-aviso)
+SCHED_CLOSE_OFFSET = float(os.environ.get("SCHED_CLOSE_OFFSET", "2"))
+SCHED_WEIGHT_PER_MIN = float(os.environ.get("SCHED_WEIGHT_PER_MIN", "1200"))
+SP_MAX_IDLE_S = float(os.environ.get("SP_MAX_IDLE_S", "0"))
+VALERTS_MAX_IDLE_S = float(os.environ.get("VALERTS_MAX_IDLE_S", "30"))
+BTC_MAX_IDLE_S = float(os.environ.get("BTC_MAX_IDLE_S", "60"))
+# SmartSignals: pares procesados a la vez, tiempo máximo por par (s) y ritmo
+# de envío a Telegram compartido por todos los pares (mensajes/s)
+SP_PAIR_CONCURRENCY = int(os.environ.get("SP_PAIR_CONCURRENCY", "8"))
+SP_PAIR_TIMEOUT = float(os.environ.get("SP_PAIR_TIMEOUT", "60"))
+SP_SEND_PER_SEC = float(os.environ.get("SP_SEND_PER_SEC", "20"))
 
 try:
     with open(os.path.join(BASE_DIR, "version.txt"), "r") as f:
@@ -10,13 +10,15 @@ from utils.ads_manager import get_random_ad_text
 from core.config import( PID, VERSION, STATE, INTERVALO_ALERTA, INTERVALO_CONTROL,
                         LOG_LINES, CUSTOM_ALERT_HISTORY_PATH, PRICE_ALERTS_PATH, USUARIOS_PATH, 
                             ADMIN_CHAT_IDS, PYTHON_VERSION, HBD_HISTORY_PATH)
-from core.api_client import obtener_precios_alerta, generar_alerta, obtener_precios_control
+from core.api_client import obtener_precios_alerta, generar_alerta
+from core.quote_snapshot import quote_snapshot
 from utils.file_manager import (
     cargar_usuarios, leer_precio_anterior_alerta, guardar_precios_alerta, add_log_line,
     load_price_alerts, update_alert_status, 
     cargar_custom_alert_history, guardar_custom_alert_history, get_hbd_alert_recipients,
     load_last_prices_status, save_last_prices_status, update_last_alert_timestamp
 )
+from utils.alerts_index import price_alert_index
 
 from core.i18n import _ # <-- Importar _
 
@@ -29,6 +31,25 @@ def set_enviar_mensaje_telegram_async(func, app: Application):
     global _enviar_mensaje_telegram_async_ref, _app_ref
     _enviar_mensaje_telegram_async_ref = func
     _app_ref = app
+    quote_snapshot.set_due_coins_provider(_monedas_jobs_proximos)
+
+
+def _monedas_jobs_proximos(ventana_s: float) -> set:
+    """Unión de monedas de los jobs de alerta periódica que vencen en los próximos ventana_s segundos."""
+    if not _app_ref or not _app_ref.job_queue:
+        return set()
+    limite = datetime.now(timezone.utc) + timedelta(seconds=ventana_s)
+    usuarios = cargar_usuarios()
+    monedas = set()
+    for job in _app_ref.job_queue.jobs():
+        if not (job.name or "").startswith("user_alert_"):
+            continue
+        next_t = job.next_t
+        if next_t is None or next_t > limite:
+            continue
+        datos = usuarios.get(str(job.chat_id)) or {}
+        monedas.update(datos.get("monedas", []))
+    return monedas
 
 # Variables globales para los loops
 PRECIOS_CONTROL_ANTERIORES = load_last_prices_status()
@@ -132,35 +153,35 @@ async def check_custom_price_alerts(bot: Bot):
 
     while True:
         try:
-            active_alerts = load_price_alerts()
+            active_alerts = load_price_alerts(readonly=True)
             if not active_alerts:
                 await asyncio.sleep(INTERVALO_CONTROL)
                 continue
 
-            coins_to_check = set(alert['coin'] for user_alerts in active_alerts.values() for alert in user_alerts if alert['status'] == 'ACTIVE')
+            # Índice por moneda: solo se reconstruye si cambió el JSON de alertas
+            price_alert_index.sync(active_alerts)
+            coins_to_check = price_alert_index.coins()
             if not coins_to_check:
                 await asyncio.sleep(INTERVALO_CONTROL)
                 continue
 
-            current_prices = obtener_precios_control(list(coins_to_check))
+            # Precios de hace como mucho 60 s (p.ej. de un lote de alertas periódicas) valen
+            current_prices = await quote_snapshot.get_prices(list(coins_to_check), max_age=60)
             if not current_prices:
                 add_log_line("⚠️ No se pudieron obtener precios para alertas personalizadas.")
                 await asyncio.sleep(INTERVALO_CONTROL)
                 continue
 
-            for user_id_str, user_alerts in active_alerts.items():
-                user_id = int(user_id_str) # <-- Obtener user_id como int
-                for alert in user_alerts:
-                    if alert['status'] != 'ACTIVE':
-                        continue
+            for coin in coins_to_check:
+                current_price = current_prices.get(coin)
+                previous_price = CUSTOM_ALERT_HISTORY.get(coin)
 
-                    coin = alert['coin']
-                    current_price = current_prices.get(coin)
-                    previous_price = CUSTOM_ALERT_HISTORY.get(coin)
-                    
-                    if current_price is None or previous_price is None:
-                        continue 
+                if current_price is None or previous_price is None:
+                    continue
 
+                # Solo las alertas cuyo objetivo cae entre prev y actual (bisect)
+                for user_id_str, alert in price_alert_index.crossings(coin, previous_price, current_price):
+                    user_id = int(user_id_str) # <-- Obtener user_id como int
                     target_price = alert['target_price']
                     condition = alert['condition']
                     triggered = False
@@ -308,7 +329,8 @@ async def alerta_trabajo_callback(context: ContextTypes.DEFAULT_TYPE):
     if not monedas:
         return
 
-    precios_actuales_usuario = obtener_precios_control(monedas) 
+    # Snapshot compartido: una llamada por lotes sirve a todos los jobs que vencen juntos
+    precios_actuales_usuario = await quote_snapshot.get_prices(monedas)
 
     if not precios_actuales_usuario:
         add_log_line(f"❌ Falló obtención de precios para usuario {chat_id_str}.")
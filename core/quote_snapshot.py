@@ -0,0 +1,116 @@
+# core/quote_snapshot.py
+# Snapshot central de cotizaciones de CoinMarketCap (clave CMC_API_KEY_CONTROL).
+#
+# Antes cada job de alerta periódica (alerta_trabajo_callback) hacía su propia
+# llamada a quotes/latest: N usuarios con listas parecidas = N llamadas por
+# intervalo. Ahora:
+#   - si todas las monedas pedidas tienen precio con edad <= max_age, se sirven
+#     del snapshot sin tocar la API,
+#   - si falta alguna, se hace UNA llamada por lotes con la unión de las que
+#     faltan y las de los jobs que vencen dentro de la ventana de anticipación,
+#   - las peticiones concurrentes esperan al mismo refresco (lock + re-chequeo).
+
+import asyncio
+import time
+
+from core.api_client import obtener_precios_control_lote
+from core.config import QUOTE_SNAPSHOT_MAX_AGE, QUOTE_SNAPSHOT_WINDOW
+from utils.file_manager import add_log_line
+
+
+class QuoteSnapshot:
+    """{MONEDA: (precio | None, time.monotonic() de la descarga)} con refresco por lotes."""
+
+    def __init__(self, fetch_batch, max_age: float = 180.0, window: float = 180.0):
+        """
+        fetch_batch(monedas) -> {moneda: precio} | None  (síncrona, va al executor)
+        """
+        self.fetch_batch = fetch_batch
+        self.max_age = float(max_age)
+        self.window = float(window)
+        self._quotes: dict[str, tuple] = {}
+        self._lock = asyncio.Lock()
+        self._due_provider = None
+        # Métricas
+        self.requests = 0
+        self.served = 0
+        self.refreshes = 0
+        self.coins_fetched = 0
+        self.failures = 0
+
+    def set_due_coins_provider(self, provider) -> None:
+        """provider(ventana_s) -> monedas de los jobs que vencen en los próximos ventana_s segundos."""
+        self._due_provider = provider
+
+    def _stale(self, coins: set, max_age: float) -> set:
+        now = time.monotonic()
+        return {c for c in coins
+                if c not in self._quotes or now - self._quotes[c][1] > max_age}
+
+    def _due_coins(self, max_age: float) -> set:
+        # Más allá de max_age lo prefetcheado ya estaría caducado al usarse
+        window = min(self.window, max_age)
+        if self._due_provider is None or window <= 0:
+            return set()
+        try:
+            return {c.upper() for c in self._due_provider(window)}
+        except Exception as e:
+            add_log_line(f"⚠️ QuoteSnapshot: error obteniendo monedas de jobs próximos: {e}")
+            return set()
+
+    async def get_prices(self, monedas, max_age: float | None = None) -> dict:
+        """
+        {moneda: precio} para las monedas pedidas (mismas claves que recibe).
+        Las monedas sin precio (desconocidas en CMC o fallo de red) se omiten.
+        """
+        max_age = self.max_age if max_age is None else float(max_age)
+        coins = {m.upper() for m in monedas}
+        self.requests += 1
+
+        if self._stale(coins, max_age):
+            async with self._lock:
+                # Otro job pudo refrescar mientras esperábamos el lock
+                stale = self._stale(coins, max_age)
+                if stale:
+                    await self._refresh(stale | self._due_coins(max_age))
+                else:
+                    self.served += 1
+        else:
+            self.served += 1
+
+        now = time.monotonic()
+        precios = {}
+        for m in monedas:
+            quote = self._quotes.get(m.upper())
+            if quote and quote[0] is not None and now - quote[1] <= max_age:
+                precios[m] = quote[0]
+        return precios
+
+    async def _refresh(self, coins: set) -> None:
+        loop = asyncio.get_running_loop()
+        batch = sorted(coins)
+        precios = await loop.run_in_executor(None, self.fetch_batch, batch)
+        if precios is None:
+            self.failures += 1
+            return
+        now = time.monotonic()
+        for c in batch:
+            # Las desconocidas también se anotan para no repetirlas en cada job
+            self._quotes[c] = (precios.get(c), now)
+        self.refreshes += 1
+        self.coins_fetched += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "coins": len(self._quotes),
+            "requests": self.requests,
+            "served_from_snapshot": self.served,
+            "refreshes": self.refreshes,
+            "coins_fetched": self.coins_fetched,
+            "failures": self.failures,
+        }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+quote_snapshot = QuoteSnapshot(obtener_precios_control_lote,
+                               QUOTE_SNAPSHOT_MAX_AGE, QUOTE_SNAPSHOT_WINDOW)
@@ -1,14 +1,15 @@
 # core/sp_loop.py
 # Bucle principal del módulo SmartSignals (/sp).
-# Ciclo de 45 segundos. Detecta señales de compra/venta con pre-aviso 10-30s antes.
+# Detecta señales de compra/venta con pre-aviso 10-30s antes. Cada par se analiza
+# segundos después del cierre de su vela y dentro de la ventana de pre-aviso
+# (utils/candle_scheduler.py), no en un ciclo fijo.
+# Con SP_STREAM_ENABLED=1 las velas llegan por WebSocket (core/sp_stream.py).
 # v2 — Integración SSS: estrategias personalizadas por usuario + quick-notify.
 
 import asyncio
 import time
 import numpy as np
 import pandas as pd
-import pandas_ta as ta
-import requests
 from io import BytesIO
 from datetime import datetime
 from telegram.constants import ParseMode
@@ -23,9 +24,23 @@ from utils.sp_manager import (
     estimate_time_to_candle_close,
     SP_TIMEFRAMES,
     pop_quick_notify,
+    has_quick_notify,
+    add_quick_notify_listener,
+    get_quick_notify_pairs,
 )
 from utils.file_manager import add_log_line
+from utils.indicator_stream import SignalIndicators
+from utils.sp_batch import closed_frames, finish_signal
+from utils.analysis_memo import analysis_memo
+from utils.market_data import get_klines
 from utils.sp_chart import generate_sp_chart
+from utils.candle_scheduler import CandleScheduler, WeightBudget, binance_weight, klines_weight
+from utils.market_data import interval_to_ms
+from core.config import (
+    SP_STREAM_ENABLED, SCHED_CLOSE_OFFSET, SP_MAX_IDLE_S,
+    SP_PAIR_CONCURRENCY, SP_PAIR_TIMEOUT, SP_SEND_PER_SEC,
+)
+from core.sp_stream import SPKlineStream
 
 # SSS: estrategias de trading como skills
 try:
@@ -55,48 +70,48 @@ def set_sp_sender(func):
     _sender_func = func
 
 # ─── PARÁMETROS DEL BUCLE ────────────────────────────────────────────────────
-LOOP_INTERVAL_S   = 45    # Ciclo base del bucle
 MIN_SCORE_SIGNAL  = 4.5   # Puntuación mínima para emitir señal
 MIN_SCORE_STRONG  = 6.5   # Puntuación para señal "FUERTE"
 PRE_ALERT_SECS    = 35    # Umbral para pre-aviso (vela cierra en <N segundos)
 PRE_ALERT_MIN_SCORE = 5.5 # Score mínimo para activar pre-aviso
+PRE_ALERT_WAKE_SECS = PRE_ALERT_SECS - 10  # Despertar de pre-aviso, con margen dentro de la ventana
+
+# Versión de la lógica de análisis: invalida el memo por vela cerrada al cambiarla.
+# sp-2: una sola fuente para los indicadores SP, recalculados sobre la ventana de
+# velas cerradas del ciclo (analyze y analyze_batch dan lo mismo y comparten memo)
+SP_ENGINE_VERSION = "sp-2"
 
 # Control de pre-avisos ya enviados (evitar spam)
 _pre_alerts_sent: dict = {}   # key f"{symbol}_{tf}_{open_time}" -> True
 
-# ─── OBTENCIÓN DE DATOS ───────────────────────────────────────────────────────
+# ─── CONCURRENCIA ─────────────────────────────────────────────────────────────
+# Los pares se procesan en paralelo (como mucho SP_PAIR_CONCURRENCY a la vez).
+# El ritmo de envío a Telegram es global: con varios pares enviando a la vez,
+# una pausa fija por mensaje multiplicaría el caudal total.
+_pair_slots = asyncio.Semaphore(max(1, SP_PAIR_CONCURRENCY))
+_send_budget = WeightBudget(SP_SEND_PER_SEC * 60, burst=SP_SEND_PER_SEC)
+# generate_sp_chart usa pyplot, que no admite figuras en varios hilos a la vez
+_chart_lock = asyncio.Lock()
 
-def _get_klines(symbol: str, interval: str, limit: int = 120) -> pd.DataFrame | None:
-    """Descarga velas de Binance (con fallback a Binance US)."""
-    endpoints = [
-        "https://api.binance.com/api/v3/klines",
-        "https://api.binance.us/api/v3/klines",
-    ]
-    params = {"symbol": symbol, "interval": interval, "limit": limit}
+# Stream WebSocket en uso (modo SP_STREAM_ENABLED), para sus métricas
+_stream: SPKlineStream | None = None
 
-    for url in endpoints:
-        try:
-            r = requests.get(url, params=params, timeout=5)
-            if r.status_code != 200:
-                continue
-            data = r.json()
-            if not isinstance(data, list) or len(data) < 30:
-                continue
-
-            df = pd.DataFrame(data, columns=[
-                "open_time", "open", "high", "low", "close", "volume",
-                "close_time", "q_vol", "trades", "tb_base", "tb_quote", "ignore"
-            ])
-            for col in ["open", "high", "low", "close", "volume"]:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+# Métricas por ciclo (sp_loop_stats)
+_cycle_stats: dict = {
+    "cycles": 0, "pairs": 0, "timeouts": 0, "errors": 0, "overruns": 0,
+    "max_total_s": 0.0, "last": {},
+}
 
-            df['time'] = pd.to_datetime(df['open_time'], unit='ms')
-            df.set_index('time', inplace=True)
-            return df
+# ─── OBTENCIÓN DE DATOS ───────────────────────────────────────────────────────
 
-        except Exception:
-            continue
-    return None
+async def _get_klines(symbol: str, interval: str, limit: int = 120) -> pd.DataFrame | None:
+    """
+    Descarga velas de Binance (cliente compartido, con fallback de endpoints).
+    Pasa antes por el presupuesto de peso compartido: los pares que cierran a
+    la vez se escalonan en lugar de pedir todos en el mismo segundo.
+    """
+    await binance_weight.acquire(klines_weight(limit))
+    return await get_klines(symbol, interval, limit, min_rows=30)
 
 
 # ─── MOTOR DE SEÑALES ─────────────────────────────────────────────────────────
@@ -107,192 +122,170 @@ class SPSignalEngine:
     Produce un score compuesto (positivo = BUY, negativo = SELL).
     """
 
-    def analyze(self, df: pd.DataFrame) -> dict:
+    def analyze(self, df: pd.DataFrame, key: tuple | None = None) -> dict:
         """
         Analiza el dataframe y devuelve un dict con la señal.
         Usa las velas cerradas (df[:-1]) para indicadores y la última
         vela parcial sólo para confirmar precio y timing.
+        key=(symbol, tf): la parte cerrada del análisis se memoriza hasta que
+        cierra otra vela (utils/analysis_memo.py), en la misma entrada que usa
+        analyze_batch. Los indicadores salen siempre de la ventana de velas
+        cerradas de df, como en el cálculo en lote: con estado incremental entre
+        ciclos (historia más larga que la ventana) las EMAs y RMAs no coincidirían
+        y el memo daría uno u otro resultado según quién lo hubiera llenado.
         """
         try:
             if len(df) < 30:
                 return self._empty_result(df)
 
             # Velas cerradas (confiables para indicadores)
-            df_c = df.iloc[:-1].copy()
+            df_c = df.iloc[:-1]
             if len(df_c) < 20:
                 return self._empty_result(df)
 
-            curr = df_c.iloc[-1]
-            price = float(df.iloc[-1]['close'])  # Precio actual (vela parcial)
-
-            buy_score  = 0.0
-            sell_score = 0.0
-            reasons    = []
-
-            # ── GRUPO 1: EMAs (Tendencia) ──────────────────────────────────
-            for span in [9, 20, 50]:
-                ema_val = df_c['close'].ewm(span=span, adjust=False).mean().iloc[-1]
-                if price > ema_val:
-                    buy_score  += 0.5
-                else:
-                    sell_score += 0.5
-
-            # EMA 50 doble peso
-            ema50 = df_c['close'].ewm(span=50, adjust=False).mean().iloc[-1]
-            if price > ema50:
-                buy_score += 0.5
-            else:
-                sell_score += 0.5
-
-            # ── GRUPO 2: RSI ───────────────────────────────────────────────
-            rsi_series = ta.rsi(df_c['close'], length=14)
-            rsi = float(rsi_series.iloc[-1]) if rsi_series is not None else 50.0
-
-            if rsi < 30:
-                buy_score += 1.5
-                reasons.append(f"RSI sobrevendido ({rsi:.1f})")
-            elif rsi < 45:
-                buy_score += 0.75
-            elif rsi > 70:
-                sell_score += 1.5
-                reasons.append(f"RSI sobrecomprado ({rsi:.1f})")
-            elif rsi > 55:
-                sell_score += 0.75
-
-            # ── GRUPO 3: MACD ──────────────────────────────────────────────
-            macd_df = ta.macd(df_c['close'], fast=12, slow=26, signal=9)
-            if macd_df is not None and len(macd_df.columns) >= 2:
-                hist_series = macd_df.iloc[:, 1]
-                hist_curr = float(hist_series.iloc[-1])
-                hist_prev = float(hist_series.iloc[-2]) if len(hist_series) > 1 else 0.0
-
-                if hist_curr > 0 and hist_prev <= 0:
-                    buy_score += 2.0
-                    reasons.append("MACD cruzó al alza")
-                elif hist_curr < 0 and hist_prev >= 0:
-                    sell_score += 2.0
-                    reasons.append("MACD cruzó a la baja")
-                elif hist_curr > 0:
-                    buy_score += 0.75
-                else:
-                    sell_score += 0.75
-
-            # ── GRUPO 4: Stochastic ────────────────────────────────────────
-            stoch = ta.stoch(df_c['high'], df_c['low'], df_c['close'], k=14, d=3, smooth_k=3)
-            if stoch is not None and len(stoch.columns) >= 2:
-                k_curr = float(stoch.iloc[-1, 0])
-                d_curr = float(stoch.iloc[-1, 1])
-                k_prev = float(stoch.iloc[-2, 0]) if len(stoch) > 1 else k_curr
-                d_prev = float(stoch.iloc[-2, 1]) if len(stoch) > 1 else d_curr
-
-                if k_curr < 20 and d_curr < 20:
-                    buy_score += 1.0
-                    reasons.append(f"Estocástico sobrevendido ({k_curr:.1f})")
-                elif k_curr > 80 and d_curr > 80:
-                    sell_score += 1.0
-                    reasons.append(f"Estocástico sobrecomprado ({k_curr:.1f})")
-
-                # Cruce de K sobre D (bullish)
-                if k_prev <= d_prev and k_curr > d_curr and k_curr < 50:
-                    buy_score += 0.75
-                elif k_prev >= d_prev and k_curr < d_curr and k_curr > 50:
-                    sell_score += 0.75
-
-            # ── GRUPO 5: CCI ───────────────────────────────────────────────
-            cci_series = ta.cci(df_c['high'], df_c['low'], df_c['close'], length=20)
-            if cci_series is not None:
-                cci = float(cci_series.iloc[-1])
-                cci_prev = float(cci_series.iloc[-2]) if len(cci_series) > 1 else 0.0
-
-                if cci < -100 and cci > cci_prev:
-                    buy_score += 1.0
-                    reasons.append(f"CCI en zona de rebote ({cci:.0f})")
-                elif cci > 100 and cci < cci_prev:
-                    sell_score += 1.0
-
-            # ── GRUPO 6: Bollinger Bands ───────────────────────────────────
-            bb_up = df_c['close'].rolling(20).mean() + 2 * df_c['close'].rolling(20).std()
-            bb_lo = df_c['close'].rolling(20).mean() - 2 * df_c['close'].rolling(20).std()
-            bb_up_val = float(bb_up.iloc[-1])
-            bb_lo_val = float(bb_lo.iloc[-1])
-
-            if price <= bb_lo_val * 1.005:
-                buy_score += 1.0
-                reasons.append("Precio en banda inferior BB")
-            elif price >= bb_up_val * 0.995:
-                sell_score += 1.0
-                reasons.append("Precio en banda superior BB")
-
-            # ── GRUPO 7: Volumen (MFI) ────────────────────────────────────
-            mfi_series = ta.mfi(df_c['high'], df_c['low'], df_c['close'], df_c['volume'], length=14)
-            if mfi_series is not None:
-                mfi = float(mfi_series.iloc[-1])
-                if mfi < 20:
-                    buy_score += 0.75
-                elif mfi > 80:
-                    sell_score += 0.75
-
-            # ── CÁLCULO FINAL ──────────────────────────────────────────────
-            net = buy_score - sell_score
-            score_abs = abs(net)
-
-            direction = 'NEUTRAL'
-            if net > 0.5:
-                direction = 'BUY'
-            elif net < -0.5:
-                direction = 'SELL'
-
-            if score_abs >= MIN_SCORE_STRONG:
-                strength = 'STRONG'
-            elif score_abs >= MIN_SCORE_SIGNAL:
-                strength = 'MODERATE'
-            else:
-                strength = 'WEAK'
-
-            # ── NIVELES ────────────────────────────────────────────────────
-            atr_series = ta.atr(df_c['high'], df_c['low'], df_c['close'], length=14)
-            atr = float(atr_series.iloc[-1]) if atr_series is not None else price * 0.002
-
-            if direction == 'BUY':
-                stop_loss = price - atr * 1.5
-                target1   = price + atr * 2.0
-                target2   = price + atr * 3.5
-            elif direction == 'SELL':
-                stop_loss = price + atr * 1.5
-                target1   = price - atr * 2.0
-                target2   = price - atr * 3.5
-            else:
-                stop_loss = price - atr
-                target1   = price + atr
-                target2   = price + atr * 2
-
-            # Tiempo hasta cierre de vela
-            try:
-                open_time_ms = int(df.iloc[-1]['open_time'])
-            except Exception:
-                open_time_ms = int(time.time() * 1000) - 30000
-
-            return {
-                'direction': direction,
-                'score':     round(net, 2),
-                'score_buy': round(buy_score, 2),
-                'score_sell': round(sell_score, 2),
-                'score_abs': round(score_abs, 2),
-                'strength':  strength,
-                'price':     round(price, 8),
-                'stop':      round(stop_loss, 8),
-                'target1':   round(target1, 8),
-                'target2':   round(target2, 8),
-                'atr':       round(atr, 8),
-                'rsi':       round(rsi, 2),
-                'reasons':   reasons[:4],          # Máximo 4 razones
-                'open_time': open_time_ms,
-            }
+            part = None
+            if key is not None:
+                closed_ot = int(df_c['open_time'].iloc[-1])
+                part = analysis_memo.get((*key, "sp"), closed_ot, SP_ENGINE_VERSION)
+            if part is None:
+                part = self._analyze_closed(df_c)
+                if key is not None:
+                    analysis_memo.put((*key, "sp"), closed_ot, SP_ENGINE_VERSION, part)
+
+            return self._finish(part, df)
 
         except Exception as e:
             add_log_line(f"[SP Engine] Error en analyze(): {e}")
             return self._empty_result(df)
 
+    def _analyze_closed(self, df_c: pd.DataFrame) -> dict:
+        """
+        Parte del análisis que solo depende de velas cerradas: grupos RSI,
+        MACD, Stochastic, CCI y MFI, más EMAs, bandas BB y ATR para la parte viva.
+        """
+        ind = SignalIndicators.from_frame(df_c)
+        curr, prev = ind.last, ind.prev or ind.last
+
+        buy_score  = 0.0
+        sell_score = 0.0
+        reasons    = []
+
+        # ── GRUPO 2: RSI ───────────────────────────────────────────────
+        rsi = curr['rsi']
+
+        if rsi < 30:
+            buy_score += 1.5
+            reasons.append(f"RSI sobrevendido ({rsi:.1f})")
+        elif rsi < 45:
+            buy_score += 0.75
+        elif rsi > 70:
+            sell_score += 1.5
+            reasons.append(f"RSI sobrecomprado ({rsi:.1f})")
+        elif rsi > 55:
+            sell_score += 0.75
+
+        # ── GRUPO 3: MACD ──────────────────────────────────────────────
+        hist_curr = curr['macd_hist']
+        hist_prev = prev['macd_hist']
+
+        if hist_curr > 0 and hist_prev <= 0:
+            buy_score += 2.0
+            reasons.append("MACD cruzó al alza")
+        elif hist_curr < 0 and hist_prev >= 0:
+            sell_score += 2.0
+            reasons.append("MACD cruzó a la baja")
+        elif hist_curr > 0:
+            buy_score += 0.75
+        else:
+            sell_score += 0.75
+
+        # ── GRUPO 4: Stochastic ────────────────────────────────────────
+        k_curr, d_curr = curr['stoch_k'], curr['stoch_d']
+        k_prev, d_prev = prev['stoch_k'], prev['stoch_d']
+
+        if k_curr < 20 and d_curr < 20:
+            buy_score += 1.0
+            reasons.append(f"Estocástico sobrevendido ({k_curr:.1f})")
+        elif k_curr > 80 and d_curr > 80:
+            sell_score += 1.0
+            reasons.append(f"Estocástico sobrecomprado ({k_curr:.1f})")
+
+        # Cruce de K sobre D (bullish)
+        if k_prev <= d_prev and k_curr > d_curr and k_curr < 50:
+            buy_score += 0.75
+        elif k_prev >= d_prev and k_curr < d_curr and k_curr > 50:
+            sell_score += 0.75
+
+        # ── GRUPO 5: CCI ───────────────────────────────────────────────
+        cci, cci_prev = curr['cci'], prev['cci']
+
+        if cci < -100 and cci > cci_prev:
+            buy_score += 1.0
+            reasons.append(f"CCI en zona de rebote ({cci:.0f})")
+        elif cci > 100 and cci < cci_prev:
+            sell_score += 1.0
+
+        # ── GRUPO 7: Volumen (MFI) ────────────────────────────────────
+        mfi = curr['mfi']
+        if mfi < 20:
+            buy_score += 0.75
+        elif mfi > 80:
+            sell_score += 0.75
+
+        return {
+            'buy': buy_score, 'sell': sell_score, 'reasons': reasons,
+            'rsi': rsi,
+            'ema9': curr['ema9'], 'ema20': curr['ema20'], 'ema50': curr['ema50'],
+            'bb_up': curr['bb_mid'] + 2 * curr['bb_std'],
+            'bb_lo': curr['bb_mid'] - 2 * curr['bb_std'],
+            'atr': curr['atr'],
+        }
+
+    def _finish(self, part: dict, df: pd.DataFrame) -> dict:
+        """Parte viva (GRUPO 1 EMAs, GRUPO 6 Bollinger y niveles) con el precio de la vela parcial."""
+        price = float(df.iloc[-1]['close'])  # Precio actual (vela parcial)
+
+        # Tiempo hasta cierre de vela
+        try:
+            open_time_ms = int(df.iloc[-1]['open_time'])
+        except Exception:
+            open_time_ms = int(time.time() * 1000) - 30000
+
+        return finish_signal(part, price, open_time_ms, MIN_SCORE_SIGNAL, MIN_SCORE_STRONG)
+
+    def analyze_batch(self, frames: dict) -> dict:
+        """
+        {(symbol, tf): df} → {(symbol, tf): señal}. La parte cerrada sale del
+        memo si no ha cerrado otra vela; las demás se calculan todas a la vez
+        sobre un tensor NumPy (utils/sp_batch.py). Mismo resultado que analyze(df)
+        sin key; los frames que no se pueden apilar van por analyze().
+        """
+        parts, pending, closed_ots = {}, {}, {}
+        for key, df in frames.items():
+            if df is None or len(df) < 30:
+                continue
+            closed_ots[key] = int(df['open_time'].iloc[-2])
+            part = analysis_memo.get((*key, "sp"), closed_ots[key], SP_ENGINE_VERSION)
+            if part is None:
+                pending[key] = df
+            else:
+                parts[key] = part
+
+        try:
+            for key, part in closed_frames(pending).items():
+                parts[key] = part
+                analysis_memo.put((*key, "sp"), closed_ots[key], SP_ENGINE_VERSION, part)
+        except Exception as e:
+            add_log_line(f"[SP Engine] Error en analyze_batch(): {e}")
+
+        signals = {}
+        for key, df in frames.items():
+            if key in parts:
+                signals[key] = self._finish(parts[key], df)
+            elif df is not None and len(df) > 0:
+                signals[key] = self.analyze(df, key=key)
+        return signals
+
     def _empty_result(self, df: pd.DataFrame) -> dict:
         price = float(df.iloc[-1]['close']) if len(df) > 0 else 0
         return {
@@ -438,64 +431,205 @@ def _get_signal_keyboard(symbol: str, tf: str) -> InlineKeyboardMarkup:
 async def sp_monitor_loop(bot):
     """
     Loop principal de SmartSignals.
-    Ciclo: 45 segundos.
+    Cada par despierta SCHED_CLOSE_OFFSET s después del cierre de su vela y
+    dentro de la ventana de pre-aviso (o streaming por WebSocket si SP_STREAM_ENABLED).
     """
-    add_log_line("📡 Iniciando SmartSignals Monitor (ciclo 45s)...")
+    global _stream
     init_sss()
     engine = SPSignalEngine()
 
+    if SP_STREAM_ENABLED:
+        add_log_line("📡 Iniciando SmartSignals Monitor (modo WebSocket)...")
+
+        async def _on_candle(symbol: str, tf: str, df: pd.DataFrame) -> None:
+            await _run_pair(bot, engine, symbol, tf, df=df)
+
+        stream = _stream = SPKlineStream(_on_candle, get_active_sp_pairs)
+        # Quick-notify: el par se analiza en el acto, sin esperar al siguiente mensaje
+        add_quick_notify_listener(stream.poke)
+        await stream.run()
+        return
+
+    add_log_line("📡 Iniciando SmartSignals Monitor (alineado al cierre de vela)...")
+    scheduler = CandleScheduler("sp", close_offset_s=SCHED_CLOSE_OFFSET,
+                                pre_window_s=PRE_ALERT_WAKE_SECS, max_idle_s=SP_MAX_IDLE_S)
+    # Quick-notify: el par despierta en el acto, sin esperar al cierre de su vela
+    add_quick_notify_listener(lambda symbol, tf: scheduler.wake_now((symbol, tf)))
+    quick_seen: set = set()
     while True:
         try:
-            pairs = get_active_sp_pairs()
-
+            active = list(get_active_sp_pairs())
+            scheduler.sync_pairs(active)
+            # Pendientes que no pasaron por el aviso (p.ej. encolados antes de un reinicio)
+            quick = set(get_quick_notify_pairs())
+            for pair in quick - quick_seen:
+                scheduler.wake_now(pair)
+            quick_seen = quick
+            # Solo los pares cuya vela acaba de cerrar o entra en pre-aviso
+            pairs = [pair for pair, _kind in await scheduler.wait()]
             if not pairs:
-                await asyncio.sleep(30)
                 continue
 
-            for symbol, tf in pairs:
-                try:
-                    await _process_pair(bot, engine, symbol, tf)
-                except Exception as e:
-                    add_log_line(f"[SP Loop] Error procesando {symbol}/{tf}: {e}")
-
-                # Pausa pequeña entre pares para no saturar la API
-                await asyncio.sleep(1.2)
+            t_start = time.perf_counter()
+            # Velas de todos los pares (el cliente compartido limita las conexiones
+            # y el presupuesto de peso las escalona)
+            results = await asyncio.gather(
+                *(asyncio.wait_for(_get_klines(symbol, tf, 120), SP_PAIR_TIMEOUT)
+                  for symbol, tf in pairs),
+                return_exceptions=True,
+            )
+            frames = {}
+            for (symbol, tf), df in zip(pairs, results):
+                if isinstance(df, Exception):
+                    add_log_line(f"[SP Loop] Error descargando {symbol}/{tf}: {df!r}")
+                elif df is not None and len(df) >= 30:
+                    frames[(symbol, tf)] = df
+            t_fetch = time.perf_counter()
+
+            # Todas las señales en un solo cálculo vectorizado
+            signals = engine.analyze_batch(frames)
+            t_analyze = time.perf_counter()
+
+            outcomes = await asyncio.gather(*(
+                _run_pair(bot, engine, symbol, tf, df=df, sig=signals.get((symbol, tf)))
+                for (symbol, tf), df in frames.items()
+            ))
+            _record_cycle(active, pairs, frames, outcomes, t_start, t_fetch, t_analyze,
+                          time.perf_counter(), scheduler)
 
         except Exception as e:
             add_log_line(f"[SP Loop] Error general: {e}")
+            await asyncio.sleep(5)
+
+
+async def _run_pair(bot, engine: SPSignalEngine, symbol: str, tf: str,
+                    df: pd.DataFrame | None = None, sig: dict | None = None) -> tuple[str, float]:
+    """
+    _process_pair dentro del pool acotado. El tiempo máximo por par se aplica
+    a la preparación (descarga, análisis, filtros); el gráfico y los envíos van
+    fuera del pool y del timeout: la espera de _chart_lock no cuenta contra el
+    par y un envío nunca se cancela a medias.
+    Devuelve (resultado, segundos de preparación): 'ok', 'timeout' o 'error'.
+    """
+    deliveries = []
+    async with _pair_slots:
+        t0 = time.perf_counter()
+        try:
+            deliveries = await asyncio.wait_for(
+                _prepare_pair(bot, engine, symbol, tf, df=df, sig=sig), SP_PAIR_TIMEOUT
+            )
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            add_log_line(f"[SP Loop] {symbol}/{tf} superó {SP_PAIR_TIMEOUT:g}s, se abandona este ciclo")
+            outcome = "timeout"
+        except Exception as e:
+            add_log_line(f"[SP Loop] Error procesando {symbol}/{tf}: {e}")
+            outcome = "error"
+        elapsed = time.perf_counter() - t0
 
-        await asyncio.sleep(LOOP_INTERVAL_S)
+    for deliver in deliveries:
+        try:
+            await deliver()
+        except Exception as e:
+            add_log_line(f"[SP Loop] Error enviando {symbol}/{tf}: {e}")
+    return outcome, elapsed
 
 
-async def _process_pair(bot, engine: SPSignalEngine, symbol: str, tf: str) -> None:
+def _record_cycle(active: list, pairs: list, frames: dict, outcomes: list, t_start: float,
+                  t_fetch: float, t_analyze: float, t_end: float, scheduler: CandleScheduler) -> None:
+    """
+    Guarda los tiempos del ciclo y avisa si la pasada completa tarda más que
+    una vela de la temporalidad suscrita más rápida.
+    """
+    total = t_end - t_start
+    durations = [d for _o, d in outcomes]
+    slowest = max(zip(durations, frames), default=(0.0, None))
+    budget_s = min((interval_to_ms(tf) or 60_000) for _s, tf in (active or pairs)) / 1000
+    last = {
+        "pairs": len(pairs),
+        "processed": len(frames),
+        "fetch_s": round(t_fetch - t_start, 3),
+        "analyze_s": round(t_analyze - t_fetch, 3),
+        "process_s": round(t_end - t_analyze, 3),
+        "total_s": round(total, 3),
+        "slowest_pair": "/".join(slowest[1]) if slowest[1] else None,
+        "slowest_s": round(slowest[0], 3),
+        "timeouts": sum(1 for o, _d in outcomes if o == "timeout"),
+        "errors": sum(1 for o, _d in outcomes if o == "error"),
+        "budget_s": budget_s,
+    }
+    _cycle_stats["cycles"] += 1
+    _cycle_stats["pairs"] += len(pairs)
+    _cycle_stats["timeouts"] += last["timeouts"]
+    _cycle_stats["errors"] += last["errors"]
+    _cycle_stats["max_total_s"] = max(_cycle_stats["max_total_s"], last["total_s"])
+    _cycle_stats["last"] = last
+    _cycle_stats["scheduler"] = scheduler.stats()
+    if total > budget_s:
+        _cycle_stats["overruns"] += 1
+        add_log_line(f"[SP Loop] Ciclo de {len(pairs)} pares en {total:.1f}s, más que una vela "
+                     f"de {budget_s:.0f}s (más lento: {last['slowest_pair']} {slowest[0]:.1f}s)")
+
+
+def sp_loop_stats() -> dict:
+    """Métricas del bucle: ciclos, pares, timeouts, errores y tiempos del último ciclo."""
+    return {
+        **_cycle_stats,
+        "last": dict(_cycle_stats["last"]),
+        "binance_weight": binance_weight.stats(),
+        "send_budget": _send_budget.stats(),
+        "stream": _stream.stats() if _stream is not None else None,
+    }
+
+
+async def _process_pair(bot, engine: SPSignalEngine, symbol: str, tf: str,
+                        df: pd.DataFrame | None = None, sig: dict | None = None) -> None:
     """
     Procesa un par/TF: descarga datos, analiza y envía señal si corresponde.
     v2: aplica estrategia SSS por usuario y soporta quick-notify.
+    df: velas ya en memoria (modo WebSocket o ciclo en lote); si falta se descargan.
+    sig: señal ya calculada (analyze_batch); si falta se analiza aquí.
+    """
+    for deliver in await _prepare_pair(bot, engine, symbol, tf, df=df, sig=sig):
+        await deliver()
+
+
+async def _prepare_pair(bot, engine: SPSignalEngine, symbol: str, tf: str,
+                        df: pd.DataFrame | None = None, sig: dict | None = None) -> list:
+    """
+    Todo el trabajo de _process_pair salvo el gráfico y los envíos: descarga,
+    análisis y filtros de estrategia. Devuelve los envíos pendientes (funciones
+    async sin argumentos, que generan su gráfico y envían). El cooldown y el
+    pre-aviso quedan registrados aquí, antes de enviar: si el envío se corta a
+    medias no se vuelve a mandar a quien ya lo recibió. La cola quick-notify se
+    vacía en el envío, con el gráfico ya listo: si el par se abandona por
+    timeout los usuarios siguen en cola para el siguiente ciclo.
     """
+    deliveries = []
 
     # 1. Descargar velas
     loop = asyncio.get_running_loop()
-    df = await loop.run_in_executor(None, _get_klines, symbol, tf, 120)
+    if df is None:
+        df = await _get_klines(symbol, tf, 120)
     if df is None or len(df) < 30:
-        return
+        return deliveries
 
     # 2. Analizar señal base
-    sig = engine.analyze(df)
+    if sig is None:
+        sig = engine.analyze(df, key=(symbol, tf))
 
     # 3. Manejar quick-notify (usuarios que acaban de suscribirse)
-    quick_users = pop_quick_notify(symbol, tf)
-    if quick_users:
-        await _send_quick_notify(bot, quick_users, symbol, tf, sig, df, loop)
+    if has_quick_notify(symbol, tf):
+        deliveries.append(_prepare_quick_notify(bot, symbol, tf, sig, df, loop))
 
     # 4. Señal demasiado débil — solo pre-aviso
-    if sig['direction'] == 'NEUTRAL' or sig['score_abs'] < MIN_SCORE_SIGNAL:
-        await _check_pre_alert(bot, symbol, tf, sig, df)
-        return
-
     # 5. Verificar cooldown
-    if not can_send_signal(symbol, tf):
-        await _check_pre_alert(bot, symbol, tf, sig, df)
-        return
+    if (sig['direction'] == 'NEUTRAL' or sig['score_abs'] < MIN_SCORE_SIGNAL
+            or not can_send_signal(symbol, tf)):
+        pre_alert = _prepare_pre_alert(bot, symbol, tf, sig, df)
+        if pre_alert:
+            deliveries.append(pre_alert)
+        return deliveries
 
     # 6. Calcular tiempo hasta cierre de vela
     try:
@@ -508,10 +642,9 @@ async def _process_pair(bot, engine: SPSignalEngine, symbol: str, tf: str) -> No
     # 7. Obtener suscriptores
     subscribers = get_sp_subscribers(symbol, tf)
     if not subscribers:
-        return
+        return deliveries
 
-    # 8. Generar gráfico base
-    chart_buf = await loop.run_in_executor(None, generate_sp_chart, df, symbol, tf, sig, 60)
+    # 8. El gráfico base se genera en el envío (fuera del timeout del par)
 
     # 9. Agrupar suscriptores por estrategia (personalización de mensaje)
     # Cada grupo recibe un mensaje ligeramente diferente
@@ -521,8 +654,8 @@ async def _process_pair(bot, engine: SPSignalEngine, symbol: str, tf: str) -> No
         gkey  = strat['id'] if strat else '__base__'
         groups.setdefault(gkey, []).append(uid)
 
-    # 10. Enviar a cada grupo
-    sent_count = 0
+    # 10. Preparar el mensaje de cada grupo
+    batches = []   # [(uids, texto, teclado)]
     for gkey, uids in groups.items():
         if gkey == '__base__':
             # Mensaje estándar sin estrategia
@@ -547,76 +680,53 @@ async def _process_pair(bot, engine: SPSignalEngine, symbol: str, tf: str) -> No
                 strat_block  = build_strategy_signal_block(sig_enriched)
                 msg_text     = base_msg + "\n" + strat_block
                 keyboard     = _get_signal_keyboard(symbol, tf)
-
-        # FIX caption: Telegram limita captions a 1024 chars
-        if chart_buf and len(msg_text) > 1024:
-            msg_text = msg_text[:1020] + "…`"
-
-        for uid in uids:
-            try:
-                if chart_buf:
-                    chart_buf.seek(0)
-                    await bot.send_photo(
-                        chat_id=int(uid),
-                        photo=chart_buf,
-                        caption=msg_text,
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=keyboard,
-                    )
-                else:
-                    await bot.send_message(
-                        chat_id=int(uid),
-                        text=msg_text,
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=keyboard,
-                    )
-                sent_count += 1
-                await asyncio.sleep(0.05)
-            except Exception as e:
-                add_log_line(f"[SP Loop] Error enviando a {uid}: {e}")
-
-    if sent_count > 0:
-        # 11. Registrar señal
-        update_sp_state(symbol, tf, sig)
-        record_signal_history(symbol, tf, sig)
+        batches.append((uids, msg_text, keyboard))
+
+    if not batches:
+        return deliveries
+
+    # 11. Registrar señal antes de enviarla (cooldown aunque el envío se corte)
+    update_sp_state(symbol, tf, sig)
+    record_signal_history(symbol, tf, sig)
+
+    async def _deliver_signal() -> None:
+        chart_buf = await _render_chart(loop, df, symbol, tf, sig)
+        sent_count = 0
+        for uids, msg_text, keyboard in batches:
+            # FIX caption: Telegram limita captions a 1024 chars
+            if chart_buf and len(msg_text) > 1024:
+                msg_text = msg_text[:1020] + "…`"
+            sent_count += await _fan_out(bot, uids, msg_text, keyboard, chart_buf, "[SP Loop]")
         coin = symbol.replace('USDT', '')
         add_log_line(f"📡 SP señal {sig['direction']} {coin}/{tf} — "
                      f"score {sig['score']:.1f} — enviada a {sent_count} usuarios")
 
+    deliveries.append(_deliver_signal)
+    return deliveries
 
-async def _send_quick_notify(
-    bot, users: list, symbol: str, tf: str,
-    sig: dict, df: pd.DataFrame, loop
-) -> None:
+
+async def _render_chart(loop, df: pd.DataFrame, symbol: str, tf: str, sig: dict):
     """
-    Envía señal inmediata a usuarios recién suscritos (quick-notify).
-    No respeta cooldown ni score mínimo — solo informa del estado actual.
+    generate_sp_chart en el executor, de uno en uno. Si la tarea se cancela,
+    el lock no se suelta hasta que el hilo termina de verdad: otro gráfico en
+    paralelo pisaría la figura de pyplot.
     """
-    if not users:
-        return
-
-    try:
-        open_time_ms = int(df.iloc[-1]['open_time'])
-    except Exception:
-        open_time_ms = int(time.time() * 1000)
-
-    sig_copy = dict(sig)
-    sig_copy['time_to_close'] = estimate_time_to_candle_close(open_time_ms, tf)
-
-    chart_buf = await loop.run_in_executor(None, generate_sp_chart, df, symbol, tf, sig_copy, 60)
-    coin      = symbol.replace('USDT', '')
-
-    intro = (
-        f"📡 *SmartSignals activo!* \\— `{coin}` (`{tf}`)\n"
-        f"_Esta es la señal actual en el momento de tu suscripción:_\n\n"
-    )
-    msg_text = intro + build_signal_message(symbol, tf, sig_copy)
-    keyboard = _get_signal_keyboard(symbol, tf)
+    async with _chart_lock:
+        fut = loop.run_in_executor(None, generate_sp_chart, df, symbol, tf, sig, 60)
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            await asyncio.wait([fut])
+            raise
 
-    if chart_buf and len(msg_text) > 1024:
-        msg_text = msg_text[:1020] + "…`"
 
-    for uid in users:
+async def _fan_out(bot, uids: list, msg_text: str, keyboard, chart_buf, tag: str) -> int:
+    """
+    Envía el mismo mensaje (con gráfico si lo hay) a cada usuario, al ritmo del
+    presupuesto de envío compartido. Devuelve cuántos envíos salieron bien.
+    """
+    sent = 0
+    for uid in uids:
         try:
             if chart_buf:
                 chart_buf.seek(0)
@@ -634,62 +744,93 @@ async def _send_quick_notify(
                     parse_mode=ParseMode.MARKDOWN,
                     reply_markup=keyboard,
                 )
-            await asyncio.sleep(0.05)
+            sent += 1
+            await _send_budget.acquire()
         except Exception as e:
-            add_log_line(f"[SP Quick] Error enviando a {uid}: {e}")
+            add_log_line(f"{tag} Error enviando a {uid}: {e}")
+    return sent
+
+
+def _prepare_quick_notify(
+    bot, symbol: str, tf: str,
+    sig: dict, df: pd.DataFrame, loop
+):
+    """
+    Prepara la señal inmediata para usuarios recién suscritos (quick-notify)
+    y devuelve el envío pendiente. Los usuarios se sacan de la cola en el
+    envío, una vez generado el gráfico.
+    No respeta cooldown ni score mínimo — solo informa del estado actual.
+    """
+    try:
+        open_time_ms = int(df.iloc[-1]['open_time'])
+    except Exception:
+        open_time_ms = int(time.time() * 1000)
+
+    sig_copy = dict(sig)
+    sig_copy['time_to_close'] = estimate_time_to_candle_close(open_time_ms, tf)
+
+    coin      = symbol.replace('USDT', '')
+
+    intro = (
+        f"📡 *SmartSignals activo!* \\— `{coin}` (`{tf}`)\n"
+        f"_Esta es la señal actual en el momento de tu suscripción:_\n\n"
+    )
+    msg_text = intro + build_signal_message(symbol, tf, sig_copy)
+    keyboard = _get_signal_keyboard(symbol, tf)
+
+    async def _deliver() -> None:
+        chart_buf = await _render_chart(loop, df, symbol, tf, sig_copy)
+        users = pop_quick_notify(symbol, tf)
+        if not users:
+            return
+        text = msg_text[:1020] + "…`" if chart_buf and len(msg_text) > 1024 else msg_text
+        await _fan_out(bot, users, text, keyboard, chart_buf, "[SP Quick]")
+
+    return _deliver
 
 
-async def _check_pre_alert(bot, symbol: str, tf: str, sig: dict, df: pd.DataFrame) -> None:
+def _prepare_pre_alert(bot, symbol: str, tf: str, sig: dict, df: pd.DataFrame):
     """
     Verifica si procede enviar un pre-aviso (señal en formación, vela a punto de cerrar).
+    Devuelve el envío pendiente o None; la vela queda marcada como avisada.
     """
     if sig['score_abs'] < PRE_ALERT_MIN_SCORE:
-        return
+        return None
     if sig['direction'] == 'NEUTRAL':
-        return
+        return None
 
     try:
         open_time_ms = int(df.iloc[-1]['open_time'])
     except Exception:
-        return
+        return None
 
     time_to_close = estimate_time_to_candle_close(open_time_ms, tf)
     if time_to_close > PRE_ALERT_SECS:
-        return
+        return None
 
     # Evitar pre-avisos duplicados para la misma vela
     pre_key = f"{symbol}_{tf}_{open_time_ms}"
     if _pre_alerts_sent.get(pre_key):
-        return
+        return None
 
     subscribers = get_sp_subscribers(symbol, tf)
     if not subscribers:
-        return
+        return None
 
     sig['time_to_close'] = time_to_close
     msg = build_pre_alert_message(symbol, tf, sig)
 
-    sent = 0
-    for uid in subscribers:
-        try:
-            await bot.send_message(
-                chat_id=int(uid),
-                text=msg,
-                parse_mode=ParseMode.MARKDOWN,
-            )
-            sent += 1
-            await asyncio.sleep(0.05)
-        except Exception:
-            pass
-
-    if sent > 0:
-        _pre_alerts_sent[pre_key] = True
-        # Limpiar pre-avisos antiguos (solo guardar últimos 200)
-        if len(_pre_alerts_sent) > 200:
-            keys = list(_pre_alerts_sent.keys())
-            for old_key in keys[:50]:
-                del _pre_alerts_sent[old_key]
+    _pre_alerts_sent[pre_key] = True
+    # Limpiar pre-avisos antiguos (solo guardar últimos 200)
+    if len(_pre_alerts_sent) > 200:
+        keys = list(_pre_alerts_sent.keys())
+        for old_key in keys[:50]:
+            del _pre_alerts_sent[old_key]
 
+    async def _deliver() -> None:
+        sent = await _fan_out(bot, subscribers, msg, None, None, "[SP Pre]")
         coin = symbol.replace('USDT', '')
         add_log_line(f"⚡ SP pre-aviso {sig['direction']} {coin}/{tf} — "
-                     f"{time_to_close}s para cierre — {sent} usuarios")
\ No newline at end of file
+                     f"{time_to_close}s para cierre — {sent} usuarios")
+
+    return _deliver
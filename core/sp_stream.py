@@ -0,0 +1,274 @@
+# core/sp_stream.py
+# Ingesta de velas por WebSocket (streams combinados de Binance) para SmartSignals.
+#
+# Modo opcional (SP_STREAM_ENABLED=1). En lugar de sondear REST cada 45 s:
+#   - se siembra un ring buffer por par/TF con una descarga REST,
+#   - se abre UNA conexión a <SP_STREAM_URL>?streams=btcusdt@kline_1m/...
+#   - cada mensaje kline actualiza la vela en curso en memoria,
+#   - se dispara el análisis:
+#       · al abrir vela nueva (= la anterior cerró; el motor analiza df[:-1]),
+#       · en actualizaciones de la vela en curso, como mucho cada SP_STREAM_THROTTLE s
+#         (suficiente para la ventana de pre-aviso de 1m/5m),
+#   - reconexión con backoff exponencial y backfill REST (startTime) si falta
+#     alguna vela tras un corte o un salto en el stream.
+# Se puede probar contra scripts/ws_replay_server.py (SP_STREAM_URL / SP_STREAM_REST_URL).
+
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from core.config import SP_STREAM_URL, SP_STREAM_REST_URL, SP_STREAM_THROTTLE
+from utils.file_manager import add_log_line
+from utils.kline_buffer import KlineRingBuffer
+from utils.market_data import interval_to_ms, klines_frame, market_data
+
+HISTORY_CANDLES   = 120   # Igual que el sondeo REST de sp_loop
+PAIRS_REFRESH_S   = 30    # Cada cuánto se revisan altas/bajas de pares
+BACKOFF_MAX_S     = 60
+
+
+def _rest_endpoints():
+    if not SP_STREAM_REST_URL:
+        return None
+    return (SP_STREAM_REST_URL.rstrip("/") + "/api/v3/klines",)
+
+
+class SPKlineStream:
+    """Velas en memoria alimentadas por WebSocket + disparo de análisis."""
+
+    def __init__(self, on_candle, pairs_provider, url: str = SP_STREAM_URL,
+                 throttle: float = SP_STREAM_THROTTLE, history: int = HISTORY_CANDLES):
+        """
+        on_candle(symbol, tf, df): corrutina de análisis.
+        pairs_provider(): lista de (symbol, tf) activos.
+        """
+        self.on_candle = on_candle
+        self.pairs_provider = pairs_provider
+        self.url = url
+        self.throttle = throttle
+        self.history = history
+        self._buffers: dict[tuple, KlineRingBuffer] = {}
+        self._pairs: set = set()
+        self._last_run: dict[tuple, float] = {}
+        self._running: set = set()
+        self._rerun: set = set()        # Vela nueva llegada con el análisis en curso
+        self._tasks: set = set()        # Análisis en curso (referencia fuerte hasta que acaben)
+        self._session: aiohttp.ClientSession | None = None
+        # Métricas
+        self.messages = 0
+        self.reconnects = 0
+        self.backfills = 0
+        self.analyses = 0
+        self.bad_messages = 0
+
+    # ─── BUFFERS ──────────────────────────────────────────────────────────────
+
+    async def _seed(self, symbol: str, tf: str) -> bool:
+        df = await market_data.fetch_klines(symbol, tf, self.history,
+                                            endpoints=_rest_endpoints(), min_rows=30)
+        if df is None:
+            return False
+        buf = KlineRingBuffer(self.history)
+        buf.seed(df)
+        buf.refreshed_at = time.monotonic()
+        self._buffers[(symbol, tf)] = buf
+        return True
+
+    async def _backfill(self, key: tuple) -> None:
+        """Rellena por REST desde la última vela guardada hasta ahora."""
+        buf = self._buffers.get(key)
+        step = interval_to_ms(key[1])
+        if buf is None or not len(buf) or not step:
+            return
+        missing = (int(time.time() * 1000) - buf.last_open_time) // step + 2
+        if missing > self.history:
+            await self._seed(*key)
+            self.backfills += 1
+            return
+        new = await market_data.fetch_klines(key[0], key[1], missing,
+                                             endpoints=_rest_endpoints(),
+                                             start_time=buf.last_open_time)
+        if new is not None:
+            buf.merge(new)
+            buf.refreshed_at = time.monotonic()
+            self.backfills += 1
+
+    def frame(self, symbol: str, tf: str):
+        buf = self._buffers.get((symbol, tf))
+        return buf.to_frame() if buf is not None and len(buf) else None
+
+    # ─── MENSAJES ─────────────────────────────────────────────────────────────
+
+    async def handle_message(self, raw: str) -> None:
+        """Procesa un mensaje del stream combinado {"stream": ..., "data": {"e": "kline", ...}}."""
+        try:
+            msg = json.loads(raw)
+        except ValueError:
+            return
+        data = msg.get("data", msg)
+        k = data.get("k") if isinstance(data, dict) else None
+        if not isinstance(k, dict):
+            return
+        self.messages += 1
+        try:
+            key = (str(k["s"]).upper(), str(k["i"]))
+            open_time = int(k["t"])
+            row = [open_time, float(k["o"]), float(k["h"]), float(k["l"]),
+                   float(k["c"]), float(k["v"]), int(k["T"])]
+        except (KeyError, TypeError, ValueError) as e:
+            self.bad_messages += 1
+            add_log_line(f"[SP Stream] Kline mal formada ignorada: {e!r}")
+            return
+        buf = self._buffers.get(key)
+        if buf is None:
+            return
+
+        last = buf.last_open_time
+        step = interval_to_ms(key[1]) or 0
+        if last is not None and step and open_time > last + step:
+            # Salto en el stream: faltan velas intermedias
+            await self._backfill(key)
+            last = buf.last_open_time
+
+        buf.merge(klines_frame([row]))
+
+        new_candle = last is not None and open_time > last
+        self._maybe_analyze(key, force=new_candle)
+
+    def _maybe_analyze(self, key: tuple, force: bool = False) -> None:
+        now = time.monotonic()
+        if key in self._running:
+            # La vela nueva no se pierde: se analiza al terminar el análisis en curso
+            if force:
+                self._rerun.add(key)
+            return
+        if not force and now - self._last_run.get(key, 0.0) < self.throttle:
+            return
+        self._last_run[key] = now
+        self._running.add(key)
+        task = asyncio.create_task(self._analyze(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            add_log_line(f"[SP Stream] Análisis terminado con error: {task.exception()!r}")
+
+    def stop(self) -> None:
+        """Cancela los análisis en curso (al salir de run() o al apagar el bot)."""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def poke(self, symbol: str, tf: str) -> None:
+        """Analiza el par en cuanto sea posible (p.ej. quick-notify de un usuario)."""
+        if (symbol, tf) in self._buffers:
+            self._maybe_analyze((symbol, tf), force=True)
+
+    async def _analyze(self, key: tuple) -> None:
+        try:
+            df = self.frame(*key)
+            if df is not None:
+                self.analyses += 1
+                await self.on_candle(key[0], key[1], df)
+        except Exception as e:
+            add_log_line(f"[SP Stream] Error analizando {key[0]}/{key[1]}: {e}")
+        finally:
+            self._running.discard(key)
+            if key in self._rerun:
+                self._rerun.discard(key)
+                if key in self._buffers:
+                    self._maybe_analyze(key, force=True)
+
+    # ─── CONEXIÓN ─────────────────────────────────────────────────────────────
+
+    def stream_url(self, pairs) -> str:
+        streams = "/".join(f"{s.lower()}@kline_{tf}" for s, tf in sorted(pairs))
+        return f"{self.url}?streams={streams}"
+
+    async def _sync_pairs(self) -> bool:
+        """Siembra pares nuevos y olvida los retirados. True si cambió el conjunto."""
+        pairs = set(self.pairs_provider())
+        # También se reintentan los pares cuya siembra falló antes
+        for key in pairs - set(self._buffers):
+            if not await self._seed(*key):
+                add_log_line(f"[SP Stream] No se pudo sembrar {key[0]}/{key[1]}")
+        if pairs == self._pairs:
+            return False
+        for key in self._pairs - pairs:
+            self._buffers.pop(key, None)
+            self._last_run.pop(key, None)
+            self._rerun.discard(key)
+        self._pairs = pairs
+        return True
+
+    async def _watch_pairs(self, ws) -> None:
+        """Cierra la conexión cuando cambian los pares para resuscribir."""
+        while not ws.closed:
+            await asyncio.sleep(PAIRS_REFRESH_S)
+            try:
+                changed = set(self.pairs_provider()) != self._pairs
+            except Exception as e:
+                add_log_line(f"[SP Stream] Error leyendo pares activos: {e}")
+                continue
+            if changed:
+                await ws.close()
+                return
+
+    async def run(self) -> None:
+        """Bucle de conexión con reconexión y backfill. No retorna."""
+        backoff = 1
+        self._session = aiohttp.ClientSession()
+        try:
+            while True:
+                try:
+                    await self._sync_pairs()
+                    if not self._pairs:
+                        await asyncio.sleep(PAIRS_REFRESH_S)
+                        continue
+                    async with self._session.ws_connect(self.stream_url(self._pairs),
+                                                        heartbeat=20) as ws:
+                        add_log_line(f"📡 [SP Stream] Conectado ({len(self._pairs)} streams)")
+                        backoff = 1
+                        # Lo ocurrido durante el corte se recupera por REST
+                        for key, buf in list(self._buffers.items()):
+                            if time.monotonic() - buf.refreshed_at > 5:
+                                try:
+                                    await self._backfill(key)
+                                except Exception as e:
+                                    add_log_line(f"[SP Stream] Backfill fallido {key[0]}/{key[1]}: {e!r}")
+                        watcher = asyncio.create_task(self._watch_pairs(ws))
+                        try:
+                            async for msg in ws:
+                                if msg.type == aiohttp.WSMsgType.TEXT:
+                                    try:
+                                        await self.handle_message(msg.data)
+                                    except Exception as e:
+                                        # Un mensaje raro no tumba la conexión
+                                        self.bad_messages += 1
+                                        add_log_line(f"[SP Stream] Error procesando mensaje: {e!r}")
+                                elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                                    break
+                        finally:
+                            watcher.cancel()
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    add_log_line(f"[SP Stream] Conexión perdida: {e}")
+                except Exception as e:
+                    # Fallos de pairs_provider, siembra o backfill: mismo backoff que un corte
+                    add_log_line(f"[SP Stream] Error en la conexión: {e!r}")
+
+                self.reconnects += 1
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX_S)
+        finally:
+            self.stop()
+            await self._session.close()
+
+    def stats(self) -> dict:
+        return {
+            "pairs": len(self._pairs), "messages": self.messages,
+            "reconnects": self.reconnects, "backfills": self.backfills,
+            "analyses": self.analyses, "bad_messages": self.bad_messages,
+        }
@@ -6,7 +6,7 @@ from telegram.constants import ParseMode
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from utils.valerts_manager import (
-    get_active_symbols,
+    get_active_valerts_pairs,
     get_valerts_subscribers,
     update_symbol_state,
     get_symbol_state
@@ -14,8 +14,10 @@ from utils.valerts_manager import (
 from utils.file_manager import add_log_line
 from utils.ads_manager import get_random_ad_text
 from utils.tv_helper import get_tv_data
-from core.btc_advanced_analysis import BTCAdvancedAnalyzer
+from core.btc_advanced_analysis import analyze_live
 from handlers.valerts_handlers import get_kline_data
+from utils.candle_scheduler import CandleScheduler, binance_weight, klines_weight
+from core.config import SCHED_CLOSE_OFFSET, VALERTS_MAX_IDLE_S
 
 # Variable global para la función de envío
 _sender_func = None
@@ -38,25 +40,31 @@ async def valerts_monitor_loop(bot):
     """
     Monitor Multi-Moneda PRO (Estilo BTC Alert).
     Incluye lógica de Sesión, Niveles Dinámicos y Alertas Ricas.
+    Cada (symbol, TF) despierta tras el cierre de su vela (sesión nueva) y
+    cada VALERTS_MAX_IDLE_S entre cierres para los cruces de nivel.
     """
     add_log_line("🦁 Iniciando Monitor Valerts PRO (Smart Logic Multi-Coin)...")
     
     # Definimos las temporalidades a monitorear
     TIMEFRAMES = ["1h", "4h", "12h", "1d"]
+    scheduler = CandleScheduler("valerts", close_offset_s=SCHED_CLOSE_OFFSET,
+                                max_idle_s=VALERTS_MAX_IDLE_S)
     
     while True:
         try:
-            active_symbols = get_active_symbols()
+            scheduler.sync_pairs(p for p in get_active_valerts_pairs() if p[1] in TIMEFRAMES)
+            due = await scheduler.wait()
+
+            # Agrupados por símbolo, en el orden de TIMEFRAMES
+            due_by_symbol = {}
+            for symbol, interval in sorted((pair for pair, _kind in due),
+                                           key=lambda p: (p[0], TIMEFRAMES.index(p[1]))):
+                due_by_symbol.setdefault(symbol, []).append(interval)
             
-            # Si no hay nadie suscrito a nada, esperamos y reintentamos
-            if not active_symbols:
-                await asyncio.sleep(30)
-                continue
-            
-            for symbol in active_symbols:
+            for symbol, intervals in due_by_symbol.items():
                 display_sym = symbol.replace("USDT", "") # Ej: ETH
                 
-                for interval in TIMEFRAMES:
+                for interval in intervals:
                     
                     # 1. Validación de Suscriptores
                     subs = get_valerts_subscribers(symbol, interval)
@@ -65,7 +73,8 @@ async def valerts_monitor_loop(bot):
                     
                     # 2. Obtención de Datos (Binance primero, TradingView fallback)
                     source = "BINANCE"
-                    df = get_kline_data(symbol, interval, limit=300)
+                    await binance_weight.acquire(klines_weight(300))
+                    df = await get_kline_data(symbol, interval, limit=300)
 
                     if df is None or len(df) < 100:
                         # Verificar throttling para TradingView (5 minutos = 300 segundos)
@@ -110,10 +119,9 @@ async def valerts_monitor_loop(bot):
                         current_price = float(curr_candle['close'])
 
                         # 3. Análisis Técnico Avanzado (Binance)
-                        analyzer = BTCAdvancedAnalyzer(df)
-                        levels_fib = analyzer.get_support_resistance_dynamic(interval=interval)
-                        momentum_signal, mom_emoji, (buy_score, sell_score), reasons = analyzer.get_momentum_signal()
-                        divergence = analyzer.detect_rsi_divergence(lookback=5)
+                        # Niveles memorizados por vela cerrada; solo se recalcula la parte en vivo
+                        levels_fib, momentum, divergence = analyze_live(df, interval, (symbol, interval, "valerts"))
+                        momentum_signal, mom_emoji, (buy_score, sell_score), reasons = momentum
                     
                     # 4. Gestión de Estado (Persistencia)
                     current_state = get_symbol_state(symbol, interval)
@@ -434,8 +442,6 @@ async def valerts_monitor_loop(bot):
                 
                 await asyncio.sleep(0.5) # Pausa entre símbolos
             
-            await asyncio.sleep(30) # Espera antes del siguiente ciclo general
-            
         except Exception as e:
             add_log_line(f"❌ Error en Valerts Monitor Loop: {e}")
             import traceback
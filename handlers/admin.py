@@ -34,11 +34,19 @@ from utils.telemetry import (
 )
 from core.config import ( 
     VERSION, PID, PYTHON_VERSION, STATE, ADMIN_CHAT_IDS, 
-    USUARIOS_PATH, PRICE_ALERTS_PATH, HBD_HISTORY_PATH,
+    USUARIOS_PATH, USUARIOS_DB_PATH, PRICE_ALERTS_PATH, HBD_HISTORY_PATH,
     CUSTOM_ALERT_HISTORY_PATH, ADS_PATH, ELTOQUE_HISTORY_PATH,
     LAST_PRICES_PATH, TEMPLATE_PATH, HBD_THRESHOLDS_PATH,
-    WEATHER_SUBS_PATH, WEATHER_LAST_ALERTS_PATH
+    WEATHER_SUBS_PATH, WEATHER_LAST_ALERTS_PATH,
+    CMC_API_KEY_ALERTA, CMC_API_KEY_CONTROL
     )
+from utils.cmc_budget import cmc_budget, cmc_budget_stats
+from utils.analysis_memo import analysis_memo
+from utils.indicator_stream import indicator_streams
+from utils.candle_archive import candle_archive
+from utils.candle_scheduler import scheduler_stats
+from core.sp_loop import sp_loop_stats
+from core.btc_loop import btc_resample_stats
 from core.i18n import _
 
 # Definimos los estados para nuestra conversación de mensaje masivo
@@ -597,7 +605,7 @@ async def users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # 3. Size file
     size={"file_size": 0}
     archivos = [
-        USUARIOS_PATH, PRICE_ALERTS_PATH, HBD_HISTORY_PATH,
+        USUARIOS_PATH, USUARIOS_DB_PATH, f"{USUARIOS_DB_PATH}-wal", PRICE_ALERTS_PATH, HBD_HISTORY_PATH,
         CUSTOM_ALERT_HISTORY_PATH, ADS_PATH, ELTOQUE_HISTORY_PATH,
         LAST_PRICES_PATH, TEMPLATE_PATH, HBD_THRESHOLDS_PATH,
         WEATHER_SUBS_PATH, WEATHER_LAST_ALERTS_PATH
@@ -956,4 +964,113 @@ async def ad_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(_("⚠️ Uso: `/ad del N` (N es el número del anuncio).", chat_id), parse_mode=ParseMode.MARKDOWN)
 
     else:
-        await update.message.reply_text(_("⚠️ Comandos: `/ad`, `/ad add <txt>`, `/ad del <num>`", chat_id), parse_mode=ParseMode.MARKDOWN)
\ No newline at end of file
+        await update.message.reply_text(_("⚠️ Comandos: `/ad`, `/ad add <txt>`, `/ad del <num>`", chat_id), parse_mode=ParseMode.MARKDOWN)
+
+
+# ─── /cmc: PRESUPUESTO DE CRÉDITOS COINMARKETCAP ─────────────────────────────
+async def cmc_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Consumo de créditos CMC por API key, ritmo de gasto y agotamiento previsto."""
+    chat_id = update.effective_chat.id
+
+    if chat_id not in ADMIN_CHAT_IDS:
+        return
+
+    # Asegura que ambas keys aparezcan aunque aún no se hayan usado
+    cmc_budget(CMC_API_KEY_ALERTA, "alerta")
+    cmc_budget(CMC_API_KEY_CONTROL, "control")
+
+    nombres_prioridad = {"0": "HBD", "1": "alertas", "2": "consultas"}
+    mensaje = "💳 *Créditos CoinMarketCap*\n—————————————————\n"
+    for st in cmc_budget_stats():
+        pct = st['month_used'] / st['monthly'] * 100 if st['monthly'] else 0
+        agotamiento = st['exhaustion'] or "no antes del reinicio"
+        denegadas = " · ".join(
+            f"{nombres_prioridad.get(p, p)} {n}" for p, n in sorted(st['denied'].items())
+        ) or "ninguna"
+        mensaje += (
+            f"\n🔑 *{st['label']}*\n"
+            f"• Mes: `{st['month_used']} / {st['monthly']}` ({pct:.1f}%)\n"
+            f"• Hoy: `{st['today_used']}` de `{st['daily_allowance']}` planificados\n"
+            f"• Ritmo: `{st['burn_rate']}` créditos/día (7d)\n"
+            f"• Agotamiento estimado: `{agotamiento}`\n"
+            f"• Llamadas libres/min: `{st['tokens']}`\n"
+            f"• A CryptoCompare: `{st['fallbacks']}` ({denegadas})\n"
+        )
+        if st['blocked']:
+            mensaje += "• ⛔ CMC devolvió límite agotado: en pausa hasta el reinicio\n"
+
+    await update.message.reply_text(mensaje, parse_mode=ParseMode.MARKDOWN)
+
+
+# ─── /perf: MÉTRICAS DE LOS BUCLES DE SEÑALES ────────────────────────────────
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ciclos de SmartSignals, planificadores, memo, indicadores, remuestreo BTC y archivo de velas."""
+    chat_id = update.effective_chat.id
+
+    if chat_id not in ADMIN_CHAT_IDS:
+        return
+
+    sp = sp_loop_stats()
+    last = sp['last']
+    mensaje = "📈 *Rendimiento de los bucles*\n—————————————————\n"
+
+    mensaje += (
+        f"\n📡 *SmartSignals*\n"
+        f"• Ciclos: `{sp['cycles']}` · pares: `{sp['pairs']}`\n"
+        f"• Timeouts: `{sp['timeouts']}` · errores: `{sp['errors']}` · "
+        f"más largos que la vela: `{sp['overruns']}`\n"
+        f"• Ciclo más lento: `{sp['max_total_s']}s`\n"
+    )
+    if last:
+        mensaje += (
+            f"• Último: `{last['processed']}/{last['pairs']}` pares en `{last['total_s']}s` "
+            f"(velas `{last['fetch_s']}s`, análisis `{last['analyze_s']}s`, "
+            f"proceso `{last['process_s']}s`)\n"
+            f"• Par más lento: `{last['slowest_pair']}` `{last['slowest_s']}s`\n"
+        )
+    if sp['stream']:
+        st = sp['stream']
+        mensaje += (
+            f"• WebSocket: `{st['pairs']}` streams, `{st['messages']}` mensajes, "
+            f"`{st['reconnects']}` reconexiones, `{st['backfills']}` backfills, "
+            f"`{st['bad_messages']}` descartados\n"
+        )
+    bw, sb = sp['binance_weight'], sp['send_budget']
+    mensaje += (
+        f"• Peso Binance: `{bw['per_min']:g}`/min, `{bw['waits']}` esperas (`{bw['waited_s']}s`)\n"
+        f"• Envíos Telegram: `{sb['waits']}` esperas (`{sb['waited_s']}s`)\n"
+    )
+
+    schedulers = scheduler_stats()
+    if schedulers:
+        mensaje += "\n⏰ *Planificadores*\n"
+        for st in schedulers:
+            wakes = " · ".join(f"{k} {n}" for k, n in st['wakes'].items() if n) or "ninguno"
+            mensaje += (
+                f"• `{st['name']}`: `{st['pairs']}` pares, despertares {wakes}, "
+                f"retraso máx `{st['lag_ms_max']}ms`, reloj `{st['clock_offset_ms']:+d}ms`\n"
+            )
+
+    memo, streams = analysis_memo.stats(), indicator_streams.stats()
+    mensaje += (
+        f"\n🧮 *Análisis*\n"
+        f"• Memo por vela cerrada: `{memo['entries']}` entradas, acierto `{memo['hit_rate'] * 100:.1f}%`\n"
+        f"• Indicadores incrementales: `{streams['streams']}` sets, `{streams['seeds']}` siembras, "
+        f"`{streams['advanced']}` velas integradas, `{streams['reused']}` reutilizados\n"
+    )
+
+    mensaje += "\n🕯 *Remuestreo BTC*\n"
+    for st in btc_resample_stats():
+        mensaje += (
+            f"• Base `{st['base']}` → {', '.join(st['targets'])}: `{st['rebuilds']}` reconstrucciones, "
+            f"`{st['updates']}` actualizaciones, `{st['seed_pages']}` páginas de siembra\n"
+        )
+
+    arch = candle_archive.stats()
+    mensaje += (
+        f"\n🗄 *Archivo de velas*\n"
+        f"• `{arch['series']}` series, `{arch['pages']}` páginas descargadas, "
+        f"`{arch['rows_written']}` velas escritas\n"
+    )
+
+    await update.message.reply_text(mensaje, parse_mode=ParseMode.MARKDOWN)
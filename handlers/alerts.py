@@ -11,6 +11,7 @@ from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler
 from telegram.constants import ParseMode
 from core.config import TOKEN_TELEGRAM, ADMIN_CHAT_IDS, PID, VERSION, STATE, PYTHON_VERSION, LOG_LINES, USUARIOS_PATH
 from core.api_client import obtener_precios_control
+from utils.cmc_budget import PRIORIDAD_CONSULTA
 from core.loops import set_custom_alert_history_util # Nueva importación
 from utils.file_manager import(\
      delete_all_alerts, add_price_alert, get_user_alerts,
@@ -77,7 +78,7 @@ async def alerta_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # 3. Obtener el precio actual para establecer un punto de referencia inicial
-    precios_actuales = obtener_precios_control([coin])
+    precios_actuales = obtener_precios_control([coin], prioridad=PRIORIDAD_CONSULTA)
     initial_price = precios_actuales.get(coin)
 
     if initial_price is not None:
@@ -137,7 +137,7 @@ async def btc_alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
     
     
     # --- CAMBIO: Pasar interval explícito ---
-    df = get_btc_klines(interval=target_tf, limit=150)
+    df = await get_btc_klines(interval=target_tf, limit=150)
     
     if df is None or df.empty:
         await update.message.reply_text(_("⚠️ Error obteniendo datos de Binance.", user_id))
@@ -245,7 +245,7 @@ async def btc_alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
     else:
         try:
             # 1. Obtener Velas (Limit 10000 para precisión en EMA200)
-            df = get_btc_klines(interval=target_tf, limit=1000)
+            df = await get_btc_klines(interval=target_tf, limit=1000)
             
             if df is None or len(df) < 200:
                 msg = "⚠️ *Datos insuficientes de Binance.*\nIntenta de nuevo en unos segundos."
@@ -5,12 +5,14 @@ import aiohttp
 import feedparser
 import hashlib
 import json
+import time
 from bs4 import BeautifulSoup
 import re
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 from utils.file_manager import add_log_line
+from utils.endpoint_health import endpoint_health, is_down_status
 
 # ===== NUEVAS IMPORTACIONES =====
 from utils.rss_generator import RSSGenerator
@@ -163,15 +165,15 @@ class FeedParserV4:
         # --- TWITTER/X ---
         if source_type == 'twitter':
             # Nitter (más rápido)
-            for instance in self.NITTER_INSTANCES:
+            for instance in endpoint_health.order(self.NITTER_INSTANCES):
                 services.append(f"{instance}/{identifier}/rss")
             
             # RSSHub
-            for mirror in self.RSSHUB_MIRRORS:
+            for mirror in endpoint_health.order(self.RSSHUB_MIRRORS):
                 services.append(f"{mirror}/twitter/user/{identifier}")
             
             # RSS Bridge
-            for mirror in self.RSS_BRIDGE_MIRRORS:
+            for mirror in endpoint_health.order(self.RSS_BRIDGE_MIRRORS):
                 services.append(
                     f"{mirror}/?action=display&bridge=Twitter&context=By+username"
                     f"&u={identifier}&format=Atom"
@@ -187,26 +189,26 @@ class FeedParserV4:
             add_log_line("⚠️ Scraper nativo falló, intentando servicios externos...")
     
             # 2. RSS Bridge (Aquí usará https://rss-bridge.madbots.dev primero)
-            for mirror in self.RSS_BRIDGE_MIRRORS:
+            for mirror in endpoint_health.order(self.RSS_BRIDGE_MIRRORS):
                 services.append(
                     f"{mirror}/?action=display&bridge=Instagram&context=Username"
                     f"&u={identifier}&media_type=all&format=Atom"
                 )
     
             # 3. RSSHub (Aquí usará https://rss-proxy.madbots.dev primero)
-            for mirror in self.RSSHUB_MIRRORS:
+            for mirror in endpoint_health.order(self.RSSHUB_MIRRORS):
                 services.append(f"{mirror}/instagram/user/{identifier}")
                 services.append(f"{mirror}/instagram/feed/{identifier}")
     
             # ===== FALLBACK: RSS Bridge =====
-            for mirror in self.RSS_BRIDGE_MIRRORS:
+            for mirror in endpoint_health.order(self.RSS_BRIDGE_MIRRORS):
                 services.append(
                     f"{mirror}/?action=display&bridge=Instagram&context=Username"
                     f"&u={identifier}&media_type=all&format=Atom"
                 )
     
             # ===== FALLBACK: RSSHub =====
-            for mirror in self.RSSHUB_MIRRORS:
+            for mirror in endpoint_health.order(self.RSSHUB_MIRRORS):
                 services.append(f"{mirror}/instagram/user/{identifier}")
                 services.append(f"{mirror}/instagram/feed/{identifier}")
         
@@ -219,13 +221,13 @@ class FeedParserV4:
                 services.append(f"https://www.youtube.com/feeds/videos.xml?user={identifier}")
             
             # RSSHub (backup)
-            for mirror in self.RSSHUB_MIRRORS:
+            for mirror in endpoint_health.order(self.RSSHUB_MIRRORS):
                 services.append(f"{mirror}/youtube/user/{identifier}")
         
         # --- TELEGRAM ---
         elif source_type == 'telegram':
             # RSSHub
-            for mirror in self.RSSHUB_MIRRORS:
+            for mirror in endpoint_health.order(self.RSSHUB_MIRRORS):
                 services.append(f"{mirror}/telegram/channel/{identifier}")
         
         # --- REDDIT ---
@@ -238,10 +240,16 @@ class FeedParserV4:
         session = await self._get_session()
         
         for service_url in services:
+            # Mirror con el circuito abierto (caído hace poco): ni se intenta
+            if not endpoint_health.allow(service_url):
+                continue
+            healthy = None
+            started = time.monotonic()
             try:
                 add_log_line(f"🔄 Intentando: {service_url[:70]}...")
                 
                 async with session.get(service_url) as response:
+                    healthy = not is_down_status(response.status)
                     if response.status == 200:
                         content = await response.read()
                         
@@ -253,8 +261,11 @@ class FeedParserV4:
                 await asyncio.sleep(0.5)  # Rate limiting
             
             except Exception as e:
+                healthy = False
                 add_log_line(f"⚠️ Falló {service_url[:50]}: {str(e)[:50]}")
                 continue
+            finally:
+                endpoint_health.record(service_url, healthy, time.monotonic() - started)
         
         return None
     
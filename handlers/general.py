@@ -14,6 +14,7 @@ from utils.file_manager import (
     registrar_uso_comando
 )
 from core.api_client import obtener_precios_control
+from utils.cmc_budget import PRIORIDAD_CONSULTA
 from utils.ads_manager import get_random_ad_text
 from core.config import ADMIN_CHAT_IDS
 from locales.texts import HELP_MSG
@@ -76,7 +77,7 @@ async def ver(update: Update, context: ContextTypes.DEFAULT_TYPE):
     mensaje_espera = await update.message.reply_text(_("⏳ Consultando precios actuales...", user_id))
 
     # 3. Obtener precios en tiempo real
-    precios_actuales = obtener_precios_control(monedas)
+    precios_actuales = obtener_precios_control(monedas, prioridad=PRIORIDAD_CONSULTA)
     
     if not precios_actuales:
         await mensaje_espera.edit_text(
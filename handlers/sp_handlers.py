@@ -27,6 +27,7 @@
 import asyncio
 import json
 import os
+from io import BytesIO
 import pandas as pd
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Document
 from telegram.ext import (
@@ -56,6 +57,8 @@ from utils.sp_manager import (
     queue_quick_notify,
 )
 from utils.sp_chart import generate_sp_chart
+from utils.market_data import get_klines
+from utils.single_flight import single_flight
 from core.sp_loop import SPSignalEngine, _get_klines, build_signal_message, _fmt_price
 
 # SSS: estrategias como skills
@@ -366,6 +369,37 @@ async def sp_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 
 # ─── VISTA DE SEÑAL ───────────────────────────────────────────────────────────
 
+_SIGNAL_VIEWS = single_flight("sp_view")
+
+
+async def _compute_signal_view(symbol: str, tf: str):
+    """
+    Parte común a todos los usuarios: velas → señal base → gráfico.
+    Devuelve (df, sig, chart_bytes) o None si no hay datos. Compartido vía
+    single-flight: quien lo use no debe mutar df ni sig.
+    """
+    loop = asyncio.get_running_loop()
+
+    df = await _get_klines(symbol, tf, 120)
+    if df is None or len(df) < 30:
+        return None
+
+    engine = SPSignalEngine()
+    sig    = engine.analyze(df)
+
+    try:
+        sig['time_to_close'] = estimate_time_to_candle_close(
+            int(df.iloc[-1]['open_time']), tf
+        )
+    except Exception:
+        sig['time_to_close'] = 0
+
+    chart_buf = await loop.run_in_executor(
+        None, generate_sp_chart, df, symbol, tf, sig, 60
+    )
+    return df, sig, (chart_buf.getvalue() if chart_buf else None)
+
+
 async def _show_signal_view(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
@@ -382,22 +416,16 @@ async def _show_signal_view(
     try:
         loop = asyncio.get_running_loop()
 
-        df = await loop.run_in_executor(None, _get_klines, symbol, tf, 120)
-        if df is None or len(df) < 30:
+        # Pulsaciones simultáneas del mismo par/TF comparten descarga y gráfico
+        view = await _SIGNAL_VIEWS.do((symbol, tf), _compute_signal_view, symbol, tf)
+        if view is None:
             err = f"❌ Sin datos para *{symbol}* ({tf})."
             if edit_msg:
                 await edit_msg.edit_text(err, parse_mode=ParseMode.MARKDOWN)
             return
 
-        engine = SPSignalEngine()
-        sig    = engine.analyze(df)
-
-        try:
-            sig['time_to_close'] = estimate_time_to_candle_close(
-                int(df.iloc[-1]['open_time']), tf
-            )
-        except Exception:
-            sig['time_to_close'] = 0
+        df, sig, chart_bytes = view
+        sig = dict(sig)
 
         # SSS: bloque de estrategia activa ─────────────────────────────────────
         strat_block = ""
@@ -421,9 +449,7 @@ async def _show_signal_view(
                     )
         # ──────────────────────────────────────────────────────────────────────
 
-        chart_buf = await loop.run_in_executor(
-            None, generate_sp_chart, df, symbol, tf, sig, 60
-        )
+        chart_buf = BytesIO(chart_bytes) if chart_bytes else None
 
         msg_text = build_signal_message(symbol, tf, sig) + strat_block
         keyboard = _get_view_keyboard(user_id, symbol, tf)
@@ -1058,8 +1084,10 @@ async def sp_strat_test_callback(update: Update, context: ContextTypes.DEFAULT_T
 
     loop = asyncio.get_running_loop()
     try:
+        # Descarga async en el loop; el executor solo hace el cálculo
+        candles = await get_klines(symbol, tf, 500, timeout=10, min_rows=50)
         result = await loop.run_in_executor(
-            None, run_strategy_backtest, strat, symbol, 500
+            None, run_strategy_backtest, strat, symbol, 500, candles
         )
     except Exception as e:
         add_log_line(f"[SSS Test] Excepción en backtest {strat_id}/{symbol}: {e}")
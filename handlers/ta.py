@@ -1,7 +1,6 @@
 # handlers/ta.py
 
 import asyncio
-import requests
 import json
 import pytz 
 import pandas as pd
@@ -20,44 +19,96 @@ from utils.file_manager import (
 from utils.ads_manager import get_random_ad_text
 from core.i18n import _
 from core.btc_advanced_analysis import BTCAdvancedAnalyzer
+from utils.market_data import get_klines
+from utils.single_flight import single_flight
+from utils.symbol_index import symbol_index
 
 
 
 # === NUEVO COMANDO /ta MEJORADO ===
 
-def get_binance_klines(symbol, interval, limit=500): 
+_TA_VIEWS = single_flight("ta")
+
+async def get_binance_klines(symbol, interval, limit=500):
     """
-    Obtiene velas de Binance (Global o US). 
+    Obtiene velas de Binance (Global o US) con el cliente compartido.
     Limit reducido a 500 por defecto para rapidez, el Analyzer usa internamente lo necesario.
     """
-    endpoints = [
-        "https://api.binance.com/api/v3/klines", 
-        "https://api.binance.us/api/v3/klines"
-    ]
-    for url in endpoints:
-        params = {"symbol": symbol, "interval": interval, "limit": limit}
-        try:
-            response = requests.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            if not data or not isinstance(data, list): continue
-            
-            df = pd.DataFrame(data, columns=[
-                "open_time", "open", "high", "low", "close", "volume",
-                "close_time", "quote_asset_volume", "trades", 
-                "taker_base", "taker_quote", "ignore"
-            ])
-            cols = ["open", "high", "low", "close", "volume"]
-            df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
-            
-            # Convertir tiempo para el Analyzer
-            df['time'] = pd.to_datetime(df['open_time'], unit='ms')
-            df.set_index('time', inplace=True)
-            
-            return df
-        except Exception:
-            continue
-    return None
+    return await get_klines(symbol, interval, limit, timeout=3)  # Timeout rápido para UX
+
+
+async def _compute_ta_binance(full_symbol, timeframe):
+    """
+    Parte local (Binance) de /ta: velas + tabla + análisis + niveles.
+    Compartida entre usuarios vía single-flight; devuelve None si no hay velas.
+    """
+    df_result = await get_binance_klines(full_symbol, timeframe)
+    if df_result is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    # A) TABLA
+    last_3 = await loop.run_in_executor(None, calculate_table_indicators, df_result.copy())
+    
+    # B) ANÁLISIS
+    analyzer = BTCAdvancedAnalyzer(df_result)
+    sig, emo, (sb, ss), reasons = analyzer.get_momentum_signal()
+    curr_vals = analyzer.get_current_values()
+
+    curr = last_3.iloc[-1]
+    prev = last_3.iloc[-2]
+    pprev = last_3.iloc[-3]
+
+    # === CAMBIO: CÁLCULO DE NIVELES CON 10 VELAS ===
+    # 1. Tomamos las últimas 10 velas del dataframe original
+    last_10 = df_result.tail(10)
+    
+    # 2. Obtenemos el Máximo y Mínimo de ese rango de 10 velas
+    period_high = last_10['high'].max()
+    period_low = last_10['low'].min()
+    period_close = last_10['close'].iloc[-1] # El cierre sigue siendo el actual
+    
+    # 3. Calculamos el Pivote y el Rango basados en esas 10 velas
+    pivot_val = (period_high + period_low + period_close) / 3
+    rango_val = period_high - period_low
+
+    final_data = {
+        'close': curr['close'], 'volume': curr['volume'], 'ATR': curr_vals.get('ATR', 0),
+        'RSI_list': [curr.get('RSI', 0), prev.get('RSI', 0), pprev.get('RSI', 0)],
+        'MFI_list': [curr.get('MFI', 0), prev.get('MFI', 0), pprev.get('MFI', 0)],
+        'CCI_list': [curr.get('CCI', 0), prev.get('CCI', 0), pprev.get('CCI', 0)],
+        'ADX_list': [curr.get('ADX', 0), prev.get('ADX', 0), pprev.get('ADX', 0)],
+        'WR_list':  [curr.get('WILLR', 0), prev.get('WILLR', 0), pprev.get('WILLR', 0)],
+        'OBV_list': [curr.get('OBV', 0), prev.get('OBV', 0), pprev.get('OBV', 0)],
+        'MACD_hist': curr_vals.get('MACD_HIST', 0),
+        'SMA_50': curr_vals.get('EMA_50', 0),
+        
+        # Guardamos los valores calculados con las 10 velas
+        'Pivot': pivot_val,
+        'Rango': rango_val
+    }
+    
+    # 4. Actualizamos los niveles R y S usando Fibonacci sobre el rango de 10 velas
+    p = final_data['Pivot']
+    r = final_data['Rango']
+    
+    final_data.update({
+        'R1': p + (r * 0.382), 
+        'R2': p + (r * 0.618),
+        'R3': p + (r * 1.272),
+        'S1': p - (r * 0.382),
+        'S2': p - (r * 0.618),
+        'S3': p - (r * 1.272)
+    })
+
+    return {
+        'final_data': final_data,
+        'signal_emoji': emo, 'signal_text': sig,
+        'score_buy': sb, 'score_sell': ss,
+        'reasons': reasons,
+        'sr': analyzer.get_support_resistance_dynamic(),
+    }
+
 
 def calculate_table_indicators(df):
     """
@@ -140,34 +191,6 @@ def get_tradingview_analysis_enhanced(symbol_pair, interval_str):
         'EMA_200': ind.get('EMA200', 0)
     }
 
-def get_binance_klines(symbol, interval, limit=500): 
-    """Obtiene velas de Binance (Global o US)."""
-    endpoints = [
-        "https://api.binance.com/api/v3/klines", 
-        "https://api.binance.us/api/v3/klines"
-    ]
-    for url in endpoints:
-        params = {"symbol": symbol, "interval": interval, "limit": limit}
-        try:
-            response = requests.get(url, params=params, timeout=3) # Timeout rápido para UX
-            if response.status_code != 200: continue
-            data = response.json()
-            if not data or not isinstance(data, list): continue
-            
-            df = pd.DataFrame(data, columns=[
-                "open_time", "open", "high", "low", "close", "volume",
-                "close_time", "quote_asset_volume", "trades", 
-                "taker_base", "taker_quote", "ignore"
-            ])
-            cols = ["open", "high", "low", "close", "volume"]
-            df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
-            df['time'] = pd.to_datetime(df['open_time'], unit='ms')
-            df.set_index('time', inplace=True)
-            return df
-        except Exception:
-            continue
-    return None
-
 def calculate_table_indicators(df):
     """Calcula indicadores visuales para la tabla."""
     def safe_ind(name, series):
@@ -264,7 +287,7 @@ async def ta_command(update: Update, context: ContextTypes.DEFAULT_TYPE, overrid
         if "TV" in raw_args: raw_args.remove("TV")
         
         symbol_base = raw_args[0]
-        pair = "USDT"
+        pair = None
         timeframe = "1h"
         
         if len(raw_args) > 1:
@@ -273,6 +296,10 @@ async def ta_command(update: Update, context: ContextTypes.DEFAULT_TYPE, overrid
                     timeframe = arg.lower()
                 else:
                     pair = arg
+        if pair is None:
+            # Sin par explícito: la quote que de verdad lista Binance (USDT si existe)
+            resolved = symbol_index.resolve(symbol_base)
+            pair = resolved[len(symbol_base):] if resolved else "USDT"
         full_symbol = f"{symbol_base}{pair}"
 
     # === MENSAJE DE ESPERA ===
@@ -280,12 +307,19 @@ async def ta_command(update: Update, context: ContextTypes.DEFAULT_TYPE, overrid
         # Si es callback, no mandamos mensaje nuevo, editaremos el existente.
         # Pero primero validamos disponibilidad si se pide LOCAL
         if target_source == "BINANCE" and not skip_binance_check:
-            # Chequeo rápido de existencia
+            # Chequeo rápido de existencia contra el índice local (sin red)
             # NOTA: Hacemos esto antes de borrar nada para poder cancelar si falla
-            loop = asyncio.get_running_loop()
-            check_df = await loop.run_in_executor(None, get_binance_klines, full_symbol, timeframe, 50)
-            if check_df is None or check_df.empty:
-                await update.callback_query.answer("❌ No disponible en Binance Local", show_alert=True)
+            listed = symbol_index.is_valid(full_symbol)
+            if listed is None:
+                # Índice aún sin cargar: sondeo como antes
+                check_df = await get_binance_klines(full_symbol, timeframe, 50)
+                listed = check_df is not None and not check_df.empty
+            if not listed:
+                suggestion = symbol_index.suggest(full_symbol)
+                alert = "❌ No disponible en Binance Local"
+                if suggestion:
+                    alert += f"\n¿Quizás {suggestion}?"
+                await update.callback_query.answer(alert, show_alert=True)
                 return # IMPORTANTE: Detenemos ejecución aquí, el mensaje anterior se mantiene intacto
     else:
         msg_wait = await message.reply_text(_("⏳ _Analizando {full_symbol} ({timeframe})..._", user_id).format(full_symbol=full_symbol, timeframe=timeframe), parse_mode=ParseMode.MARKDOWN)
@@ -300,82 +334,36 @@ async def ta_command(update: Update, context: ContextTypes.DEFAULT_TYPE, overrid
     signal_emoji, signal_text = "⚖️", "NEUTRAL"
     score_buy, score_sell = 0, 0
     
-    df_result = None
+    ta_local = None
 
     # 1. INTENTO BINANCE (Si se solicitó)
-    if target_source == "BINANCE":
-        df_result = await loop.run_in_executor(None, get_binance_klines, full_symbol, timeframe)
-        
-        if df_result is not None:
-            data_source_display = "Binance (Local PRO)"
-            # A) TABLA
-            last_3 = await loop.run_in_executor(None, calculate_table_indicators, df_result.copy())
-            
-            # B) ANÁLISIS
-            analyzer = BTCAdvancedAnalyzer(df_result)
-            sig, emo, (sb, ss), reasons = analyzer.get_momentum_signal()
-            curr_vals = analyzer.get_current_values()
-            
-            signal_emoji, signal_text = emo, sig
-            score_buy, score_sell = sb, ss
-            reasons_list = reasons
-            
-            curr = last_3.iloc[-1]
-            prev = last_3.iloc[-2]
-            pprev = last_3.iloc[-3]
+    # Par que Binance no lista: directo a TradingView sin la descarga fallida
+    if target_source == "BINANCE" and symbol_index.is_valid(full_symbol) is not False:
+        # Varios usuarios pidiendo el mismo par/TF a la vez comparten el cálculo
+        ta_local = await _TA_VIEWS.do(
+            ("BINANCE", full_symbol, timeframe), _compute_ta_binance, full_symbol, timeframe
+        )
 
-            # === CAMBIO: CÁLCULO DE NIVELES CON 10 VELAS ===
-            # 1. Tomamos las últimas 10 velas del dataframe original
-            last_10 = df_result.tail(10)
-            
-            # 2. Obtenemos el Máximo y Mínimo de ese rango de 10 velas
-            period_high = last_10['high'].max()
-            period_low = last_10['low'].min()
-            period_close = last_10['close'].iloc[-1] # El cierre sigue siendo el actual
-            
-            # 3. Calculamos el Pivote y el Rango basados en esas 10 velas
-            pivot_val = (period_high + period_low + period_close) / 3
-            rango_val = period_high - period_low
-
-            final_data = {
-                'close': curr['close'], 'volume': curr['volume'], 'ATR': curr_vals.get('ATR', 0),
-                'RSI_list': [curr.get('RSI', 0), prev.get('RSI', 0), pprev.get('RSI', 0)],
-                'MFI_list': [curr.get('MFI', 0), prev.get('MFI', 0), pprev.get('MFI', 0)],
-                'CCI_list': [curr.get('CCI', 0), prev.get('CCI', 0), pprev.get('CCI', 0)],
-                'ADX_list': [curr.get('ADX', 0), prev.get('ADX', 0), pprev.get('ADX', 0)],
-                'WR_list':  [curr.get('WILLR', 0), prev.get('WILLR', 0), pprev.get('WILLR', 0)],
-                'OBV_list': [curr.get('OBV', 0), prev.get('OBV', 0), pprev.get('OBV', 0)],
-                'MACD_hist': curr_vals.get('MACD_HIST', 0),
-                'SMA_50': curr_vals.get('EMA_50', 0),
-                
-                # Guardamos los valores calculados con las 10 velas
-                'Pivot': pivot_val,
-                'Rango': rango_val
-            }
-            
-            # 4. Actualizamos los niveles R y S usando Fibonacci sobre el rango de 10 velas
-            p = final_data['Pivot']
-            r = final_data['Rango']
-            
-            final_data.update({
-                'R1': p + (r * 0.382), 
-                'R2': p + (r * 0.618),
-                'R3': p + (r * 1.272),
-                'S1': p - (r * 0.382),
-                'S2': p - (r * 0.618),
-                'S3': p - (r * 1.272)
-            })
+        if ta_local is not None:
+            data_source_display = "Binance (Local PRO)"
+            final_data = dict(ta_local['final_data'])
+            signal_emoji, signal_text = ta_local['signal_emoji'], ta_local['signal_text']
+            score_buy, score_sell = ta_local['score_buy'], ta_local['score_sell']
+            reasons_list = ta_local['reasons']
 
     # 2. INTENTO TRADINGVIEW (Fallback o Solicitud Directa)
     used_tv = False
-    if df_result is None:
+    if ta_local is None:
         # Si falló Binance (o se pidió TV), vamos a TV
         used_tv = True
-        tv_data = await loop.run_in_executor(None, get_tradingview_analysis_enhanced, full_symbol, timeframe)
+        tv_data = await _TA_VIEWS.do(
+            ("TV", full_symbol, timeframe),
+            loop.run_in_executor, None, get_tradingview_analysis_enhanced, full_symbol, timeframe
+        )
         
         if tv_data:
             data_source_display = "TradingView API"
-            final_data = tv_data
+            final_data = dict(tv_data)
             
             # Interpretar señales TV
             rec = final_data.get('RECOMMENDATION', '')
@@ -430,9 +418,9 @@ async def ta_command(update: Update, context: ContextTypes.DEFAULT_TYPE, overrid
     kijun_label = "N/A"
     fib_label = "N/A"
 
-    # 3. Solo calculamos lógica avanzada si 'analyzer' existe (Modo Binance Local)
-    if 'analyzer' in locals():
-        sr = analyzer.get_support_resistance_dynamic()
+    # 3. Solo calculamos lógica avanzada en Modo Binance Local
+    if ta_local is not None:
+        sr = ta_local['sr']
         
         # Ichimoku Kijun
         kijun_val = sr.get('KIJUN', 0)
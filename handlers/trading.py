@@ -1,7 +1,6 @@
 # handlers/trading.py
 
 import asyncio
-import requests
 import json
 import pytz
 import pandas as pd
@@ -14,12 +13,15 @@ from tradingview_ta import TA_Handler, Interval, Exchange
 from datetime import timedelta, datetime
 from core.ai_logic import get_groq_crypto_analysis
 from core.config import ADMIN_CHAT_IDS
-from core.api_client import obtener_datos_moneda
+from core.coin_quote import get_coin_quote
 from utils.file_manager import (
     add_log_line, check_feature_access, registrar_uso_comando
 )
 from utils.ads_manager import get_random_ad_text
 from utils.chart_generator import generate_ohlcv_chart
+from utils.market_data import get_klines_hedged
+from utils.single_flight import single_flight
+from utils.symbol_index import symbol_index
 from core.i18n import _
 from core.btc_advanced_analysis import BTCAdvancedAnalyzer
 
@@ -49,151 +51,19 @@ _CANDLES_FOR_TF = {
 
 # ─── HELPERS DE DATOS ────────────────────────────────────────────────────────
 
-# Mapeo de intervalos Binance → KuCoin (KuCoin usa formato diferente)
-_TF_KUCOIN = {
-    "1m": "1min", "3m": "3min", "5m": "5min", "15m": "15min", "30m": "30min",
-    "1h": "1hour", "2h": "2hour", "4h": "4hour", "6h": "6hour",
-    "1d": "1day", "1w": "1week",
-}
-
-def _df_from_rows(rows: list) -> pd.DataFrame:
-    """Convierte lista OHLCV normalizada a DataFrame con índice datetime."""
-    df = pd.DataFrame(rows, columns=["time", "open", "high", "low", "close", "volume"])
-    for col in ["open", "high", "low", "close", "volume"]:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df['time'] = pd.to_datetime(df['time'], unit='ms')
-    df.set_index('time', inplace=True)
-    return df
-
-
-def _get_klines_binance(symbol: str, interval: str, limit: int) -> pd.DataFrame | None:
-    """Intenta obtener velas de Binance Global y Binance US."""
-    for url in ["https://api.binance.com/api/v3/klines", "https://api.binance.us/api/v3/klines"]:
-        try:
-            resp = requests.get(url, params={"symbol": symbol, "interval": interval, "limit": limit}, timeout=5)
-            if resp.status_code != 200:
-                continue
-            data = resp.json()
-            if not data or not isinstance(data, list):
-                continue
-            df = pd.DataFrame(data, columns=[
-                "open_time", "open", "high", "low", "close", "volume",
-                "close_time", "quote_vol", "trades", "taker_base", "taker_quote", "ignore"
-            ])
-            for col in ["open", "high", "low", "close", "volume"]:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            df['time'] = pd.to_datetime(df['open_time'], unit='ms')
-            df.set_index('time', inplace=True)
-            return df
-        except Exception:
-            continue
-    return None
-
-
-def _get_klines_kucoin(symbol: str, interval: str, limit: int) -> pd.DataFrame | None:
-    """Fallback a KuCoin. Formato de símbolo: BTC-USDT."""
-    kucoin_tf = _TF_KUCOIN.get(interval)
-    if not kucoin_tf:
-        return None
-
-    # KuCoin usa guión: BTCUSDT → BTC-USDT
-    # Detectar quote a partir de sufijos comunes
-    known_quotes = ["USDT", "USDC", "BTC", "ETH", "BNB", "BUSD"]
-    base, quote = symbol, "USDT"
-    for q in known_quotes:
-        if symbol.endswith(q) and len(symbol) > len(q):
-            base = symbol[:-len(q)]
-            quote = q
-            break
-    kucoin_symbol = f"{base}-{quote}"
-
-    try:
-        url = "https://api.kucoin.com/api/v1/market/candles"
-        resp = requests.get(url, params={"symbol": kucoin_symbol, "type": kucoin_tf}, timeout=6)
-        if resp.status_code != 200:
-            return None
-        data = resp.json().get("data", [])
-        if not data:
-            return None
-        # KuCoin devuelve: [time_sec, open, close, high, low, volume, turnover] — orden diferente
-        # y en orden DESCENDENTE, hay que invertir
-        rows = []
-        for c in reversed(data[:limit]):
-            rows.append({
-                "time": int(c[0]) * 1000,  # seg → ms
-                "open": float(c[1]),
-                "high": float(c[3]),
-                "low":  float(c[4]),
-                "close": float(c[2]),
-                "volume": float(c[5]),
-            })
-        df = pd.DataFrame(rows)
-        df['time'] = pd.to_datetime(df['time'], unit='ms')
-        df.set_index('time', inplace=True)
-        return df
-    except Exception:
-        return None
-
-
-def _get_klines_bybit(symbol: str, interval: str, limit: int) -> pd.DataFrame | None:
-    """Segundo fallback: Bybit (también soporta pares spot)."""
-    # Bybit usa intervalos en minutos como string: 1m→1, 1h→60, 1d→D
-    bybit_tf_map = {
-        "1m": "1", "3m": "3", "5m": "5", "15m": "15", "30m": "30",
-        "1h": "60", "2h": "120", "4h": "240", "6h": "360",
-        "1d": "D", "1w": "W",
-    }
-    bybit_tf = bybit_tf_map.get(interval)
-    if not bybit_tf:
-        return None
-    try:
-        url = "https://api.bybit.com/v5/market/kline"
-        resp = requests.get(url, params={
-            "category": "spot", "symbol": symbol,
-            "interval": bybit_tf, "limit": str(limit)
-        }, timeout=6)
-        if resp.status_code != 200:
-            return None
-        items = resp.json().get("result", {}).get("list", [])
-        if not items:
-            return None
-        rows = []
-        for c in reversed(items):
-            rows.append({
-                "time": int(c[0]),
-                "open": float(c[1]),
-                "high": float(c[2]),
-                "low":  float(c[3]),
-                "close": float(c[4]),
-                "volume": float(c[5]),
-            })
-        df = pd.DataFrame(rows)
-        df['time'] = pd.to_datetime(df['time'], unit='ms')
-        df.set_index('time', inplace=True)
-        return df
-    except Exception:
-        return None
-
-
-def _get_binance_klines_for_chart(symbol: str, interval: str, limit: int = 120) -> tuple[pd.DataFrame | None, str]:
+async def _get_binance_klines_for_chart(symbol: str, interval: str, limit: int = 120) -> tuple[pd.DataFrame | None, str]:
     """
-    Obtiene velas OHLCV con fallback multi-exchange.
-    Intenta en orden: Binance → KuCoin → Bybit.
+    Obtiene velas OHLCV con fallback multi-exchange escalonado (hedged).
+    Preferencia: Binance → KuCoin → Bybit; si uno tarda más de MARKET_HEDGE_DELAY
+    se lanza el siguiente en paralelo y gana el primero que responde.
     Devuelve (DataFrame | None, nombre_exchange).
     """
-    df = _get_klines_binance(symbol, interval, limit)
-    if df is not None and not df.empty:
-        return df, "Binance"
-
-    df = _get_klines_kucoin(symbol, interval, limit)
-    if df is not None and not df.empty:
-        return df, "KuCoin"
-
-    df = _get_klines_bybit(symbol, interval, limit)
-    if df is not None and not df.empty:
-        return df, "Bybit"
-
-    return None, ""
+    # Solo los exchanges que listan el par (o cuyo índice aún no se conoce)
+    exchanges = [e for e in ("binance", "kucoin", "bybit")
+                 if symbol_index.is_valid(symbol, e) is not False]
+    if not exchanges:
+        return None, ""
+    return await get_klines_hedged(symbol, interval, limit, exchanges=exchanges)
 
 
 def _get_tv_signal(symbol: str, interval_str: str) -> dict:
@@ -279,47 +149,25 @@ async def graf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await _do_graf(update, context, base=base, quote=quote, timeframe=timeframe, is_callback=False)
 
 
-async def _do_graf(
-    update: Update,
-    context: ContextTypes.DEFAULT_TYPE,
-    base: str,
-    quote: str,
-    timeframe: str,
-    is_callback: bool = False,
-):
-    """Lógica central del comando /graf. Reutilizable desde callbacks."""
-    user_id = update.effective_user.id
-    symbol  = f"{base}{quote}"
+_GRAF_VIEWS = single_flight("graf")
 
-    # Mensaje de espera
-    msg_wait = None
-    if not is_callback:
-        msg_wait = await update.message.reply_text(
-            _(f"📊 _Generando gráfico de *{symbol}* ({timeframe})..._", user_id),
-            parse_mode=ParseMode.MARKDOWN
-        )
 
+async def _build_graf_chart(symbol: str, timeframe: str) -> dict:
+    """
+    Parte común de /graf (sin datos de usuario): velas, señal TV, niveles y PNG.
+    Devuelve un dict con 'error' = None | 'no_data' | 'chart'. El gráfico va
+    como bytes para poder enviarlo a varios usuarios a la vez.
+    """
     loop = asyncio.get_running_loop()
     binance_interval = _TF_BINANCE[timeframe]
     candles_needed   = _CANDLES_FOR_TF.get(timeframe, 80) + 210
 
     # Obtener velas — con fallback multi-exchange
-    df, exchange_name = await loop.run_in_executor(
-        None, _get_binance_klines_for_chart, symbol, binance_interval, candles_needed
+    df, exchange_name = await _get_binance_klines_for_chart(
+        symbol, binance_interval, candles_needed
     )
-
     if df is None or df.empty:
-        err_msg = _(
-            f"❌ No se encontraron datos para *{symbol}*\n"
-            f"No está disponible en Binance, KuCoin ni Bybit.\n\n"
-            f"Verifica que el par sea correcto (ej: `SOLUSDT`, `ETHBTC`).",
-            user_id
-        )
-        if msg_wait:
-            await msg_wait.edit_text(err_msg, parse_mode=ParseMode.MARKDOWN)
-        elif update.callback_query:
-            await update.callback_query.answer("❌ Par no encontrado en ningún exchange", show_alert=True)
-        return
+        return {'error': 'no_data'}
 
     # Obtener señal TV (en paralelo no bloqueante)
     tv_data = await loop.run_in_executor(None, _get_tv_signal, symbol, timeframe)
@@ -349,7 +197,7 @@ async def _do_graf(
     candles_display = _CANDLES_FOR_TF.get(timeframe, 80)
     show_bb = timeframe in ('1h', '4h', '1d', '1w')
 
-    chart_bytes = await loop.run_in_executor(
+    chart_buf = await loop.run_in_executor(
         None,
         generate_ohlcv_chart,
         df, symbol, timeframe,
@@ -360,8 +208,57 @@ async def _do_graf(
         signal, sig_emoji,
         pivot, r1, s1,
     )
+    if chart_buf is None:
+        return {'error': 'chart'}
+
+    return {
+        'error': None, 'df': df, 'exchange_name': exchange_name, 'tv_data': tv_data,
+        'signal': signal, 'sig_emoji': sig_emoji,
+        'pivot': pivot, 'r1': r1, 's1': s1,
+        'chart_bytes': chart_buf.getvalue(),
+    }
+
+
+async def _do_graf(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    base: str,
+    quote: str,
+    timeframe: str,
+    is_callback: bool = False,
+):
+    """Lógica central del comando /graf. Reutilizable desde callbacks."""
+    user_id = update.effective_user.id
+    symbol  = f"{base}{quote}"
 
-    if chart_bytes is None:
+    # Mensaje de espera
+    msg_wait = None
+    if not is_callback:
+        msg_wait = await update.message.reply_text(
+            _(f"📊 _Generando gráfico de *{symbol}* ({timeframe})..._", user_id),
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    # Pulsaciones simultáneas del mismo par/TF comparten velas, señal TV y render
+    graf = await _GRAF_VIEWS.do((symbol, timeframe), _build_graf_chart, symbol, timeframe)
+
+    if graf['error'] == 'no_data':
+        err_msg = _(
+            f"❌ No se encontraron datos para *{symbol}*\n"
+            f"No está disponible en Binance, KuCoin ni Bybit.\n\n"
+            f"Verifica que el par sea correcto (ej: `SOLUSDT`, `ETHBTC`).",
+            user_id
+        )
+        suggestion = symbol_index.suggest(symbol)
+        if suggestion:
+            err_msg += f"\n💡 `{suggestion}`"
+        if msg_wait:
+            await msg_wait.edit_text(err_msg, parse_mode=ParseMode.MARKDOWN)
+        elif update.callback_query:
+            await update.callback_query.answer("❌ Par no encontrado en ningún exchange", show_alert=True)
+        return
+
+    if graf['error'] == 'chart':
         err_msg = _("❌ Error interno al generar el gráfico. Intenta de nuevo.", user_id)
         if msg_wait:
             await msg_wait.edit_text(err_msg, parse_mode=ParseMode.MARKDOWN)
@@ -369,6 +266,11 @@ async def _do_graf(
             await update.callback_query.answer("❌ Error al generar gráfico", show_alert=True)
         return
 
+    df, exchange_name, tv_data = graf['df'], graf['exchange_name'], graf['tv_data']
+    signal, sig_emoji = graf['signal'], graf['sig_emoji']
+    pivot, r1, s1 = graf['pivot'], graf['r1'], graf['s1']
+    chart_bytes = graf['chart_bytes']
+
     # Construir caption
     last_price = df['close'].iloc[-1]
     prev_price = df['close'].iloc[-2] if len(df) > 1 else last_price
@@ -454,7 +356,8 @@ async def p_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message:
         await update.message.reply_chat_action("typing")
     
-    datos = obtener_datos_moneda(moneda)
+    # CMC y high/low 24h en paralelo, sin bloquear el loop; los refresh salen de caché
+    datos = await get_coin_quote(moneda)
 
     if not datos:
         error_msg = _("😕 No se pudieron obtener los datos para *{moneda}*.", user_id).format(moneda=moneda)
@@ -572,14 +475,18 @@ async def ta_quick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     timeframe  = parts[2].lower() if len(parts) >= 3 else "4h"
 
     # Detectar si viene símbolo completo (BTCUSDT) o solo base (BTC)
-    known_quotes = ("USDT", "BUSD", "BTC", "ETH", "BNB", "USD")
-    pair = "USDT"
-    base = raw_symbol
-    for q in known_quotes:
-        if raw_symbol.endswith(q) and len(raw_symbol) > len(q):
-            pair = q
-            base = raw_symbol[: len(raw_symbol) - len(pair)]
-            break
+    split = symbol_index.split(raw_symbol)
+    if split:
+        base, pair = split
+    else:
+        known_quotes = ("USDT", "BUSD", "BTC", "ETH", "BNB", "USD")
+        pair = "USDT"
+        base = raw_symbol
+        for q in known_quotes:
+            if raw_symbol.endswith(q) and len(raw_symbol) > len(q):
+                pair = q
+                base = raw_symbol[: len(raw_symbol) - len(pair)]
+                break
 
     # Detectar si el mensaje origen es una foto (viene de /graf)
     msg = query.message
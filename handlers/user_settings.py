@@ -19,6 +19,7 @@ from utils.file_manager import(cargar_usuarios, guardar_usuarios, registrar_usua
                                         check_feature_access, registrar_uso_comando
                                 ) 
 from core.api_client import obtener_precios_control
+from utils.cmc_budget import PRIORIDAD_CONSULTA
 from core.loops import set_custom_alert_history_util # Nueva importación
 
 from core.i18n import _ # <-- AGREGAR LA FUNCIÓN DE TRADUCCIÓN
@@ -254,7 +255,7 @@ async def set_monedas_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     actualizar_monedas(chat_id, monedas)
     
     # 4. Obtener los precios de la nueva lista para dar una respuesta inmediata
-    precios = obtener_precios_control(monedas)
+    precios = obtener_precios_control(monedas, prioridad=PRIORIDAD_CONSULTA)
 
     # 5. Construir y enviar el mensaje de confirmación
     if precios:
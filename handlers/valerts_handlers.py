@@ -1,7 +1,5 @@
 # handlers/valerts_handlers.py
 
-import pandas as pd
-import requests
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler
 from telegram.constants import ParseMode
@@ -13,41 +11,17 @@ from utils.valerts_manager import (
     get_active_symbols
 )
 from utils.tv_helper import get_tv_data
+from utils.kline_buffer import get_klines_incremental
 from core.btc_advanced_analysis import BTCAdvancedAnalyzer
 from utils.ads_manager import get_random_ad_text
 
 # --- FETCHER DE DATOS ROBUSTO ---
-def get_kline_data(symbol, interval="4h", limit=200):
-    """Obtiene velas de Binance para cualquier par."""
+async def get_kline_data(symbol, interval="4h", limit=200):
+    """Obtiene velas de Binance para cualquier par (cliente compartido)."""
     if not symbol.endswith("USDT") and "BTC" not in symbol: 
         symbol += "USDT"
-    
-    # Intentamos endpoints redundantes
-    endpoints = [
-        "https://api.binance.com/api/v3/klines",
-        "https://api.binance.us/api/v3/klines"
-    ]
-    
-    params = {"symbol": symbol, "interval": interval, "limit": limit}
-    
-    for url in endpoints:
-        try:
-            r = requests.get(url, params=params, timeout=5)
-            if r.status_code == 200:
-                data = r.json()
-                if isinstance(data, list) and len(data) > 50:
-                    df = pd.DataFrame(data, columns=[
-                        "open_time", "open", "high", "low", "close", "volume",
-                        "c_time", "q_vol", "trades", "tb_base", "tb_quote", "ig"
-                    ])
-                    cols = ["open", "high", "low", "close", "volume"]
-                    df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
-                    # Importante: Convertir tiempo para el Analyzer
-                    df['time'] = pd.to_datetime(df['open_time'], unit='ms')
-                    return df
-        except Exception:
-            continue
-    return None
+    # Más de 50 velas o no sirve; tras la siembra solo se descargan las velas nuevas
+    return await get_klines_incremental(symbol, interval, limit, min_rows=51)
 
 # --- TECLADO DINÁMICO (Estilo BTC) ---
 def _get_valerts_keyboard(user_id, symbol, current_source="BINANCE", current_tf="4h"):
@@ -193,7 +167,7 @@ async def valerts_show_analysis(update: Update, context: ContextTypes.DEFAULT_TY
     # MODO LOCAL (BINANCE PRO) - Lógica Idéntica a BTC Handler
     # ==================================================================
     if source == "BINANCE":
-        df = get_kline_data(symbol, tf)
+        df = await get_kline_data(symbol, tf)
         if df is None:
             msg = f"⚠️ No hay datos para {display_sym}. Prueba TradingView."
         else:
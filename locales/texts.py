@@ -34,6 +34,8 @@ HELP_MSG = {
         "  • `/logs [N]`: Muestra las últimas líneas del log.\n"
         "  • `/ms`: Enviar mensaje masivo a todos los usuarios.\n" 
         "  • `/ad`: Gestionar anuncios (listar, añadir, borrar).\n"
+        "  • `/cmc`: Consumo de créditos de CoinMarketCap y fecha estimada de agotamiento.\n"
+        "  • `/perf`: Métricas de los bucles de señales, cachés y archivo de velas.\n"
     ),
     "en": (
         "📚 *Help Menu*\n"
@@ -68,5 +70,7 @@ HELP_MSG = {
         "  • `/logs [N]`: Shows the last lines of the log.\n"
         "  • `/ms`: Send mass message to all users.\n" 
         "  • `/ad`: Manage ads (list, add, delete).\n"
+        "  • `/cmc`: CoinMarketCap credit usage and projected exhaustion date.\n"
+        "  • `/perf`: Signal loop, cache and candle archive metrics.\n"
     )
 }
@@ -0,0 +1,104 @@
+# scripts/bench_price_alerts.py
+# Benchmark: evaluación de alertas de cruce con el recorrido completo antiguo
+# frente al índice por moneda con bisect (utils/alerts_index.py).
+#
+# Uso:  python scripts/bench_price_alerts.py [--alerts 100000] [--coins 50] [--ticks 200]
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.alerts_index import PriceAlertIndex  # noqa: E402
+
+
+def _synthetic_alerts(n_alerts: int, n_coins: int, base_prices: dict) -> dict:
+    """n_alerts registros (pares ABOVE/BELOW) repartidos entre usuarios."""
+    coins = list(base_prices)
+    alerts: dict[str, list] = {}
+    for i in range(n_alerts // 2):
+        uid = str(100_000 + i // 10)
+        coin = random.choice(coins)
+        target = base_prices[coin] * random.uniform(0.8, 1.2)
+        for cond in ("ABOVE", "BELOW"):
+            alerts.setdefault(uid, []).append({
+                "alert_id": uuid.uuid4().hex[:8], "coin": coin,
+                "target_price": target, "condition": cond, "status": "ACTIVE",
+            })
+    return alerts
+
+
+def _scan(alerts: dict, prev: dict, curr: dict) -> list:
+    """Lógica antigua de check_custom_price_alerts: todas las alertas, todos los ticks."""
+    hits = []
+    for uid, user_alerts in alerts.items():
+        for a in user_alerts:
+            if a["status"] != "ACTIVE":
+                continue
+            p, c = prev.get(a["coin"]), curr.get(a["coin"])
+            if p is None or c is None:
+                continue
+            t = a["target_price"]
+            if a["condition"] == "ABOVE" and p < t <= c:
+                hits.append(a["alert_id"])
+            elif a["condition"] == "BELOW" and p > t >= c:
+                hits.append(a["alert_id"])
+    return hits
+
+
+def _indexed(index: PriceAlertIndex, prev: dict, curr: dict) -> list:
+    hits = []
+    for coin in index.coins():
+        for _uid, a in index.crossings(coin, prev.get(coin), curr.get(coin)):
+            hits.append(a["alert_id"])
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--alerts", type=int, default=100_000)
+    parser.add_argument("--coins", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(42)
+    base = {f"C{i}": random.uniform(0.01, 50_000) for i in range(args.coins)}
+    alerts = _synthetic_alerts(args.alerts, args.coins, base)
+
+    # Secuencia de precios (paseo aleatorio ±1% por tick)
+    path = [dict(base)]
+    for _ in range(args.ticks):
+        path.append({c: p * random.uniform(0.99, 1.01) for c, p in path[-1].items()})
+
+    index = PriceAlertIndex()
+    t0 = time.perf_counter()
+    index.sync(alerts)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    scan_hits = [_scan(alerts, path[i], path[i + 1]) for i in range(args.ticks)]
+    t_scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    idx_hits = [_indexed(index, path[i], path[i + 1]) for i in range(args.ticks)]
+    t_idx = time.perf_counter() - t0
+
+    same = all(sorted(a) == sorted(b) for a, b in zip(scan_hits, idx_hits))
+    total_hits = sum(len(h) for h in idx_hits)
+
+    print(f"alertas={args.alerts}  monedas={args.coins}  ticks={args.ticks}  disparos={total_hits}")
+    print(f"construcción del índice : {build * 1000:8.1f} ms (una vez por cambio de alertas)")
+    print(f"recorrido completo      : {t_scan / args.ticks * 1000:8.3f} ms/tick")
+    print(f"índice + bisect         : {t_idx / args.ticks * 1000:8.3f} ms/tick")
+    print(f"aceleración             : {t_scan / t_idx if t_idx else float('inf'):8.1f}x")
+    print(f"resultados idénticos    : {same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# scripts/bench_sp_batch.py
+# Benchmark: SPSignalEngine.analyze() par a par frente a la puntuación en lote
+# sobre un tensor NumPy (utils/sp_batch.py), sin memo (vela recién cerrada) y
+# con el memo por vela cerrada vigente (utils/analysis_memo.py). Verifica además
+# que todas las rutas devuelven las mismas señales.
+#
+# Uso:  python scripts/bench_sp_batch.py [--pairs 65] [--bars 120] [--rounds 20]
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sp_loop import SPSignalEngine  # noqa: E402
+from utils.analysis_memo import analysis_memo  # noqa: E402
+
+
+def _synthetic_frames(n_pairs: int, n_bars: int, seed: int = 1) -> dict:
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for p in range(n_pairs):
+        base = rng.uniform(0.01, 60000)
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.006, n_bars)))
+        open_ = np.r_[close[0], close[:-1]]
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.004, n_bars))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.004, n_bars))
+        open_time = 1_700_000_000_000 + np.arange(n_bars, dtype=np.int64) * 60_000
+        frames[(f"PAIR{p}USDT", "1m")] = pd.DataFrame({
+            "open_time": open_time, "open": open_, "high": high, "low": low,
+            "close": close, "volume": rng.uniform(10, 1000, n_bars),
+        })
+    return frames
+
+
+def _same(a: dict, b: dict) -> bool:
+    for k, va in a.items():
+        vb = b[k]
+        if isinstance(va, float) or isinstance(vb, float):
+            if not math.isclose(va, vb, rel_tol=1e-6, abs_tol=0.011):
+                return False
+        elif va != vb:
+            return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, default=65)
+    parser.add_argument("--bars", type=int, default=120)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = SPSignalEngine()
+    frames = _synthetic_frames(args.pairs, args.bars)
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        single = {key: engine.analyze(df) for key, df in frames.items()}
+    t_single = (time.perf_counter() - t0) / args.rounds
+
+    engine.analyze_batch(frames)   # Calentar la caché de matrices de pesos
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        analysis_memo.clear()
+        batch = engine.analyze_batch(frames)
+    t_batch = (time.perf_counter() - t0) / args.rounds
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        memo = engine.analyze_batch(frames)
+    t_memo = (time.perf_counter() - t0) / args.rounds
+
+    mismatches = [key for key in frames
+                  if not _same(single[key], batch[key]) or not _same(single[key], memo[key])]
+    print(f"Pares: {args.pairs}  velas: {args.bars}")
+    print(f"  analyze() par a par: {t_single * 1000:8.2f} ms/ciclo")
+    print(f"  analyze_batch():     {t_batch * 1000:8.2f} ms/ciclo  (x{t_single / t_batch:.1f})")
+    print(f"  con memo vigente:    {t_memo * 1000:8.2f} ms/ciclo  (x{t_single / t_memo:.1f})")
+    print(f"  Señales distintas: {len(mismatches)}" + (f"  {mismatches[:5]}" if mismatches else ""))
+
+
+if __name__ == "__main__":
+    main()
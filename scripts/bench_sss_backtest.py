@@ -0,0 +1,124 @@
+# scripts/bench_sss_backtest.py
+# Benchmark del backtest SSS: motor vectorizado de una pasada
+# (_bt_run_vectorized) frente al motor original barra a barra
+# (_bt_run_bar_by_bar, O(n²)). Comprueba además que ambos dan las mismas
+# operaciones y el mismo diagnóstico sobre un histórico sintético fijo.
+#
+# El motor de referencia solo se ejecuta hasta --max-ref velas: con 50.000
+# tardaría horas.
+#
+# Uso:  python scripts/bench_sss_backtest.py [--sizes 500 5000 50000] [--max-ref 5000] [--seed 11]
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.sss_manager import _bt_run_bar_by_bar, _bt_run_vectorized  # noqa: E402
+
+# Estrategias de prueba: cubren todos los filtros de entrada y el trailing
+STRATEGIES = [
+    {
+        "id": "bench_basic", "name": "Básica", "timeframes": ["5m"],
+        "entry_filter": {"min_score": 3.0},
+        "risk": {"sl_atr_mult": 1.5, "tp1_atr_mult": 2.0, "tp2_atr_mult": 3.5, "tp3_atr_mult": 5.5},
+        "leverage": {"default": 5, "max": 20},
+    },
+    {
+        "id": "bench_trend", "name": "Tendencia", "timeframes": ["15m"],
+        "entry_filter": {
+            "min_score": 2.5, "supertrend_align": True, "ash_signal": True,
+            "adx_min": 18, "adx_di_confirm": True,
+            "rsi_oversold_buy": 62, "rsi_overbought_sell": 38,
+        },
+        "risk": {"sl_atr_mult": 1.2, "tp1_atr_mult": 1.5, "tp2_atr_mult": 3.0, "tp3_atr_mult": 4.5,
+                 "trailing_after_tp1": True, "trailing_type": "supertrend"},
+        "leverage": {"default": 10, "max": 20, "volatile_reduce": True, "volatile_threshold": 0.004},
+    },
+    {
+        "id": "bench_scalper", "name": "Scalper", "timeframes": ["1m"],
+        "entry_filter": {"min_score": 2.0, "volume_spike": True, "volume_spike_mult": 1.2,
+                         "macd_cross_required": True},
+        "risk": {"sl_atr_mult": 0.8, "tp1_atr_mult": 1.0, "tp2_atr_mult": 1.8, "tp3_atr_mult": 2.6},
+        "leverage": {"default": 8, "max": 25},
+    },
+]
+
+
+def _synthetic(n_bars: int, seed: int) -> pd.DataFrame:
+    """Paseo aleatorio con régimen de volatilidad variable, mechas y volumen."""
+    rng = np.random.default_rng(seed)
+    vol = 0.003 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)).clip(-1.5, 1.5))
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 1, n_bars) * vol))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 1, n_bars) * vol)
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 1, n_bars) * vol)
+    index = pd.date_range("2024-01-01", periods=n_bars, freq="5min")
+    return pd.DataFrame({
+        "open_time": index.asi8 // 1_000_000, "open": open_, "high": high, "low": low,
+        "close": close, "volume": rng.lognormal(5, 0.6, n_bars),
+    }, index=index)
+
+
+def _same_value(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def _diff(ref: tuple, vec: tuple) -> list:
+    """Diferencias entre (trades, diag) de ambos motores."""
+    (t_ref, d_ref), (t_vec, d_vec) = ref, vec
+    out = []
+    if len(t_ref) != len(t_vec):
+        out.append(f"nº operaciones {len(t_ref)} != {len(t_vec)}")
+    for a, b in zip(t_ref, t_vec):
+        bad = [k for k in a if not _same_value(a[k], b.get(k))]
+        if bad:
+            out.append(f"barra {a['bar_idx']}: {bad}")
+    for key in d_ref:
+        if d_ref[key] != d_vec[key]:
+            out.append(f"{key}: {d_ref[key]} != {d_vec[key]}")
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--max-ref", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    ok = True
+    for n_bars in args.sizes:
+        df = _synthetic(n_bars, args.seed)
+        for strategy in STRATEGIES:
+            t0 = time.perf_counter()
+            vec = _bt_run_vectorized(strategy, df)
+            t_vec = time.perf_counter() - t0
+            line = (f"{n_bars:>6} velas  {strategy['id']:<14} ops={len(vec[0]):>4}  "
+                    f"vectorizado={t_vec * 1000:9.1f} ms")
+            if n_bars <= args.max_ref:
+                t0 = time.perf_counter()
+                ref = _bt_run_bar_by_bar(strategy, df)
+                t_ref = time.perf_counter() - t0
+                diffs = _diff(ref, vec)
+                ok &= not diffs
+                line += (f"  barra_a_barra={t_ref * 1000:10.1f} ms  (x{t_ref / t_vec:.0f})"
+                         f"  {'OK' if not diffs else 'DIFERENTE'}")
+                for d in diffs[:5]:
+                    line += f"\n      {d}"
+            print(line)
+
+    print("RESULTADOS IGUALES" if ok else "RESULTADOS DIFERENTES")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
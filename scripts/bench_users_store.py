@@ -0,0 +1,104 @@
+# scripts/bench_users_store.py
+# Benchmark: throughput de registrar_uso_comando con users.json (reescritura
+# completa con indent=4) frente al almacén SQLite (json_set por campo).
+#
+# Uso:  python scripts/bench_users_store.py [--users 10000 100000] [--seconds 5]
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import users_db  # noqa: E402
+
+
+def _fake_user(i: int) -> dict:
+    today = datetime.now().strftime('%Y-%m-%d')
+    return {
+        "monedas": ["BTC", "HIVE", "HBD", "TON"],
+        "hbd_alerts": bool(i % 2),
+        "language": "es",
+        "intervalo_alerta_h": 1.0,
+        "registered_at": "2025-01-01 00:00:00",
+        "last_seen": None,
+        "daily_usage": {
+            "date": today, "ver": 0, "tasa": 0, "ta": 0,
+            "temp_changes": 0, "reminders": 0, "weather": 0, "btc": 0,
+        },
+        "subscriptions": {
+            "alerts_extra": {"qty": 0, "expires": None},
+            "coins_extra": {"qty": 0, "expires": None},
+            "watchlist_bundle": {"active": False, "expires": None},
+            "tasa_vip": {"active": False, "expires": None},
+            "ta_vip": {"active": False, "expires": None},
+            "sp_signals": {"active": False, "expires": None},
+        },
+    }
+
+
+def _bench_json(usuarios: dict, path: str, seconds: float) -> tuple[int, float]:
+    """Camino antiguo: muta el dict y reescribe el fichero entero."""
+    ids = list(usuarios)
+    ops, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        uid = random.choice(ids)
+        usuarios[uid]["daily_usage"]["ta"] += 1
+        usuarios[uid]["last_seen"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(usuarios, f, indent=4)
+        os.replace(tmp, path)
+        ops += 1
+    return ops, time.perf_counter() - t0
+
+
+def _bench_sqlite(usuarios: dict, db_path: str, seconds: float) -> tuple[int, float]:
+    """Camino nuevo: muta el dict y escribe solo los dos campos tocados."""
+    users_db.init_users_db(db_path)
+    users_db.upsert_users({k: users_db.serialize_user(v) for k, v in usuarios.items()})
+    ids = list(usuarios)
+    ops, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        uid = random.choice(ids)
+        daily = usuarios[uid]["daily_usage"]
+        daily["ta"] += 1
+        usuarios[uid]["last_seen"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        users_db.update_user_fields(uid, {
+            "daily_usage.ta": daily["ta"],
+            "last_seen": usuarios[uid]["last_seen"],
+        })
+        ops += 1
+    elapsed = time.perf_counter() - t0
+    users_db.close_users_db()
+    return ops, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'usuarios':>10} | {'backend':>7} | {'ops':>7} | {'ops/s':>10} | {'ms/op':>8}")
+    print("-" * 56)
+    for n in args.users:
+        with tempfile.TemporaryDirectory() as tmp:
+            base = {str(1_000_000 + i): _fake_user(i) for i in range(n)}
+            for name, fn, path in (
+                ("json",   _bench_json,   os.path.join(tmp, "users.json")),
+                ("sqlite", _bench_sqlite, os.path.join(tmp, "users.db")),
+            ):
+                usuarios = json.loads(json.dumps(base))
+                ops, elapsed = fn(usuarios, path, args.seconds)
+                rate = ops / elapsed if elapsed else 0.0
+                print(f"{n:>10} | {name:>7} | {ops:>7} | {rate:>10.1f} | {1000 / rate if rate else 0:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# scripts/candle_archive.py
+# Gestión del archivo local de velas (utils/candle_archive.py).
+#
+#   python scripts/candle_archive.py download --symbols BTCUSDT ETHUSDT --intervals 5m 1h --start 2024-01-01
+#   python scripts/candle_archive.py topup                # completa hasta ahora todas las series
+#   python scripts/candle_archive.py info
+#
+# download es reanudable: si se corta, al relanzarlo sigue desde la última
+# página confirmada. Con una serie ya creada y un --start anterior a su primera
+# vela, descarga también el tramo que falta por delante.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.candle_archive import candle_archive  # noqa: E402
+
+
+def _fmt_ms(ms: int) -> str:
+    return pd.Timestamp(ms, unit="ms").strftime("%Y-%m-%d %H:%M")
+
+
+async def _download(pairs: list, start, end) -> int:
+    from utils.market_data import MarketDataClient
+
+    client = MarketDataClient(timeout=15, cache=None)
+    total = 0
+    try:
+        for symbol, interval in pairs:
+            t0 = time.perf_counter()
+            added = await candle_archive.download(symbol, interval, start, end, client=client)
+            total += added
+            print(f"{symbol}/{interval}: +{added} velas en {time.perf_counter() - t0:.1f} s")
+    finally:
+        await client.close()
+    return total
+
+
+def _info() -> None:
+    series = candle_archive.series()
+    if not series:
+        print(f"Archivo vacío ({candle_archive.root})")
+        return
+    print(f"{'serie':<20} {'velas':>9}  {'desde':<16}  {'hasta':<16}")
+    for symbol, interval in series:
+        meta = candle_archive.meta(symbol, interval)
+        print(f"{symbol + '/' + interval:<20} {meta['rows']:>9}  "
+              f"{_fmt_ms(meta['first_open_time']):<16}  {_fmt_ms(meta['last_open_time']):<16}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Archivo local de velas")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    dl = sub.add_parser("download", help="Descarga o amplía series")
+    dl.add_argument("--symbols", nargs="+", required=True)
+    dl.add_argument("--intervals", nargs="+", required=True)
+    dl.add_argument("--start", help="Fecha inicial (UTC, 'YYYY-MM-DD'); obligatoria en series nuevas")
+    dl.add_argument("--end", help="Fecha final exclusiva (por defecto, ahora)")
+    sub.add_parser("topup", help="Completa hasta ahora todas las series archivadas")
+    sub.add_parser("info", help="Series archivadas")
+    args = parser.parse_args()
+
+    if args.cmd == "info":
+        _info()
+        return 0
+    if args.cmd == "topup":
+        pairs, start, end = candle_archive.series(), None, None
+    else:
+        pairs = [(s.upper(), i) for s in args.symbols for i in args.intervals]
+        start, end = args.start, args.end
+    if not pairs:
+        print("No hay series que descargar")
+        return 1
+    try:
+        total = asyncio.run(_download(pairs, start, end))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+    print(f"Total: +{total} velas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# scripts/check_btc_resample.py
+# Comprueba las temporalidades agregadas en local (utils/kline_resample.py).
+#
+# Sin argumentos trabaja sin red, sobre una serie base sintética:
+#   - la agregación frente a DataFrame.resample de pandas (cubetas desde la
+#     época y semanas W-MON), como referencia independiente,
+#   - que la actualización incremental, vela base a vela base, da lo mismo
+#     que agregar de cero.
+# Con --exchange compara con las velas de Binance las temporalidades del
+# monitor BTC (core/btc_loop.py): velas que faltan y velas que difieren.
+#
+# Uso:  python scripts/check_btc_resample.py [--bars 6000] [--seed 3]
+#       python scripts/check_btc_resample.py --exchange [--limit 300]
+
+import argparse
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.kline_resample import KlineResampler, resample_columns  # noqa: E402
+from utils.market_data import KLINE_COLUMNS, interval_to_ms, klines_frame  # noqa: E402
+
+_PANDAS_RULE = {"2h": "2h", "4h": "4h", "8h": "8h", "12h": "12h", "1d": "1D", "1w": "W-MON"}
+
+
+def _synthetic(n_bars: int, seed: int, base: str) -> pd.DataFrame:
+    """Paseo aleatorio que empieza a mitad de cubeta (un miércoles a las 05:00 UTC)."""
+    rng = np.random.default_rng(seed)
+    step = interval_to_ms(base)
+    t0 = int(pd.Timestamp("2024-01-03 05:00").value // 1_000_000) // step * step
+    close = 40000 * np.exp(np.cumsum(rng.normal(0, 0.003, n_bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.002, n_bars))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.002, n_bars))
+    ot = t0 + np.arange(n_bars, dtype=np.int64) * step
+    rows = np.c_[ot, open_, high, low, close, rng.uniform(1, 50, n_bars), ot + step - 1]
+    return klines_frame(rows.tolist())
+
+
+def _pandas_reference(df: pd.DataFrame, target: str) -> pd.DataFrame:
+    rule = _PANDAS_RULE[target]
+    if target == "1w":
+        kw = {"label": "left", "closed": "left"}
+    else:
+        kw = {"origin": "epoch"} if target.endswith("h") else {}
+    out = df.resample(rule, **kw).agg({"open": "first", "high": "max", "low": "min",
+                                       "close": "last", "volume": "sum"}).dropna()
+    out["open_time"] = (out.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    return out
+
+
+def _check_offline(bars: int, seed: int) -> int:
+    failures = 0
+    for base, targets in (("1h", ("2h", "4h", "8h", "12h", "1d")), ("1d", ("1w",))):
+        df = _synthetic(bars, seed, base)
+        cols = {c: df[c].to_numpy() for c in KLINE_COLUMNS}
+        full = {t: resample_columns(cols, t) for t in targets}
+
+        for t in targets:
+            ref = _pandas_reference(df, t)
+            ours = full[t]
+            ref = ref[ref["open_time"] >= ours["open_time"][0]]   # Primera cubeta incompleta fuera
+            same = (np.array_equal(ours["open_time"], ref["open_time"].to_numpy())
+                    and all(np.allclose(ours[c], ref[c].to_numpy(), rtol=1e-12)
+                            for c in ("open", "high", "low", "close", "volume")))
+            failures += not same
+            print(f"{base}→{t:<4} {len(ours['open_time']):>6} velas  pandas: {'OK' if same else 'DIFIERE'}")
+
+        # Incremental: la base llega en trozos, con la última vela aún en curso
+        inc = KlineResampler("SYNTH", base, targets, rows=10**9)
+        for end in range(bars // 2, bars + 1, 7):
+            inc.update(df.iloc[:end])
+        inc.update(df)
+        for t in targets:
+            same = all(np.array_equal(inc._cols[t][c], full[t][c]) for c in KLINE_COLUMNS)
+            failures += not same
+            print(f"{base}→{t:<4} incremental frente a completo: {'OK' if same else 'DIFIERE'}")
+    return failures
+
+
+async def _check_exchange(limit: int) -> int:
+    from core.btc_loop import _BTC_RESAMPLERS
+    from utils.market_data import close_market_data
+
+    failures = 0
+    try:
+        for resampler in _BTC_RESAMPLERS:
+            for t in resampler.targets:
+                report = await resampler.validate(t, limit)
+                ok = not (report.get("error") or report["missing_local"] or report["mismatched"])
+                failures += not ok
+                print(f"{t:<4} {'OK' if ok else 'DIFIERE'}  {report}")
+    finally:
+        await close_market_data()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Comprueba el remuestreo local de velas")
+    parser.add_argument("--bars", type=int, default=6000)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--exchange", action="store_true", help="Comparar con las velas de Binance")
+    parser.add_argument("--limit", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.exchange:
+        failures = asyncio.run(_check_exchange(args.limit))
+    else:
+        failures = _check_offline(args.bars, args.seed)
+    print("\n✅ Sin diferencias" if not failures else f"\n❌ {failures} comprobación(es) con diferencias")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
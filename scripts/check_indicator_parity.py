@@ -0,0 +1,192 @@
+# scripts/check_indicator_parity.py
+# Paridad de los indicadores incrementales (utils/indicator_stream.py) con
+# pandas_ta / pandas sobre una serie OHLCV sintética (o velas reales de Binance).
+#
+# Comprueba, vela a vela:
+#   - cada indicador frente a su equivalente pandas_ta (o Series.ewm/rolling),
+#   - que peek() sobre la vela en curso coincide con el update() posterior
+#     y no altera el estado,
+#   - que IndicatorStreamStore.sync() incremental da lo mismo que sembrar de cero.
+#
+# Uso:  python scripts/check_indicator_parity.py [--bars 1500] [--seed 7] [--symbol BTCUSDT --interval 1h]
+
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicator_stream import (  # noqa: E402
+    BTCIndicators,
+    IndicatorStreamStore,
+    SignalIndicators,
+)
+
+
+def _synthetic(n_bars: int, seed: int) -> pd.DataFrame:
+    """Paseo aleatorio con mechas, volumen y algún tramo plano (rango cero)."""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.004, n_bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, n_bars))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, n_bars))
+    flat = slice(n_bars // 3, n_bars // 3 + 20)
+    open_[flat] = high[flat] = low[flat] = close[flat] = close[n_bars // 3]
+    volume = rng.uniform(10, 500, n_bars)
+    open_time = 1_700_000_000_000 + np.arange(n_bars, dtype=np.int64) * 3_600_000
+    return pd.DataFrame({"open_time": open_time, "open": open_, "high": high,
+                         "low": low, "close": close, "volume": volume})
+
+
+def _reference(df: pd.DataFrame) -> dict:
+    """Series de referencia con pandas_ta (las mismas llamadas que usa el bot)."""
+    import pandas_ta as ta
+
+    h, l, c, v = df["high"], df["low"], df["close"], df["volume"]
+    macd = ta.macd(c, fast=12, slow=26, signal=9)
+    stoch = ta.stoch(h, l, c, k=14, d=3, smooth_k=3)
+    ref = {
+        "sp": {
+            "ema9": c.ewm(span=9, adjust=False).mean(),
+            "ema20": c.ewm(span=20, adjust=False).mean(),
+            "ema50": c.ewm(span=50, adjust=False).mean(),
+            "rsi": ta.rsi(c, length=14),
+            "macd": macd.iloc[:, 0], "macd_hist": macd.iloc[:, 1], "macd_signal": macd.iloc[:, 2],
+            "stoch_k": stoch.iloc[:, 0], "stoch_d": stoch.iloc[:, 1],
+            "cci": ta.cci(h, l, c, length=20),
+            "bb_mid": c.rolling(20).mean(), "bb_std": c.rolling(20).std(),
+            "mfi": ta.mfi(h, l, c, v, length=14),
+            "atr": ta.atr(h, l, c, length=14),
+        },
+        "btc": {
+            **{f"EMA_{n}": ta.ema(c, length=n) for n in BTCIndicators.EMA_LENGTHS},
+            "RSI": ta.rsi(c, length=14),
+            "STOCH_K": stoch.iloc[:, 0], "STOCH_D": stoch.iloc[:, 1],
+            "CCI": ta.cci(h, l, c, length=20),
+            "AO": ta.ao(h, l),
+            "ADX": ta.adx(h, l, c, length=14).iloc[:, 0],
+            "MACD_LINE": macd.iloc[:, 0], "MACD_HIST": macd.iloc[:, 1],
+            "MACD_SIGNAL": macd.iloc[:, 2],
+            "ATR": ta.atr(h, l, c, length=14),
+        },
+    }
+    return {name: {k: s.to_numpy(dtype=np.float64) for k, s in cols.items()}
+            for name, cols in ref.items()}
+
+
+def _stream_series(factory, df: pd.DataFrame) -> dict:
+    ind = factory()
+    rows = []
+    for r in df.itertuples(index=False):
+        rows.append(ind.update(r.high, r.low, r.close, r.volume, r.open_time))
+    return {k: np.array([row[k] for row in rows], dtype=np.float64) for k in rows[-1]}
+
+
+# Indicadores que dividen por la dispersión de una ventana de 20: en ventanas
+# totalmente planas pandas arrastra residuos de coma flotante (std ~1e-4 en vez
+# de 0) y el resultado no es comparable.
+_FLAT_SENSITIVE = {"bb_std", "cci", "CCI"}
+
+
+def _flat_windows(df: pd.DataFrame, length: int = 20) -> np.ndarray:
+    close = df["close"].to_numpy()
+    flat = np.zeros(len(close), dtype=bool)
+    for i in range(length - 1, len(close)):
+        win = close[i - length + 1:i + 1]
+        flat[i] = win.max() == win.min()
+    return flat
+
+
+def _compare(name: str, ref: dict, got: dict, tol: float, flat: np.ndarray) -> bool:
+    ok = True
+    for key, expected in ref.items():
+        actual = got[key]
+        mask = ~np.isnan(expected)
+        if key in _FLAT_SENSITIVE:
+            mask &= ~flat
+        # Las primeras velas válidas dependen de la semilla: se descarta el arranque
+        warm = np.flatnonzero(mask)
+        if not len(warm):
+            print(f"  {name}.{key:<12} sin valores de referencia")
+            continue
+        mask[warm[0]:warm[0] + 1] = False
+        missing = int(np.isnan(actual[mask]).sum())
+        err = np.abs(actual[mask] - expected[mask]) / np.maximum(1.0, np.abs(expected[mask]))
+        worst = float(np.nanmax(err)) if err.size else 0.0
+        bad = missing > 0 or worst > tol
+        ok &= not bad
+        print(f"  {name}.{key:<12} max_rel_err={worst:.2e}  nan_faltantes={missing}"
+              f"{'  ✗' if bad else ''}")
+    return ok
+
+
+def _check_provisional(factory, df: pd.DataFrame) -> bool:
+    """peek() de la vela en curso == update() al cerrarla, sin modificar el estado."""
+    ind = factory.from_frame(df.iloc[:-1])
+    last = df.iloc[-1]
+    args = (last["high"], last["low"], last["close"], last["volume"])
+    first, second = ind.peek(*args), ind.peek(*args)
+    closed = ind.update(*args)
+    return all(
+        (math.isnan(first[k]) and math.isnan(closed[k])) or
+        (first[k] == second[k] and math.isclose(first[k], closed[k], rel_tol=1e-12, abs_tol=1e-12))
+        for k in closed
+    )
+
+
+def _check_sync(factory, df: pd.DataFrame) -> bool:
+    """Sincronizar por trozos (ventana deslizante) == sembrar con todo el histórico."""
+    store = IndicatorStreamStore()
+    window = 120
+    for end in range(window, len(df) + 1, 7):
+        ind = store.sync(("TEST", "1h", "parity"), df.iloc[end - window:end], factory)
+    full = factory.from_frame(df.iloc[:ind.count])
+    same = all(
+        (math.isnan(ind.last[k]) and math.isnan(full.last[k]))
+        or math.isclose(ind.last[k], full.last[k], rel_tol=1e-9, abs_tol=1e-9)
+        for k in full.last
+    )
+    print(f"  sync: {store.stats()}")
+    return same and store.seeds == 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bars", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--symbol", help="Usar velas reales de Binance en vez de sintéticas")
+    parser.add_argument("--interval", default="1h")
+    parser.add_argument("--tol", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    if args.symbol:
+        from utils.market_data import get_klines_blocking
+        df = get_klines_blocking(args.symbol, args.interval, min(args.bars, 1000), timeout=10)
+        if df is None:
+            print("No se pudieron descargar velas")
+            return 2
+        df = df.reset_index(drop=True)
+    else:
+        df = _synthetic(args.bars, args.seed)
+    print(f"Velas: {len(df)}")
+
+    ref = _reference(df)
+    flat = _flat_windows(df)
+    ok = _compare("sp", ref["sp"], _stream_series(SignalIndicators, df), args.tol, flat)
+    ok &= _compare("btc", ref["btc"], _stream_series(BTCIndicators, df), args.tol, flat)
+    for factory in (SignalIndicators, BTCIndicators):
+        prov = _check_provisional(factory, df)
+        sync = _check_sync(factory, df)
+        print(f"  {factory.__name__}: provisional={'OK' if prov else '✗'} sync={'OK' if sync else '✗'}")
+        ok &= prov and sync
+
+    print("PARIDAD OK" if ok else "PARIDAD FALLIDA")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# scripts/sss_sweep.py
+# Barrido de backtests SSS: rejilla de parámetros × símbolos × temporalidades
+# en paralelo (utils/sss_sweep.py), con tabla ordenada y exportación a CSV.
+#
+# La rejilla es un JSON {ruta.del.parámetro: [valores]} (o la ruta a un
+# fichero con ese JSON). Ejemplo:
+#
+#   python scripts/sss_sweep.py --strategy sasas_pro \
+#       --grid '{"entry_filter.min_score": [4, 4.5, 5], "risk.sl_atr_mult": [1.2, 1.5]}' \
+#       --symbols BTCUSDT ETHUSDT SOLUSDT --timeframes 5m 15m --candles 1000 \
+#       --csv data/sss/sweeps/sasas.csv
+#
+# Con --start/--end las velas salen del archivo local (utils/candle_archive.py)
+# para ese rango de fechas en lugar de las últimas --candles en vivo: el mismo
+# barrido da siempre el mismo resultado.
+#
+# --strategy acepta un id cargado en data/sss/strategies/ o la ruta a un .json.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.sss_sweep import RANK_FIELDS, format_table, rank_results, run_sweep, write_csv  # noqa: E402
+
+DEFAULT_SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT"]
+
+
+def _load_json_arg(value: str):
+    if os.path.isfile(value):
+        with open(value, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def _load_strategy(value: str) -> dict | None:
+    if value.endswith(".json") and os.path.isfile(value):
+        return _load_json_arg(value)
+    from utils.sss_manager import get_strategy_by_id
+    return get_strategy_by_id(value)
+
+
+def _download(symbols: list, timeframes: list, candles: int) -> dict:
+    """Descarga cada (symbol, tf) una sola vez en el proceso padre."""
+    from utils.market_data import get_klines_blocking
+
+    frames = {}
+    for symbol in symbols:
+        for tf in timeframes:
+            df = get_klines_blocking(symbol, tf, candles, timeout=15, min_rows=80)
+            if df is None or len(df) < 80:
+                print(f"⚠️ Sin velas suficientes para {symbol}/{tf}, se omite")
+                continue
+            frames[(symbol, tf)] = df
+    return frames
+
+
+def _from_archive(symbols: list, timeframes: list, start, end) -> dict:
+    """Rango [start, end) del archivo local; completa antes las series que no lo cubran."""
+    from utils.sss_manager import _bt_download_candles
+
+    frames = {}
+    for symbol in symbols:
+        for tf in timeframes:
+            df = _bt_download_candles(symbol, tf, start=start, end=end)
+            if df is None or len(df) < 80:
+                print(f"⚠️ Sin velas suficientes en el archivo para {symbol}/{tf}, se omite")
+                continue
+            frames[(symbol, tf)] = df
+    return frames
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--strategy", required=True, help="id de estrategia o ruta a un .json")
+    parser.add_argument("--grid", default="{}", help="JSON {ruta.parámetro: [valores]} o ruta a un fichero")
+    parser.add_argument("--symbols", nargs="+", default=DEFAULT_SYMBOLS)
+    parser.add_argument("--timeframes", nargs="+", help="Por defecto, las de la estrategia")
+    parser.add_argument("--candles", type=int, default=1000)
+    parser.add_argument("--start", help="Fecha inicial (UTC) del archivo local de velas")
+    parser.add_argument("--end", help="Fecha final exclusiva (UTC) del archivo local de velas")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, nº de CPUs)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--csv", help="Exporta una fila por (combinación, symbol, tf)")
+    parser.add_argument("--ranking-csv", help="Exporta la tabla agregada")
+    args = parser.parse_args()
+
+    strategy = _load_strategy(args.strategy)
+    if not strategy:
+        print(f"❌ Estrategia no encontrada: {args.strategy}")
+        return 2
+    grid = _load_json_arg(args.grid)
+    if not isinstance(grid, dict) or not all(isinstance(v, list) and v for v in grid.values()):
+        print("❌ --grid debe ser un objeto {ruta: [valores]} con listas no vacías")
+        return 2
+    timeframes = args.timeframes or strategy.get("timeframes") or ["5m"]
+
+    t0 = time.perf_counter()
+    if args.start or args.end:
+        frames = _from_archive(args.symbols, timeframes, args.start, args.end)
+    else:
+        frames = _download(args.symbols, timeframes, args.candles)
+    if not frames:
+        print("❌ No se pudo descargar ninguna serie")
+        return 1
+    t_download = time.perf_counter() - t0
+
+    n_combos = 1
+    for values in grid.values():
+        n_combos *= len(values)
+    print(f"Estrategia '{strategy.get('id')}': {n_combos} combinación(es) × {len(frames)} serie(s)")
+
+    t0 = time.perf_counter()
+    rows = run_sweep(strategy, grid, frames, workers=args.workers)
+    t_sweep = time.perf_counter() - t0
+    ranked = rank_results(rows)
+
+    print(format_table(ranked, args.top))
+    print(f"\n{len(rows)} backtests en {t_sweep:.1f} s (descarga {t_download:.1f} s)")
+
+    if args.csv:
+        write_csv(rows, args.csv)
+        print(f"CSV: {args.csv}")
+    if args.ranking_csv:
+        write_csv(ranked, args.ranking_csv, RANK_FIELDS)
+        print(f"Ranking CSV: {args.ranking_csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
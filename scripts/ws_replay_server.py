@@ -0,0 +1,252 @@
+# scripts/ws_replay_server.py
+# Servidor local que imita los streams combinados de kline de Binance para
+# probar el modo WebSocket de SmartSignals (core/sp_stream.py) sin red.
+#
+#   GET /stream?streams=btcusdt@kline_1m/ethusdt@kline_5m   → WebSocket
+#   GET /api/v3/klines?symbol=..&interval=..&limit=..&startTime=..   → REST (siembra/backfill)
+#
+# Fuentes de velas:
+#   --replay FILE   JSONL con mensajes grabados del stream combinado (uno por línea).
+#                   Los tiempos se desplazan a "ahora" (múltiplo de 1 día) y se
+#                   reproducen al ritmo original (--speed para acelerar).
+#   (por defecto)   velas sintéticas (paseo aleatorio) alineadas al reloj real.
+#   --record FILE   graba mensajes reales de Binance para replays posteriores.
+#
+# --drop-after N cierra cada conexión tras N mensajes (prueba de reconexión + backfill).
+#
+# Uso con el bot:
+#   python scripts/ws_replay_server.py --port 8765
+#   SP_STREAM_ENABLED=1 SP_STREAM_URL=ws://127.0.0.1:8765/stream \
+#   SP_STREAM_REST_URL=http://127.0.0.1:8765 python bbalert.py
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+from aiohttp import web
+
+_DAY_MS = 86_400_000
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": _DAY_MS, "w": 7 * _DAY_MS}
+
+
+def interval_to_ms(interval: str) -> int:
+    # Independiente de utils.market_data: el servidor no necesita la config del bot
+    return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+
+
+class Market:
+    """Velas por (SYMBOL, interval): {open_time: [t, o, h, l, c, v, T]}."""
+
+    def __init__(self):
+        self.candles: dict[tuple, dict[int, list]] = {}
+
+    def upsert(self, symbol: str, interval: str, row: list) -> None:
+        self.candles.setdefault((symbol, interval), {})[int(row[0])] = row
+
+    def klines(self, symbol: str, interval: str, limit: int, start_time: int | None) -> list:
+        rows = sorted(self.candles.get((symbol, interval), {}).values(), key=lambda r: r[0])
+        if start_time is not None:
+            rows = [r for r in rows if r[0] >= start_time][:limit]
+        else:
+            rows = rows[-limit:]
+        return [[r[0], str(r[1]), str(r[2]), str(r[3]), str(r[4]), str(r[5]), r[6],
+                 "0", 0, "0", "0", "0"] for r in rows]
+
+    @staticmethod
+    def message(symbol: str, interval: str, row: list, closed: bool) -> str:
+        return json.dumps({
+            "stream": f"{symbol.lower()}@kline_{interval}",
+            "data": {
+                "e": "kline", "E": int(time.time() * 1000), "s": symbol,
+                "k": {"t": row[0], "T": row[6], "s": symbol, "i": interval,
+                      "o": str(row[1]), "h": str(row[2]), "l": str(row[3]),
+                      "c": str(row[4]), "v": str(row[5]), "x": closed},
+            },
+        })
+
+
+class SyntheticFeed:
+    """Paseo aleatorio alineado al reloj real; semilla de historia bajo demanda."""
+
+    def __init__(self, market: Market, tick: float, history: int = 200):
+        self.market = market
+        self.tick = tick
+        self.history = history
+        self.keys: set = set()
+
+    def ensure(self, symbol: str, interval: str) -> None:
+        key = (symbol, interval)
+        if key in self.keys:
+            return
+        step = interval_to_ms(interval)
+        now = int(time.time() * 1000) // step * step
+        price = random.uniform(1, 50_000)
+        for i in range(self.history, -1, -1):
+            t = now - i * step
+            o = price
+            price *= random.uniform(0.995, 1.005)
+            self.market.upsert(symbol, interval, [t, o, max(o, price), min(o, price), price,
+                                                  random.uniform(1, 100), t + step - 1])
+        self.keys.add(key)
+
+    async def run(self, broadcast) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            now = int(time.time() * 1000)
+            for symbol, interval in list(self.keys):
+                step = interval_to_ms(interval)
+                candles = self.market.candles[(symbol, interval)]
+                last = candles[max(candles)]
+                t = now // step * step
+                if t > last[0]:
+                    broadcast(symbol, interval, Market.message(symbol, interval, last, True))
+                    last = [t, last[4], last[4], last[4], last[4], 0.0, t + step - 1]
+                c = last[4] * random.uniform(0.999, 1.001)
+                last = [last[0], last[1], max(last[2], c), min(last[3], c), c,
+                        last[5] + random.uniform(0, 5), last[6]]
+                self.market.upsert(symbol, interval, last)
+                broadcast(symbol, interval, Market.message(symbol, interval, last, False))
+
+
+class ReplayFeed:
+    """Reproduce mensajes grabados desplazados a la hora actual."""
+
+    def __init__(self, market: Market, path: str, speed: float):
+        self.market = market
+        self.speed = max(speed, 1e-6)
+        with open(path, "r", encoding="utf-8") as f:
+            self.messages = [json.loads(line) for line in f if line.strip()]
+        first = min(m["data"]["k"]["t"] for m in self.messages)
+        self.offset = (int(time.time() * 1000) - first) // _DAY_MS * _DAY_MS
+        self._seed_history()
+
+    def _shift(self, k: dict) -> list:
+        return [k["t"] + self.offset, float(k["o"]), float(k["h"]), float(k["l"]),
+                float(k["c"]), float(k["v"]), k["T"] + self.offset]
+
+    def _seed_history(self, history: int = 200) -> None:
+        """Historia previa sintética (precio plano) para que la siembra REST funcione."""
+        seen = set()
+        for m in self.messages:
+            k = m["data"]["k"]
+            key = (k["s"], k["i"])
+            if key in seen:
+                continue
+            seen.add(key)
+            step = interval_to_ms(k["i"])
+            row = self._shift(k)
+            for i in range(history, 0, -1):
+                t = row[0] - i * step
+                self.market.upsert(k["s"], k["i"], [t, row[1], row[1], row[1], row[1], 0.0, t + step - 1])
+
+    def ensure(self, symbol: str, interval: str) -> None:
+        pass
+
+    async def run(self, broadcast) -> None:
+        prev_e = None
+        for m in self.messages:
+            e = m["data"].get("E")
+            if prev_e is not None and e is not None:
+                await asyncio.sleep(max(0.0, (e - prev_e) / 1000 / self.speed))
+            prev_e = e
+            k = m["data"]["k"]
+            row = self._shift(k)
+            self.market.upsert(k["s"], k["i"], row)
+            broadcast(k["s"], k["i"], Market.message(k["s"], k["i"], row, bool(k.get("x"))))
+        print("Replay terminado.")
+
+
+def build_app(feed, market: Market, drop_after: int | None) -> web.Application:
+    clients: dict[web.WebSocketResponse, dict] = {}
+
+    def broadcast(symbol: str, interval: str, text: str) -> None:
+        key = f"{symbol.lower()}@kline_{interval}"
+        for ws, info in list(clients.items()):
+            if key not in info["streams"]:
+                continue
+            info["queue"].put_nowait(text)
+
+    async def stream(request: web.Request):
+        streams = set(filter(None, request.query.get("streams", "").split("/")))
+        for s in streams:
+            sym, _, iv = s.partition("@kline_")
+            feed.ensure(sym.upper(), iv)
+        ws = web.WebSocketResponse(heartbeat=20)
+        await ws.prepare(request)
+        info = {"streams": streams, "queue": asyncio.Queue()}
+        clients[ws] = info
+        print(f"+ cliente ({len(streams)} streams)")
+        sent = 0
+        try:
+            while not ws.closed:
+                text = await info["queue"].get()
+                await ws.send_str(text)
+                sent += 1
+                if drop_after and sent >= drop_after:
+                    print(f"- cortando conexión tras {sent} mensajes")
+                    await ws.close()
+        finally:
+            clients.pop(ws, None)
+        return ws
+
+    async def klines(request: web.Request):
+        q = request.query
+        symbol, interval = q["symbol"].upper(), q["interval"]
+        feed.ensure(symbol, interval)
+        start = int(q["startTime"]) if "startTime" in q else None
+        return web.json_response(market.klines(symbol, interval, int(q.get("limit", 500)), start))
+
+    async def start_feed(app):
+        app["feed_task"] = asyncio.create_task(feed.run(broadcast))
+
+    app = web.Application()
+    app.router.add_get("/stream", stream)
+    app.router.add_get("/api/v3/klines", klines)
+    app.on_startup.append(start_feed)
+    return app
+
+
+async def record(path: str, streams: str, seconds: float) -> None:
+    url = f"wss://stream.binance.com:9443/stream?streams={streams}"
+    deadline = time.monotonic() + seconds
+    n = 0
+    async with aiohttp.ClientSession() as session, session.ws_connect(url) as ws:
+        with open(path, "w", encoding="utf-8") as f:
+            while time.monotonic() < deadline:
+                try:
+                    msg = await asyncio.wait_for(ws.receive(), timeout=max(0.1, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                f.write(msg.data + "\n")
+                n += 1
+    print(f"{n} mensajes grabados en {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in local de los streams kline de Binance")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--replay", help="JSONL de mensajes grabados")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--tick", type=float, default=1.0, help="segundos entre updates sintéticos")
+    parser.add_argument("--drop-after", type=int, default=None)
+    parser.add_argument("--record", help="grabar mensajes reales en este fichero")
+    parser.add_argument("--streams", default="btcusdt@kline_1m", help="streams a grabar")
+    parser.add_argument("--seconds", type=float, default=300)
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.record, args.streams, args.seconds))
+        return
+
+    market = Market()
+    feed = ReplayFeed(market, args.replay, args.speed) if args.replay else SyntheticFeed(market, args.tick)
+    web.run_app(build_app(feed, market, args.drop_after), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
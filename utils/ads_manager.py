@@ -4,15 +4,16 @@ import json
 import os
 import random
 from core.config import ADS_PATH
+from utils.json_cache import load_json_cached, load_json_readonly, invalidate_json
 
 def load_ads():
-    """Carga la lista de anuncios desde el JSON."""
-    if not os.path.exists(ADS_PATH):
-        return []
+    """
+    Carga la lista de anuncios desde el JSON.
+    Cacheada por mtime/tamaño: get_random_ad_text la llama en casi cada mensaje.
+    """
     try:
-        with open(ADS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
+        return load_json_cached(ADS_PATH, default=list)
+    except (json.JSONDecodeError, OSError):
         return []
 
 def save_ads(ads_list):
@@ -24,13 +25,19 @@ def save_ads(ads_list):
     except Exception as e:
         print(f"Error guardando anuncios: {e}")
         return False
+    finally:
+        invalidate_json(ADS_PATH)
 
 def get_random_ad_text():
     """
     Devuelve un anuncio aleatorio formateado.
     Si no hay anuncios, devuelve una cadena vacía.
     """
-    ads = load_ads()
+    # Solo lectura: objeto compartido de la caché, sin copia en cada mensaje
+    try:
+        ads = load_json_readonly(ADS_PATH, default=list)
+    except (json.JSONDecodeError, OSError):
+        ads = []
     if not ads:
         return ""
     
@@ -0,0 +1,97 @@
+# utils/alerts_index.py
+# Índice de alertas de precio por moneda para check_custom_price_alerts.
+#
+# Por cada moneda se guardan dos arrays ordenados de precios objetivo (ABOVE y
+# BELOW) con sus alertas asociadas. Un cruce previo→actual se resuelve con dos
+# bisect en vez de recorrer todas las alertas de todos los usuarios:
+#   ABOVE dispara si  prev < target <= curr   → targets en (prev, curr]
+#   BELOW dispara si  prev > target >= curr   → targets en [curr, prev)
+
+import threading
+from bisect import bisect_left, bisect_right
+
+
+class _SortedTargets:
+    """Precios ordenados + referencias (user_id_str, alert) en paralelo."""
+
+    __slots__ = ("prices", "refs")
+
+    def __init__(self, items):
+        items.sort(key=lambda x: x[0])
+        self.prices = [p for p, _ in items]
+        self.refs = [r for _, r in items]
+
+
+class PriceAlertIndex:
+    """Índice {coin: {'ABOVE': _SortedTargets, 'BELOW': _SortedTargets}}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source = None
+        self._dirty = True
+        self._by_coin: dict[str, dict[str, _SortedTargets]] = {}
+        self.rebuilds = 0
+
+    def invalidate(self) -> None:
+        """Fuerza reconstrucción en el próximo sync (alta/baja/cambio de estado)."""
+        with self._lock:
+            self._dirty = True
+
+    def sync(self, alerts_doc: dict) -> None:
+        """Reconstruye si el documento es otro objeto o se marcó como sucio."""
+        with self._lock:
+            if alerts_doc is self._source and not self._dirty:
+                return
+            buckets: dict[str, dict[str, list]] = {}
+            for user_id_str, user_alerts in alerts_doc.items():
+                for alert in user_alerts:
+                    if alert.get('status') != 'ACTIVE':
+                        continue
+                    cond = alert.get('condition')
+                    if cond not in ('ABOVE', 'BELOW'):
+                        continue
+                    try:
+                        target = float(alert['target_price'])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    per_coin = buckets.setdefault(alert['coin'], {'ABOVE': [], 'BELOW': []})
+                    per_coin[cond].append((target, (user_id_str, alert)))
+
+            self._by_coin = {
+                coin: {cond: _SortedTargets(items) for cond, items in conds.items()}
+                for coin, conds in buckets.items()
+            }
+            self._source = alerts_doc
+            self._dirty = False
+            self.rebuilds += 1
+
+    def coins(self) -> set:
+        """Monedas con al menos una alerta activa."""
+        with self._lock:
+            return set(self._by_coin)
+
+    def crossings(self, coin: str, previous: float, current: float) -> list:
+        """
+        Alertas de `coin` cruzadas al pasar de `previous` a `current`.
+        Devuelve [(user_id_str, alert), ...] en O(log n + k).
+        """
+        with self._lock:
+            conds = self._by_coin.get(coin)
+            if not conds or previous is None or current is None:
+                return []
+            hits = []
+            if current > previous:
+                above = conds['ABOVE']
+                lo = bisect_right(above.prices, previous)
+                hi = bisect_right(above.prices, current)
+                hits.extend(above.refs[lo:hi])
+            elif current < previous:
+                below = conds['BELOW']
+                lo = bisect_left(below.prices, current)
+                hi = bisect_left(below.prices, previous)
+                hits.extend(below.refs[lo:hi])
+            return hits
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+price_alert_index = PriceAlertIndex()
@@ -0,0 +1,60 @@
+# utils/analysis_memo.py
+# Memo de análisis por vela cerrada.
+#
+# Una vela de 4h o 1d cierra pocas veces, pero sp_monitor_loop (cada 45 s) y
+# valerts volvían a calcular toda la pila de indicadores sobre las mismas velas
+# cerradas. La parte del análisis que solo depende de velas cerradas se guarda
+# aquí con clave (symbol, interval, motor) y se valida con la open_time de la
+# última vela cerrada y la versión del motor: mientras no cierre otra vela (ni
+# cambie la lógica) se reutiliza y solo se recalculan las comprobaciones que
+# dependen del precio en vivo.
+
+import threading
+from collections import OrderedDict
+
+
+class AnalysisMemo:
+    """{(symbol, interval, motor): (open_time cerrada, versión, parte)} con LRU."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = int(max_entries)
+        self._lock = threading.Lock()
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, closed_open_time: int, version: str):
+        """Parte guardada si sigue siendo la de esa vela y esa versión; si no, None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != closed_open_time or entry[1] != version:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: tuple, closed_open_time: int, version: str, part) -> None:
+        with self._lock:
+            self._data[key] = (closed_open_time, version, part)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+analysis_memo = AnalysisMemo()
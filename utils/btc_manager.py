@@ -4,6 +4,9 @@ import json
 import os
 from datetime import datetime
 from core.config import DATA_DIR
+from utils.write_behind import schedule_json_write, get_pending
+from utils.json_cache import load_json_cached, load_json_readonly, invalidate_json
+from utils.subs_index import SubscriptionIndex
 
 BTC_SUBS_PATH = os.path.join(DATA_DIR, "btc_subs.json")
 BTC_STATE_PATH = os.path.join(DATA_DIR, "btc_alert_state.json")
@@ -12,12 +15,9 @@ BTC_STATE_PATH = os.path.join(DATA_DIR, "btc_alert_state.json")
 VALID_TIMEFRAMES = ["1h", "2h", "4h", "8h", "12h", "1d", "1w"]
 
 def load_btc_subs():
-    if not os.path.exists(BTC_SUBS_PATH):
-        return {}
     try:
-        with open(BTC_SUBS_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
+        data = load_json_cached(BTC_SUBS_PATH)
+
         # --- MIGRACIÓN AUTOMÁTICA DE FORMATO ANTIGUO ---
         # Si detectamos formato antiguo ('active': True), lo convertimos a lista ['4h']
         migrated = False
@@ -39,16 +39,42 @@ def load_btc_subs():
         print(f"Error cargando subs BTC: {e}")
         return {}
 
+def _extract_btc_tfs(subs):
+    for uid, data in subs.items():
+        if isinstance(data, dict):
+            for tf in data.get("subscriptions", []):
+                yield tf, uid
+
+# Índice invertido timeframe -> {uid}
+_BTC_INDEX = SubscriptionIndex(_extract_btc_tfs)
+
+def _load_subs_indexed():
+    # El índice se liga al objeto compartido de la caché (solo lectura);
+    # el formato antiguo pasa antes por la migración de load_btc_subs
+    try:
+        subs = load_json_readonly(BTC_SUBS_PATH)
+        if any(isinstance(d, dict) and 'active' in d for d in subs.values()):
+            load_btc_subs()
+            subs = load_json_readonly(BTC_SUBS_PATH)
+    except Exception as e:
+        print(f"Error cargando subs BTC: {e}")
+        subs = {}
+    _BTC_INDEX.sync(subs)
+    return subs
+
 def save_btc_subs(subs):
     try:
         with open(BTC_SUBS_PATH, 'w', encoding='utf-8') as f:
             json.dump(subs, f, indent=4)
     except Exception as e:
         print(f"Error guardando subs BTC: {e}")
+    finally:
+        invalidate_json(BTC_SUBS_PATH)
 
 def toggle_btc_subscription(user_id, timeframe="1d"):
     """Activa o desactiva una temporalidad específica para el usuario."""
-    subs = load_btc_subs()
+    _load_subs_indexed()         # Índice al día
+    subs = load_btc_subs()       # Copia que se modifica y se guarda
     uid = str(user_id)
     
     if uid not in subs:
@@ -63,9 +89,11 @@ def toggle_btc_subscription(user_id, timeframe="1d"):
     if timeframe in user_subs:
         user_subs.remove(timeframe) # Si existe, la quita
         is_active = False
+        _BTC_INDEX.discard(timeframe, uid)
     else:
         user_subs.append(timeframe) # Si no existe, la pone
         is_active = True
+        _BTC_INDEX.add(timeframe, uid)
         
     save_btc_subs(subs)
     return is_active
@@ -77,16 +105,14 @@ def is_btc_subscribed(user_id, interval="1d"):
     return interval in user_list
 
 def get_btc_subscribers(timeframe):
-    """Devuelve lista de IDs suscritos a un timeframe específico."""
-    subs = load_btc_subs()
-    active_users = []
-    
-    for uid, data in subs.items():
-        # Verificamos si la lista 'subscriptions' existe y contiene el timeframe
-        if "subscriptions" in data and timeframe in data["subscriptions"]:
-            active_users.append(uid)
-            
-    return active_users
+    """Devuelve lista de IDs suscritos a un timeframe específico (vía índice)."""
+    _load_subs_indexed()
+    return list(_BTC_INDEX.get(timeframe))
+
+def get_active_btc_timeframes():
+    """Timeframes con al menos un suscriptor."""
+    _load_subs_indexed()
+    return _BTC_INDEX.keys()
 
 # --- GESTIÓN DE ESTADO MULTI-TEMPORAL ---
 
@@ -105,6 +131,10 @@ def load_btc_state():
         "1w": {"last_candle_time": 0, "levels": {}, "alerted_levels": []}
     }
 
+    pending = get_pending(BTC_STATE_PATH)
+    if pending is not None:
+        return pending
+
     if not os.path.exists(BTC_STATE_PATH):
         return default_structure
         
@@ -135,5 +165,5 @@ def load_btc_state():
         return default_structure
 
 def save_btc_state(data):
-    with open(BTC_STATE_PATH, 'w') as f:
-        json.dump(data, f, indent=4)
\ No newline at end of file
+    # Write-behind: se vuelca de forma atómica desde el hilo de fondo
+    schedule_json_write(BTC_STATE_PATH, data, indent=4)
\ No newline at end of file
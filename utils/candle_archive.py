@@ -0,0 +1,416 @@
+# utils/candle_archive.py
+# Archivo local de velas históricas (columnar, memory-mapped).
+#
+# _bt_download_candles bajaba en cada backtest como mucho `limit` velas en vivo
+# de Binance: los resultados cambiaban entre ejecuciones y la profundidad
+# quedaba limitada. Aquí cada (symbol, interval) se guarda en
+#   data/candles/<SYMBOL>/<interval>/
+#       open_time.bin  open.bin  high.bin  low.bin  close.bin  volume.bin  close_time.bin
+#       meta.json
+# Un fichero binario por columna (little-endian, int64/float64, sin cabecera:
+# a un .npy no se le pueden añadir filas sin reescribirlo). Se leen con
+# np.memmap, sin copiar: un backtest sobre un rango de fechas solo toca las
+# páginas de ese rango.
+#
+# Escritura: las filas nuevas se añaden al final de cada columna y después se
+# reescribe meta.json (tmp + os.replace) con el número de filas. meta.json es el
+# punto de confirmación: si una descarga se corta a medias, lo que sobre en las
+# columnas se trunca al volver a abrir la serie y la descarga continúa desde la
+# última vela confirmada (reanudable). meta.json no pasa por write_behind: tiene
+# que quedar escrito justo después de los datos, en ese orden.
+#
+# Insertar velas anteriores a las archivadas obliga a reescribir la serie: las
+# columnas fusionadas se escriben completas en un directorio de generación nuevo
+# (g<N>/) y la confirmación es otra vez meta.json, que nombra la generación
+# vigente ("generation"; sin ella, las columnas están en el propio directorio).
+# Hasta ese momento la generación anterior sigue intacta; después se borra. Al
+# abrir una serie para escribir se comprueba que la primera y la última
+# open_time de las columnas coinciden con meta.json; si no, la serie se descarta
+# y se vuelve a descargar.
+#
+# El descargador pagina /api/v3/klines de 1000 en 1000 (límite de Binance) con
+# startTime, solo guarda velas cerradas y sirve igual para crear una serie que
+# para completarla (top-up incremental).
+#
+# CLI: scripts/candle_archive.py
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.config import CANDLE_ARCHIVE_DIR, CANDLE_ARCHIVE_PAGE_DELAY
+from utils.logger import logger
+
+COLUMNS = (
+    ("open_time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+    ("close", "<f8"), ("volume", "<f8"), ("close_time", "<i8"),
+)
+PAGE_LIMIT = 1000        # Máximo de velas por petición en Binance
+_PAGE_RETRIES = 3
+
+
+def to_ms(value) -> int | None:
+    """ms int, 'YYYY-MM-DD[ HH:MM]' (UTC) o Timestamp → ms. None se queda en None."""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.value // 1_000_000)
+
+
+def _fsync_dir(path: str) -> None:
+    """Persiste las entradas de un directorio (ficheros recién creados)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class CandleArchive:
+    """Series OHLCV por (symbol, interval) en columnas binarias bajo `root`."""
+
+    def __init__(self, root: str = CANDLE_ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        # Métricas
+        self.pages = 0
+        self.rows_written = 0
+
+    # ─── RUTAS Y METADATOS ────────────────────────────────────────────────────
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def meta(self, symbol: str, interval: str) -> dict | None:
+        try:
+            with open(os.path.join(self._dir(symbol, interval), "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, path: str, meta: dict) -> None:
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def _col_dir(self, path: str, meta: dict) -> str:
+        """Directorio de las columnas de la generación vigente."""
+        gen = int(meta.get("generation", 0))
+        return os.path.join(path, f"g{gen}") if gen else path
+
+    def _consistent(self, path: str, meta: dict) -> bool:
+        """Las columnas tienen las filas de meta y su primera/última open_time coinciden."""
+        rows = int(meta.get("rows", 0))
+        if not rows:
+            return True
+        fpath = os.path.join(self._col_dir(path, meta), "open_time.bin")
+        try:
+            if os.path.getsize(fpath) < rows * 8:
+                return False
+            ot = np.memmap(fpath, dtype="<i8", mode="r", shape=(rows,))
+            return (int(ot[0]) == int(meta["first_open_time"])
+                    and int(ot[-1]) == int(meta["last_open_time"]))
+        except (OSError, KeyError, ValueError):
+            return False
+
+    def _discard(self, path: str) -> None:
+        """Borra una serie inconsistente (meta.json primero: deja de existir en el acto)."""
+        try:
+            os.remove(os.path.join(path, "meta.json"))
+        except FileNotFoundError:
+            pass
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full) and name.startswith("g") and name[1:].isdigit():
+                shutil.rmtree(full, ignore_errors=True)
+            elif name.endswith((".bin", ".tmp")):
+                os.remove(full)
+
+    def _open_meta(self, path: str, symbol: str, interval: str) -> dict:
+        """meta.json de una serie cuyas columnas cuadran; si no cuadran, se descarta ({}). Con _lock."""
+        meta = self.meta(symbol, interval) or {}
+        if not self._consistent(path, meta):
+            logger.warning(f"[CandleArchive] {symbol}/{interval}: columnas y meta.json no cuadran, se reconstruye")
+            self._discard(path)
+            return {}
+        return meta
+
+    def _collect(self, path: str, meta: dict) -> None:
+        """Borra las generaciones que no son la vigente (reescrituras cortadas o ya sustituidas)."""
+        current = self._col_dir(path, meta)
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if full == current:
+                continue
+            if os.path.isdir(full) and name.startswith("g") and name[1:].isdigit():
+                shutil.rmtree(full, ignore_errors=True)
+            elif current != path and name.endswith(".bin"):
+                os.remove(full)
+
+    def series(self) -> list[tuple[str, str]]:
+        """(symbol, interval) de todas las series archivadas."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for symbol in sorted(os.listdir(self.root)):
+            sym_dir = os.path.join(self.root, symbol)
+            if not os.path.isdir(sym_dir):
+                continue
+            for interval in sorted(os.listdir(sym_dir)):
+                if os.path.isfile(os.path.join(sym_dir, interval, "meta.json")):
+                    out.append((symbol, interval))
+        return out
+
+    # ─── ESCRITURA ────────────────────────────────────────────────────────────
+
+    def _columns_from_frame(self, df: pd.DataFrame) -> dict:
+        return {col: df[col].to_numpy().astype(dtype) for col, dtype in COLUMNS}
+
+    def _read_all(self, col_dir: str, rows: int) -> dict:
+        return {col: np.fromfile(os.path.join(col_dir, f"{col}.bin"), dtype=dtype, count=rows)
+                for col, dtype in COLUMNS}
+
+    def _rewrite(self, path: str, meta: dict, symbol: str, interval: str, cols: dict) -> None:
+        """
+        Reescribe la serie completa (solo al insertar velas anteriores a las
+        archivadas) en una generación nueva; meta.json la confirma al final.
+        """
+        gen = int(meta.get("generation", 0)) + 1
+        gen_dir = os.path.join(path, f"g{gen}")
+        shutil.rmtree(gen_dir, ignore_errors=True)   # Restos de una reescritura cortada
+        os.makedirs(gen_dir)
+        for col, dtype in COLUMNS:
+            with open(os.path.join(gen_dir, f"{col}.bin"), "wb") as f:
+                cols[col].astype(dtype).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        _fsync_dir(gen_dir)
+        ot = cols["open_time"]
+        self._commit(path, symbol, interval, int(ot[0]), int(ot[-1]), len(ot), gen)
+        self._collect(path, {"generation": gen})
+
+    def _commit(self, path: str, symbol: str, interval: str, first: int, last: int, rows: int,
+                generation: int = 0) -> None:
+        meta = {
+            "symbol": symbol.upper(),
+            "interval": interval,
+            "rows": int(rows),
+            "first_open_time": first,
+            "last_open_time": last,
+            "updated": int(time.time()),
+        }
+        if generation:
+            meta["generation"] = int(generation)
+        self._write_meta(path, meta)
+
+    def write(self, symbol: str, interval: str, df: pd.DataFrame) -> int:
+        """
+        Integra las velas de df (columnas de utils/market_data.py). Las
+        posteriores a la última archivada se añaden al final; si hay alguna
+        anterior se fusiona y reescribe la serie. Devuelve las filas nuevas.
+        """
+        if df is None or df.empty:
+            return 0
+        path = self._dir(symbol, interval)
+        new = self._columns_from_frame(df.sort_values("open_time"))
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            meta = self._open_meta(path, symbol, interval)
+            rows = int(meta.get("rows", 0))
+            col_dir = self._col_dir(path, meta)
+            self._collect(path, meta)
+
+            # Descartar lo escrito tras la última confirmación (descarga cortada)
+            for col, dtype in COLUMNS:
+                fpath = os.path.join(col_dir, f"{col}.bin")
+                size = rows * np.dtype(dtype).itemsize
+                if not os.path.exists(fpath):
+                    open(fpath, "wb").close()
+                if os.path.getsize(fpath) != size:
+                    os.truncate(fpath, size)
+
+            last = int(meta["last_open_time"]) if rows else None
+            if last is not None and new["open_time"][0] <= last:
+                old = self._read_all(col_dir, rows)
+                merged_ot, idx = np.unique(np.concatenate([old["open_time"], new["open_time"]]),
+                                           return_index=True)
+                merged = {col: np.concatenate([old[col], new[col]])[idx] for col, _ in COLUMNS}
+                added = len(merged_ot) - rows
+                if added > 0:
+                    self._rewrite(path, meta, symbol, interval, merged)
+                    self.rows_written += added
+                return max(0, added)
+
+            _, keep = np.unique(new["open_time"], return_index=True)
+            for col, _ in COLUMNS:
+                with open(os.path.join(col_dir, f"{col}.bin"), "ab") as f:
+                    new[col][keep].tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            first = int(meta["first_open_time"]) if rows else int(new["open_time"][keep[0]])
+            self._commit(path, symbol, interval, first, int(new["open_time"][keep[-1]]), rows + len(keep),
+                         int(meta.get("generation", 0)))
+            self.rows_written += len(keep)
+            return len(keep)
+
+    # ─── LECTURA ──────────────────────────────────────────────────────────────
+
+    def arrays(self, symbol: str, interval: str, start=None, end=None) -> dict | None:
+        """
+        Columnas como vistas np.memmap de solo lectura (sin copia), recortadas
+        a open_time en [start, end). start/end: ms, fecha 'YYYY-MM-DD' o Timestamp.
+        """
+        meta = self.meta(symbol, interval)
+        if not meta or not meta.get("rows"):
+            return None
+        path = self._dir(symbol, interval)
+        if not self._consistent(path, meta):
+            logger.warning(f"[CandleArchive] {symbol}/{interval}: columnas y meta.json no cuadran, se ignora la serie")
+            return None
+        rows = int(meta["rows"])
+        col_dir = self._col_dir(path, meta)
+        cols = {col: np.memmap(os.path.join(col_dir, f"{col}.bin"), dtype=dtype, mode="r", shape=(rows,))
+                for col, dtype in COLUMNS}
+        ot = cols["open_time"]
+        lo = 0 if start is None else int(np.searchsorted(ot, to_ms(start), side="left"))
+        hi = rows if end is None else int(np.searchsorted(ot, to_ms(end), side="left"))
+        return {col: arr[lo:hi] for col, arr in cols.items()}
+
+    def load(self, symbol: str, interval: str, start=None, end=None,
+             limit: int | None = None) -> pd.DataFrame | None:
+        """
+        DataFrame con el formato de utils/market_data.py para [start, end).
+        limit=N se queda con las N últimas velas del rango.
+        """
+        cols = self.arrays(symbol, interval, start, end)
+        if cols is None or not len(cols["open_time"]):
+            return None
+        if limit:
+            cols = {col: arr[-int(limit):] for col, arr in cols.items()}
+        df = pd.DataFrame(cols, copy=False)
+        df.index = pd.DatetimeIndex(pd.to_datetime(df["open_time"], unit="ms"), name="time")
+        return df
+
+    # ─── DESCARGA ─────────────────────────────────────────────────────────────
+
+    async def _fetch_range(self, client, symbol: str, interval: str,
+                           start_ms: int, end_ms: int, sink) -> tuple[int, bool]:
+        """
+        Pagina [start_ms, end_ms) de PAGE_LIMIT en PAGE_LIMIT; sink(df) recibe cada página.
+        Devuelve (velas, completo): completo es False si una página falló tras
+        los reintentos y el tramo quedó cortado antes de end_ms.
+        """
+        from utils.market_data import interval_to_ms
+
+        step = interval_to_ms(interval)
+        cursor, total = start_ms, 0
+        while cursor < end_ms:
+            page = None
+            for attempt in range(_PAGE_RETRIES):
+                page = await client.binance_klines(symbol, interval, PAGE_LIMIT,
+                                                   start_time=cursor, timeout=15)
+                if page is not None:
+                    break
+                await asyncio.sleep(1.0 + attempt * 2)
+            if page is None:
+                logger.warning(f"[CandleArchive] {symbol}/{interval}: sin respuesta en {cursor}, se reanudará")
+                return total, False
+            self.pages += 1
+            full_page = len(page) >= PAGE_LIMIT
+            now_ms = int(time.time() * 1000)
+            page = page[(page["open_time"] >= cursor) & (page["open_time"] < end_ms)
+                        & (page["close_time"] < now_ms)]   # Solo velas cerradas
+            if page.empty:
+                break
+            sink(page)
+            total += len(page)
+            cursor = int(page["open_time"].iloc[-1]) + step
+            if not full_page:
+                break
+            await asyncio.sleep(CANDLE_ARCHIVE_PAGE_DELAY)
+        return total, True
+
+    async def download(self, symbol: str, interval: str, start=None, end=None, client=None) -> int:
+        """
+        Completa la serie hasta `end` (por defecto, ahora). Sin serie previa se
+        empieza en `start`; con serie, se sigue desde la última vela archivada
+        y, si `start` es anterior a la primera, se descarga también ese tramo.
+        Devuelve las velas nuevas.
+        """
+        from utils.market_data import MarketDataClient, interval_to_ms
+
+        step = interval_to_ms(interval)
+        if not step:
+            raise ValueError(f"Intervalo no soportado por el archivo: {interval}")
+        symbol = symbol.upper()
+        start_ms, end_ms = to_ms(start), to_ms(end) or int(time.time() * 1000)
+        path = self._dir(symbol, interval)
+        meta = {}
+        if os.path.isdir(path):
+            with self._lock:
+                meta = self._open_meta(path, symbol, interval)
+        if not meta.get("rows") and start_ms is None:
+            raise ValueError("Serie nueva: hace falta una fecha de inicio")
+
+        own_client = client is None
+        client = client or MarketDataClient(timeout=15, cache=None)
+        added = 0
+        try:
+            if meta.get("rows") and start_ms is not None and start_ms < int(meta["first_open_time"]):
+                # Tramo anterior a lo archivado: se junta en memoria y se fusiona una
+                # vez, solo si llegó entero hasta la primera vela. Un tramo cortado
+                # dejaría un hueco antes de first_open_time que ya no se repararía
+                # (la siguiente descarga empezaría después de la nueva primera vela).
+                pages = []
+                _, complete = await self._fetch_range(client, symbol, interval, start_ms,
+                                                      int(meta["first_open_time"]), pages.append)
+                if not complete:
+                    logger.warning(f"[CandleArchive] {symbol}/{interval}: tramo anterior incompleto, "
+                                   f"no se fusiona; se reintentará en la próxima descarga")
+                elif pages:
+                    added += self.write(symbol, interval, pd.concat(pages))
+                meta = self.meta(symbol, interval) or meta
+
+            cursor = int(meta["last_open_time"]) + step if meta.get("rows") else start_ms
+            counter = []
+            await self._fetch_range(client, symbol, interval, cursor, end_ms,
+                                    lambda page: counter.append(self.write(symbol, interval, page)))
+            added += sum(counter)
+        finally:
+            if own_client:
+                await client.close()
+        logger.info(f"[CandleArchive] {symbol}/{interval}: +{added} velas")
+        return added
+
+    def download_blocking(self, symbol: str, interval: str, start=None, end=None) -> int:
+        """Versión síncrona para scripts e hilos del executor."""
+        return asyncio.run(self.download(symbol, interval, start, end))
+
+    def stats(self) -> dict:
+        return {
+            "series": len(self.series()),
+            "pages": self.pages,
+            "rows_written": self.rows_written,
+        }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+candle_archive = CandleArchive()
@@ -0,0 +1,259 @@
+# utils/candle_scheduler.py
+# Planificador alineado con el cierre de vela para los bucles de señales.
+#
+# sp_monitor_loop dormía 45 s fijos y valerts/btc iban a su propio ritmo: una
+# señal podía salir hasta 45 s después del cierre y los pares de 4h o 1d se
+# volvían a analizar decenas de veces por vela sin que nada cambiase. Aquí:
+#   - ExchangeClock mide el desfase con la hora de Binance (/api/v3/time) y
+#     calcula cuándo cierra cada vela (cubetas como las del exchange, semana
+#     desde el lunes 00:00 UTC),
+#   - CandleScheduler despierta cada (symbol, interval) `close_offset` segundos
+#     después del cierre, otra vez dentro de la ventana de pre-aviso y, si se
+#     pide, cada `max_idle` segundos como mucho (comprobaciones que dependen
+#     del precio en vivo); los pares nuevos se despiertan en el acto, igual
+#     que los que piden wake_now() (p.ej. quick-notify de SmartSignals),
+#   - WeightBudget reparte las descargas en el tiempo según el peso que cobra
+#     Binance por petición: los pares que cierran a la vez se escalonan en
+#     lugar de salir todos en el mismo segundo.
+
+import asyncio
+import heapq
+import time
+
+import pandas as pd
+
+from core.config import SCHED_WEIGHT_PER_MIN
+from utils.kline_resample import bucket_open
+from utils.logger import logger
+from utils.market_data import interval_to_ms, market_data
+
+BINANCE_TIME_URL = "https://api.binance.com/api/v3/time"
+
+
+# ─── HORA DEL EXCHANGE ────────────────────────────────────────────────────────
+
+class ExchangeClock:
+    """Hora de Binance = hora local + desfase medido (se vuelve a medir cada resync_s)."""
+
+    def __init__(self, url: str = BINANCE_TIME_URL, resync_s: float = 1800.0):
+        self.url = url
+        self.resync_s = float(resync_s)
+        self.offset_ms = 0.0
+        self.synced_at = 0.0     # time.monotonic() de la última medición válida
+        self._attempted_at = 0.0
+
+    async def sync(self, client=market_data) -> bool:
+        """Mide el desfase con la mitad del tiempo de ida y vuelta como corrección."""
+        self._attempted_at = time.monotonic()
+        t0 = time.time()
+        data = await client.get_json(self.url, timeout=5)
+        t1 = time.time()
+        if not isinstance(data, dict) or "serverTime" not in data:
+            return False
+        self.offset_ms = float(data["serverTime"]) - (t0 + t1) / 2 * 1000
+        self.synced_at = time.monotonic()
+        if abs(self.offset_ms) > 1000:
+            logger.info(f"[Scheduler] Reloj local desfasado {self.offset_ms / 1000:+.1f} s respecto a Binance")
+        return True
+
+    async def maybe_sync(self) -> None:
+        # Si falla, se reintenta al minuto sin bloquear el bucle
+        if time.monotonic() - self._attempted_at > (self.resync_s if self.synced_at else 60):
+            await self.sync()
+
+    def now_ms(self) -> int:
+        return int(time.time() * 1000 + self.offset_ms)
+
+
+def next_close_ms(interval: str, now_ms: int) -> int:
+    """Fin (exclusivo) de la vela de `interval` en curso en now_ms."""
+    step = interval_to_ms(interval)
+    if step is None:
+        # 1M: velas de mes natural
+        month = pd.Timestamp(now_ms, unit="ms").to_period("M") + 1
+        return int(month.start_time.value // 1_000_000)
+    return int(bucket_open(now_ms, interval)) + step
+
+
+def klines_weight(limit: int) -> int:
+    """Peso de /api/v3/klines según limit (tabla de Binance)."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+# ─── PRESUPUESTO DE PESO ──────────────────────────────────────────────────────
+
+class WeightBudget:
+    """
+    Cubo de fichas de `per_min` unidades de peso por minuto, compartido por los
+    bucles. `burst` limita lo que se puede gastar de golpe (por defecto, un minuto).
+    """
+
+    def __init__(self, per_min: float, burst: float | None = None):
+        self.per_min = float(per_min)
+        self.burst = float(burst) if burst else self.per_min
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+        # Métricas
+        self.waits = 0
+        self.waited_s = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.per_min / 60)
+        self._stamp = now
+
+    async def acquire(self, weight: float = 1) -> None:
+        """Espera hasta que haya peso disponible (las peticiones pasan en orden de llegada)."""
+        if self.per_min <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            if self._tokens < weight:
+                delay = (weight - self._tokens) * 60 / self.per_min
+                self.waits += 1
+                self.waited_s += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= weight
+
+    def stats(self) -> dict:
+        return {"per_min": self.per_min, "waits": self.waits, "waited_s": round(self.waited_s, 1)}
+
+
+# ─── PLANIFICADOR ─────────────────────────────────────────────────────────────
+
+WAKE_NEW = "new"        # Par recién añadido
+WAKE_CLOSE = "close"    # Tras el cierre de vela
+WAKE_PRE = "pre"        # Dentro de la ventana de pre-aviso
+WAKE_IDLE = "idle"      # Comprobación periódica (max_idle)
+WAKE_NOW = "now"        # Despertar pedido con wake_now()
+
+
+# Planificadores creados, por nombre (métricas de /perf)
+_SCHEDULERS: dict = {}
+
+
+class CandleScheduler:
+    """
+    Cola de despertares {(symbol, interval): próximo despertar}. El bucle llama
+    a sync_pairs() con los pares activos y a wait() para recibir los que tocan.
+    """
+
+    def __init__(self, name: str, close_offset_s: float = 2.0, pre_window_s: float = 0.0,
+                 max_idle_s: float = 0.0, clock: ExchangeClock | None = None):
+        self.name = name
+        self.close_offset_ms = int(close_offset_s * 1000)
+        self.pre_window_ms = int(pre_window_s * 1000)
+        self.max_idle_ms = int(max_idle_s * 1000)
+        self.clock = clock or exchange_clock
+        self._heap: list = []
+        self._next: dict = {}    # {par: (despertar, tipo)}; lo que no coincide en el heap está caducado
+        self._seq = 0
+        self._wakeup = asyncio.Event()   # Corta la espera de wait() (wake_now)
+        # Métricas
+        self.wakes = {WAKE_NEW: 0, WAKE_CLOSE: 0, WAKE_PRE: 0, WAKE_IDLE: 0, WAKE_NOW: 0}
+        self.lag_ms_max = 0
+        _SCHEDULERS[name] = self
+
+    def _push(self, pair: tuple, wake_ms: int, kind: str) -> None:
+        self._seq += 1
+        self._next[pair] = (wake_ms, kind)
+        heapq.heappush(self._heap, (wake_ms, self._seq, pair, kind))
+
+    def _plan(self, pair: tuple, now_ms: int) -> None:
+        """Siguiente despertar de `pair` a partir de now_ms."""
+        interval = pair[1]
+        # Restar el offset: si aún no se ha despertado tras el último cierre, ese va primero
+        close = next_close_ms(interval, now_ms - self.close_offset_ms)
+        options = [(close + self.close_offset_ms, WAKE_CLOSE)]
+        if self.pre_window_ms:
+            pre = close - self.pre_window_ms
+            if pre > now_ms:
+                options.append((pre, WAKE_PRE))
+        if self.max_idle_ms:
+            options.append((now_ms + self.max_idle_ms, WAKE_IDLE))
+        wake_ms, kind = min(options)
+        self._push(pair, wake_ms, kind)
+
+    def sync_pairs(self, pairs) -> None:
+        """Alta inmediata de los pares nuevos y baja de los que ya no están activos."""
+        pairs = set(pairs)
+        now_ms = self.clock.now_ms()
+        for pair in pairs - self._next.keys():
+            self._push(pair, now_ms, WAKE_NEW)
+        for pair in self._next.keys() - pairs:
+            del self._next[pair]
+        if len(self._heap) > 4 * len(self._next) + 64:
+            self._heap = [e for e in self._heap if self._next.get(e[2]) == (e[0], e[3])]
+            heapq.heapify(self._heap)
+
+    def wake_now(self, pair: tuple) -> None:
+        """
+        Despierta `pair` en el acto, aunque su vela no haya cerrado. Si aún no
+        está planificado, basta con cortar la espera: el próximo sync_pairs lo
+        da de alta como nuevo.
+        """
+        if pair in self._next and self._next[pair][1] != WAKE_NOW:
+            self._push(pair, self.clock.now_ms(), WAKE_NOW)
+        self._wakeup.set()
+
+    async def wait(self, max_wait_s: float = 30.0) -> list[tuple[tuple, str]]:
+        """
+        Duerme hasta el próximo despertar (como mucho max_wait_s, para que el
+        bucle vuelva a mirar los pares activos) y devuelve [(par, tipo)] de
+        todos los que vencen; cada uno queda planificado para su siguiente vez.
+        """
+        await self.clock.maybe_sync()
+        while self._heap and self._next.get(self._heap[0][2]) != (self._heap[0][0], self._heap[0][3]):
+            heapq.heappop(self._heap)
+        delay_s = max_wait_s
+        if self._heap:
+            delay_s = min(max_wait_s, (self._heap[0][0] - self.clock.now_ms()) / 1000)
+        if delay_s > 0 and not self._wakeup.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay_s)
+            except asyncio.TimeoutError:
+                pass
+        self._wakeup.clear()
+
+        now_ms = self.clock.now_ms()
+        due = []
+        while self._heap and self._heap[0][0] <= now_ms:
+            wake_ms, _, pair, kind = heapq.heappop(self._heap)
+            if self._next.get(pair) != (wake_ms, kind):
+                continue
+            due.append((pair, kind))
+            self.wakes[kind] += 1
+            self.lag_ms_max = max(self.lag_ms_max, now_ms - wake_ms)
+            self._plan(pair, now_ms)
+        return due
+
+    def next_wake(self, pair: tuple) -> tuple | None:
+        """(ms del próximo despertar, tipo) de un par, o None si no está planificado."""
+        return self._next.get(pair)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "pairs": len(self._next),
+            "wakes": dict(self.wakes),
+            "lag_ms_max": self.lag_ms_max,
+            "clock_offset_ms": round(self.clock.offset_ms),
+        }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+exchange_clock = ExchangeClock()
+binance_weight = WeightBudget(SCHED_WEIGHT_PER_MIN)
+
+
+def scheduler_stats() -> list[dict]:
+    """Métricas de los planificadores de los bucles (sp, valerts, btc) que ya arrancaron."""
+    return [s.stats() for s in _SCHEDULERS.values()]
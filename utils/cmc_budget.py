@@ -0,0 +1,268 @@
+# utils/cmc_budget.py
+# Contabilidad y limitación de créditos de CoinMarketCap por API key.
+#
+# Cada key tiene:
+#   - un token bucket de llamadas/minuto (límite de tasa del plan),
+#   - un presupuesto mensual de créditos y un cupo diario. Por defecto el cupo
+#     diario se planifica: lo que queda del mes / días que quedan (incluido hoy),
+#   - cuotas por prioridad: las consultas interactivas (/p, /ver) se cortan antes
+#     que las alertas de usuario, y estas antes que las alertas de umbral HBD.
+# Si acquire() deniega, el llamador degrada a CryptoCompare en lugar de gastar
+# créditos. El consumo real se corrige con status.credit_count de la respuesta y
+# se persiste en CMC_USAGE_PATH (write-behind) para sobrevivir reinicios.
+
+import calendar
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from core.config import CMC_DAILY_CREDITS, CMC_MONTHLY_CREDITS, CMC_RATE_PER_MIN, CMC_USAGE_PATH
+from utils.write_behind import get_pending, schedule_json_write
+
+# Prioridades (menor = más importante)
+PRIORIDAD_ALERTA   = 0   # Alertas de umbral HBD
+PRIORIDAD_CONTROL  = 1   # Alertas periódicas y de cruce de usuarios
+PRIORIDAD_CONSULTA = 2   # /p, /ver y demás consultas interactivas
+
+# Fracción del cupo (diario y mensual) que puede consumir cada prioridad
+_CUOTA = {PRIORIDAD_ALERTA: 1.0, PRIORIDAD_CONTROL: 0.9, PRIORIDAD_CONSULTA: 0.7}
+# Llamadas/minuto que deben quedar libres en el bucket tras consumir
+_RESERVA_TOKENS = {PRIORIDAD_ALERTA: 0, PRIORIDAD_CONTROL: 1, PRIORIDAD_CONSULTA: 3}
+
+# Códigos de error de CMC por límite alcanzado
+_ERR_MINUTO = (1008, 1011)
+_ERR_DIARIO = 1009
+_ERR_MENSUAL = 1010
+
+_DIAS_HISTORIAL = 35
+
+
+def creditos_quotes(n_symbols: int) -> int:
+    """quotes/latest: 1 crédito por cada 100 símbolos (redondeando hacia arriba)."""
+    return max(1, math.ceil(n_symbols / 100))
+
+
+class CreditBudget:
+    """Token bucket + presupuesto diario/mensual de una API key."""
+
+    def __init__(self, label: str, monthly: int, daily: int, rate_per_min: int, state: dict | None = None):
+        self.label = label
+        self._lock = threading.Lock()
+        self.monthly = int(monthly)
+        self.daily = int(daily)
+        self.rate_per_min = max(1, int(rate_per_min))
+        self._tokens = float(self.rate_per_min)
+        self._refill_at = time.monotonic()
+        state = state or {}
+        self.month = state.get("month")
+        self.month_used = int(state.get("month_used", 0))
+        self.days: dict[str, int] = dict(state.get("days", {}))
+        self.denied: dict[str, int] = dict(state.get("denied", {}))
+        self.fallbacks = int(state.get("fallbacks", 0))
+        self.blocked_until = float(state.get("blocked_until", 0))   # epoch (errores 1009/1010)
+
+    # ─── CALENDARIO ───────────────────────────────────────────────────────────
+
+    def _roll(self, now: datetime) -> None:
+        month = now.strftime("%Y-%m")
+        if self.month != month:
+            self.month = month
+            self.month_used = 0
+        limite = (now - timedelta(days=_DIAS_HISTORIAL)).strftime("%Y-%m-%d")
+        for day in [d for d in self.days if d < limite]:
+            del self.days[day]
+
+    @staticmethod
+    def _days_left(now: datetime) -> int:
+        return calendar.monthrange(now.year, now.month)[1] - now.day + 1
+
+    def daily_allowance(self, now: datetime | None = None) -> float:
+        """Cupo de hoy: fijo (CMC_DAILY_CREDITS) o lo que queda del mes repartido."""
+        now = now or datetime.now(timezone.utc)
+        if self.daily > 0:
+            return float(self.daily)
+        today_used = self.days.get(now.strftime("%Y-%m-%d"), 0)
+        remaining = max(0, self.monthly - (self.month_used - today_used))
+        return remaining / self._days_left(now)
+
+    # ─── CONSUMO ──────────────────────────────────────────────────────────────
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(float(self.rate_per_min),
+                           self._tokens + (now - self._refill_at) * self.rate_per_min / 60)
+        self._refill_at = now
+
+    def acquire(self, credits: int, priority: int) -> bool:
+        """Reserva una llamada de `credits` créditos. False → usar el fallback."""
+        with self._lock:
+            return self._acquire_locked(credits, priority)
+
+    def _acquire_locked(self, credits: int, priority: int) -> bool:
+        now = datetime.now(timezone.utc)
+        self._roll(now)
+        self._refill()
+        today = now.strftime("%Y-%m-%d")
+        cuota = _CUOTA.get(priority, _CUOTA[PRIORIDAD_CONSULTA])
+        ok = (
+            time.time() >= self.blocked_until
+            and self._tokens - 1 >= _RESERVA_TOKENS.get(priority, 0)
+            and self.days.get(today, 0) + credits <= self.daily_allowance(now) * cuota
+            and self.month_used + credits <= self.monthly * cuota
+        )
+        if ok:
+            self._tokens -= 1
+            self.month_used += credits
+            self.days[today] = self.days.get(today, 0) + credits
+        else:
+            self.denied[str(priority)] = self.denied.get(str(priority), 0) + 1
+            self.fallbacks += 1
+        return ok
+
+    def settle(self, estimated: int, actual) -> None:
+        """Corrige la reserva con el credit_count real devuelto por CMC."""
+        try:
+            delta = int(actual) - int(estimated)
+        except (TypeError, ValueError):
+            return
+        if delta:
+            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            with self._lock:
+                self.month_used = max(0, self.month_used + delta)
+                self.days[today] = max(0, self.days.get(today, 0) + delta)
+
+    def refund(self, credits: int) -> None:
+        """Devuelve la reserva de una llamada que no llegó a cobrarse (error de red)."""
+        self.settle(credits, 0)
+
+    def penalize(self, error_code) -> None:
+        """CMC respondió con límite alcanzado: no volver a intentarlo hasta que se reinicie."""
+        with self._lock:
+            self._penalize_locked(error_code)
+
+    def _penalize_locked(self, error_code) -> None:
+        now = datetime.now(timezone.utc)
+        if error_code in _ERR_MINUTO:
+            self._tokens = 0.0
+            self._refill_at = time.monotonic()
+        elif error_code == _ERR_DIARIO:
+            manana = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            self.blocked_until = manana.timestamp()
+        elif error_code == _ERR_MENSUAL:
+            dias_mes = calendar.monthrange(now.year, now.month)[1]
+            fin_mes = now.replace(day=dias_mes, hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            self.blocked_until = fin_mes.timestamp()
+            self.month_used = max(self.month_used, self.monthly)
+
+    # ─── ESTADO ───────────────────────────────────────────────────────────────
+
+    def burn_rate(self, now: datetime | None = None, days: int = 7) -> float:
+        """Créditos/día de media en los últimos `days` días (desde el primero con datos; hoy prorrateado)."""
+        now = now or datetime.now(timezone.utc)
+        fechas = [(now - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+        registrados = [f for f in fechas if f in self.days]
+        if not registrados:
+            return 0.0
+        total = sum(self.days[f] for f in registrados)
+        # Días completos desde el primero registrado + fracción transcurrida de hoy
+        completos = fechas.index(min(registrados))
+        hoy = (now.hour * 3600 + now.minute * 60 + now.second) / 86400
+        return total / (completos + max(hoy, 1 / 24))
+
+    def projected_exhaustion(self, now: datetime | None = None) -> datetime | None:
+        """Fecha estimada de agotamiento del mes al ritmo actual, o None si llega al reinicio."""
+        now = now or datetime.now(timezone.utc)
+        rate = self.burn_rate(now)
+        remaining = self.monthly - self.month_used
+        if remaining <= 0:
+            return now
+        if rate <= 0:
+            return None
+        fecha = now + timedelta(days=remaining / rate)
+        return fecha if fecha.strftime("%Y-%m") == now.strftime("%Y-%m") else None
+
+    def to_state(self) -> dict:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> dict:
+        return {
+            "label": self.label, "month": self.month, "month_used": self.month_used,
+            "days": dict(self.days), "denied": dict(self.denied),
+            "fallbacks": self.fallbacks, "blocked_until": self.blocked_until,
+        }
+
+    def stats(self) -> dict:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._roll(now)
+            self._refill()
+        agotamiento = self.projected_exhaustion(now)
+        return {
+            "label": self.label,
+            "month_used": self.month_used,
+            "monthly": self.monthly,
+            "today_used": self.days.get(now.strftime("%Y-%m-%d"), 0),
+            "daily_allowance": round(self.daily_allowance(now), 1),
+            "burn_rate": round(self.burn_rate(now), 1),
+            "exhaustion": agotamiento.strftime("%Y-%m-%d") if agotamiento else None,
+            "tokens": round(self._tokens, 1),
+            "denied": dict(self.denied),
+            "fallbacks": self.fallbacks,
+            "blocked": time.time() < self.blocked_until,
+        }
+
+
+# ─── REGISTRO POR API KEY ─────────────────────────────────────────────────────
+_lock = threading.Lock()
+_BUDGETS: dict[str, CreditBudget] = {}
+
+
+def _key_id(api_key: str | None) -> str:
+    # Nunca se guarda la key en disco: solo una huella corta
+    return hashlib.sha1((api_key or "").encode()).hexdigest()[:10]
+
+
+def _load_usage() -> dict:
+    pending = get_pending(CMC_USAGE_PATH)
+    if pending is not None:
+        return pending
+    if not os.path.exists(CMC_USAGE_PATH):
+        return {}
+    try:
+        with open(CMC_USAGE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def cmc_budget(api_key: str | None, label: str) -> CreditBudget:
+    """Presupuesto de la key (compartido si ALERTA y CONTROL usan la misma)."""
+    key_id = _key_id(api_key)
+    with _lock:
+        budget = _BUDGETS.get(key_id)
+        if budget is None:
+            state = _load_usage().get(key_id)
+            budget = _BUDGETS[key_id] = CreditBudget(
+                label, CMC_MONTHLY_CREDITS, CMC_DAILY_CREDITS, CMC_RATE_PER_MIN, state
+            )
+        elif label not in budget.label.split("+"):
+            budget.label = f"{budget.label}+{label}"
+        return budget
+
+
+def save_usage() -> None:
+    """Programa el volcado del consumo de todas las keys (write-behind)."""
+    with _lock:
+        data = {key_id: b.to_state() for key_id, b in _BUDGETS.items()}
+    schedule_json_write(CMC_USAGE_PATH, data, indent=2)
+
+
+def cmc_budget_stats() -> list[dict]:
+    with _lock:
+        budgets = list(_BUDGETS.values())
+    return [b.stats() for b in budgets]
@@ -0,0 +1,159 @@
+# utils/endpoint_health.py
+# Registro compartido de salud de endpoints (mirrors de Binance, RSSHub,
+# RSS-Bridge, Nitter...) con circuit breakers.
+#
+# Por endpoint (scheme://host) se guarda una media móvil de éxito y latencia y
+# un circuito:
+#   - closed:    se usa normalmente,
+#   - open:      tras ENDPOINT_FAILURE_THRESHOLD fallos seguidos se salta durante
+#                un cooldown (que se duplica en cada recaída hasta el máximo),
+#   - half-open: pasado el cooldown se deja pasar UNA petición de prueba;
+#                si va bien se cierra, si falla vuelve a open.
+# order() reordena una lista de mirrors: primero los sanos (por tasa de éxito,
+# respetando el orden configurado a igualdad), luego los que están a prueba;
+# los abiertos se omiten. Así un mirror caído no cuesta un timeout en cada llamada.
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+from core.config import ENDPOINT_COOLDOWN, ENDPOINT_FAILURE_THRESHOLD, ENDPOINT_MAX_COOLDOWN
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Respuestas HTTP que indican endpoint inutilizable (bloqueo geográfico, baneo,
+# rate limit); el resto de 4xx son errores de la petición, no del endpoint.
+_DOWN_STATUS = {403, 418, 429, 451}
+_SLOW_S = 2.0   # Latencia media a partir de la cual un endpoint pierde prioridad
+
+
+def endpoint_key(url: str) -> str:
+    """Identificador del endpoint: scheme://host[:puerto]."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.netloc else url
+
+
+def is_down_status(status: int) -> bool:
+    return status >= 500 or status in _DOWN_STATUS
+
+
+class _Endpoint:
+    __slots__ = ("state", "success", "latency", "failures", "opened_at",
+                 "cooldown", "probing", "calls", "trips")
+
+    def __init__(self, cooldown: float):
+        self.state = CLOSED
+        self.success = 1.0        # EWMA de éxito (1 = siempre bien)
+        self.latency = 0.0        # EWMA de latencia (s)
+        self.failures = 0         # Fallos consecutivos
+        self.opened_at = 0.0
+        self.cooldown = cooldown
+        self.probing = False      # Hay una petición de prueba en vuelo (half-open)
+        self.calls = 0
+        self.trips = 0
+
+
+class EndpointHealth:
+    """Puntuación y circuit breaker por endpoint."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0,
+                 max_cooldown: float = 600.0, alpha: float = 0.2):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_cooldown = float(cooldown)
+        self.max_cooldown = float(max_cooldown)
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, _Endpoint] = {}
+        self.skipped = 0
+
+    def _get(self, key: str) -> _Endpoint:
+        ep = self._endpoints.get(key)
+        if ep is None:
+            ep = self._endpoints[key] = _Endpoint(self.base_cooldown)
+        return ep
+
+    def _usable(self, ep: _Endpoint, now: float) -> bool:
+        if ep.state == CLOSED:
+            return True
+        if ep.state == OPEN:
+            return now - ep.opened_at >= ep.cooldown
+        return not ep.probing
+
+    def order(self, urls) -> list:
+        """Mirrors utilizables, de más a menos sano (los abiertos se omiten)."""
+        now = time.monotonic()
+        ranked = []
+        with self._lock:
+            for i, url in enumerate(urls):
+                ep = self._get(endpoint_key(url))
+                if not self._usable(ep, now):
+                    self.skipped += 1
+                    continue
+                ranked.append((ep.state != CLOSED, -round(ep.success, 1),
+                               ep.latency > _SLOW_S, i, url))
+        ranked.sort()
+        return [r[-1] for r in ranked]
+
+    def allow(self, url: str) -> bool:
+        """¿Se puede lanzar ya una petición? En half-open reserva la única prueba."""
+        now = time.monotonic()
+        with self._lock:
+            ep = self._get(endpoint_key(url))
+            if not self._usable(ep, now):
+                self.skipped += 1
+                return False
+            if ep.state != CLOSED:
+                ep.state = HALF_OPEN
+                ep.probing = True
+            return True
+
+    def record(self, url: str, ok: bool | None, latency: float | None = None) -> None:
+        """Resultado de una petición. ok=None (cancelada) solo libera la prueba."""
+        with self._lock:
+            ep = self._get(endpoint_key(url))
+            was_probe = ep.probing
+            ep.probing = False
+            if ok is None:
+                return
+            ep.calls += 1
+            ep.success += self.alpha * ((1.0 if ok else 0.0) - ep.success)
+            if latency is not None:
+                ep.latency = latency if ep.calls == 1 else ep.latency + self.alpha * (latency - ep.latency)
+            if ok:
+                ep.failures = 0
+                if ep.state != CLOSED:
+                    ep.state = CLOSED
+                    ep.cooldown = self.base_cooldown
+                return
+            ep.failures += 1
+            if ep.state == HALF_OPEN and was_probe:
+                # La prueba falló: otra vez abierto y con más espera
+                ep.cooldown = min(ep.cooldown * 2, self.max_cooldown)
+                self._trip(ep)
+            elif ep.state == CLOSED and ep.failures >= self.failure_threshold:
+                self._trip(ep)
+
+    def _trip(self, ep: _Endpoint) -> None:
+        ep.state = OPEN
+        ep.opened_at = time.monotonic()
+        ep.trips += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    "state": ep.state,
+                    "success": round(ep.success, 2),
+                    "latency_ms": round(ep.latency * 1000),
+                    "calls": ep.calls,
+                    "trips": ep.trips,
+                    "retry_in": round(max(0.0, ep.cooldown - (now - ep.opened_at)))
+                                if ep.state == OPEN else 0,
+                }
+                for key, ep in self._endpoints.items()
+            }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+endpoint_health = EndpointHealth(ENDPOINT_FAILURE_THRESHOLD, ENDPOINT_COOLDOWN, ENDPOINT_MAX_COOLDOWN)
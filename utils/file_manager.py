@@ -11,10 +11,17 @@ from utils.logger import logger
 from core.config import (
     LOG_LINES, LOG_MAX, CUSTOM_ALERT_HISTORY_PATH, 
     PRICE_ALERTS_PATH, HBD_HISTORY_PATH, ELTOQUE_HISTORY_PATH, 
-    LAST_PRICES_PATH, HBD_THRESHOLDS_PATH, ADMIN_CHAT_IDS, USUARIOS_PATH
+    LAST_PRICES_PATH, HBD_THRESHOLDS_PATH, ADMIN_CHAT_IDS, USUARIOS_PATH,
+    USUARIOS_DB_PATH
 )
+from utils import users_db
+from utils.write_behind import schedule_json_write, get_pending
+from utils.json_cache import load_json_cached, load_json_readonly
+from utils.alerts_index import price_alert_index
 
 _USUARIOS_CACHE = None
+# chat_id -> JSON persistido por última vez (para detectar filas modificadas)
+_USUARIOS_SNAPSHOT = {}
 _MIGRATION_TIMESTAMPS_DONE = False
 
 
@@ -211,6 +218,9 @@ def modify_hbd_threshold(price: float, action: str):
     return True, msg
 
 def load_last_prices_status():
+    pending = get_pending(LAST_PRICES_PATH)
+    if pending is not None:
+        return pending
     if not os.path.exists(LAST_PRICES_PATH):
         return {}
     try:
@@ -220,9 +230,9 @@ def load_last_prices_status():
         return {}
 
 def save_last_prices_status(data: dict):
+    # Write-behind: alerta_trabajo_callback lo llama en cada job de usuario
     try:
-        with open(LAST_PRICES_PATH, "w", encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        schedule_json_write(LAST_PRICES_PATH, data, indent=4)
     except Exception as e:
         logger.error(f"❌ Error guardando last_prices.json: {e}")
 
@@ -279,8 +289,10 @@ def migrate_user_timestamps():
         # Obtener tiempo de modificacion del archivo como fallback
         file_mtime = None
         try:
-            if os.path.exists(USUARIOS_PATH):
-                file_mtime = datetime.fromtimestamp(os.path.getmtime(USUARIOS_PATH))
+            for ruta in (f"{USUARIOS_PATH}.migrated", USUARIOS_DB_PATH):
+                if os.path.exists(ruta):
+                    file_mtime = datetime.fromtimestamp(os.path.getmtime(ruta))
+                    break
         except Exception:
             file_mtime = datetime.now()
 
@@ -343,32 +355,66 @@ def migrate_user_timestamps():
 
 
 def cargar_usuarios():
-    global _USUARIOS_CACHE
+    global _USUARIOS_CACHE, _USUARIOS_SNAPSHOT
 
     # Si ya está en memoria, usar memoria (rápido y seguro)
     if _USUARIOS_CACHE is not None:
         return _USUARIOS_CACHE
 
-    if not os.path.exists(USUARIOS_PATH):
-        _USUARIOS_CACHE = {}
-        return _USUARIOS_CACHE
-
     try:
-        with open(USUARIOS_PATH, 'r', encoding='utf-8') as f:
-            _USUARIOS_CACHE = json.load(f)
-            # Ejecutar migracion automaticamente despues de cargar
-            migrate_user_timestamps()
-            return _USUARIOS_CACHE
-    except json.JSONDecodeError:
-        # Si el archivo está roto, intentamos recuperar backup o iniciar vacío
-        if os.path.exists(USUARIOS_PATH):
-            shutil.copy(USUARIOS_PATH, f"{USUARIOS_PATH}.corrupto")
-        _USUARIOS_CACHE = {}
+        users_db.init_users_db(USUARIOS_DB_PATH)
+        # Migración única: users.json → users.db (renombra el JSON a .migrated)
+        migrados = users_db.migrate_users_json(USUARIOS_PATH)
+        if migrados:
+            logger.info(f"✅ {migrados} usuarios migrados de users.json a SQLite")
+
+        _USUARIOS_CACHE = users_db.load_all_users()
+        _USUARIOS_SNAPSHOT = {
+            k: users_db.serialize_user(v) for k, v in _USUARIOS_CACHE.items()
+        }
+        # Ejecutar migracion automaticamente despues de cargar
+        migrate_user_timestamps()
         return _USUARIOS_CACHE
-    except Exception:
+    except Exception as e:
+        logger.error(f"❌ Error al cargar usuarios desde SQLite: {e}")
         return {}
 
+def _guardar_usuario(chat_id_str):
+    """Persiste una sola fila (el resto de usuarios no se toca)."""
+    if _USUARIOS_CACHE is None or chat_id_str not in _USUARIOS_CACHE:
+        return
+    try:
+        _USUARIOS_SNAPSHOT[chat_id_str] = users_db.upsert_user(
+            chat_id_str, _USUARIOS_CACHE[chat_id_str]
+        )
+    except Exception as e:
+        logger.error(f"❌ Error al guardar usuario {chat_id_str}: {e}")
+
+def _actualizar_campos_usuario(chat_id_str, campos: dict):
+    """
+    Persiste campos concretos de un usuario (json_set por ruta 'a.b').
+    El dict en memoria ya debe estar modificado por el llamador. En la foto
+    de lo guardado solo se apuntan esos campos: otros cambios sin guardar de
+    la misma fila siguen pendientes para guardar_usuarios().
+    """
+    if _USUARIOS_CACHE is None or chat_id_str not in _USUARIOS_CACHE:
+        return
+    fila = _USUARIOS_CACHE[chat_id_str]
+    try:
+        if users_db.update_user_fields(chat_id_str, campos, full_row=fila):
+            previo = _USUARIOS_SNAPSHOT.get(chat_id_str)
+            if previo is not None:
+                _USUARIOS_SNAPSHOT[chat_id_str] = users_db.apply_fields(previo, campos)
+        else:
+            _guardar_usuario(chat_id_str)
+    except Exception as e:
+        logger.error(f"❌ Error al actualizar campos de {chat_id_str}: {e}")
+
 def guardar_usuarios(usuarios_data=None):
+    """
+    Sincroniza el dict en memoria con SQLite escribiendo solo las filas
+    que cambiaron (o se borraron) desde el último guardado.
+    """
     global _USUARIOS_CACHE
     
     if usuarios_data is not None:
@@ -378,11 +424,20 @@ def guardar_usuarios(usuarios_data=None):
         return
 
     try:
-        # Guardado atómico: escribe en .tmp y renombra (evita corrupción)
-        temp_path = f"{USUARIOS_PATH}.tmp"
-        with open(temp_path, "w", encoding='utf-8') as f:
-            json.dump(_USUARIOS_CACHE, f, indent=4)
-        os.replace(temp_path, USUARIOS_PATH)
+        users_db.init_users_db(USUARIOS_DB_PATH)
+        cambiados = {}
+        for chat_id_str, data in _USUARIOS_CACHE.items():
+            payload = users_db.serialize_user(data)
+            if _USUARIOS_SNAPSHOT.get(chat_id_str) != payload:
+                cambiados[str(chat_id_str)] = payload
+        borrados = [k for k in _USUARIOS_SNAPSHOT if k not in _USUARIOS_CACHE]
+
+        users_db.upsert_users(cambiados)
+        users_db.delete_users(borrados)
+
+        _USUARIOS_SNAPSHOT.update(cambiados)
+        for k in borrados:
+            _USUARIOS_SNAPSHOT.pop(k, None)
     except Exception as e:
         logger.error(f"❌ Error al guardar usuarios: {e}")
 
@@ -452,7 +507,7 @@ def obtener_datos_usuario_seguro(chat_id):
         guardar = True
         
     if guardar:
-        guardar_usuarios(usuarios)
+        _guardar_usuario(chat_id_str)
         
     return usuario
 
@@ -632,7 +687,11 @@ def registrar_uso_comando(chat_id, comando):
         # MEJORA: Actualizar last_seen con cada uso de comando (actividad real del usuario)
         usuarios[chat_id_str]['last_seen'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        guardar_usuarios(usuarios)
+        # Solo se escriben los dos campos tocados, no el fichero completo
+        _actualizar_campos_usuario(chat_id_str, {
+            f'daily_usage.{comando}': daily[comando],
+            'last_seen': usuarios[chat_id_str]['last_seen'],
+        })
         
         # LOG DE DEBUG (Opcional: te ayudará a ver en consola si cuenta)
         print(f"DEBUG: Usuario {chat_id} usó {comando}. Nuevo total: {daily[comando]}")
@@ -671,7 +730,7 @@ def add_subscription_days(chat_id, sub_type, days=30, quantity=0):
         subs[sub_type]['expires'] = new_exp.strftime('%Y-%m-%d %H:%M:%S')
         logger.info(f"💰 Usuario {chat_id} añadió +{quantity} a {sub_type}.")
 
-    guardar_usuarios(usuarios)
+    _actualizar_campos_usuario(chat_id_str, {f'subscriptions.{sub_type}': subs[sub_type]})
 # ------------------------------------------------------------------
 
 def set_user_language(chat_id: int, lang_code: str):
@@ -679,7 +738,7 @@ def set_user_language(chat_id: int, lang_code: str):
     chat_id_str = str(chat_id)
     if chat_id_str in usuarios:
         usuarios[chat_id_str]['language'] = lang_code
-        guardar_usuarios(usuarios)
+        _actualizar_campos_usuario(chat_id_str, {'language': lang_code})
 
 def get_user_language(chat_id: int) -> str:
     usuarios = cargar_usuarios()
@@ -687,19 +746,22 @@ def get_user_language(chat_id: int) -> str:
 
 
 # === GESTIÓN DE ALERTAS DE PRECIO ===
-def load_price_alerts():
-    if not os.path.exists(PRICE_ALERTS_PATH):
-        return {}
+def load_price_alerts(readonly=False):
+    # Caché por mtime/tamaño (incluye la escritura diferida pendiente).
+    # readonly=True devuelve el objeto compartido (no modificar): lo usa el
+    # loop de alertas, cuyo índice detecta las recargas por identidad
     try:
-        with open(PRICE_ALERTS_PATH, "r") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
+        if readonly:
+            return load_json_readonly(PRICE_ALERTS_PATH)
+        return load_json_cached(PRICE_ALERTS_PATH)
+    except (json.JSONDecodeError, OSError):
         return {}
 
 def save_price_alerts(alerts):
+    # El índice por moneda de check_custom_price_alerts debe reconstruirse
+    price_alert_index.invalidate()
     try:
-        with open(PRICE_ALERTS_PATH, "w") as f:
-            json.dump(alerts, f, indent=4)
+        schedule_json_write(PRICE_ALERTS_PATH, alerts, indent=4)
     except Exception as e:
         logger.error(f"Error al guardar alertas de precio: {e}")
 
@@ -760,7 +822,7 @@ def actualizar_intervalo_alerta(chat_id, new_interval_h):
     if chat_id_str in usuarios:
         try:
             usuarios[chat_id_str]['intervalo_alerta_h'] = float(new_interval_h)
-            guardar_usuarios(usuarios)
+            _actualizar_campos_usuario(chat_id_str, {'intervalo_alerta_h': float(new_interval_h)})
             return True
         except ValueError:
             return False
@@ -771,7 +833,9 @@ def update_last_alert_timestamp(chat_id):
     chat_id_str = str(chat_id)
     if chat_id_str in usuarios:
         usuarios[chat_id_str]['last_alert_timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        guardar_usuarios(usuarios)
+        _actualizar_campos_usuario(
+            chat_id_str, {'last_alert_timestamp': usuarios[chat_id_str]['last_alert_timestamp']}
+        )
 
 def registrar_usuario(chat_id, user_lang_code: str = 'es'):
     usuarios = cargar_usuarios()
@@ -789,7 +853,7 @@ def registrar_usuario(chat_id, user_lang_code: str = 'es'):
             "registered_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             "last_seen": None,
         }
-        guardar_usuarios(usuarios)
+        _guardar_usuario(chat_id_str)
 
 def actualizar_monedas(chat_id, lista_monedas):
     usuarios = cargar_usuarios()
@@ -797,7 +861,7 @@ def actualizar_monedas(chat_id, lista_monedas):
     if chat_id_str not in usuarios:
         usuarios[chat_id_str] = {}
     usuarios[chat_id_str]["monedas"] = lista_monedas
-    guardar_usuarios(usuarios)
+    _guardar_usuario(chat_id_str)
 
 def obtener_monedas_usuario(chat_id):
     usuarios = cargar_usuarios()
@@ -814,7 +878,7 @@ def toggle_hbd_alert_status(user_id: int) -> bool:
         current_status = usuarios[user_id_str].get('hbd_alerts', False)
         new_status = not current_status
         usuarios[user_id_str]['hbd_alerts'] = new_status
-        guardar_usuarios(usuarios)
+        _actualizar_campos_usuario(user_id_str, {'hbd_alerts': new_status})
         return new_status
     return False
 
@@ -0,0 +1,552 @@
+# utils/indicator_stream.py
+# Indicadores técnicos incrementales (estado O(1) por vela).
+#
+# SPSignalEngine recalculaba EMAs, RSI, MACD, Stoch, CCI, Bollinger, MFI y ATR
+# desde cero sobre 120 velas en cada ciclo, BTCAdvancedAnalyzer lo mismo sobre
+# 1000 y el backtest SSS sobre un slice creciente en cada barra. Aquí cada
+# indicador guarda su estado y avanza una vela por update():
+#   - update(...) integra una vela CERRADA (modifica el estado),
+#   - peek(...)   calcula el valor para la vela EN CURSO sin tocar el estado
+#                 (actualización provisional: se repite en cada tick y solo la
+#                 vela definitiva entra con update()).
+# Las fórmulas replican pandas_ta (EMA sembrada con SMA, RMA = ewm(alpha=1/n,
+# adjust=True), Stoch con SMA, CCI con desviación media) y pandas ewm/rolling;
+# scripts/check_indicator_parity.py compara ambos.
+#
+# IndicatorStreamStore mantiene un set por (symbol, interval, fuente, motor) y lo
+# sincroniza con el DataFrame del ciclo por open_time: solo se integran las
+# velas cerradas nuevas; si hay un hueco se vuelve a sembrar. Lo usa el
+# análisis BTC; SmartSignals no: su lote (utils/sp_batch.py) recalcula sobre la
+# ventana del ciclo y el análisis par a par tiene que dar lo mismo.
+
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+_NAN = float("nan")
+_RESYNC_EVERY = 4096   # Recalcular sumas móviles desde la ventana (deriva de coma flotante)
+
+
+# ─── PRIMITIVAS ───────────────────────────────────────────────────────────────
+
+class EMA:
+    """
+    EMA con adjust=False. sma_seed=False replica Series.ewm(span, adjust=False)
+    (semilla = primer valor); sma_seed=True replica pandas_ta.ema (semilla = SMA
+    de las primeras `length` muestras, NaN antes).
+    """
+
+    __slots__ = ("length", "alpha", "sma_seed", "value", "_n", "_sum")
+
+    def __init__(self, length: int, sma_seed: bool = False):
+        self.length = int(length)
+        self.alpha = 2.0 / (self.length + 1)
+        self.sma_seed = sma_seed
+        self.value = _NAN
+        self._n = 0
+        self._sum = 0.0
+
+    def update(self, x: float, commit: bool = True) -> float:
+        n = self._n + 1
+        if self.sma_seed and n <= self.length:
+            s = self._sum + x
+            v = s / n if n == self.length else _NAN
+            if commit:
+                self._n, self._sum, self.value = n, s, v
+            return v
+        v = x if n == 1 else (1.0 - self.alpha) * self.value + self.alpha * x
+        if commit:
+            self._n, self.value = n, v
+        return v
+
+    def peek(self, x: float) -> float:
+        return self.update(x, commit=False)
+
+
+class RMA:
+    """Media de Wilder tal como la calcula pandas_ta: ewm(alpha=1/n, adjust=True, min_periods=n)."""
+
+    __slots__ = ("length", "_beta", "_num", "_den", "_n")
+
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._beta = 1.0 - 1.0 / self.length
+        self._num = 0.0
+        self._den = 0.0
+        self._n = 0
+
+    def update(self, x: float, commit: bool = True) -> float:
+        num = x + self._beta * self._num
+        den = 1.0 + self._beta * self._den
+        n = self._n + 1
+        if commit:
+            self._num, self._den, self._n = num, den, n
+        return num / den if n >= self.length else _NAN
+
+    def peek(self, x: float) -> float:
+        return self.update(x, commit=False)
+
+
+class RollingStats:
+    """Media y desviación típica (ddof=1) móviles, como Series.rolling(n).mean()/.std()."""
+
+    __slots__ = ("length", "_win", "_ref", "_s", "_s2", "_updates")
+
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._win = deque(maxlen=self.length)
+        self._ref = None        # Desplazamiento para reducir cancelación en s2
+        self._s = 0.0
+        self._s2 = 0.0
+        self._updates = 0
+
+    def _result(self, n: int, s: float, s2: float) -> tuple[float, float]:
+        if n < self.length:
+            return _NAN, _NAN
+        mean = s / n
+        var = (s2 - s * s / n) / (n - 1) if n > 1 else _NAN
+        return self._ref + mean, math.sqrt(var) if var > 0 else 0.0
+
+    def update(self, x: float, commit: bool = True) -> tuple[float, float]:
+        ref = x if self._ref is None else self._ref
+        d = x - ref
+        s, s2, n = self._s + d, self._s2 + d * d, len(self._win) + 1
+        if n > self.length:
+            out = self._win[0] - ref
+            s, s2, n = s - out, s2 - out * out, self.length
+        if not commit:
+            saved, self._ref = self._ref, ref
+            result = self._result(n, s, s2)
+            self._ref = saved
+            return result
+        self._ref = ref
+        self._win.append(x)
+        self._updates += 1
+        if self._updates % _RESYNC_EVERY == 0:
+            # Re-centrar en la media actual y recalcular desde la ventana
+            self._ref = sum(self._win) / len(self._win)
+            s = sum(v - self._ref for v in self._win)
+            s2 = sum((v - self._ref) ** 2 for v in self._win)
+        self._s, self._s2 = s, s2
+        return self._result(n, s, s2)
+
+    def peek(self, x: float) -> tuple[float, float]:
+        return self.update(x, commit=False)
+
+
+class SMA:
+    """Media simple móvil (pandas_ta.sma / rolling(n).mean())."""
+
+    __slots__ = ("_stats",)
+
+    def __init__(self, length: int):
+        self._stats = RollingStats(length)
+
+    def update(self, x: float, commit: bool = True) -> float:
+        return self._stats.update(x, commit)[0]
+
+    def peek(self, x: float) -> float:
+        return self.update(x, commit=False)
+
+
+class RollingExtreme:
+    """Máximo o mínimo móvil con deque monótona (O(1) amortizado)."""
+
+    __slots__ = ("length", "_maximum", "_dq", "_i")
+
+    def __init__(self, length: int, maximum: bool):
+        self.length = int(length)
+        self._maximum = maximum
+        self._dq = deque()      # (índice, valor), valores monótonos
+        self._i = 0
+
+    def _better(self, a: float, b: float) -> bool:
+        return a >= b if self._maximum else a <= b
+
+    def update(self, x: float, commit: bool = True) -> float:
+        i = self._i
+        start = i - self.length + 1
+        if not commit:
+            best = x
+            for idx, v in self._dq:
+                if idx >= start:
+                    # El primer elemento vigente es el extremo de lo retenido
+                    if not self._better(x, v):
+                        best = v
+                    break
+            return best if i + 1 >= self.length else _NAN
+        dq = self._dq
+        while dq and self._better(x, dq[-1][1]):
+            dq.pop()
+        dq.append((i, x))
+        while dq[0][0] < start:
+            dq.popleft()
+        self._i = i + 1
+        return dq[0][1] if i + 1 >= self.length else _NAN
+
+    def peek(self, x: float) -> float:
+        return self.update(x, commit=False)
+
+
+# ─── INDICADORES ──────────────────────────────────────────────────────────────
+
+class RSI:
+    """RSI de Wilder (pandas_ta.rsi)."""
+
+    __slots__ = ("_up", "_dn", "_prev")
+
+    def __init__(self, length: int = 14):
+        self._up = RMA(length)
+        self._dn = RMA(length)
+        self._prev = None
+
+    def update(self, close: float, commit: bool = True) -> float:
+        prev = self._prev
+        if commit:
+            self._prev = close
+        if prev is None:
+            return _NAN
+        diff = close - prev
+        up = self._up.update(max(diff, 0.0), commit)
+        dn = self._dn.update(max(-diff, 0.0), commit)
+        total = up + dn
+        return 100.0 * up / total if total else _NAN
+
+    def peek(self, close: float) -> float:
+        return self.update(close, commit=False)
+
+
+class ATR:
+    """ATR con RMA del true range (pandas_ta.atr, mamode='rma')."""
+
+    __slots__ = ("_rma", "_prev_close")
+
+    def __init__(self, length: int = 14):
+        self._rma = RMA(length)
+        self._prev_close = None
+
+    def update(self, high: float, low: float, close: float, commit: bool = True) -> float:
+        pc = self._prev_close
+        if commit:
+            self._prev_close = close
+        if pc is None:
+            return _NAN
+        tr = max(high - low, abs(high - pc), abs(low - pc))
+        return self._rma.update(tr, commit)
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        return self.update(high, low, close, commit=False)
+
+
+class MACD:
+    """MACD (pandas_ta.macd): devuelve (macd, histograma, señal)."""
+
+    __slots__ = ("_fast", "_slow", "_signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = EMA(fast, sma_seed=True)
+        self._slow = EMA(slow, sma_seed=True)
+        self._signal = EMA(signal, sma_seed=True)
+
+    def update(self, close: float, commit: bool = True) -> tuple[float, float, float]:
+        macd = self._fast.update(close, commit) - self._slow.update(close, commit)
+        if math.isnan(macd):
+            return _NAN, _NAN, _NAN
+        sig = self._signal.update(macd, commit)
+        return macd, macd - sig, sig
+
+    def peek(self, close: float) -> tuple[float, float, float]:
+        return self.update(close, commit=False)
+
+
+class Stochastic:
+    """Estocástico %K/%D (pandas_ta.stoch con mamode='sma')."""
+
+    __slots__ = ("_hh", "_ll", "_smooth", "_d")
+
+    def __init__(self, k: int = 14, d: int = 3, smooth_k: int = 3):
+        self._hh = RollingExtreme(k, maximum=True)
+        self._ll = RollingExtreme(k, maximum=False)
+        self._smooth = SMA(smooth_k)
+        self._d = SMA(d)
+
+    def update(self, high: float, low: float, close: float,
+               commit: bool = True) -> tuple[float, float]:
+        hh = self._hh.update(high, commit)
+        ll = self._ll.update(low, commit)
+        if math.isnan(hh):
+            return _NAN, _NAN
+        rng = hh - ll
+        raw = 100.0 * (close - ll) / rng if rng else 0.0
+        k = self._smooth.update(raw, commit)
+        if math.isnan(k):
+            return _NAN, _NAN
+        return k, self._d.update(k, commit)
+
+    def peek(self, high: float, low: float, close: float) -> tuple[float, float]:
+        return self.update(high, low, close, commit=False)
+
+
+class CCI:
+    """
+    CCI (pandas_ta.cci). La desviación media exige recorrer la ventana:
+    O(length) por vela, sin recalcular el histórico.
+    """
+
+    __slots__ = ("length", "c", "_win")
+
+    def __init__(self, length: int = 20, c: float = 0.015):
+        self.length = int(length)
+        self.c = c
+        self._win = deque(maxlen=self.length)
+
+    def update(self, high: float, low: float, close: float, commit: bool = True) -> float:
+        tp = (high + low + close) / 3.0
+        if commit:
+            self._win.append(tp)
+            win = self._win
+        else:
+            win = list(self._win)[1:] if len(self._win) == self.length else list(self._win)
+            win.append(tp)
+        if len(win) < self.length:
+            return _NAN
+        mean = sum(win) / self.length
+        mad = sum(abs(v - mean) for v in win) / self.length
+        return (tp - mean) / (self.c * mad) if mad else _NAN
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        return self.update(high, low, close, commit=False)
+
+
+class MFI:
+    """Money Flow Index (pandas_ta.mfi) con sumas móviles de flujo positivo/negativo."""
+
+    __slots__ = ("length", "_pos", "_neg", "_prev_tp")
+
+    def __init__(self, length: int = 14):
+        self.length = int(length)
+        self._pos = RollingStats(length)
+        self._neg = RollingStats(length)
+        self._prev_tp = None
+
+    def update(self, high: float, low: float, close: float, volume: float,
+               commit: bool = True) -> float:
+        tp = (high + low + close) / 3.0
+        flow = tp * volume
+        prev = self._prev_tp
+        pos = flow if prev is not None and tp > prev else 0.0
+        neg = flow if prev is not None and tp < prev else 0.0
+        if commit:
+            self._prev_tp = tp
+        psum = self._pos.update(pos, commit)[0] * self.length
+        nsum = self._neg.update(neg, commit)[0] * self.length
+        total = psum + nsum
+        return 100.0 * psum / total if total else _NAN
+
+    def peek(self, high: float, low: float, close: float, volume: float) -> float:
+        return self.update(high, low, close, volume, commit=False)
+
+
+class ADX:
+    """ADX con DI+/DI- (pandas_ta.adx, mamode='rma'): devuelve (adx, dmp, dmn)."""
+
+    __slots__ = ("_atr", "_pos", "_neg", "_adx", "_prev")
+
+    def __init__(self, length: int = 14):
+        self._atr = ATR(length)
+        self._pos = RMA(length)
+        self._neg = RMA(length)
+        self._adx = RMA(length)
+        self._prev = None
+
+    def update(self, high: float, low: float, close: float,
+               commit: bool = True) -> tuple[float, float, float]:
+        atr = self._atr.update(high, low, close, commit)
+        prev = self._prev
+        if commit:
+            self._prev = (high, low)
+        if prev is None:
+            return _NAN, _NAN, _NAN
+        up, dn = high - prev[0], prev[1] - low
+        pos = up if (up > dn and up > 0) else 0.0
+        neg = dn if (dn > up and dn > 0) else 0.0
+        pos_avg = self._pos.update(pos, commit)
+        neg_avg = self._neg.update(neg, commit)
+        dmp = 100.0 * pos_avg / atr if atr else _NAN
+        dmn = 100.0 * neg_avg / atr if atr else _NAN
+        if math.isnan(dmp) or math.isnan(dmn) or not (dmp + dmn):
+            return _NAN, dmp, dmn
+        dx = 100.0 * abs(dmp - dmn) / (dmp + dmn)
+        return self._adx.update(dx, commit), dmp, dmn
+
+    def peek(self, high: float, low: float, close: float) -> tuple[float, float, float]:
+        return self.update(high, low, close, commit=False)
+
+
+# ─── SETS POR MOTOR ───────────────────────────────────────────────────────────
+
+class IndicatorSet:
+    """
+    Conjunto de indicadores de un motor. `last` es la instantánea de la última
+    vela cerrada integrada y `prev` la anterior (para cruces).
+    """
+
+    def __init__(self):
+        self.last: dict | None = None
+        self.prev: dict | None = None
+        self.count = 0
+        self.last_open_time: int | None = None
+
+    def _step(self, high, low, close, volume, commit: bool) -> dict:
+        raise NotImplementedError
+
+    def update(self, high, low, close, volume, open_time: int | None = None) -> dict:
+        snap = self._step(float(high), float(low), float(close), float(volume), True)
+        self.prev, self.last = self.last, snap
+        self.count += 1
+        if open_time is not None:
+            self.last_open_time = int(open_time)
+        return snap
+
+    def peek(self, high, low, close, volume) -> dict:
+        """Valores si la vela en curso cerrara ahora; no altera el estado."""
+        return self._step(float(high), float(low), float(close), float(volume), False)
+
+    def feed(self, df, start: int = 0) -> int:
+        """Integra las filas df[start:] como velas cerradas. Devuelve cuántas."""
+        cols = [df[c].to_numpy(dtype=np.float64) for c in ("high", "low", "close", "volume")]
+        ots = df["open_time"].to_numpy() if "open_time" in df.columns else None
+        for i in range(start, len(df)):
+            self.update(cols[0][i], cols[1][i], cols[2][i], cols[3][i],
+                        ots[i] if ots is not None else None)
+        return max(0, len(df) - start)
+
+    @classmethod
+    def from_frame(cls, df):
+        ind = cls()
+        ind.feed(df)
+        return ind
+
+
+class SignalIndicators(IndicatorSet):
+    """
+    Set de SPSignalEngine y del backtest SSS: EMA 9/20/50 (como Series.ewm),
+    RSI 14, MACD 12/26/9, Stoch 14/3/3, CCI 20, Bollinger 20, MFI 14 y ATR 14.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._ema = {span: EMA(span) for span in (9, 20, 50)}
+        self._rsi = RSI(14)
+        self._macd = MACD(12, 26, 9)
+        self._stoch = Stochastic(14, 3, 3)
+        self._cci = CCI(20)
+        self._bb = RollingStats(20)
+        self._mfi = MFI(14)
+        self._atr = ATR(14)
+
+    def _step(self, high, low, close, volume, commit):
+        macd, hist, signal = self._macd.update(close, commit)
+        k, d = self._stoch.update(high, low, close, commit)
+        bb_mid, bb_std = self._bb.update(close, commit)
+        snap = {f"ema{span}": ema.update(close, commit) for span, ema in self._ema.items()}
+        snap.update({
+            "close": close,
+            "rsi": self._rsi.update(close, commit),
+            "macd": macd, "macd_hist": hist, "macd_signal": signal,
+            "stoch_k": k, "stoch_d": d,
+            "cci": self._cci.update(high, low, close, commit),
+            "bb_mid": bb_mid, "bb_std": bb_std,
+            "mfi": self._mfi.update(high, low, close, volume, commit),
+            "atr": self._atr.update(high, low, close, commit),
+        })
+        return snap
+
+
+class BTCIndicators(IndicatorSet):
+    """Set de BTCAdvancedAnalyzer, con los nombres de columna que usa el analizador."""
+
+    EMA_LENGTHS = (9, 20, 50, 200)
+
+    def __init__(self):
+        super().__init__()
+        self._ema = {n: EMA(n, sma_seed=True) for n in self.EMA_LENGTHS}
+        self._rsi = RSI(14)
+        self._stoch = Stochastic(14, 3, 3)
+        self._cci = CCI(20)
+        self._ao_fast = SMA(5)
+        self._ao_slow = SMA(34)
+        self._adx = ADX(14)
+        self._macd = MACD(12, 26, 9)
+        self._atr = ATR(14)
+
+    def _step(self, high, low, close, volume, commit):
+        k, d = self._stoch.update(high, low, close, commit)
+        median = (high + low) / 2.0
+        macd, hist, signal = self._macd.update(close, commit)
+        snap = {f"EMA_{n}": ema.update(close, commit) for n, ema in self._ema.items()}
+        snap.update({
+            "RSI": self._rsi.update(close, commit),
+            "STOCH_K": k, "STOCH_D": d,
+            "CCI": self._cci.update(high, low, close, commit),
+            "AO": self._ao_fast.update(median, commit) - self._ao_slow.update(median, commit),
+            "ADX": self._adx.update(high, low, close, commit)[0],
+            "MACD_LINE": macd, "MACD_HIST": hist, "MACD_SIGNAL": signal,
+            "ATR": self._atr.update(high, low, close, commit),
+        })
+        return snap
+
+
+# ─── REGISTRO POR (SYMBOL, INTERVAL, MOTOR) ───────────────────────────────────
+
+class IndicatorStreamStore:
+    """{(symbol, interval, motor): IndicatorSet} sincronizado por open_time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: dict[tuple, IndicatorSet] = {}
+        self.seeds = 0
+        self.advanced = 0     # Velas integradas incrementalmente
+        self.reused = 0       # Sincronizaciones sin velas nuevas
+
+    def sync(self, key: tuple, closed_df, factory) -> IndicatorSet:
+        """
+        Avanza el set de `key` hasta la última vela de closed_df (solo velas
+        cerradas). Se siembra de nuevo si no existe o si closed_df ya no
+        contiene la última vela integrada (hueco en los datos).
+        """
+        ots = closed_df["open_time"].to_numpy(dtype=np.int64)
+        with self._lock:
+            ind = self._streams.get(key)
+            if ind is not None and ind.last_open_time is not None and len(ots):
+                pos = int(np.searchsorted(ots, ind.last_open_time))
+                if pos < len(ots) and ots[pos] == ind.last_open_time:
+                    n = ind.feed(closed_df, pos + 1)
+                    if n:
+                        self.advanced += n
+                    else:
+                        self.reused += 1
+                    return ind
+            ind = factory.from_frame(closed_df)
+            self._streams[key] = ind
+            self.seeds += 1
+            return ind
+
+    def drop(self, key: tuple) -> None:
+        with self._lock:
+            self._streams.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "streams": len(self._streams),
+                "seeds": self.seeds,
+                "advanced": self.advanced,
+                "reused": self.reused,
+            }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+indicator_streams = IndicatorStreamStore()
@@ -0,0 +1,122 @@
+# utils/json_cache.py
+# Caché compartida de documentos JSON por ruta.
+#
+# Cada lectura cuesta un os.stat(): si mtime y tamaño no cambiaron desde el
+# último parseo, se devuelve el objeto ya cargado. Los save_* del proyecto
+# llaman a invalidate() tras escribir. Si hay una escritura diferida pendiente
+# (utils.write_behind), manda la versión en memoria.
+#
+# load() devuelve una copia propia: se puede mutar (y recorrer entre awaits)
+# sin tocar la caché; solo un save la cambia. load_readonly() devuelve el
+# objeto compartido, sin copia, para lecturas frecuentes y para los índices
+# que detectan recargas por identidad (utils/subs_index.py, utils/alerts_index.py):
+# ese objeto NO se debe modificar. Lo que se pasa a un save también pasa a ser
+# de la caché: no se toca después de guardarlo.
+
+import json
+import os
+import threading
+
+from utils.write_behind import get_pending, add_write_listener
+
+
+def _clone(obj):
+    """Copia profunda de un documento JSON (dict/list/escalares), más rápida que deepcopy."""
+    if isinstance(obj, dict):
+        return {k: _clone(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_clone(v) for v in obj]
+    return obj
+
+
+class JsonDocumentCache:
+    """Caché {path: (mtime_ns, size, data)} revalidada por os.stat."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs: dict[str, tuple[int, int, object]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str, default=dict):
+        """
+        Devuelve una copia del JSON de `path` que el llamador puede modificar.
+        default: callable que genera el valor si el fichero no existe.
+        Los errores de parseo se propagan; cada manager decide su fallback.
+        """
+        return _clone(self.load_readonly(path, default))
+
+    def load_readonly(self, path: str, default=dict):
+        """Como load(), pero devuelve el objeto compartido de la caché: no modificarlo."""
+        pending = get_pending(path)
+        if pending is not None:
+            with self._lock:
+                self.hits += 1
+            return pending
+
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._docs.pop(path, None)
+                self.misses += 1
+            return default()
+
+        with self._lock:
+            cached = self._docs.get(path)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        with self._lock:
+            self._docs[path] = (st.st_mtime_ns, st.st_size, data)
+        return data
+
+    def prime(self, path: str, data) -> None:
+        """Registra `data` como contenido actual de `path` (tras escribirlo)."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._docs[path] = (st.st_mtime_ns, st.st_size, data)
+
+    def invalidate(self, path: str | None = None) -> None:
+        """Olvida un documento (o todos si path=None)."""
+        with self._lock:
+            if path is None:
+                self._docs.clear()
+            else:
+                self._docs.pop(path, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "docs": len(self._docs),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+            }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+json_cache = JsonDocumentCache()
+# Lo que acaba de volcar el write-behind ya está en memoria: no hace falta releerlo
+add_write_listener(json_cache.prime)
+
+
+def load_json_cached(path: str, default=dict):
+    return json_cache.load(path, default)
+
+
+def load_json_readonly(path: str, default=dict):
+    return json_cache.load_readonly(path, default)
+
+
+def invalidate_json(path: str | None = None) -> None:
+    json_cache.invalidate(path)
@@ -0,0 +1,188 @@
+# utils/kline_buffer.py
+# Buffers circulares de velas por (symbol, interval, origen) sobre arrays NumPy.
+#
+# Los loops de BTC (1000 velas x 7 TF) y Valerts (300 por símbolo/TF) volvían a
+# descargar todo el histórico en cada pasada aunque solo cambian la última o
+# las dos últimas velas. Ahora:
+#   1. la primera vez se siembra el buffer con una descarga completa,
+#   2. en cada ciclo se piden solo las velas con startTime >= última open_time
+#      guardada (la vela en curso + las nuevas),
+#   3. la vela en curso se sobrescribe en su sitio y las nuevas se añaden,
+#      desplazando las más antiguas cuando el buffer está lleno.
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.config import OHLCV_CACHE_MAX_AGE
+from utils.market_data import KLINE_COLUMNS, cache_source, interval_to_ms, market_data
+
+_INT_COLUMNS = ("open_time", "close_time")
+
+
+class KlineRingBuffer:
+    """Velas OHLCV en arrays NumPy de tamaño fijo (ring buffer)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._cols = {
+            c: np.zeros(self.capacity, dtype=np.int64 if c in _INT_COLUMNS else np.float64)
+            for c in KLINE_COLUMNS
+        }
+        self._start = 0
+        self._len = 0
+        self.refreshed_at = 0.0   # time.monotonic() de la última descarga integrada
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def last_open_time(self) -> int | None:
+        if not self._len:
+            return None
+        return int(self._cols["open_time"][(self._start + self._len - 1) % self.capacity])
+
+    @property
+    def last_close_time(self) -> int | None:
+        if not self._len:
+            return None
+        return int(self._cols["close_time"][(self._start + self._len - 1) % self.capacity])
+
+    def seed(self, df: pd.DataFrame) -> None:
+        """Reinicia el buffer con las últimas `capacity` velas de df."""
+        tail = df.tail(self.capacity)
+        n = len(tail)
+        for c in KLINE_COLUMNS:
+            self._cols[c][:n] = tail[c].to_numpy()
+        self._start = 0
+        self._len = n
+
+    def merge(self, df: pd.DataFrame) -> int:
+        """
+        Integra velas nuevas (ordenadas por open_time). La que coincide con la
+        última guardada se sobrescribe; las anteriores se ignoran.
+        Devuelve el número de velas añadidas (sin contar la sobrescrita).
+        """
+        if df is None or df.empty:
+            return 0
+        rows = {c: df[c].to_numpy() for c in KLINE_COLUMNS}
+        added = 0
+        for i in range(len(df)):
+            ot = int(rows["open_time"][i])
+            last = self.last_open_time
+            if last is not None and ot < last:
+                continue
+            if last is not None and ot == last:
+                pos = (self._start + self._len - 1) % self.capacity
+            elif self._len < self.capacity:
+                pos = (self._start + self._len) % self.capacity
+                self._len += 1
+                added += 1
+            else:
+                pos = self._start
+                self._start = (self._start + 1) % self.capacity
+                added += 1
+            for c in KLINE_COLUMNS:
+                self._cols[c][pos] = rows[c][i]
+        return added
+
+    def to_frame(self, limit: int | None = None) -> pd.DataFrame:
+        """DataFrame normalizado (mismo formato que market_data) de las últimas `limit` velas."""
+        n = self._len if limit is None else min(int(limit), self._len)
+        idx = (self._start + self._len - n + np.arange(n)) % self.capacity
+        df = pd.DataFrame({c: self._cols[c][idx] for c in KLINE_COLUMNS})
+        df.index = pd.DatetimeIndex(pd.to_datetime(df["open_time"], unit="ms"), name="time")
+        return df
+
+
+class KlineBufferStore:
+    """Registro {(symbol, interval, origen): KlineRingBuffer} con métricas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers: dict[tuple, KlineRingBuffer] = {}
+        self.seeds = 0
+        self.increments = 0
+        self.rows_fetched = 0
+
+    def get(self, key: tuple) -> KlineRingBuffer | None:
+        with self._lock:
+            return self._buffers.get(key)
+
+    def reset(self, key: tuple, capacity: int, df: pd.DataFrame) -> KlineRingBuffer:
+        buf = KlineRingBuffer(capacity)
+        buf.seed(df)
+        buf.refreshed_at = time.monotonic()
+        with self._lock:
+            self._buffers[key] = buf
+            self.seeds += 1
+            self.rows_fetched += len(df)
+        return buf
+
+    def record_increment(self, rows: int) -> None:
+        with self._lock:
+            self.increments += 1
+            self.rows_fetched += rows
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffers": len(self._buffers),
+                "seeds": self.seeds,
+                "increments": self.increments,
+                "rows_fetched": self.rows_fetched,
+            }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+kline_buffers = KlineBufferStore()
+
+
+# Máximo de velas por petición en /api/v3/klines
+_BINANCE_MAX_LIMIT = 1000
+
+
+async def get_klines_incremental(symbol: str, interval: str, limit: int = 500,
+                                 endpoints=None, min_rows: int = 1,
+                                 client=market_data) -> pd.DataFrame | None:
+    """
+    Velas de Binance mantenidas en un ring buffer. Misma salida que
+    market_data.get_klines; la descarga completa solo ocurre al sembrar.
+    """
+    step = interval_to_ms(interval)
+    if step is None:
+        # Intervalos de duración variable (1M): sin buffer
+        return await client.get_klines(symbol, interval, limit,
+                                       endpoints=endpoints, min_rows=min_rows)
+
+    key = (symbol, interval, cache_source("binance", endpoints))
+    buf = kline_buffers.get(key)
+    now_ms = int(time.time() * 1000)
+
+    if (buf is None or buf.capacity < limit or not len(buf)
+            or now_ms - buf.last_open_time > step * (_BINANCE_MAX_LIMIT - 1)):
+        # Siembra (o re-siembra tras un hueco mayor de lo que cabe en una petición)
+        df = await client.fetch_klines(symbol, interval, limit,
+                                       endpoints=endpoints, min_rows=min_rows)
+        if df is None:
+            return None
+        buf = kline_buffers.reset(key, limit, df)
+    elif (now_ms <= buf.last_close_time
+          and time.monotonic() - buf.refreshed_at < OHLCV_CACHE_MAX_AGE):
+        # Vela en curso sin cerrar y descargada hace poco: nada que pedir
+        pass
+    else:
+        needed = min(_BINANCE_MAX_LIMIT, (now_ms - buf.last_open_time) // step + 2)
+        new = await client.fetch_klines(symbol, interval, needed, endpoints=endpoints,
+                                        start_time=buf.last_open_time)
+        if new is None:
+            return None
+        buf.merge(new)
+        buf.refreshed_at = time.monotonic()
+        kline_buffers.record_increment(len(new))
+
+    if len(buf) < min_rows:
+        return None
+    return buf.to_frame(limit)
@@ -0,0 +1,241 @@
+# utils/kline_resample.py
+# Temporalidades altas construidas en local a partir de una vela base.
+#
+# btc_monitor_loop pedía por separado 1h, 2h, 4h, 8h, 12h, 1d y 1w (1000 velas
+# cada una) de la misma serie BTCUSDT. Aquí se mantiene una sola serie base
+# por familia (ring buffer de utils/kline_buffer.py, sembrado con descarga
+# paginada) y las demás se agregan en local:
+#   - cubetas alineadas como en Binance: 2h/4h/8h/12h/1d desde 00:00 UTC
+#     (múltiplos de la época) y 1w desde el lunes 00:00 UTC,
+#   - open = primera, high = máx, low = mín, close = última, volume = suma y
+#     close_time = fin de la cubeta (igual que la vela en curso del exchange),
+#   - la agregación es incremental: en cada ciclo solo se recalculan las
+#     cubetas desde la que contiene la última vela base ya vista.
+#
+# Con BTC_RESAMPLE_VALIDATE=1, cada vez que cierra una cubeta se compara con la
+# vela del exchange y se registran las diferencias (scripts/check_btc_resample.py
+# hace lo mismo a demanda).
+
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.config import BTC_RESAMPLE_VALIDATE
+from utils.kline_buffer import get_klines_incremental, kline_buffers
+from utils.logger import logger
+from utils.market_data import KLINE_COLUMNS, cache_source, interval_to_ms, market_data
+
+_DAY_MS = 86_400_000
+# La época (1970-01-01) cae en jueves; las semanas de Binance abren en lunes
+_WEEK_OFFSET = 4 * _DAY_MS
+_PAGE_LIMIT = 1000
+_PRICE_TOL = 1e-9      # Tolerancia relativa de la validación (precios)
+_VOLUME_TOL = 1e-6     # El volumen es una suma de floats: algo más de margen
+
+
+# ─── AGREGACIÓN ───────────────────────────────────────────────────────────────
+
+def bucket_open(open_time: np.ndarray, interval: str) -> np.ndarray:
+    """open_time de la cubeta de `interval` que contiene cada vela base."""
+    step = interval_to_ms(interval)
+    offset = _WEEK_OFFSET if interval.endswith("w") else 0
+    return (open_time - offset) // step * step + offset
+
+
+def resample_columns(cols: dict, interval: str, drop_partial_head: bool = True) -> dict:
+    """
+    Columnas base (KLINE_COLUMNS, ordenadas por open_time) → columnas de
+    `interval`. Con drop_partial_head se descarta la primera cubeta si la base
+    no empieza en su apertura (le faltarían velas).
+    """
+    ot = cols["open_time"]
+    if not len(ot):
+        return {c: cols[c][:0] for c in KLINE_COLUMNS}
+    buckets = bucket_open(ot, interval)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ot)] - 1
+    out = {
+        "open_time": buckets[starts],
+        "open": cols["open"][starts],
+        "high": np.maximum.reduceat(cols["high"], starts),
+        "low": np.minimum.reduceat(cols["low"], starts),
+        "close": cols["close"][ends],
+        "volume": np.add.reduceat(cols["volume"], starts),
+        "close_time": buckets[starts] + interval_to_ms(interval) - 1,
+    }
+    if drop_partial_head and ot[0] != buckets[0]:
+        out = {c: v[1:] for c, v in out.items()}
+    return out
+
+
+def _frame(cols: dict, limit: int | None = None) -> pd.DataFrame:
+    """Columnas → DataFrame normalizado de utils/market_data.py (últimas `limit` filas)."""
+    if limit:
+        cols = {c: v[-int(limit):] for c, v in cols.items()}
+    df = pd.DataFrame({c: cols[c] for c in KLINE_COLUMNS})
+    df.index = pd.DatetimeIndex(pd.to_datetime(df["open_time"], unit="ms"), name="time")
+    return df
+
+
+class KlineResampler:
+    """
+    Serie base de (symbol, base) + temporalidades `targets` agregadas en local.
+    Cada temporalidad guarda como mucho `rows` velas; la base guarda las
+    necesarias para llenar la más larga.
+    """
+
+    def __init__(self, symbol: str, base: str, targets: tuple, rows: int = 1000,
+                 endpoints=None, client=market_data):
+        self.symbol = symbol
+        self.base = base
+        self.targets = tuple(targets)
+        self.rows = int(rows)
+        self.endpoints = endpoints
+        self.client = client
+        step = interval_to_ms(base)
+        self.depth = max(self.rows * interval_to_ms(t) // step for t in self.targets)
+        self._key = (symbol, base, cache_source("binance", endpoints))
+        self._lock = asyncio.Lock()
+        self._cols: dict = {}            # {target: columnas agregadas}
+        self._base_last = None           # open_time de la última vela base agregada
+        self._validated: dict = {}       # {target: open_time de la última cubeta validada}
+        # Métricas
+        self.rebuilds = 0
+        self.updates = 0
+        self.seed_pages = 0
+
+    # ─── SERIE BASE ───────────────────────────────────────────────────────────
+
+    async def _seed(self) -> bool:
+        """Siembra el ring buffer base con `depth` velas, de 1000 en 1000."""
+        step = interval_to_ms(self.base)
+        cursor = (int(time.time() * 1000) // step - self.depth + 1) * step
+        pages = []
+        while True:
+            page = await self.client.fetch_klines(self.symbol, self.base, _PAGE_LIMIT,
+                                                  endpoints=self.endpoints, start_time=cursor)
+            if page is None:
+                return False
+            self.seed_pages += 1
+            pages.append(page)
+            if len(page) < _PAGE_LIMIT:
+                break
+            cursor = int(page["open_time"].iloc[-1]) + step
+        df = pd.concat(pages)
+        df = df[~df["open_time"].duplicated(keep="last")]
+        kline_buffers.reset(self._key, self.depth, df)
+        return True
+
+    async def _base_frame(self) -> pd.DataFrame | None:
+        step = interval_to_ms(self.base)
+        buf = kline_buffers.get(self._key)
+        if (buf is None or buf.capacity < self.depth or not len(buf)
+                or time.time() * 1000 - buf.last_open_time > step * (_PAGE_LIMIT - 1)):
+            # get_klines_incremental solo sabe sembrar con una petición (≤1000)
+            if not await self._seed():
+                return None
+        return await get_klines_incremental(self.symbol, self.base, self.depth,
+                                            endpoints=self.endpoints, client=self.client)
+
+    # ─── AGREGACIÓN INCREMENTAL ───────────────────────────────────────────────
+
+    def update(self, base_df: pd.DataFrame) -> None:
+        """Integra la serie base: solo se recalculan las cubetas desde la última vela vista."""
+        base = {c: base_df[c].to_numpy() for c in KLINE_COLUMNS}
+        ot = base["open_time"]
+        i = int(np.searchsorted(ot, self._base_last)) if self._base_last is not None else 0
+        if (self._base_last is None or not self._cols
+                or i >= len(ot) or ot[i] != self._base_last):
+            # Primera vez o la base se volvió a sembrar: se agrega todo
+            self._cols = {t: resample_columns(base, t) for t in self.targets}
+            self.rebuilds += 1
+        else:
+            for t in self.targets:
+                cols = self._cols[t]
+                start = int(bucket_open(ot[i:i + 1], t)[0])
+                j = int(np.searchsorted(ot, start))
+                fresh = resample_columns({c: v[j:] for c, v in base.items()}, t,
+                                         drop_partial_head=(j == 0))
+                keep = int(np.searchsorted(cols["open_time"], start))
+                self._cols[t] = {c: np.concatenate([cols[c][:keep], fresh[c]])[-self.rows:]
+                                 for c in KLINE_COLUMNS}
+            self.updates += 1
+        self._base_last = int(ot[-1])
+
+    async def get(self, interval: str, limit: int | None = None) -> pd.DataFrame | None:
+        """Velas de `interval` (una de targets) con el formato de utils/market_data.py."""
+        async with self._lock:
+            base_df = await self._base_frame()
+            if base_df is None or base_df.empty:
+                return None
+            self.update(base_df)
+        cols = self._cols.get(interval)
+        if cols is None or not len(cols["open_time"]):
+            return None
+        df = _frame(cols, min(limit or self.rows, self.rows))
+        if BTC_RESAMPLE_VALIDATE:
+            await self._validate_closed(interval, df)
+        return df
+
+    # ─── VALIDACIÓN ───────────────────────────────────────────────────────────
+
+    async def validate(self, interval: str, limit: int = 200, df: pd.DataFrame | None = None) -> dict:
+        """
+        Compara las velas cerradas agregadas con las del exchange (mismo
+        intervalo y endpoints). Devuelve el número de velas comparadas, las
+        que faltan en cada lado y las que difieren, con la mayor diferencia
+        relativa por columna.
+        """
+        if df is None:
+            df = await self.get(interval, limit)
+        ref = await self.client.fetch_klines(self.symbol, interval, limit, endpoints=self.endpoints)
+        if df is None or ref is None:
+            return {"interval": interval, "error": "sin datos"}
+        ours = df.iloc[:-1].set_index("open_time")
+        theirs = ref.iloc[:-1].set_index("open_time")
+        theirs = theirs[theirs.index >= ours.index.min()] if len(ours) else theirs
+        common = ours.index.intersection(theirs.index)
+        report = {
+            "interval": interval,
+            "compared": len(common),
+            "missing_local": int(len(theirs.index.difference(ours.index))),
+            "missing_exchange": int(len(ours.index[ours.index >= theirs.index.min()]
+                                        .difference(theirs.index))) if len(theirs) else 0,
+            "max_rel_diff": {},
+            "mismatched": [],
+        }
+        bad = np.zeros(len(common), dtype=bool)
+        for col in ("open", "high", "low", "close", "volume", "close_time"):
+            a = ours.loc[common, col].to_numpy(dtype=np.float64)
+            b = theirs.loc[common, col].to_numpy(dtype=np.float64)
+            rel = np.abs(a - b) / np.maximum(np.abs(b), 1e-12)
+            report["max_rel_diff"][col] = float(rel.max()) if len(rel) else 0.0
+            bad |= rel > (_VOLUME_TOL if col == "volume" else _PRICE_TOL)
+        report["mismatched"] = [int(t) for t in common[bad]]
+        return report
+
+    async def _validate_closed(self, interval: str, df: pd.DataFrame) -> None:
+        """Modo validación: una comparación con el exchange por cubeta cerrada."""
+        if len(df) < 2:
+            return
+        closed = int(df["open_time"].iloc[-2])
+        if self._validated.get(interval) == closed:
+            return
+        self._validated[interval] = closed
+        report = await self.validate(interval, limit=50, df=df)
+        if report.get("error") or report["missing_local"] or report["mismatched"]:
+            logger.warning(f"[Resample] {self.symbol}/{interval} difiere del exchange: {report}")
+        else:
+            logger.info(f"[Resample] {self.symbol}/{interval}: {report['compared']} velas idénticas al exchange")
+
+    def stats(self) -> dict:
+        return {
+            "base": self.base,
+            "depth": self.depth,
+            "targets": list(self.targets),
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+            "seed_pages": self.seed_pages,
+        }
@@ -155,6 +155,9 @@ class Logger:
 
     # --- MÉTODOS GENÉRICOS ---
 
+    def debug(self, message: str, *args, **kwargs):
+        _loguru_logger.debug(message, *args, **kwargs)
+
     def info(self, message: str, *args, **kwargs):
         _loguru_logger.info(message, *args, **kwargs)
 
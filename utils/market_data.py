@@ -0,0 +1,397 @@
+# utils/market_data.py
+# Cliente asíncrono único de datos de mercado (velas OHLCV).
+#
+# Sustituye a los fetchers duplicados con requests.get que había en sp_loop,
+# btc_loop, valerts, /ta, /graf y el backtest SSS:
+#   - una sola aiohttp.ClientSession con pool de conexiones y keep-alive,
+#   - fallback entre endpoints de Binance y, si se pide, entre exchanges
+#     (Binance → KuCoin → Bybit); el orden de mirrors lo decide la salud de cada
+#     uno (utils/endpoint_health.py) y los caídos se saltan durante un cooldown,
+#   - salida normalizada: DataFrame con columnas
+#       open_time (int ms), open, high, low, close, volume (float), close_time (int ms)
+#     e índice DatetimeIndex 'time' (UTC naive, igual que antes),
+#   - caché OHLCV compartida (utils/ohlcv_cache.py) delante de cada descarga,
+#   - descarga "hedged" entre exchanges (get_klines_hedged) para respuestas
+#     interactivas: no se espera al timeout de uno para probar el siguiente.
+#
+# La sesión queda ligada al event loop del bot. Para código que corre en un
+# hilo del executor (sin loop propio) existe get_klines_blocking().
+
+import asyncio
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+import pandas as pd
+
+from core.config import MARKET_HEDGE_DELAY
+from utils.endpoint_health import endpoint_health, is_down_status
+from utils.logger import logger
+from utils.ohlcv_cache import ohlcv_cache
+
+
+# ─── ENDPOINTS ────────────────────────────────────────────────────────────────
+
+BINANCE_ENDPOINTS = (
+    "https://api.binance.com/api/v3/klines",
+    "https://api.binance.us/api/v3/klines",
+    "https://api1.binance.com/api/v3/klines",
+)
+KUCOIN_KLINES_URL = "https://api.kucoin.com/api/v1/market/candles"
+BYBIT_KLINES_URL = "https://api.bybit.com/v5/market/kline"
+
+KLINE_COLUMNS = ["open_time", "open", "high", "low", "close", "volume", "close_time"]
+_PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Mapeo de intervalos Binance → KuCoin / Bybit
+_TF_KUCOIN = {
+    "1m": "1min", "3m": "3min", "5m": "5min", "15m": "15min", "30m": "30min",
+    "1h": "1hour", "2h": "2hour", "4h": "4hour", "6h": "6hour",
+    "1d": "1day", "1w": "1week",
+}
+_TF_BYBIT = {
+    "1m": "1", "3m": "3", "5m": "5", "15m": "15", "30m": "30",
+    "1h": "60", "2h": "120", "4h": "240", "6h": "360",
+    "1d": "D", "1w": "W",
+}
+
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+
+def interval_to_ms(interval: str) -> int | None:
+    """'15m' → 900000. Devuelve None para intervalos de duración variable (1M)."""
+    try:
+        return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+    except (KeyError, ValueError, IndexError):
+        return None
+
+
+def _split_symbol(symbol: str) -> tuple[str, str]:
+    """BTCUSDT → ('BTC', 'USDT') detectando la quote por sufijos comunes."""
+    for q in ("USDT", "USDC", "BTC", "ETH", "BNB", "BUSD"):
+        if symbol.endswith(q) and len(symbol) > len(q):
+            return symbol[:-len(q)], q
+    return symbol, "USDT"
+
+
+def cache_source(exchange: str, endpoints) -> str:
+    """Etiqueta de origen para la caché: endpoints distintos pueden dar datos distintos."""
+    if not endpoints:
+        return exchange
+    return f"{exchange}:{urlsplit(endpoints[0]).netloc}"
+
+
+def klines_frame(rows: list) -> pd.DataFrame:
+    """Filas [open_time, o, h, l, c, v, close_time] → DataFrame normalizado."""
+    df = pd.DataFrame(rows, columns=KLINE_COLUMNS)
+    df["open_time"] = df["open_time"].astype("int64")
+    df["close_time"] = df["close_time"].astype("int64")
+    for col in _PRICE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df.index = pd.DatetimeIndex(pd.to_datetime(df["open_time"], unit="ms"), name="time")
+    return df
+
+
+# ─── CLIENTE ──────────────────────────────────────────────────────────────────
+
+class MarketDataClient:
+    """Sesión HTTP compartida + adaptadores por exchange."""
+
+    HEADERS = {"User-Agent": "BitBreadAlert/1.0", "Accept": "application/json"}
+
+    def __init__(self, timeout: float = 5.0, pool_size: int = 20, cache=ohlcv_cache):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cache = cache
+        self._session: aiohttp.ClientSession | None = None
+        # Métricas
+        self.requests = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self._hedge: dict[str, dict] = {}
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Crea la sesión persistente en el primer uso (dentro del loop)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.HEADERS,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, ttl_dns_cache=300, keepalive_timeout=60
+                ),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_json(self, url: str, params: dict | None = None, timeout: float | None = None):
+        """
+        GET → JSON. Devuelve None si el status no es 200, hay error de red o el
+        circuito del endpoint está abierto (sin esperar a ningún timeout).
+        """
+        if not endpoint_health.allow(url):
+            return None
+        session = await self._get_session()
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        self.requests += 1
+        healthy = None    # None = cancelada (p.ej. perdedora de un hedge)
+        started = time.monotonic()
+        try:
+            async with session.get(url, params=params, **kwargs) as resp:
+                healthy = not is_down_status(resp.status)
+                if resp.status != 200:
+                    self.errors += 1
+                    return None
+                return await resp.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            healthy = False
+            self.errors += 1
+            logger.debug(f"[MarketData] {url} falló: {e!r}")
+            return None
+        finally:
+            endpoint_health.record(url, healthy, time.monotonic() - started)
+
+    # ─── ADAPTADORES ──────────────────────────────────────────────────────────
+
+    async def binance_klines(self, symbol: str, interval: str, limit: int = 500,
+                             endpoints=None, timeout: float | None = None,
+                             min_rows: int = 1, start_time: int | None = None) -> pd.DataFrame | None:
+        """
+        Velas de Binance probando los endpoints de más a menos sano (start_time en
+        ms, opcional). Los mirrors con el circuito abierto no se intentan.
+        """
+        params = {"symbol": symbol, "interval": interval, "limit": int(limit)}
+        if start_time is not None:
+            params["startTime"] = int(start_time)
+        for i, url in enumerate(endpoint_health.order(endpoints or BINANCE_ENDPOINTS)):
+            if i:
+                self.fallbacks += 1
+            data = await self.get_json(url, params, timeout)
+            if not isinstance(data, list) or len(data) < max(1, min_rows):
+                continue
+            try:
+                return klines_frame([row[:7] for row in data])
+            except (ValueError, TypeError, IndexError) as e:
+                logger.debug(f"[MarketData] Respuesta inválida de {url}: {e}")
+        return None
+
+    async def kucoin_klines(self, symbol: str, interval: str, limit: int = 500,
+                            timeout: float | None = None) -> pd.DataFrame | None:
+        """KuCoin: símbolo BTC-USDT, filas [t_seg, o, c, h, l, v, turnover] descendentes."""
+        kucoin_tf = _TF_KUCOIN.get(interval)
+        if not kucoin_tf:
+            return None
+        base, quote = _split_symbol(symbol)
+        payload = await self.get_json(
+            KUCOIN_KLINES_URL, {"symbol": f"{base}-{quote}", "type": kucoin_tf}, timeout
+        )
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if not data:
+            return None
+        step = interval_to_ms(interval) or 0
+        rows = []
+        for c in reversed(data[:limit]):
+            t = int(c[0]) * 1000
+            rows.append([t, c[1], c[3], c[4], c[2], c[5], t + step - 1])
+        return klines_frame(rows)
+
+    async def bybit_klines(self, symbol: str, interval: str, limit: int = 500,
+                           timeout: float | None = None) -> pd.DataFrame | None:
+        """Bybit v5 spot: filas [t_ms, o, h, l, c, v, turnover] descendentes."""
+        bybit_tf = _TF_BYBIT.get(interval)
+        if not bybit_tf:
+            return None
+        payload = await self.get_json(BYBIT_KLINES_URL, {
+            "category": "spot", "symbol": symbol,
+            "interval": bybit_tf, "limit": str(limit),
+        }, timeout)
+        items = (payload.get("result") or {}).get("list") if isinstance(payload, dict) else None
+        if not items:
+            return None
+        step = interval_to_ms(interval) or 0
+        rows = [[int(c[0]), c[1], c[2], c[3], c[4], c[5], int(c[0]) + step - 1]
+                for c in reversed(items)]
+        return klines_frame(rows)
+
+    # ─── API DE ALTO NIVEL ────────────────────────────────────────────────────
+
+    async def get_klines(self, symbol: str, interval: str, limit: int = 500,
+                         exchange: str = "binance", use_cache: bool = True,
+                         **kwargs) -> pd.DataFrame | None:
+        """Velas normalizadas de un exchange concreto, servidas desde la caché OHLCV si es posible."""
+        if not use_cache or self.cache is None or kwargs.get("start_time") is not None:
+            return await self.fetch_klines(symbol, interval, limit, exchange, **kwargs)
+
+        source = cache_source(exchange, kwargs.get("endpoints"))
+        min_rows = kwargs.get("min_rows", 1)
+        df = self.cache.get(symbol, interval, source, limit, min_rows)
+        if df is not None:
+            return df
+        df = await self.fetch_klines(symbol, interval, limit, exchange, **kwargs)
+        if df is not None:
+            self.cache.put(symbol, interval, source, limit, df)
+            df = df.copy()
+        return df
+
+    async def fetch_klines(self, symbol: str, interval: str, limit: int = 500,
+                           exchange: str = "binance", **kwargs) -> pd.DataFrame | None:
+        """Descarga directa (sin caché)."""
+        if exchange == "binance":
+            return await self.binance_klines(symbol, interval, limit, **kwargs)
+        kwargs.pop("endpoints", None)
+        kwargs.pop("min_rows", None)
+        kwargs.pop("start_time", None)
+        if exchange == "kucoin":
+            return await self.kucoin_klines(symbol, interval, limit, **kwargs)
+        if exchange == "bybit":
+            return await self.bybit_klines(symbol, interval, limit, **kwargs)
+        raise ValueError(f"Exchange no soportado: {exchange}")
+
+    async def get_klines_multi(self, symbol: str, interval: str, limit: int = 500,
+                               exchanges=("binance", "kucoin", "bybit"),
+                               **kwargs) -> tuple[pd.DataFrame | None, str]:
+        """Prueba exchanges en orden. Devuelve (DataFrame | None, nombre_exchange)."""
+        names = {"binance": "Binance", "kucoin": "KuCoin", "bybit": "Bybit"}
+        for exchange in exchanges:
+            try:
+                df = await self.get_klines(symbol, interval, limit, exchange, **kwargs)
+            except Exception as e:
+                logger.debug(f"[MarketData] {exchange} {symbol}/{interval}: {e}")
+                continue
+            if df is not None and not df.empty:
+                return df, names.get(exchange, exchange)
+        return None, ""
+
+    # ─── HEDGING ENTRE EXCHANGES ──────────────────────────────────────────────
+
+    def _hedge_entry(self, exchange: str) -> dict:
+        entry = self._hedge.get(exchange)
+        if entry is None:
+            entry = self._hedge[exchange] = {
+                "launched": 0, "wins": 0, "failures": 0, "cancelled": 0,
+                "latencies": deque(maxlen=200),
+            }
+        return entry
+
+    async def get_klines_hedged(self, symbol: str, interval: str, limit: int = 500,
+                                exchanges=("binance", "kucoin", "bybit"),
+                                hedge_delay: float | None = None,
+                                **kwargs) -> tuple[pd.DataFrame | None, str]:
+        """
+        Como get_klines_multi pero en paralelo escalonado: si el exchange en curso
+        no ha respondido en `hedge_delay` s (o falla) se lanza el siguiente sin
+        cancelar el anterior. Gana el primer DataFrame válido; el resto se cancela.
+        Devuelve (DataFrame | None, nombre_exchange).
+        """
+        names = {"binance": "Binance", "kucoin": "KuCoin", "bybit": "Bybit"}
+        delay = MARKET_HEDGE_DELAY if hedge_delay is None else max(0.0, hedge_delay)
+        loop = asyncio.get_running_loop()
+        queue = list(exchanges)
+        pending: dict[asyncio.Task, tuple[str, float]] = {}
+
+        def launch() -> None:
+            exchange = queue.pop(0)
+            task = asyncio.ensure_future(self.get_klines(symbol, interval, limit, exchange, **kwargs))
+            pending[task] = (exchange, loop.time())
+            self._hedge_entry(exchange)["launched"] += 1
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay if queue else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # El más reciente sigue sin responder: se cubre con el siguiente
+                    launch()
+                    continue
+                # Por orden de lanzamiento: ante empate gana el exchange preferido
+                for task in sorted(done, key=lambda t: pending[t][1]):
+                    exchange, started = pending.pop(task)
+                    entry = self._hedge_entry(exchange)
+                    df = None
+                    if task.exception() is not None:
+                        logger.debug(f"[MarketData] {exchange} {symbol}/{interval}: {task.exception()}")
+                    else:
+                        df = task.result()
+                    if df is not None and not df.empty:
+                        entry["wins"] += 1
+                        entry["latencies"].append(loop.time() - started)
+                        return df, names.get(exchange, exchange)
+                    entry["failures"] += 1
+                    if queue:
+                        launch()
+            return None, ""
+        finally:
+            for task, (exchange, _) in pending.items():
+                if not task.done():
+                    task.cancel()
+                    self._hedge_entry(exchange)["cancelled"] += 1
+
+    def hedge_stats(self) -> dict:
+        """Por exchange: lanzamientos, % de victorias y latencias (ms) de las victorias."""
+        out = {}
+        for exchange, e in self._hedge.items():
+            lat = sorted(e["latencies"])
+            out[exchange] = {
+                "launched": e["launched"], "wins": e["wins"],
+                "failures": e["failures"], "cancelled": e["cancelled"],
+                "win_rate": round(e["wins"] / e["launched"] * 100, 1) if e["launched"] else 0.0,
+                "p50_ms": round(lat[len(lat) // 2] * 1000) if lat else None,
+                "p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000) if lat else None,
+            }
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests, "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "session_open": self._session is not None and not self._session.closed,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "hedge": self.hedge_stats(),
+            "endpoints": endpoint_health.stats(),
+        }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+market_data = MarketDataClient()
+
+
+async def get_klines(symbol: str, interval: str, limit: int = 500,
+                     exchange: str = "binance", **kwargs) -> pd.DataFrame | None:
+    return await market_data.get_klines(symbol, interval, limit, exchange, **kwargs)
+
+
+async def get_klines_multi(symbol: str, interval: str, limit: int = 500, **kwargs):
+    return await market_data.get_klines_multi(symbol, interval, limit, **kwargs)
+
+
+async def get_klines_hedged(symbol: str, interval: str, limit: int = 500, **kwargs):
+    return await market_data.get_klines_hedged(symbol, interval, limit, **kwargs)
+
+
+def get_klines_blocking(symbol: str, interval: str, limit: int = 500,
+                        exchange: str = "binance", **kwargs) -> pd.DataFrame | None:
+    """
+    Versión síncrona para hilos del executor (backtests, scripts).
+    Usa un cliente temporal: la sesión global pertenece al loop del bot.
+    """
+    async def _run():
+        client = MarketDataClient()
+        try:
+            return await client.get_klines(symbol, interval, limit, exchange, **kwargs)
+        finally:
+            await client.close()
+
+    return asyncio.run(_run())
+
+
+async def close_market_data() -> None:
+    await market_data.close()
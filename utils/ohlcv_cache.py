@@ -0,0 +1,108 @@
+# utils/ohlcv_cache.py
+# Caché OHLCV compartida por todo el proceso (loops y handlers).
+#
+# Clave: (symbol, interval, exchange). Cada entrada caduca en el primero de:
+#   - el cierre de la última vela descargada (a partir de ahí falta una vela),
+#   - OHLCV_CACHE_MAX_AGE segundos (la vela en curso sigue cambiando de precio
+#     y los loops leen el precio actual de df.iloc[-1]).
+# Una entrada descargada con limit=N sirve cualquier petición con limit <= N.
+# Memoria acotada por OHLCV_CACHE_MAX_MB con expulsión LRU.
+
+import threading
+import time
+from collections import OrderedDict
+
+from core.config import OHLCV_CACHE_MAX_AGE, OHLCV_CACHE_MAX_MB
+
+
+class _Entry:
+    __slots__ = ("df", "limit", "expires_at", "nbytes")
+
+    def __init__(self, df, limit: int, expires_at: float, nbytes: int):
+        self.df = df
+        self.limit = limit
+        self.expires_at = expires_at
+        self.nbytes = nbytes
+
+
+class OHLCVCache:
+    """LRU {(symbol, interval, exchange): _Entry} con TTL ligado al cierre de vela."""
+
+    def __init__(self, max_age: float = 30.0, max_bytes: int = 64 * 1024 * 1024):
+        self.max_age = max(0.0, float(max_age))
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._bytes = 0
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _ttl_for(df, now: float) -> float:
+        """Segundos hasta el cierre de la última vela (close_time es inclusivo)."""
+        try:
+            next_close_ms = int(df["close_time"].iloc[-1]) + 1
+        except (KeyError, IndexError, TypeError, ValueError):
+            return 0.0
+        return max(0.0, next_close_ms / 1000 - now)
+
+    def get(self, symbol: str, interval: str, exchange: str, limit: int, min_rows: int = 1):
+        """Copia de las últimas `limit` velas o None si no hay entrada válida."""
+        key = (symbol, interval, exchange)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is None or entry.expires_at <= time.monotonic()
+                    or entry.limit < limit or len(entry.df) < min_rows):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df = entry.df
+        # Copia: varios consumidores modifican el DataFrame (índices, columnas)
+        return df.tail(limit).copy()
+
+    def put(self, symbol: str, interval: str, exchange: str, limit: int, df) -> None:
+        if df is None or df.empty or self.max_age <= 0:
+            return
+        ttl = min(self.max_age, self._ttl_for(df, time.time()))
+        if ttl <= 0:
+            return
+        nbytes = int(df.memory_usage(index=True, deep=False).sum())
+        key = (symbol, interval, exchange)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = _Entry(df, int(limit), time.monotonic() + ttl, nbytes)
+            self._bytes += nbytes
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self.evictions += 1
+
+    def invalidate(self, symbol: str | None = None) -> None:
+        """Olvida un símbolo (todas sus temporalidades) o toda la caché."""
+        with self._lock:
+            for key in [k for k in self._entries if symbol is None or k[0] == symbol]:
+                self._bytes -= self._entries.pop(key).nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "mb": round(self._bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+            }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+ohlcv_cache = OHLCVCache(OHLCV_CACHE_MAX_AGE, int(OHLCV_CACHE_MAX_MB * 1024 * 1024))
@@ -4,6 +4,7 @@ import time
 import uuid
 from datetime import datetime, timedelta
 from utils.logger import logger
+from utils.json_cache import load_json_cached, invalidate_json
 
 # Importar relativedelta si está disponible, sino usar implementación manual
 try:
@@ -18,12 +19,9 @@ REMINDERS_FILE = os.path.join(DATA_DIR, "reminders.json")
 
 
 def load_reminders():
-    """Carga los recordatorios desde el JSON."""
-    if not os.path.exists(REMINDERS_FILE):
-        return {}
+    """Carga los recordatorios desde el JSON (cacheado por mtime/tamaño)."""
     try:
-        with open(REMINDERS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json_cached(REMINDERS_FILE)
     except Exception as e:
         logger.error(f"Error cargando reminders.json: {e}")
         return {}
@@ -36,6 +34,8 @@ def save_reminders(data):
             json.dump(data, f, indent=4, ensure_ascii=False)
     except Exception as e:
         logger.error(f"Error guardando reminders.json: {e}")
+    finally:
+        invalidate_json(REMINDERS_FILE)
 
 
 def add_reminder(user_id, text, trigger_time_dt, recurrence_config=None):
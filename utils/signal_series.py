@@ -0,0 +1,189 @@
+# utils/signal_series.py
+# Series completas de los indicadores del motor de señales, vectorizadas.
+#
+# El backtest SSS necesita, para cada barra, los indicadores de la vela cerrada
+# anterior. Avanzarlos vela a vela con SignalIndicators es O(n) pero con un
+# update() Python por vela; aquí cada serie se calcula de una vez sobre todo el
+# histórico con NumPy/pandas (ewm/rolling en C) y la puntuación de
+# _bt_analyze_signal se deriva como columnas: una fila por barra.
+#
+# Convención: series[k][i] es el valor tras cerrar la vela i (lo mismo que
+# SignalIndicators.update() en la fila i); scores[k][b] es la señal de la barra
+# b, evaluada con las velas cerradas 0..b-1 y el precio de cierre de b.
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# ─── PRIMITIVAS ───────────────────────────────────────────────────────────────
+
+def _ema(x: np.ndarray, span: int) -> np.ndarray:
+    """Series.ewm(span, adjust=False): semilla = primer valor."""
+    return pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def _ema_sma_seed(x: np.ndarray, length: int) -> np.ndarray:
+    """pandas_ta.ema: NaN hasta length-1, semilla SMA y luego EMA (adjust=False)."""
+    out = np.full(len(x), np.nan)
+    if len(x) < length:
+        return out
+    seeded = x[length - 1:].copy()
+    seeded[0] = sum(x[:length].tolist()) / length   # Suma secuencial, como EMA(sma_seed=True)
+    out[length - 1:] = _ema(seeded, length)
+    return out
+
+
+def _rma(x: np.ndarray, length: int) -> np.ndarray:
+    """RMA de pandas_ta: ewm(alpha=1/length, adjust=True, min_periods=length)."""
+    return pd.Series(x).ewm(alpha=1.0 / length, adjust=True, min_periods=length).mean().to_numpy()
+
+
+def _rolling(x: np.ndarray, length: int):
+    return pd.Series(x).rolling(length)
+
+
+def _ratio(num: np.ndarray, den: np.ndarray, scale: float = 100.0) -> np.ndarray:
+    """scale·num/den con NaN si den es 0 (mismo criterio que los indicadores incrementales)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, scale * num / np.where(den != 0, den, 1.0), np.nan)
+
+
+# ─── SERIES DE INDICADORES ────────────────────────────────────────────────────
+
+def signal_series(df: pd.DataFrame) -> dict:
+    """
+    Series de SignalIndicators sobre todo df: ema9/20/50, rsi, macd_hist,
+    stoch_k/d, cci, bb_mid, bb_std, mfi y atr (arrays de len(df)).
+    """
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    close = df["close"].to_numpy(dtype=np.float64)
+    volume = df["volume"].to_numpy(dtype=np.float64)
+    n = len(close)
+    s = {f"ema{span}": _ema(close, span) for span in (9, 20, 50)}
+
+    # RSI de Wilder
+    diff = np.diff(close)
+    up = _rma(np.maximum(diff, 0.0), 14)
+    dn = _rma(np.maximum(-diff, 0.0), 14)
+    s["rsi"] = np.r_[np.nan, _ratio(up, up + dn)]
+
+    # MACD 12/26/9 (la señal arranca con el primer MACD válido)
+    macd = _ema_sma_seed(close, 12) - _ema_sma_seed(close, 26)
+    signal = np.full(n, np.nan)
+    if n > 25:
+        signal[25:] = _ema_sma_seed(macd[25:], 9)
+    s["macd_hist"] = macd - signal
+
+    # Estocástico 14/3/3 (rango cero → 0)
+    hh = _rolling(high, 14).max().to_numpy()
+    ll = _rolling(low, 14).min().to_numpy()
+    rng = hh - ll
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw = np.where(rng != 0, 100.0 * (close - ll) / np.where(rng != 0, rng, 1.0), 0.0)
+    raw[np.isnan(hh)] = np.nan
+    s["stoch_k"] = _rolling(raw, 3).mean().to_numpy()
+    s["stoch_d"] = _rolling(s["stoch_k"], 3).mean().to_numpy()
+
+    # CCI 20 con desviación media (ventanas deslizantes, sin bucle)
+    tp = (high + low + close) / 3.0
+    s["cci"] = np.full(n, np.nan)
+    if n >= 20:
+        win = sliding_window_view(tp, 20)
+        mean = win.mean(axis=1)
+        mad = np.abs(win - mean[:, None]).mean(axis=1)
+        s["cci"][19:] = _ratio(tp[19:] - mean, 0.015 * mad, scale=1.0)
+
+    # Bollinger 20
+    s["bb_mid"] = _rolling(close, 20).mean().to_numpy()
+    s["bb_std"] = _rolling(close, 20).std().to_numpy()
+
+    # MFI 14 (la primera vela no tiene flujo)
+    flow = tp * volume
+    tp_prev = np.r_[np.inf, tp[:-1]]
+    pos = np.where(tp > tp_prev, flow, 0.0)
+    neg = np.where((tp < tp_prev) & np.isfinite(tp_prev), flow, 0.0)
+    psum = _rolling(pos, 14).sum().to_numpy()
+    nsum = _rolling(neg, 14).sum().to_numpy()
+    s["mfi"] = _ratio(psum, psum + nsum)
+
+    # ATR 14 (RMA del true range)
+    prev_close = close[:-1]
+    tr = np.maximum.reduce([high[1:] - low[1:], np.abs(high[1:] - prev_close),
+                            np.abs(low[1:] - prev_close)])
+    s["atr"] = np.r_[np.nan, _rma(tr, 14)]
+    return s
+
+
+# ─── PUNTUACIÓN POR BARRA ─────────────────────────────────────────────────────
+
+def signal_scores(df: pd.DataFrame, series: dict | None = None) -> dict:
+    """
+    Puntuación de _bt_analyze_signal para todas las barras a la vez.
+    Devuelve arrays de len(df): buy, sell, net, score_abs, direction
+    (1 BUY, -1 SELL, 0 NEUTRAL), price, atr, rsi, has_macd_cross.
+    """
+    s = series if series is not None else signal_series(df)
+    price = df["close"].to_numpy(dtype=np.float64)
+    n = len(price)
+    cur = {k: np.r_[np.nan, v[:-1]] for k, v in s.items()}
+    prv = {k: np.r_[np.nan, np.nan, v[:-2]][:n] for k, v in s.items()}
+    buy = np.zeros(n)
+    sell = np.zeros(n)
+
+    # EMAs (la 50 pesa doble)
+    for key in ("ema9", "ema20", "ema50", "ema50"):
+        above = price > cur[key]
+        buy += np.where(above, 0.5, 0.0)
+        sell += np.where(above, 0.0, 0.5)
+
+    # RSI
+    rsi = np.where(np.isnan(cur["rsi"]), 50.0, cur["rsi"])
+    buy += np.select([rsi < 30, rsi < 45], [1.5, 0.75], 0.0)
+    sell += np.select([rsi < 45, rsi > 70, rsi > 55], [0.0, 1.5, 0.75], 0.0)
+
+    # MACD
+    h, hp = cur["macd_hist"], prv["macd_hist"]
+    macd_up = (h > 0) & (hp <= 0)
+    macd_down = ~macd_up & (h < 0) & (hp >= 0)
+    buy += np.select([macd_up, macd_down, h > 0], [2.0, 0.0, 0.75], 0.0)
+    sell += np.select([macd_up, macd_down, h > 0], [0.0, 2.0, 0.0], 0.75)
+
+    # Estocástico
+    k, d = cur["stoch_k"], cur["stoch_d"]
+    kp, dp = prv["stoch_k"], prv["stoch_d"]
+    stoch_low = (k < 20) & (d < 20)
+    buy += np.where(stoch_low, 1.0, 0.0)
+    sell += np.where(~stoch_low & (k > 80) & (d > 80), 1.0, 0.0)
+    cross_up = (kp <= dp) & (k > d) & (k < 50)
+    buy += np.where(cross_up, 0.75, 0.0)
+    sell += np.where(~cross_up & (kp >= dp) & (k < d) & (k > 50), 0.75, 0.0)
+
+    # CCI
+    cci, ccp = cur["cci"], prv["cci"]
+    rebound = (cci < -100) & (cci > ccp)
+    buy += np.where(rebound, 1.0, 0.0)
+    sell += np.where(~rebound & (cci > 100) & (cci < ccp), 1.0, 0.0)
+
+    # Bollinger
+    bb_up = cur["bb_mid"] + 2 * cur["bb_std"]
+    bb_lo = cur["bb_mid"] - 2 * cur["bb_std"]
+    touch_lo = price <= bb_lo * 1.005
+    buy += np.where(touch_lo, 1.0, 0.0)
+    sell += np.where(~touch_lo & (price >= bb_up * 0.995), 1.0, 0.0)
+
+    # MFI
+    mv = cur["mfi"]
+    buy += np.where(mv < 20, 0.75, 0.0)
+    sell += np.where(~(mv < 20) & (mv > 80), 0.75, 0.0)
+
+    net = buy - sell
+    return {
+        "buy": buy, "sell": sell, "net": net, "score_abs": np.abs(net),
+        "direction": np.select([net > 0.5, net < -0.5], [1, -1], 0),
+        "price": price,
+        "atr": np.where(np.isnan(cur["atr"]), price * 0.002, cur["atr"]),
+        "rsi": rsi,
+        "has_macd_cross": macd_up | macd_down,
+    }
@@ -0,0 +1,75 @@
+# utils/single_flight.py
+# Coalescencia de peticiones idénticas concurrentes ("single-flight").
+#
+# Cuando sale una señal, decenas de usuarios pulsan el mismo botón a la vez
+# (🔄 Actualizar, 📊 Ver Gráfico TA, /ta BTC 4h...). Con SingleFlight la
+# primera llamada para una clave lanza el cálculo y las que llegan mientras
+# sigue en vuelo esperan ese mismo resultado en lugar de repetir descarga,
+# indicadores y render del gráfico.
+#
+# OJO: el resultado se comparte. Debe ser inmutable o el llamador debe copiar
+# lo que vaya a modificar (los gráficos se comparten como bytes, no BytesIO).
+
+import asyncio
+
+
+class SingleFlight:
+    """Grupo de llamadas {clave: Task en vuelo} con métricas."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict = {}
+        # Métricas
+        self.calls = 0
+        self.executions = 0
+        self.absorbed = 0
+        self.errors = 0
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        """
+        Ejecuta coro_fn(*args, **kwargs) una sola vez por clave en vuelo.
+        Las llamadas concurrentes con la misma clave reciben el mismo resultado
+        (o la misma excepción). Cancelar a un llamador no cancela el cálculo.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.absorbed += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key, task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "executions": self.executions,
+            "absorbed": self.absorbed,
+            "errors": self.errors,
+            "absorbed_pct": round(self.absorbed / self.calls * 100, 1) if self.calls else 0.0,
+        }
+
+
+# ─── REGISTRO GLOBAL ──────────────────────────────────────────────────────────
+_GROUPS: dict[str, SingleFlight] = {}
+
+
+def single_flight(name: str) -> SingleFlight:
+    """Grupo con nombre (uno por tipo de petición: 'sp_view', 'ta', 'graf'...)."""
+    group = _GROUPS.get(name)
+    if group is None:
+        group = _GROUPS[name] = SingleFlight(name)
+    return group
+
+
+def single_flight_stats() -> dict:
+    return {name: g.stats() for name, g in _GROUPS.items()}
@@ -0,0 +1,379 @@
+# utils/sp_batch.py
+# Puntuación SmartSignals en lote sobre un tensor NumPy (pares × velas × campos).
+#
+# SPSignalEngine.analyze() puntúa cada (symbol, tf) por separado y, con frames
+# de 120 filas, el coste está dominado por la sobrecarga de cada llamada
+# pandas. Aquí todos los pares con el mismo número de velas se apilan en un
+# único array y cada grupo del motor (EMAs, RSI, cruce MACD, cruce Stoch,
+# rebote CCI, toque BB, MFI, niveles ATR) se calcula vectorizado sobre el eje
+# de pares. Las medias exponenciales se resuelven como un producto por una
+# matriz de pesos (cacheada por longitud), sin bucle por vela.
+#
+# Devuelve exactamente los mismos dicts que SPSignalEngine.analyze(df) sin key
+# (indicadores calculados sobre la ventana de velas cerradas del frame).
+# finish_signal() es además la parte viva que usa el propio motor.
+
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+FIELDS = ("open_time", "open", "high", "low", "close", "volume")
+_OT, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME = range(len(FIELDS))
+
+MIN_BARS = 30   # Igual que analyze(): con menos velas el resultado es vacío
+
+
+# ─── MEDIAS EXPONENCIALES VECTORIZADAS ────────────────────────────────────────
+
+@lru_cache(maxsize=64)
+def _ewm_weights(n: int, alpha: float, adjust: bool) -> np.ndarray:
+    """
+    Matriz (n × n) tal que X @ W.T == X.ewm(alpha, adjust).mean() fila a fila.
+    adjust=False: semilla = primer valor (pandas ewm / EMA de SPSignalEngine).
+    adjust=True:  media ponderada normalizada (RMA de pandas_ta).
+    """
+    beta = 1.0 - alpha
+    lag = np.arange(n)[:, None] - np.arange(n)[None, :]
+    lower = lag >= 0
+    w = np.where(lower, beta ** np.where(lower, lag, 0), 0.0)
+    if adjust:
+        w /= w.sum(axis=1, keepdims=True)
+    else:
+        w[:, 1:] *= alpha
+    w.setflags(write=False)
+    return w
+
+
+def _ewm(x: np.ndarray, alpha: float, adjust: bool = False, tail: int | None = None) -> np.ndarray:
+    """EWM por filas de x (pares × n). tail=k devuelve solo las k últimas columnas."""
+    w = _ewm_weights(x.shape[1], alpha, adjust)
+    if tail is not None:
+        w = w[-tail:]
+    return x @ w.T
+
+
+def _ema_sma_seed(x: np.ndarray, length: int) -> np.ndarray:
+    """pandas_ta.ema: NaN hasta length-1, semilla SMA y luego EMA (adjust=False)."""
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] < length:
+        return out
+    seeded = x[:, length - 1:].copy()
+    seeded[:, 0] = x[:, :length].mean(axis=1)
+    out[:, length - 1:] = _ewm(seeded, 2.0 / (length + 1))
+    return out
+
+
+def _rma_tail(x: np.ndarray, length: int, tail: int) -> np.ndarray:
+    """RMA de pandas_ta (ewm alpha=1/length, adjust=True, min_periods=length), últimas `tail`."""
+    out = _ewm(x, 1.0 / length, adjust=True, tail=tail)
+    counts = np.arange(x.shape[1] - tail + 1, x.shape[1] + 1)
+    out[:, counts < length] = np.nan
+    return out
+
+
+def _safe_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / np.where(den != 0, den, 1.0), np.nan)
+
+
+# ─── INDICADORES ──────────────────────────────────────────────────────────────
+
+def _indicators(closed: np.ndarray) -> dict:
+    """Valores de la última vela cerrada (y la anterior, para cruces) por par."""
+    high, low = closed[:, :, _HIGH], closed[:, :, _LOW]
+    close, volume = closed[:, :, _CLOSE], closed[:, :, _VOLUME]
+    n = close.shape[1]
+    ind = {}
+
+    # EMAs (Series.ewm(span, adjust=False)): solo hace falta la última fila de pesos
+    for span in (9, 20, 50):
+        ind[f"ema{span}"] = _ewm(close, 2.0 / (span + 1), tail=1)[:, 0]
+
+    # RSI de Wilder
+    diff = np.diff(close, axis=1)
+    up = _rma_tail(np.maximum(diff, 0.0), 14, 1)[:, 0]
+    dn = _rma_tail(np.maximum(-diff, 0.0), 14, 1)[:, 0]
+    ind["rsi"] = 100.0 * _safe_div(up, up + dn)
+
+    # MACD 12/26/9: histograma actual y anterior
+    macd = _ema_sma_seed(close, 12) - _ema_sma_seed(close, 26)
+    hist = np.full((close.shape[0], 2), np.nan)
+    if n >= 26:
+        signal = _ema_sma_seed(macd[:, 25:], 9)
+        hist_full = macd[:, 25:] - signal
+        hist[:, -min(2, hist_full.shape[1]):] = hist_full[:, -2:]
+    ind["macd_hist"], ind["macd_hist_prev"] = hist[:, 1], hist[:, 0]
+
+    # Estocástico 14/3/3: %K y %D actuales y anteriores
+    k_d = np.full((close.shape[0], 2, 2), np.nan)
+    if n >= 14:
+        hh = sliding_window_view(high, 14, axis=1).max(axis=2)
+        ll = sliding_window_view(low, 14, axis=1).min(axis=2)
+        rng = hh - ll
+        raw = np.where(rng != 0, 100.0 * (close[:, 13:] - ll) / np.where(rng != 0, rng, 1.0), 0.0)
+        if raw.shape[1] >= 3:
+            k = sliding_window_view(raw, 3, axis=1).mean(axis=2)
+            k_d[:, :, 0] = np.pad(k[:, -2:], ((0, 0), (2 - min(2, k.shape[1]), 0)),
+                                  constant_values=np.nan)
+            if k.shape[1] >= 3:
+                d = sliding_window_view(k, 3, axis=1).mean(axis=2)
+                k_d[:, :, 1] = np.pad(d[:, -2:], ((0, 0), (2 - min(2, d.shape[1]), 0)),
+                                      constant_values=np.nan)
+    ind["stoch_k"], ind["stoch_d"] = k_d[:, 1, 0], k_d[:, 1, 1]
+    ind["stoch_k_prev"], ind["stoch_d_prev"] = k_d[:, 0, 0], k_d[:, 0, 1]
+
+    # CCI 20 (desviación media): solo las dos últimas ventanas
+    tp = (high + low + close) / 3.0
+    cci = np.full((close.shape[0], 2), np.nan)
+    for j, end in enumerate((n - 1, n)):
+        if end >= 20:
+            win = tp[:, end - 20:end]
+            mean = win.mean(axis=1)
+            mad = np.abs(win - mean[:, None]).mean(axis=1)
+            cci[:, j] = _safe_div(tp[:, end - 1] - mean, 0.015 * mad)
+    ind["cci"], ind["cci_prev"] = cci[:, 1], cci[:, 0]
+
+    # Bollinger 20 (rolling mean/std con ddof=1)
+    win = close[:, -20:]
+    ind["bb_mid"] = win.mean(axis=1)
+    ind["bb_std"] = win.std(axis=1, ddof=1)
+
+    # MFI 14
+    flow = tp * volume
+    tp_diff = np.diff(tp, axis=1)
+    pos = np.where(tp_diff > 0, flow[:, 1:], 0.0)[:, -14:].sum(axis=1)
+    neg = np.where(tp_diff < 0, flow[:, 1:], 0.0)[:, -14:].sum(axis=1)
+    ind["mfi"] = 100.0 * _safe_div(pos, pos + neg)
+
+    # ATR 14 (RMA del true range)
+    prev_close = close[:, :-1]
+    tr = np.maximum.reduce([high[:, 1:] - low[:, 1:],
+                            np.abs(high[:, 1:] - prev_close),
+                            np.abs(low[:, 1:] - prev_close)])
+    ind["atr"] = _rma_tail(tr, 14, 1)[:, 0]
+    return ind
+
+
+# ─── PUNTUACIÓN ───────────────────────────────────────────────────────────────
+# Dos etapas:
+#   1. parte cerrada (closed_batch): todo lo que solo depende de velas cerradas
+#      (RSI, cruce MACD, Stoch, rebote CCI, MFI) más los valores de EMA, bandas
+#      BB y ATR. Es lo que se puede memorizar por vela cerrada.
+#   2. parte viva (finish_signal): posición del precio frente a las EMAs, toque
+#      de banda, dirección, fuerza y niveles con el precio de la vela parcial.
+
+def _closed_scores(ind: dict, n_pairs: int) -> tuple:
+    buy = np.zeros(n_pairs)
+    sell = np.zeros(n_pairs)
+    flags = {}
+
+    # ── GRUPO 2: RSI ──
+    rsi = ind["rsi"]
+    flags["rsi_low"] = rsi < 30
+    flags["rsi_high"] = ~flags["rsi_low"] & ~(rsi < 45) & (rsi > 70)
+    buy += np.select([rsi < 30, rsi < 45], [1.5, 0.75], 0.0)
+    sell += np.select([rsi < 45, rsi > 70, rsi > 55], [0.0, 1.5, 0.75], 0.0)
+
+    # ── GRUPO 3: MACD ──
+    h, hp = ind["macd_hist"], ind["macd_hist_prev"]
+    flags["macd_up"] = (h > 0) & (hp <= 0)
+    flags["macd_down"] = ~flags["macd_up"] & (h < 0) & (hp >= 0)
+    buy += np.select([flags["macd_up"], flags["macd_down"], h > 0], [2.0, 0.0, 0.75], 0.0)
+    sell += np.select([flags["macd_up"], flags["macd_down"], h > 0], [0.0, 2.0, 0.0], 0.75)
+
+    # ── GRUPO 4: Estocástico ──
+    k, d = ind["stoch_k"], ind["stoch_d"]
+    kp, dp = ind["stoch_k_prev"], ind["stoch_d_prev"]
+    flags["stoch_low"] = (k < 20) & (d < 20)
+    flags["stoch_high"] = ~flags["stoch_low"] & (k > 80) & (d > 80)
+    buy += np.where(flags["stoch_low"], 1.0, 0.0)
+    sell += np.where(flags["stoch_high"], 1.0, 0.0)
+    cross_up = (kp <= dp) & (k > d) & (k < 50)
+    cross_down = ~cross_up & (kp >= dp) & (k < d) & (k > 50)
+    buy += np.where(cross_up, 0.75, 0.0)
+    sell += np.where(cross_down, 0.75, 0.0)
+
+    # ── GRUPO 5: CCI ──
+    cci, ccp = ind["cci"], ind["cci_prev"]
+    flags["cci_rebound"] = (cci < -100) & (cci > ccp)
+    buy += np.where(flags["cci_rebound"], 1.0, 0.0)
+    sell += np.where(~flags["cci_rebound"] & (cci > 100) & (cci < ccp), 1.0, 0.0)
+
+    # ── GRUPO 7: MFI ──
+    mfi = ind["mfi"]
+    buy += np.where(mfi < 20, 0.75, 0.0)
+    sell += np.where(~(mfi < 20) & (mfi > 80), 0.75, 0.0)
+    return buy, sell, flags
+
+
+def closed_batch(closed: np.ndarray) -> list[dict]:
+    """
+    closed: (pares × velas cerradas × FIELDS). Parte cerrada del análisis de
+    cada par: puntos, razones y los valores que necesita finish_signal().
+    """
+    closed = np.asarray(closed, dtype=np.float64)
+    ind = _indicators(closed)
+    buy, sell, flags = _closed_scores(ind, closed.shape[0])
+    bb_up = ind["bb_mid"] + 2 * ind["bb_std"]
+    bb_lo = ind["bb_mid"] - 2 * ind["bb_std"]
+    return [
+        {
+            'buy': float(buy[p]), 'sell': float(sell[p]),
+            'reasons': _reasons(p, flags, ind),
+            'rsi': float(ind["rsi"][p]),
+            'ema9': float(ind["ema9"][p]), 'ema20': float(ind["ema20"][p]),
+            'ema50': float(ind["ema50"][p]),
+            'bb_up': float(bb_up[p]), 'bb_lo': float(bb_lo[p]),
+            'atr': float(ind["atr"][p]),
+        }
+        for p in range(closed.shape[0])
+    ]
+
+
+def finish_signal(part: dict, price: float, open_time: int,
+                  min_score_signal: float, min_score_strong: float) -> dict:
+    """Parte viva: combina la parte cerrada con el precio de la vela parcial."""
+    buy, sell = part['buy'], part['sell']
+    reasons = list(part['reasons'])
+
+    # ── GRUPO 1: EMAs (EMA 50 con doble peso) ──
+    for span, weight in ((9, 0.5), (20, 0.5), (50, 1.0)):
+        if price > part[f'ema{span}']:
+            buy += weight
+        else:
+            sell += weight
+
+    # ── GRUPO 6: Bollinger ──
+    if price <= part['bb_lo'] * 1.005:
+        buy += 1.0
+        reasons.append("Precio en banda inferior BB")
+    elif price >= part['bb_up'] * 0.995:
+        sell += 1.0
+        reasons.append("Precio en banda superior BB")
+
+    net = buy - sell
+    score_abs = abs(net)
+    direction = 'NEUTRAL'
+    if net > 0.5:
+        direction = 'BUY'
+    elif net < -0.5:
+        direction = 'SELL'
+
+    if score_abs >= min_score_strong:
+        strength = 'STRONG'
+    elif score_abs >= min_score_signal:
+        strength = 'MODERATE'
+    else:
+        strength = 'WEAK'
+
+    # ── NIVELES ──
+    atr = part['atr'] if not np.isnan(part['atr']) else price * 0.002
+    if direction == 'BUY':
+        stop_loss, target1, target2 = price - atr * 1.5, price + atr * 2.0, price + atr * 3.5
+    elif direction == 'SELL':
+        stop_loss, target1, target2 = price + atr * 1.5, price - atr * 2.0, price - atr * 3.5
+    else:
+        stop_loss, target1, target2 = price - atr, price + atr, price + atr * 2
+
+    return {
+        'direction': direction,
+        'score':     round(net, 2),
+        'score_buy': round(buy, 2),
+        'score_sell': round(sell, 2),
+        'score_abs': round(score_abs, 2),
+        'strength':  strength,
+        'price':     round(price, 8),
+        'stop':      round(stop_loss, 8),
+        'target1':   round(target1, 8),
+        'target2':   round(target2, 8),
+        'atr':       round(atr, 8),
+        'rsi':       round(part['rsi'], 2),
+        'reasons':   reasons[:4],          # Máximo 4 razones
+        'open_time': open_time,
+    }
+
+
+def score_batch(ohlcv: np.ndarray, min_score_signal: float, min_score_strong: float) -> list[dict]:
+    """
+    ohlcv: (pares × velas × FIELDS); la última vela de cada par es la parcial.
+    Devuelve un dict de señal por par, en el mismo orden.
+    """
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    n_pairs, n_bars = ohlcv.shape[:2]
+    if n_bars < MIN_BARS:
+        return [_empty(float(ohlcv[p, -1, _CLOSE]) if n_bars else 0.0) for p in range(n_pairs)]
+    parts = closed_batch(ohlcv[:, :-1, :])
+    return [
+        finish_signal(part, float(ohlcv[p, -1, _CLOSE]), int(ohlcv[p, -1, _OT]),
+                      min_score_signal, min_score_strong)
+        for p, part in enumerate(parts)
+    ]
+
+
+def _reasons(p: int, flags: dict, ind: dict) -> list:
+    """Razones de la parte cerrada, con los textos y el orden de SPSignalEngine.analyze()."""
+    reasons = []
+    if flags["rsi_low"][p]:
+        reasons.append(f"RSI sobrevendido ({ind['rsi'][p]:.1f})")
+    elif flags["rsi_high"][p]:
+        reasons.append(f"RSI sobrecomprado ({ind['rsi'][p]:.1f})")
+    if flags["macd_up"][p]:
+        reasons.append("MACD cruzó al alza")
+    elif flags["macd_down"][p]:
+        reasons.append("MACD cruzó a la baja")
+    if flags["stoch_low"][p]:
+        reasons.append(f"Estocástico sobrevendido ({ind['stoch_k'][p]:.1f})")
+    elif flags["stoch_high"][p]:
+        reasons.append(f"Estocástico sobrecomprado ({ind['stoch_k'][p]:.1f})")
+    if flags["cci_rebound"][p]:
+        reasons.append(f"CCI en zona de rebote ({ind['cci'][p]:.0f})")
+    return reasons
+
+
+def _empty(price: float) -> dict:
+    return {
+        'direction': 'NEUTRAL', 'score': 0, 'score_buy': 0,
+        'score_sell': 0, 'score_abs': 0, 'strength': 'WEAK',
+        'price': price, 'stop': 0, 'target1': 0, 'target2': 0,
+        'atr': 0, 'rsi': 50, 'reasons': [], 'open_time': 0,
+    }
+
+
+# ─── APILADO DE FRAMES ────────────────────────────────────────────────────────
+
+def stack_frames(frames: dict) -> list[tuple[list, np.ndarray]]:
+    """
+    Agrupa {clave: DataFrame} por número de velas y apila cada grupo en un
+    tensor (pares × velas × FIELDS). Devuelve [(claves, tensor), ...].
+    """
+    groups: dict[int, list] = {}
+    for key, df in frames.items():
+        if df is not None and len(df) >= MIN_BARS:
+            groups.setdefault(len(df), []).append((key, df))
+    stacked = []
+    for n_bars, items in groups.items():
+        # Columna a columna: df[list(FIELDS)] copia el frame entero en cada par
+        tensor = np.empty((len(items), n_bars, len(FIELDS)))
+        for i, (_, df) in enumerate(items):
+            for j, col in enumerate(FIELDS):
+                tensor[i, :, j] = df[col].to_numpy()
+        stacked.append(([key for key, _ in items], tensor))
+    return stacked
+
+
+def closed_frames(frames: dict) -> dict:
+    """{clave: DataFrame} → {clave: parte cerrada} (la última fila es la vela parcial)."""
+    parts = {}
+    for keys, tensor in stack_frames(frames):
+        parts.update(zip(keys, closed_batch(tensor[:, :-1, :])))
+    return parts
+
+
+def score_frames(frames: dict, min_score_signal: float, min_score_strong: float) -> dict:
+    """{clave: DataFrame} → {clave: señal} para todos los frames apilables."""
+    signals = {}
+    for keys, tensor in stack_frames(frames):
+        for key, sig in zip(keys, score_batch(tensor, min_score_signal, min_score_strong)):
+            signals[key] = sig
+    return signals
@@ -7,6 +7,10 @@ import os
 import time
 from datetime import datetime
 from core.config import DATA_DIR
+from utils.write_behind import schedule_json_write
+from utils.json_cache import load_json_cached, load_json_readonly
+from utils.subs_index import SubscriptionIndex
+from utils.candle_scheduler import exchange_clock
 
 # ─── PATHS ────────────────────────────────────────────────────────────────────
 SP_SUBS_PATH         = os.path.join(DATA_DIR, "sp_subs.json")
@@ -50,28 +54,49 @@ SP_TIMEFRAMES = {
 # ─── HELPERS JSON ─────────────────────────────────────────────────────────────
 
 def _load(path: str) -> dict:
-    if not os.path.exists(path):
+    # Caché por mtime/tamaño (incluye escrituras diferidas pendientes); copia mutable
+    try:
+        return load_json_cached(path)
+    except Exception:
         return {}
+
+def _load_ro(path: str) -> dict:
+    # Objeto compartido de la caché: solo lectura
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json_readonly(path)
     except Exception:
         return {}
 
 def _save(path: str, data: dict) -> None:
+    # Write-behind: el hilo de fondo hace el tmp + os.replace
     try:
-        tmp = f"{path}.tmp"
-        with open(tmp, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        os.replace(tmp, path)
+        schedule_json_write(path, data, indent=2, ensure_ascii=False)
     except Exception as e:
         print(f"[SP Manager] Error guardando {path}: {e}")
 
 # ─── SUSCRIPCIONES ────────────────────────────────────────────────────────────
 
+def _extract_sp_pairs(subs: dict):
+    for uid, coins in subs.items():
+        if not isinstance(coins, dict):
+            continue
+        for sym, tfs in coins.items():
+            if isinstance(tfs, list):
+                for tf in tfs:
+                    yield (sym, tf), uid
+
+# Índice invertido (symbol, tf) -> {uid}
+_SP_INDEX = SubscriptionIndex(_extract_sp_pairs)
+
+def _load_subs() -> dict:
+    """Carga sp_subs.json y mantiene el índice invertido al día."""
+    subs = _load_ro(SP_SUBS_PATH)
+    _SP_INDEX.sync(subs)
+    return subs
+
 def is_sp_subscribed(user_id, symbol: str, timeframe: str) -> bool:
     """Verifica si el usuario está suscrito a symbol+timeframe."""
-    subs = _load(SP_SUBS_PATH)
+    subs = _load_ro(SP_SUBS_PATH)
     uid = str(user_id)
     return (
         uid in subs and
@@ -84,7 +109,8 @@ def toggle_sp_subscription(user_id, symbol: str, timeframe: str) -> bool:
     """
     Activa/desactiva la suscripción. Devuelve True si quedó activada.
     """
-    subs = _load(SP_SUBS_PATH)
+    _load_subs()                 # Índice al día
+    subs = _load(SP_SUBS_PATH)   # Copia que se modifica y se guarda
     uid = str(user_id)
 
     if uid not in subs:
@@ -99,34 +125,26 @@ def toggle_sp_subscription(user_id, symbol: str, timeframe: str) -> bool:
             del subs[uid][symbol]
         if not subs[uid]:
             del subs[uid]
+        _SP_INDEX.discard((symbol, timeframe), uid)
     else:
         subs[uid][symbol].append(timeframe)
         result = True
+        _SP_INDEX.add((symbol, timeframe), uid)
 
     _save(SP_SUBS_PATH, subs)
     return result
 
 def get_sp_subscribers(symbol: str, timeframe: str) -> list:
-    """Lista de user_ids suscritos a un par/TF concreto."""
-    subs = _load(SP_SUBS_PATH)
-    result = []
-    for uid, coins in subs.items():
-        if symbol in coins and isinstance(coins[symbol], list) and timeframe in coins[symbol]:
-            result.append(uid)
-    return result
+    """Lista de user_ids suscritos a un par/TF concreto (O(1) vía índice)."""
+    _load_subs()
+    return list(_SP_INDEX.get((symbol, timeframe)))
 
 def get_active_sp_pairs() -> list:
     """
     Devuelve lista de tuplas (symbol, timeframe) que tienen al menos 1 suscriptor.
     """
-    subs = _load(SP_SUBS_PATH)
-    pairs = set()
-    for uid, coins in subs.items():
-        for sym, tfs in coins.items():
-            if isinstance(tfs, list):
-                for tf in tfs:
-                    pairs.add((sym, tf))
-    return list(pairs)
+    _load_subs()
+    return _SP_INDEX.keys()
 
 def get_user_sp_subscriptions(user_id) -> dict:
     """
@@ -148,9 +166,9 @@ def count_user_sp_subs(user_id) -> int:
 
 def get_sp_state(symbol: str, timeframe: str) -> dict:
     """Estado actual del par (última señal, cooldown, etc.)."""
-    state = _load(SP_STATE_PATH)
+    state = _load_ro(SP_STATE_PATH)
     key = f"{symbol}_{timeframe}"
-    return state.get(key, {})
+    return dict(state.get(key, {}))
 
 def update_sp_state(symbol: str, timeframe: str, signal_data: dict) -> None:
     """Guarda el estado tras emitir una señal."""
@@ -230,14 +248,20 @@ def record_signal_history(symbol: str, timeframe: str, signal_data: dict) -> Non
 
 def get_signal_history(symbol: str, timeframe: str, limit: int = 10) -> list:
     """Últimas N señales registradas para un par."""
-    hist = _load(SP_HIST_PATH)
+    hist = _load_ro(SP_HIST_PATH)
     key = f"{symbol}_{timeframe}"
-    return hist.get(key, [])[:limit]
+    return [dict(e) for e in hist.get(key, [])[:limit]]
 
 # ─── UTILIDADES ───────────────────────────────────────────────────────────────
 
 # ─── QUICK-NOTIFY (señal inmediata al suscribirse) ────────────────────────────
 
+# fn(symbol, timeframe) tras cada alta en la cola: el loop despierta el par en el acto
+_quick_notify_listeners = []
+
+def add_quick_notify_listener(fn) -> None:
+    _quick_notify_listeners.append(fn)
+
 def queue_quick_notify(user_id, symbol: str, timeframe: str) -> None:
     """
     Marca que el usuario quiere recibir la señal actual de symbol/tf
@@ -251,6 +275,22 @@ def queue_quick_notify(user_id, symbol: str, timeframe: str) -> None:
     if uid not in data[key]:
         data[key].append(uid)
     _save(SP_QUICK_NOTIFY_PATH, data)
+    for fn in _quick_notify_listeners:
+        try:
+            fn(symbol, timeframe)
+        except Exception as e:
+            print(f"[SP Manager] Error avisando quick-notify {key}: {e}")
+
+
+def get_quick_notify_pairs() -> list:
+    """Pares (symbol, timeframe) con usuarios esperando la señal inmediata."""
+    data = _load_ro(SP_QUICK_NOTIFY_PATH)
+    return [tuple(key.rsplit('_', 1)) for key, users in data.items() if users and '_' in key]
+
+
+def has_quick_notify(symbol: str, timeframe: str) -> bool:
+    """True si hay usuarios esperando la señal inmediata de symbol/tf (sin vaciar la cola)."""
+    return bool(_load_ro(SP_QUICK_NOTIFY_PATH).get(f"{symbol}_{timeframe}"))
 
 
 def pop_quick_notify(symbol: str, timeframe: str) -> list:
@@ -279,9 +319,10 @@ def estimate_time_to_candle_close(open_time_ms: int, interval: str) -> int:
     """
     Calcula segundos restantes hasta que cierra la vela actual.
     open_time_ms: timestamp de apertura de la vela en milisegundos.
+    Usa la hora de Binance (utils/candle_scheduler.py), no la del servidor.
     """
     interval_s = SP_TIMEFRAMES.get(interval, {}).get('interval_s', 300)
-    now_ms = int(time.time() * 1000)
+    now_ms = exchange_clock.now_ms()
     elapsed_s = (now_ms - open_time_ms) / 1000
     remaining = interval_s - elapsed_s
     return max(0, int(remaining))
\ No newline at end of file
@@ -16,6 +16,7 @@ import time
 import logging
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 try:
     import pandas_ta as pta
@@ -24,6 +25,8 @@ except ImportError:
 
 from core.config import DATA_DIR, ADMIN_CHAT_IDS
 from utils.file_manager import check_feature_access
+from utils.indicator_stream import SignalIndicators
+from utils.signal_series import signal_scores
 
 logger = logging.getLogger(__name__)
 
@@ -854,109 +857,100 @@ def save_user_strategy_file(user_id: int, data: dict) -> str | None:
 # NOTA: Motor de señales inlinado aquí (sin importar sp_loop) para
 # evitar la importación circular sp_loop → sss_manager → sp_loop.
 
-def _bt_download_candles(symbol: str, interval: str, limit: int = 500):
-    """Descarga velas de Binance para el backtest."""
-    import requests as _req
-    endpoints = [
-        "https://api.binance.com/api/v3/klines",
-        "https://api.binance.us/api/v3/klines",
-    ]
-    for url in endpoints:
+_BT_MIN_BARS = 60   # Velas previas antes de la primera barra evaluada
+_BT_MAX_FWD  = 80   # Velas máximas por operación simulada
+
+def _bt_download_candles(symbol: str, interval: str, limit: int = 500, start=None, end=None):
+    """
+    Descarga velas de Binance para el backtest desde un hilo del executor.
+    Lo normal es que el handler las pase ya descargadas (ver run_strategy_backtest).
+    Con start/end el rango [start, end) sale del archivo local de velas
+    (utils/candle_archive.py), que se completa antes si le falta algo: el
+    backtest es reproducible y no depende del límite de 1000 velas por petición.
+    """
+    if start is not None or end is not None:
+        from utils.candle_archive import candle_archive, to_ms
         try:
-            r = _req.get(url, params={"symbol": symbol, "interval": interval, "limit": limit}, timeout=10)
-            if r.status_code != 200:
-                continue
-            data = r.json()
-            if not isinstance(data, list) or len(data) < 50:
-                continue
-            df = pd.DataFrame(data, columns=[
-                "open_time","open","high","low","close","volume",
-                "close_time","q_vol","trades","tb_base","tb_quote","ignore"
-            ])
-            for col in ["open","high","low","close","volume"]:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            df['time'] = pd.to_datetime(df['open_time'], unit='ms')
-            df.set_index('time', inplace=True)
-            return df
+            meta = candle_archive.meta(symbol, interval) or {}
+            from_ms, until_ms = to_ms(start), to_ms(end)
+            if (not meta.get("rows") or (from_ms is not None and from_ms < meta["first_open_time"])
+                    or until_ms is None or until_ms > meta["last_open_time"]):
+                candle_archive.download_blocking(symbol, interval, start, end)
+            return candle_archive.load(symbol, interval, start, end)
         except Exception as e:
-            logger.debug(f"[BT] Endpoint falló: {e}")
-    return None
+            logger.debug(f"[BT] Archivo de velas falló: {e}")
+            return None
+
+    from utils.market_data import get_klines_blocking
+    try:
+        return get_klines_blocking(symbol, interval, limit, timeout=10, min_rows=50)
+    except Exception as e:
+        logger.debug(f"[BT] Descarga falló: {e}")
+        return None
 
 
-def _bt_analyze_signal(df_c: pd.DataFrame, price: float) -> dict:
+def _bt_analyze_signal(df_c: pd.DataFrame, price: float, ind: SignalIndicators | None = None) -> dict:
     """
     Motor de señales inlinado — lógica idéntica a SPSignalEngine.analyze().
     Evita importación circular. Usa velas cerradas df_c.
+    ind: indicadores incrementales ya avanzados hasta la última vela de df_c
+    (el backtest los avanza una vela por barra); si falta, se calculan de df_c.
     """
     buy_score = sell_score = 0.0
     reasons   = []
     rsi_val   = 50.0
     has_macd_cross = False
 
+    if ind is None:
+        ind = SignalIndicators.from_frame(df_c)
+    curr, prev = ind.last, ind.prev or ind.last
+
     try:
         # EMAs
         for span in [9, 20, 50]:
-            ema = df_c['close'].ewm(span=span, adjust=False).mean().iloc[-1]
-            if price > ema: buy_score  += 0.5
-            else:           sell_score += 0.5
-        ema50 = df_c['close'].ewm(span=50, adjust=False).mean().iloc[-1]
-        if price > ema50: buy_score  += 0.5
-        else:             sell_score += 0.5
+            if price > curr[f'ema{span}']: buy_score  += 0.5
+            else:                          sell_score += 0.5
+        if price > curr['ema50']: buy_score  += 0.5
+        else:                     sell_score += 0.5
 
         # RSI
-        if pta:
-            rsi_s = pta.rsi(df_c['close'], length=14)
-            if rsi_s is not None:
-                rsi_val = float(rsi_s.iloc[-1])
+        if not np.isnan(curr['rsi']):
+            rsi_val = curr['rsi']
         if rsi_val < 30:   buy_score  += 1.5; reasons.append(f"RSI sobrevendido ({rsi_val:.1f})")
         elif rsi_val < 45: buy_score  += 0.75
         elif rsi_val > 70: sell_score += 1.5; reasons.append(f"RSI sobrecomprado ({rsi_val:.1f})")
         elif rsi_val > 55: sell_score += 0.75
 
         # MACD
-        if pta:
-            macd_df = pta.macd(df_c['close'], fast=12, slow=26, signal=9)
-            if macd_df is not None and len(macd_df.columns) >= 2:
-                hist = macd_df.iloc[:, 1]
-                h = float(hist.iloc[-1]); hp = float(hist.iloc[-2]) if len(hist) > 1 else 0.0
-                if h > 0 and hp <= 0:   buy_score += 2.0; reasons.append("MACD cruzó al alza"); has_macd_cross = True
-                elif h < 0 and hp >= 0: sell_score += 2.0; reasons.append("MACD cruzó a la baja"); has_macd_cross = True
-                elif h > 0: buy_score  += 0.75
-                else:       sell_score += 0.75
+        h = curr['macd_hist']; hp = prev['macd_hist']
+        if h > 0 and hp <= 0:   buy_score += 2.0; reasons.append("MACD cruzó al alza"); has_macd_cross = True
+        elif h < 0 and hp >= 0: sell_score += 2.0; reasons.append("MACD cruzó a la baja"); has_macd_cross = True
+        elif h > 0: buy_score  += 0.75
+        else:       sell_score += 0.75
 
         # Stochastic
-        if pta:
-            stoch = pta.stoch(df_c['high'], df_c['low'], df_c['close'], k=14, d=3, smooth_k=3)
-            if stoch is not None and len(stoch.columns) >= 2:
-                k = float(stoch.iloc[-1, 0]); d = float(stoch.iloc[-1, 1])
-                kp = float(stoch.iloc[-2, 0]) if len(stoch)>1 else k
-                dp = float(stoch.iloc[-2, 1]) if len(stoch)>1 else d
-                if k < 20 and d < 20:   buy_score  += 1.0; reasons.append(f"Estocástico sobrevendido ({k:.1f})")
-                elif k > 80 and d > 80: sell_score += 1.0; reasons.append(f"Estocástico sobrecomprado ({k:.1f})")
-                if kp <= dp and k > d and k < 50:   buy_score  += 0.75
-                elif kp >= dp and k < d and k > 50: sell_score += 0.75
+        k = curr['stoch_k']; d = curr['stoch_d']
+        kp = prev['stoch_k']; dp = prev['stoch_d']
+        if k < 20 and d < 20:   buy_score  += 1.0; reasons.append(f"Estocástico sobrevendido ({k:.1f})")
+        elif k > 80 and d > 80: sell_score += 1.0; reasons.append(f"Estocástico sobrecomprado ({k:.1f})")
+        if kp <= dp and k > d and k < 50:   buy_score  += 0.75
+        elif kp >= dp and k < d and k > 50: sell_score += 0.75
 
         # CCI
-        if pta:
-            cci_s = pta.cci(df_c['high'], df_c['low'], df_c['close'], length=20)
-            if cci_s is not None:
-                cci = float(cci_s.iloc[-1]); ccp = float(cci_s.iloc[-2]) if len(cci_s)>1 else 0
-                if cci < -100 and cci > ccp: buy_score  += 1.0; reasons.append(f"CCI rebote ({cci:.0f})")
-                elif cci > 100 and cci < ccp: sell_score += 1.0
+        cci = curr['cci']; ccp = prev['cci']
+        if cci < -100 and cci > ccp: buy_score  += 1.0; reasons.append(f"CCI rebote ({cci:.0f})")
+        elif cci > 100 and cci < ccp: sell_score += 1.0
 
         # Bollinger Bands
-        bb_up = df_c['close'].rolling(20).mean() + 2*df_c['close'].rolling(20).std()
-        bb_lo = df_c['close'].rolling(20).mean() - 2*df_c['close'].rolling(20).std()
-        if price <= float(bb_lo.iloc[-1]) * 1.005: buy_score  += 1.0; reasons.append("Banda inferior BB")
-        elif price >= float(bb_up.iloc[-1]) * 0.995: sell_score += 1.0; reasons.append("Banda superior BB")
+        bb_up = curr['bb_mid'] + 2*curr['bb_std']
+        bb_lo = curr['bb_mid'] - 2*curr['bb_std']
+        if price <= bb_lo * 1.005: buy_score  += 1.0; reasons.append("Banda inferior BB")
+        elif price >= bb_up * 0.995: sell_score += 1.0; reasons.append("Banda superior BB")
 
         # MFI
-        if pta:
-            mfi = pta.mfi(df_c['high'], df_c['low'], df_c['close'], df_c['volume'], length=14)
-            if mfi is not None:
-                mv = float(mfi.iloc[-1])
-                if mv < 20: buy_score  += 0.75
-                elif mv > 80: sell_score += 0.75
+        mv = curr['mfi']
+        if mv < 20: buy_score  += 0.75
+        elif mv > 80: sell_score += 0.75
 
     except Exception as e:
         logger.error(f"[BT] Error en _bt_analyze_signal: {e}")
@@ -968,14 +962,7 @@ def _bt_analyze_signal(df_c: pd.DataFrame, price: float) -> dict:
     elif net < -0.5: direction = 'SELL'
 
     # ATR
-    atr = price * 0.002
-    try:
-        if pta:
-            atr_s = pta.atr(df_c['high'], df_c['low'], df_c['close'], length=14)
-            if atr_s is not None and not pd.isna(atr_s.iloc[-1]):
-                atr = float(atr_s.iloc[-1])
-    except Exception:
-        pass
+    atr = curr['atr'] if not np.isnan(curr['atr']) else price * 0.002
 
     return {
         'direction':       direction,
@@ -1170,29 +1157,16 @@ def _bt_sim_trade(
     }
 
 
-def run_strategy_backtest(
-    strategy: dict,
-    symbol: str = "BTCUSDT",
-    candle_limit: int = 500,
-) -> dict:
+def _bt_run_bar_by_bar(strategy: dict, df: pd.DataFrame) -> tuple[list, dict]:
     """
-    Backtest de la estrategia sobre velas históricas de Binance.
-    Motor de señales inlinado — sin importar sp_loop (evita circular).
+    Motor de referencia barra a barra (el original): recalcula filtros e
+    indicadores extendidos sobre el slice creciente en cada barra, O(n²).
+    Solo lo usa scripts/bench_sss_backtest.py para comprobar que el motor
+    vectorizado da los mismos resultados.
     """
-    tfs = strategy.get('timeframes', ['5m'])
-    tf  = tfs[0] if tfs else '5m'
-
-    df = _bt_download_candles(symbol, tf, candle_limit)
-    if df is None or len(df) < 80:
-        return {
-            'error': f'No se pudieron descargar velas de {symbol}/{tf}.',
-            'trades': [], 'stats': {}, 'symbol': symbol, 'tf': tf,
-            'diagnostics': {}
-        }
-
     n_total     = len(df)
-    min_bars    = 60
-    max_fwd     = 80
+    min_bars    = _BT_MIN_BARS
+    max_fwd     = _BT_MAX_FWD
     trades      = []
     next_bar    = min_bars
     n_neutral   = 0
@@ -1200,9 +1174,16 @@ def run_strategy_backtest(
     n_no_levels = 0
     rej_counts  = {}
 
-    logger.info(f"[BT] Iniciando backtest '{strategy.get('id')}' en {symbol}/{tf}, {n_total} velas")
+    # Indicadores del motor de señales: una vela por barra en vez de recalcular
+    # todo el slice (ind siempre llega hasta la vela bar_idx - 1)
+    ind   = SignalIndicators()
+    ohlcv = [df[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close', 'volume')]
+    for i in range(min_bars - 1):
+        ind.update(ohlcv[0][i], ohlcv[1][i], ohlcv[2][i], ohlcv[3][i])
 
     for bar_idx in range(min_bars, n_total - 5):
+        i = bar_idx - 1
+        ind.update(ohlcv[0][i], ohlcv[1][i], ohlcv[2][i], ohlcv[3][i])
         if bar_idx < next_bar:
             continue
 
@@ -1211,7 +1192,7 @@ def run_strategy_backtest(
         price    = float(df_slice.iloc[-1]['close'])
 
         try:
-            sig = _bt_analyze_signal(df_c, price)
+            sig = _bt_analyze_signal(df_c, price, ind)
         except Exception as e:
             logger.warning(f"[BT] analyze error bar {bar_idx}: {e}")
             continue
@@ -1259,6 +1240,295 @@ def run_strategy_backtest(
 
         next_bar = (trade['close_bar'] + 1) if trade.get('close_bar') else bar_idx + 5
 
+    return trades, {
+        'n_neutral': n_neutral, 'n_rejected': n_rejected,
+        'n_no_levels': n_no_levels, 'rej_counts': rej_counts,
+    }
+
+
+def _bt_scan_trade(
+    high: np.ndarray,
+    low: np.ndarray,
+    entry_bar: int,
+    entry_price: float,
+    sl: float,
+    tp1: float,
+    tp2: float,
+    tp3: float,
+    direction: str,
+    max_bars: int = _BT_MAX_FWD,
+) -> dict:
+    """
+    Igual que _bt_sim_trade pero sobre arrays: busca la primera vela que toca
+    SL, TP3, TP2 y TP1 en la ventana y resuelve el orden de prioridad
+    (en la misma vela: SL > TP3 > TP2 > cierre en TP1 tras ≥5 velas).
+    """
+    is_long = direction == 'BUY'
+    start   = entry_bar + 1
+    hi      = high[start:min(entry_bar + max_bars + 1, len(high))]
+    lo      = low[start:start + len(hi)]
+    m       = len(hi)
+
+    def _first(mask: np.ndarray) -> int:
+        hits = np.flatnonzero(mask)
+        return int(hits[0]) if len(hits) else m
+
+    if is_long:
+        k_sl, k_tp3, k_tp2, k_tp1 = _first(lo <= sl), _first(hi >= tp3), _first(hi >= tp2), _first(hi >= tp1)
+    else:
+        k_sl, k_tp3, k_tp2, k_tp1 = _first(hi >= sl), _first(lo <= tp3), _first(lo <= tp2), _first(lo <= tp1)
+
+    # TP1 cierra en la primera vela con TP1 ya tocado y ≥5 velas desde la entrada
+    k_tp1_close = max(k_tp1, 4) if k_tp1 < m else m
+    k = min(k_sl, k_tp3, k_tp2, k_tp1_close)
+
+    close_bar = start + k if k < m else None
+    if k < m and k == k_sl:
+        result  = 'SL';  pnl_pct = abs((sl - entry_price) / entry_price) * -100
+    elif k < m and k == k_tp3:
+        result  = 'TP3'; pnl_pct = abs((tp3 - entry_price) / entry_price) * 100
+    elif k < m and k == k_tp2:
+        result  = 'TP2'; pnl_pct = abs((tp2 - entry_price) / entry_price) * 100
+    elif k_tp1 < m:
+        result  = 'TP1'; pnl_pct = abs((tp1 - entry_price) / entry_price) * 100
+    else:
+        result  = 'OPEN'; pnl_pct = 0.0
+
+    return {
+        'result': result, 'pnl_pct': round(pnl_pct, 3),
+        'entry_bar': entry_bar, 'close_bar': close_bar,
+        'direction': direction, 'entry_price': entry_price,
+        'sl': sl, 'tp1': tp1, 'tp2': tp2, 'tp3': tp3,
+    }
+
+
+def _bt_filter_codes(strategy: dict, sc: dict, df_ext: pd.DataFrame) -> tuple[np.ndarray, list]:
+    """
+    _bt_apply_filter para todas las barras a la vez, con las columnas de la
+    vela cerrada anterior (b-1). Devuelve (codes, labels): codes[b] = -2 si la
+    señal es NEUTRAL, -1 si pasa el filtro y k ≥ 0 si la rechaza el motivo
+    labels[k] (los motivos RSI son plantillas que se completan con el RSI).
+    """
+    ef      = strategy.get('entry_filter', {})
+    n       = len(sc['net'])
+    is_long = sc['direction'] == 1
+    codes   = np.where(sc['direction'] == 0, -2, -1)
+    labels  = []
+
+    def _reject(mask: np.ndarray, label: str) -> None:
+        labels.append(label)
+        codes[mask & (codes == -1)] = len(labels) - 1
+
+    def _col(col, default=np.nan) -> np.ndarray:
+        if col not in df_ext.columns:
+            return np.full(n, default, dtype=np.float64)
+        try:
+            v = pd.to_numeric(df_ext[col], errors='coerce').to_numpy(dtype=np.float64)
+        except Exception:
+            return np.full(n, default, dtype=np.float64)
+        v = np.r_[np.nan, v[:-1]]
+        return np.where(np.isnan(v), default, v)
+
+    # ── Score mínimo ──────────────────────────────────────────────────────────
+    min_score = ef.get('min_score', 4.5)
+    _reject(sc['score_abs'] < min_score, f"score<{min_score:.1f}")
+
+    # ── Supertrend (0 = no calculado → omitir filtro) ─────────────────────────
+    if ef.get('supertrend_align'):
+        st_dir = _col('supertrend_direction', 0)
+        _reject((st_dir != 0) & is_long & (st_dir != 1), "ST_bajista_compra")
+        _reject((st_dir != 0) & ~is_long & (st_dir != -1), "ST_alcista_venta")
+
+    # ── ASH ───────────────────────────────────────────────────────────────────
+    if ef.get('ash_signal'):
+        bulls, bears = _col('ash_bulls'), _col('ash_bears')
+        ok = ~(np.isnan(bulls) | np.isnan(bears))
+        _reject(ok & is_long & (bulls <= bears), "ASH_no_compra")
+        _reject(ok & ~is_long & (bears <= bulls), "ASH_no_venta")
+
+    # ── ADX ───────────────────────────────────────────────────────────────────
+    adx_min = ef.get('adx_min', 0)
+    if adx_min > 0:
+        _reject(_col('sss_adx') < adx_min, f"ADX<{adx_min}")
+
+    # ── DI confirmation ───────────────────────────────────────────────────────
+    if ef.get('adx_di_confirm'):
+        pdi, mdi = _col('sss_plus_di'), _col('sss_minus_di')
+        ok = ~(np.isnan(pdi) | np.isnan(mdi))
+        _reject(ok & is_long & (pdi <= mdi), "DI+<=DI-")
+        _reject(ok & ~is_long & (mdi <= pdi), "DI-<=DI+")
+
+    # ── Volume spike (media de las 20 últimas, vela en curso incluida) ────────
+    if ef.get('volume_spike') and n >= 20:
+        mult    = ef.get('volume_spike_mult', 1.5)
+        vol     = df_ext['volume'].to_numpy(dtype=np.float64)
+        vol_avg = np.full(n, np.nan)
+        vol_avg[19:] = sliding_window_view(vol, 20).mean(axis=1)
+        vol_cur = np.r_[np.nan, vol[:-1]]
+        _reject((vol_avg > 0) & (vol_cur < vol_avg * mult), f"vol<{mult}x")
+
+    # ── MACD cross ────────────────────────────────────────────────────────────
+    if ef.get('macd_cross_required'):
+        _reject(~sc['has_macd_cross'], "sin_MACD_cross")
+
+    # ── RSI extremes ──────────────────────────────────────────────────────────
+    rsi = np.round(sc['rsi'], 2)
+    rl  = ef.get('rsi_oversold_buy', 100)
+    if rl < 100:
+        _reject(is_long & (rsi > rl), f"RSI{{:.0f}}>{rl}")
+    rl  = ef.get('rsi_overbought_sell', 0)
+    if rl > 0:
+        _reject(~is_long & (rsi < rl), f"RSI{{:.0f}}<{rl}")
+
+    return codes, labels
+
+
+def _bt_reason_counts(codes: np.ndarray, labels: list, rsi: np.ndarray, evaluated: np.ndarray) -> dict:
+    """{motivo: nº de barras evaluadas rechazadas}, en orden de primera aparición."""
+    idx    = np.flatnonzero(evaluated & (codes >= 0))
+    counts = {}
+    first  = {}
+    for code in np.unique(codes[idx]):
+        sel  = idx[codes[idx] == code]
+        tmpl = labels[code]
+        if '{' in tmpl:
+            vals   = np.round(rsi[sel], 2)
+            groups = [(tmpl.format(v), sel[vals == v]) for v in np.unique(vals)]
+        else:
+            groups = [(tmpl, sel)]
+        for label, bars in groups:
+            counts[label] = counts.get(label, 0) + len(bars)
+            first[label]  = min(first.get(label, bars[0]), bars[0])
+    return {label: counts[label] for label in sorted(counts, key=first.get)}
+
+
+def _bt_sig_at(sc: dict, bar_idx: int) -> dict:
+    """Señal de la barra bar_idx con los mismos campos que _bt_analyze_signal (sin reasons)."""
+    net       = float(sc['net'][bar_idx])
+    score_abs = abs(net)
+    direction = {1: 'BUY', -1: 'SELL'}.get(int(sc['direction'][bar_idx]), 'NEUTRAL')
+    return {
+        'direction':       direction,
+        'score':           round(net, 2),
+        'score_buy':       round(float(sc['buy'][bar_idx]), 2),
+        'score_sell':      round(float(sc['sell'][bar_idx]), 2),
+        'score_abs':       round(score_abs, 2),
+        'strength':        'STRONG' if score_abs >= 6.5 else ('MODERATE' if score_abs >= 4.5 else 'WEAK'),
+        'price':           round(float(sc['price'][bar_idx]), 8),
+        'atr':             round(float(sc['atr'][bar_idx]), 8),
+        'rsi':             round(float(sc['rsi'][bar_idx]), 2),
+        'has_macd_cross':  bool(sc['has_macd_cross'][bar_idx]),
+        'stop': 0, 'target1': 0, 'target2': 0, 'open_time': 0,
+    }
+
+
+def _bt_run_vectorized(strategy: dict, df: pd.DataFrame) -> tuple[list, dict]:
+    """
+    Motor de una pasada: indicadores, puntuación y filtros se calculan una vez
+    sobre todo el histórico como columnas (utils/signal_series.py y
+    _bt_filter_codes). El bucle solo visita las barras que pasan el filtro a
+    partir de la siguiente barra libre, y cada operación se resuelve con
+    _bt_scan_trade. Mismo resultado que _bt_run_bar_by_bar.
+    """
+    n_total = len(df)
+    sc      = signal_scores(df)
+    try:
+        df_ext = _bt_compute_indicators(df, strategy)
+    except Exception:
+        df_ext = df
+    codes, labels = _bt_filter_codes(strategy, sc, df_ext)
+    high = df['high'].to_numpy(dtype=np.float64)
+    low  = df['low'].to_numpy(dtype=np.float64)
+
+    # Barras evaluadas: las que no caen dentro de una operación abierta
+    evaluated = np.zeros(n_total, dtype=bool)
+    evaluated[_BT_MIN_BARS:max(_BT_MIN_BARS, n_total - 5)] = True
+    candidates  = np.flatnonzero(evaluated & (codes == -1))
+    trades      = []
+    n_no_levels = 0
+
+    j = 0
+    while j < len(candidates):
+        bar_idx = int(candidates[j])
+        j += 1
+        sig = _bt_sig_at(sc, bar_idx)
+
+        try:
+            # Ventana suficiente para la volatilidad (20 retornos) y el trailing
+            sig_e = enrich_signal(strategy, sig, df_ext.iloc[max(0, bar_idx - 24):bar_idx + 1])
+        except Exception as e:
+            logger.warning(f"[BT] enrich error: {e}")
+            continue
+
+        e_p   = sig_e.get('price', 0)
+        sl_p  = sig_e.get('sss_sl', 0)
+        tp1_p = sig_e.get('sss_tp1', 0)
+        tp2_p = sig_e.get('sss_tp2', 0)
+        tp3_p = sig_e.get('sss_tp3', 0)
+        direc = sig_e.get('direction', 'NEUTRAL')
+
+        if not all([e_p > 0, sl_p > 0, tp1_p > 0]):
+            n_no_levels += 1
+            continue
+
+        trade = _bt_scan_trade(high, low, bar_idx, e_p, sl_p, tp1_p, tp2_p, tp3_p, direc, _BT_MAX_FWD)
+        trade['bar_idx']  = bar_idx
+        trade['time_str'] = str(df.index[bar_idx])[:16]
+        trade['score']    = sig.get('score_abs', 0)
+        trade['leverage'] = sig_e.get('sss_leverage', 1)
+        trade['rr1']      = sig_e.get('sss_rr_tp1', 0)
+        trade['rr2']      = sig_e.get('sss_rr_tp2', 0)
+        trades.append(trade)
+
+        next_bar = (trade['close_bar'] + 1) if trade.get('close_bar') else bar_idx + 5
+        evaluated[bar_idx + 1:next_bar] = False
+        j = int(np.searchsorted(candidates, next_bar))
+
+    return trades, {
+        'n_neutral':   int(np.count_nonzero(evaluated & (codes == -2))),
+        'n_rejected':  int(np.count_nonzero(evaluated & (codes >= 0))),
+        'n_no_levels': n_no_levels,
+        'rej_counts':  _bt_reason_counts(codes, labels, sc['rsi'], evaluated),
+    }
+
+
+def run_strategy_backtest(
+    strategy: dict,
+    symbol: str = "BTCUSDT",
+    candle_limit: int = 500,
+    df: pd.DataFrame | None = None,
+    start=None,
+    end=None,
+) -> dict:
+    """
+    Backtest de la estrategia sobre velas históricas de Binance.
+    Motor de señales inlinado — sin importar sp_loop (evita circular).
+    Usa el motor vectorizado de una pasada (_bt_run_vectorized).
+    df: velas ya descargadas (async) por el llamador; si falta, se descargan aquí.
+    start/end: rango de fechas [start, end) del archivo local de velas
+    (ms o 'YYYY-MM-DD', UTC); sin ellos, las últimas candle_limit velas en vivo.
+    """
+    tfs = strategy.get('timeframes', ['5m'])
+    tf  = tfs[0] if tfs else '5m'
+
+    if df is None:
+        df = _bt_download_candles(symbol, tf, candle_limit, start, end)
+    if df is None or len(df) < 80:
+        return {
+            'error': f'No se pudieron descargar velas de {symbol}/{tf}.',
+            'trades': [], 'stats': {}, 'symbol': symbol, 'tf': tf,
+            'diagnostics': {}
+        }
+
+    n_total = len(df)
+    logger.info(f"[BT] Iniciando backtest '{strategy.get('id')}' en {symbol}/{tf}, {n_total} velas")
+
+    trades, diag = _bt_run_vectorized(strategy, df)
+    n_neutral   = diag['n_neutral']
+    n_rejected  = diag['n_rejected']
+    n_no_levels = diag['n_no_levels']
+    rej_counts  = diag['rej_counts']
+
     # ── Estadísticas ──────────────────────────────────────────────────────────
     total    = len(trades)
     tp1_hits = sum(1 for t in trades if t['result'] == 'TP1')
@@ -0,0 +1,264 @@
+# utils/sss_sweep.py
+# Barridos de backtests SSS en paralelo.
+#
+# sp_strat_test_callback prueba una estrategia en un par cada vez; para ajustar
+# SASAS Pro / Momentum Scalper / Swing Wave había que lanzar decenas de
+# backtests a mano. Aquí una rejilla de overrides de parámetros × símbolos ×
+# temporalidades se reparte en un ProcessPoolExecutor:
+#   - las velas se descargan una vez en el proceso padre y se publican en
+#     bloques de memoria compartida (multiprocessing.shared_memory), uno por
+#     (symbol, tf); cada proceso se engancha a ellos al arrancar y cada tarea
+#     solo lleva (parámetros, estrategia, symbol, tf): las velas no se
+#     vuelven a serializar por tarea,
+#   - cada tarea ejecuta run_strategy_backtest (motor vectorizado) y devuelve
+#     una fila con win rate, EV y drawdown máximo,
+#   - rank_results() agrega por combinación de parámetros y ordena; las filas
+#     se exportan a CSV con write_csv().
+#
+# CLI: scripts/sss_sweep.py
+
+import copy
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+SERIES_COLUMNS = ("open_time", "open", "high", "low", "close", "volume")
+
+ROW_FIELDS = [
+    "params", "symbol", "tf", "candles", "trades", "wins", "losses", "open",
+    "win_rate", "ev", "avg_win", "avg_loss", "total_pnl", "max_dd", "error",
+]
+RANK_FIELDS = [
+    "rank", "params", "series", "trades", "wins", "losses",
+    "win_rate", "ev", "total_pnl", "max_dd", "errors",
+]
+
+
+# ─── REJILLA DE PARÁMETROS ────────────────────────────────────────────────────
+
+def set_param(strategy: dict, path: str, value) -> None:
+    """Asigna strategy['a']['b'] = value para path='a.b' (crea los dicts que falten)."""
+    node = strategy
+    keys = path.split(".")
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+
+
+def expand_grid(strategy: dict, grid: dict) -> list[tuple[dict, dict]]:
+    """
+    {'entry_filter.min_score': [3, 4], 'risk.sl_atr_mult': [1.2, 1.5]} →
+    [(params, estrategia con los overrides)] para cada combinación.
+    Una rejilla vacía devuelve la estrategia tal cual.
+    """
+    paths = list(grid)
+    combos = []
+    for values in itertools.product(*(grid[p] for p in paths)):
+        params = dict(zip(paths, values))
+        strat = copy.deepcopy(strategy)
+        for path, value in params.items():
+            set_param(strat, path, value)
+        combos.append((params, strat))
+    return combos
+
+
+def params_label(params: dict) -> str:
+    """{'entry_filter.min_score': 4} → 'min_score=4' (ruta completa si el nombre se repite)."""
+    if not params:
+        return "base"
+    short = [p.rsplit(".", 1)[-1] for p in params]
+    names = [s if short.count(s) == 1 else p for s, p in zip(short, params)]
+    return ", ".join(f"{name}={value}" for name, value in zip(names, params.values()))
+
+
+# ─── MÉTRICAS ─────────────────────────────────────────────────────────────────
+
+def max_drawdown(trades: list) -> float:
+    """Máxima caída (puntos %) de la curva de PnL acumulado, operación a operación."""
+    if not trades:
+        return 0.0
+    equity = np.cumsum([0.0] + [t.get("pnl_pct", 0.0) for t in trades])
+    return round(float(np.max(np.maximum.accumulate(equity) - equity)), 3)
+
+
+def _row(params: dict, symbol: str, tf: str, candles: int, result: dict) -> dict:
+    stats = result.get("stats") or {}
+    trades = result.get("trades") or []
+    wins = [t["pnl_pct"] for t in trades if t["result"] in ("TP1", "TP2", "TP3")]
+    losses = [abs(t["pnl_pct"]) for t in trades if t["result"] == "SL"]
+    return {
+        "params": params_label(params), "symbol": symbol, "tf": tf, "candles": candles,
+        "trades": len(trades), "wins": len(wins), "losses": len(losses),
+        "open": stats.get("open_count", 0),
+        "win_rate": stats.get("win_rate", 0.0), "ev": stats.get("ev", 0.0),
+        "avg_win": stats.get("avg_win_pct", 0.0), "avg_loss": stats.get("avg_loss_pct", 0.0),
+        "total_pnl": round(sum(t.get("pnl_pct", 0.0) for t in trades), 3),
+        "max_dd": max_drawdown(trades),
+        "error": result.get("error") or "",
+        # Para agregar sin volver a recorrer las operaciones
+        "_win_sum": sum(wins), "_loss_sum": sum(losses),
+    }
+
+
+# ─── VELAS EN MEMORIA COMPARTIDA ──────────────────────────────────────────────
+
+class SharedCandles:
+    """
+    Publica {(symbol, tf): DataFrame} en bloques de memoria compartida
+    (columnas de SERIES_COLUMNS, float64, una fila por columna). `spec` es lo
+    único que viaja a los procesos: {(symbol, tf): (nombre del bloque, n)}.
+    """
+
+    def __init__(self, frames: dict):
+        self._blocks = []
+        self.spec = {}
+        try:
+            for key, df in frames.items():
+                n = len(df)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, len(SERIES_COLUMNS) * n * 8))
+                self._blocks.append(shm)
+                arr = np.ndarray((len(SERIES_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+                for i, col in enumerate(SERIES_COLUMNS):
+                    arr[i] = df[col].to_numpy(dtype=np.float64)
+                self.spec[key] = (shm.name, n)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        for shm in self._blocks:
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Estado de cada proceso del pool (se rellena en _attach)
+_worker_frames: dict = {}
+_worker_blocks: list = []
+
+
+def frame_from_columns(arr: np.ndarray) -> pd.DataFrame:
+    """Array (columnas × n) → DataFrame con el formato de utils/market_data.py."""
+    df = pd.DataFrame({col: arr[i] for i, col in enumerate(SERIES_COLUMNS)}, copy=False)
+    df["open_time"] = df["open_time"].astype("int64")
+    df.index = pd.DatetimeIndex(pd.to_datetime(df["open_time"], unit="ms"), name="time")
+    return df
+
+
+def _attach(spec: dict) -> None:
+    """Inicializador del pool: se engancha a los bloques y arma un DataFrame por serie."""
+    for key, (name, n) in spec.items():
+        # Los procesos del pool comparten el resource_tracker del padre: el
+        # bloque se libera una sola vez, en SharedCandles.close()
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_blocks.append(shm)
+        arr = np.ndarray((len(SERIES_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+        _worker_frames[key] = frame_from_columns(arr)
+
+
+def _run_task(task: tuple) -> dict:
+    from utils.sss_manager import run_strategy_backtest
+
+    params, strategy, symbol, tf = task
+    df = _worker_frames.get((symbol, tf))
+    if df is None:
+        return _row(params, symbol, tf, 0, {"error": "sin velas"})
+    strat = dict(strategy, timeframes=[tf])
+    try:
+        result = run_strategy_backtest(strat, symbol, len(df), df=df)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    return _row(params, symbol, tf, len(df), result)
+
+
+# ─── BARRIDO ──────────────────────────────────────────────────────────────────
+
+def run_sweep(strategy: dict, grid: dict, frames: dict, workers: int | None = None) -> list[dict]:
+    """
+    Ejecuta cada combinación de la rejilla sobre cada serie de frames
+    ({(symbol, tf): DataFrame}) en un pool de procesos. Devuelve una fila por
+    (combinación, symbol, tf).
+    """
+    combos = expand_grid(strategy, grid)
+    tasks = [(params, strat, symbol, tf) for params, strat in combos for (symbol, tf) in frames]
+    if not tasks:
+        return []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    chunksize = max(1, len(tasks) // (workers * 4))
+
+    with SharedCandles(frames) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shared.spec,)) as pool:
+            return list(pool.map(_run_task, tasks, chunksize=chunksize))
+
+
+def rank_results(rows: list) -> list[dict]:
+    """
+    Agrega las filas por combinación de parámetros (todas las series juntas)
+    y ordena por EV, luego win rate y luego menor drawdown.
+    """
+    groups: dict = {}
+    for row in rows:
+        groups.setdefault(row["params"], []).append(row)
+
+    ranked = []
+    for params, group in groups.items():
+        wins = sum(r["wins"] for r in group)
+        losses = sum(r["losses"] for r in group)
+        resolved = wins + losses
+        ranked.append({
+            "params": params,
+            "series": len(group),
+            "trades": sum(r["trades"] for r in group),
+            "wins": wins,
+            "losses": losses,
+            "win_rate": round(wins / resolved * 100, 1) if resolved else 0.0,
+            # EV por operación resuelta = WR·media_ganancia − LR·media_pérdida
+            "ev": round((sum(r["_win_sum"] for r in group) - sum(r["_loss_sum"] for r in group))
+                        / resolved, 2) if resolved else 0.0,
+            "total_pnl": round(sum(r["total_pnl"] for r in group), 2),
+            "max_dd": max(r["max_dd"] for r in group),
+            "errors": sum(1 for r in group if r["error"]),
+        })
+
+    ranked.sort(key=lambda r: (-r["ev"], -r["win_rate"], r["max_dd"]))
+    for i, r in enumerate(ranked, 1):
+        r["rank"] = i
+    return ranked
+
+
+# ─── SALIDA ───────────────────────────────────────────────────────────────────
+
+def write_csv(rows: list, path: str, fields: list = ROW_FIELDS) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_table(ranked: list, top: int = 20) -> str:
+    """Tabla de texto con las `top` mejores combinaciones."""
+    header = f"{'#':>3}  {'ops':>5}  {'WR%':>6}  {'EV%':>6}  {'PnL%':>8}  {'DD%':>7}  parámetros"
+    lines = [header, "─" * len(header)]
+    for r in ranked[:top]:
+        lines.append(
+            f"{r['rank']:>3}  {r['trades']:>5}  {r['win_rate']:>6.1f}  {r['ev']:>6.2f}  "
+            f"{r['total_pnl']:>8.2f}  {r['max_dd']:>7.2f}  {r['params']}"
+            + (f"  ({r['errors']} con error)" if r["errors"] else "")
+        )
+    return "\n".join(lines)
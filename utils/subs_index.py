@@ -0,0 +1,62 @@
+# utils/subs_index.py
+# Índice invertido de suscripciones: clave (p.ej. (symbol, tf)) -> {user_ids}.
+#
+# Los managers (SP, Valerts, BTC) guardan sus suscripciones como uid -> ...
+# y los loops preguntan lo contrario: "¿quién sigue X/TF?". En vez de recorrer
+# todos los usuarios en cada ciclo, se mantiene este índice:
+#   - se reconstruye cuando el documento cargado es otro objeto (recarga
+#     desde disco: la caché JSON devuelve el mismo objeto mientras no cambie),
+#   - y los toggle_* lo actualizan de forma incremental con add()/discard().
+
+import threading
+from collections import defaultdict
+
+
+class SubscriptionIndex:
+    """Índice clave -> set(uid) ligado a un documento de suscripciones."""
+
+    def __init__(self, extract):
+        """
+        extract(doc) debe devolver un iterable de (clave, uid) con todas las
+        suscripciones activas del documento.
+        """
+        self._extract = extract
+        self._lock = threading.RLock()
+        self._source = None
+        self._index: dict = defaultdict(set)
+        self.rebuilds = 0
+
+    def sync(self, doc) -> None:
+        """Reconstruye el índice si `doc` no es el documento indexado."""
+        with self._lock:
+            if doc is self._source:
+                return
+            index = defaultdict(set)
+            for key, uid in self._extract(doc):
+                index[key].add(str(uid))
+            self._index = index
+            self._source = doc
+            self.rebuilds += 1
+
+    def add(self, key, uid) -> None:
+        with self._lock:
+            self._index[key].add(str(uid))
+
+    def discard(self, key, uid) -> None:
+        with self._lock:
+            users = self._index.get(key)
+            if users is None:
+                return
+            users.discard(str(uid))
+            if not users:
+                del self._index[key]
+
+    def get(self, key) -> set:
+        """Copia del set de usuarios de `key` (vacío si no hay)."""
+        with self._lock:
+            return set(self._index.get(key, ()))
+
+    def keys(self) -> list:
+        """Claves con al menos un suscriptor."""
+        with self._lock:
+            return [k for k, users in self._index.items() if users]
@@ -0,0 +1,207 @@
+# utils/symbol_index.py
+# Índice local de pares negociables por exchange (Binance, KuCoin, Bybit).
+#
+# /ta descargaba 50 velas solo para saber si un par existe en Binance y el resto
+# de handlers se enteraba de que un símbolo no existía tras una petición fallida.
+# Este índice se construye con los listados tipo exchangeInfo de cada exchange,
+# se persiste en SYMBOL_INDEX_PATH (arranque sin red) y se refresca cada
+# SYMBOL_INDEX_REFRESH segundos. Permite:
+#   - validar un símbolo en O(1) (None si el índice de ese exchange aún no existe),
+#   - separar base/quote con los datos reales del exchange,
+#   - resolver la quote cuando el usuario solo da la base (BTC → BTCUSDT),
+#   - sugerir el par válido más parecido.
+
+import asyncio
+import difflib
+import json
+import os
+import time
+
+from core.config import SYMBOL_INDEX_PATH, SYMBOL_INDEX_REFRESH
+from utils.endpoint_health import endpoint_health
+from utils.file_manager import add_log_line
+from utils.market_data import BINANCE_ENDPOINTS, market_data
+from utils.write_behind import get_pending, schedule_json_write
+
+EXCHANGES = ("binance", "kucoin", "bybit")
+
+# Quotes preferidas al resolver una base sin par explícito
+PREFERRED_QUOTES = ("USDT", "USDC", "FDUSD", "BUSD", "BTC", "ETH", "BNB")
+
+_BINANCE_INFO_URLS = tuple(url.replace("/klines", "/exchangeInfo") for url in BINANCE_ENDPOINTS)
+_KUCOIN_SYMBOLS_URL = "https://api.kucoin.com/api/v2/symbols"
+_BYBIT_INSTRUMENTS_URL = "https://api.bybit.com/v5/market/instruments-info"
+
+
+# ─── DESCARGA DE LISTADOS ─────────────────────────────────────────────────────
+
+async def _fetch_binance(client) -> list | None:
+    for url in endpoint_health.order(_BINANCE_INFO_URLS):
+        data = await client.get_json(url, timeout=20)
+        if isinstance(data, dict) and data.get("symbols"):
+            return [(s["symbol"], s["baseAsset"], s["quoteAsset"])
+                    for s in data["symbols"] if s.get("status") == "TRADING"]
+    return None
+
+
+async def _fetch_kucoin(client) -> list | None:
+    data = await client.get_json(_KUCOIN_SYMBOLS_URL, timeout=20)
+    rows = data.get("data") if isinstance(data, dict) else None
+    if not rows:
+        return None
+    return [(f"{s['baseCurrency']}{s['quoteCurrency']}", s["baseCurrency"], s["quoteCurrency"])
+            for s in rows if s.get("enableTrading")]
+
+
+async def _fetch_bybit(client) -> list | None:
+    data = await client.get_json(_BYBIT_INSTRUMENTS_URL, {"category": "spot"}, timeout=20)
+    rows = ((data or {}).get("result") or {}).get("list") if isinstance(data, dict) else None
+    if not rows:
+        return None
+    return [(s["symbol"], s["baseCoin"], s["quoteCoin"])
+            for s in rows if s.get("status") == "Trading"]
+
+
+_FETCHERS = {"binance": _fetch_binance, "kucoin": _fetch_kucoin, "bybit": _fetch_bybit}
+
+
+# ─── ÍNDICE ───────────────────────────────────────────────────────────────────
+
+class SymbolIndex:
+    """{exchange: {SYMBOL: (BASE, QUOTE)}} + índice inverso por base."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._symbols: dict[str, dict[str, tuple]] = {}
+        self._by_base: dict[str, dict[str, set]] = {}
+        self.updated: dict[str, float] = {}
+
+    def _set(self, exchange: str, rows, updated: float) -> None:
+        symbols, by_base = {}, {}
+        for symbol, base, quote in rows:
+            symbol, base, quote = symbol.upper(), base.upper(), quote.upper()
+            symbols[symbol] = (base, quote)
+            by_base.setdefault(base, set()).add(quote)
+        # Sustitución atómica: los lectores nunca ven un índice a medias
+        self._symbols[exchange] = symbols
+        self._by_base[exchange] = by_base
+        self.updated[exchange] = updated
+
+    def load(self) -> None:
+        data = get_pending(self.path)
+        if data is None and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                add_log_line(f"⚠️ Índice de símbolos ilegible, se reconstruirá: {e}")
+                data = None
+        for exchange, entry in (data or {}).items():
+            self._set(exchange, entry.get("symbols", []), float(entry.get("updated", 0)))
+
+    def _save(self) -> None:
+        data = {
+            exchange: {
+                "updated": self.updated.get(exchange, 0),
+                "symbols": [[s, b, q] for s, (b, q) in symbols.items()],
+            }
+            for exchange, symbols in self._symbols.items()
+        }
+        schedule_json_write(self.path, data)
+
+    async def refresh(self, exchanges=EXCHANGES, client=market_data) -> dict:
+        """Descarga los listados; un exchange que falla conserva su índice anterior."""
+        results = await asyncio.gather(*(_FETCHERS[e](client) for e in exchanges),
+                                       return_exceptions=True)
+        counts = {}
+        for exchange, rows in zip(exchanges, results):
+            if isinstance(rows, Exception) or not rows:
+                add_log_line(f"⚠️ Índice de símbolos: no se pudo actualizar {exchange}")
+                continue
+            self._set(exchange, rows, time.time())
+            counts[exchange] = len(rows)
+        if counts:
+            self._save()
+        return counts
+
+    # ─── CONSULTAS ────────────────────────────────────────────────────────────
+
+    def known(self, exchange: str = "binance") -> bool:
+        return bool(self._symbols.get(exchange))
+
+    def is_valid(self, symbol: str, exchange: str = "binance") -> bool | None:
+        """True/False en O(1); None si aún no hay índice de ese exchange."""
+        symbols = self._symbols.get(exchange)
+        if not symbols:
+            return None
+        return symbol.upper() in symbols
+
+    def is_listed(self, symbol: str, exchanges=EXCHANGES) -> bool | None:
+        """¿Está en alguno? None si algún exchange sin índice podría tenerlo."""
+        answers = [self.is_valid(symbol, e) for e in exchanges]
+        if any(answers):
+            return True
+        return None if None in answers else False
+
+    def split(self, symbol: str, exchange: str = "binance") -> tuple | None:
+        """BTCUSDT → ('BTC', 'USDT') según el exchange; None si no está."""
+        return self._symbols.get(exchange, {}).get(symbol.upper())
+
+    def resolve(self, base: str, quote: str | None = None, exchange: str = "binance") -> str | None:
+        """Par negociable para `base` (con `quote` si se da, si no la preferida disponible)."""
+        quotes = self._by_base.get(exchange, {}).get(base.upper())
+        if not quotes:
+            return None
+        if quote:
+            return f"{base.upper()}{quote.upper()}" if quote.upper() in quotes else None
+        for q in PREFERRED_QUOTES:
+            if q in quotes:
+                return f"{base.upper()}{q}"
+        return f"{base.upper()}{sorted(quotes)[0]}"
+
+    def suggest(self, symbol: str, exchange: str = "binance") -> str | None:
+        """Par válido más parecido (misma base con otra quote, o el nombre más cercano)."""
+        symbols = self._symbols.get(exchange)
+        if not symbols:
+            return None
+        symbol = symbol.upper()
+        for q in PREFERRED_QUOTES:
+            if symbol.endswith(q) and len(symbol) > len(q):
+                resolved = self.resolve(symbol[:-len(q)], exchange=exchange)
+                if resolved:
+                    return resolved
+                break
+        matches = difflib.get_close_matches(symbol, symbols.keys(), n=1, cutoff=0.75)
+        return matches[0] if matches else None
+
+    def stats(self) -> dict:
+        return {
+            exchange: {
+                "symbols": len(symbols),
+                "age_h": round((time.time() - self.updated.get(exchange, 0)) / 3600, 1),
+            }
+            for exchange, symbols in self._symbols.items()
+        }
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+symbol_index = SymbolIndex(SYMBOL_INDEX_PATH)
+symbol_index.load()
+
+
+async def symbol_index_loop() -> None:
+    """Refresca el índice al arrancar (si está viejo) y luego cada SYMBOL_INDEX_REFRESH s."""
+    while True:
+        stale = [e for e in EXCHANGES
+                 if time.time() - symbol_index.updated.get(e, 0) >= SYMBOL_INDEX_REFRESH]
+        if stale:
+            counts = await symbol_index.refresh(stale)
+            if counts:
+                add_log_line(f"📇 Índice de símbolos actualizado: {counts}")
+        # Hasta que caduque el más viejo; reintento en 5 min si alguno sigue sin índice
+        if any(not symbol_index.known(e) for e in EXCHANGES):
+            wait = 300
+        else:
+            oldest = min(symbol_index.updated.get(e, 0) for e in EXCHANGES)
+            wait = max(60, oldest + SYMBOL_INDEX_REFRESH - time.time())
+        await asyncio.sleep(wait)
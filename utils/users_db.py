@@ -0,0 +1,217 @@
+# utils/users_db.py
+# Almacén SQLite (modo WAL) para los datos de usuario.
+# Sustituye la reescritura completa de users.json: cada usuario es una fila
+# (chat_id, data JSON) y los cambios se aplican por fila o por campo.
+
+import json
+import os
+import sqlite3
+import threading
+
+# ─── ESTADO DEL MÓDULO ────────────────────────────────────────────────────────
+_CONN: sqlite3.Connection | None = None
+_DB_PATH: str | None = None
+_LOCK = threading.RLock()
+_HAS_JSON1 = True
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    chat_id TEXT PRIMARY KEY,
+    data    TEXT NOT NULL
+)
+"""
+
+
+def serialize_user(data: dict) -> str:
+    """Serialización compacta y estable (misma salida para el mismo dict)."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_fields(payload: str, fields: dict) -> str:
+    """
+    Aplica a una fila serializada las mismas rutas 'a.b' que update_user_fields,
+    con la semántica de json_set (un padre inexistente deja el campo sin tocar).
+    """
+    data = json.loads(payload)
+    for path, value in fields.items():
+        *parents, leaf = path.split(".")
+        node = data
+        for key in parents:
+            node = node.get(key) if isinstance(node, dict) else None
+        if isinstance(node, dict):
+            node[leaf] = value
+    return serialize_user(data)
+
+
+# ─── CONEXIÓN ─────────────────────────────────────────────────────────────────
+
+def init_users_db(db_path: str) -> sqlite3.Connection:
+    """
+    Abre (o crea) la base de datos de usuarios en modo WAL.
+    Idempotente: si ya está abierta sobre la misma ruta, la reutiliza.
+    """
+    global _CONN, _DB_PATH, _HAS_JSON1
+
+    with _LOCK:
+        if _CONN is not None and _DB_PATH == db_path:
+            return _CONN
+        if _CONN is not None:
+            _CONN.close()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+
+        try:
+            conn.execute("SELECT json_set('{}', '$.a', 1)")
+            _HAS_JSON1 = True
+        except sqlite3.OperationalError:
+            _HAS_JSON1 = False
+
+        _CONN, _DB_PATH = conn, db_path
+        return conn
+
+
+def close_users_db() -> None:
+    """Cierra la conexión (checkpoint del WAL incluido)."""
+    global _CONN, _DB_PATH
+    with _LOCK:
+        if _CONN is not None:
+            try:
+                _CONN.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            _CONN.close()
+        _CONN, _DB_PATH = None, None
+
+
+def _conn() -> sqlite3.Connection:
+    if _CONN is None:
+        raise RuntimeError("users_db no inicializada: llama a init_users_db() primero")
+    return _CONN
+
+
+# ─── LECTURA ──────────────────────────────────────────────────────────────────
+
+def count_users() -> int:
+    with _LOCK:
+        return _conn().execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]
+
+
+def load_all_users() -> dict:
+    """Devuelve {chat_id_str: dict} con todos los usuarios."""
+    with _LOCK:
+        rows = _conn().execute("SELECT chat_id, data FROM usuarios").fetchall()
+    usuarios = {}
+    for chat_id, data in rows:
+        try:
+            usuarios[chat_id] = json.loads(data)
+        except json.JSONDecodeError:
+            # Fila corrupta: se ignora en memoria, la fila queda intacta en disco
+            continue
+    return usuarios
+
+
+# ─── ESCRITURA ────────────────────────────────────────────────────────────────
+
+def upsert_user(chat_id: str, data: dict) -> str:
+    """Inserta o reemplaza una única fila. Devuelve el JSON escrito."""
+    payload = serialize_user(data)
+    with _LOCK:
+        _conn().execute(
+            "INSERT INTO usuarios (chat_id, data) VALUES (?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET data = excluded.data",
+            (str(chat_id), payload),
+        )
+    return payload
+
+
+def upsert_users(rows: dict) -> None:
+    """Upsert de varias filas {chat_id: payload_json} en una sola transacción."""
+    if not rows:
+        return
+    with _LOCK:
+        conn = _conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO usuarios (chat_id, data) VALUES (?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET data = excluded.data",
+                [(str(k), v) for k, v in rows.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def delete_users(chat_ids) -> None:
+    ids = [(str(c),) for c in chat_ids]
+    if not ids:
+        return
+    with _LOCK:
+        conn = _conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("DELETE FROM usuarios WHERE chat_id = ?", ids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def update_user_fields(chat_id: str, fields: dict, full_row: dict | None = None) -> bool:
+    """
+    Actualiza campos concretos de una fila con json_set.
+    fields: {"daily_usage.ver": 3, "last_seen": "..."} (rutas con puntos).
+    Si SQLite no trae JSON1, cae a reescribir la fila con full_row.
+    Devuelve True si la fila existía.
+    """
+    if not fields:
+        return True
+
+    if not _HAS_JSON1:
+        if full_row is None:
+            return False
+        upsert_user(chat_id, full_row)
+        return True
+
+    expr_parts, params = [], []
+    for path, value in fields.items():
+        expr_parts.append("?, json(?)")
+        params.extend(["$." + path, json.dumps(value, ensure_ascii=False)])
+
+    sql = f"UPDATE usuarios SET data = json_set(data, {', '.join(expr_parts)}) WHERE chat_id = ?"
+    with _LOCK:
+        cur = _conn().execute(sql, (*params, str(chat_id)))
+    return cur.rowcount > 0
+
+
+# ─── MIGRACIÓN ────────────────────────────────────────────────────────────────
+
+def migrate_users_json(json_path: str) -> int:
+    """
+    Migración única users.json → SQLite.
+    Solo actúa si la tabla está vacía y existe el JSON. Tras copiar las filas,
+    renombra el JSON a '.migrated' para no volver a importarlo.
+    Un JSON corrupto se aparta a '.corrupto' (como hacía cargar_usuarios).
+    Devuelve el número de usuarios importados.
+    """
+    if not os.path.exists(json_path) or count_users() > 0:
+        return 0
+
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            usuarios = json.load(f)
+    except json.JSONDecodeError:
+        os.replace(json_path, f"{json_path}.corrupto")
+        return 0
+
+    if not isinstance(usuarios, dict):
+        return 0
+
+    upsert_users({str(k): serialize_user(v) for k, v in usuarios.items()})
+    os.replace(json_path, f"{json_path}.migrated")
+    return len(usuarios)
@@ -3,6 +3,9 @@
 import json
 import os
 from core.config import DATA_DIR
+from utils.write_behind import schedule_json_write
+from utils.json_cache import load_json_cached, load_json_readonly
+from utils.subs_index import SubscriptionIndex
 
 VALERTS_SUBS_PATH = os.path.join(DATA_DIR, "valerts_subs.json")
 VALERTS_STATE_PATH = os.path.join(DATA_DIR, "valerts_state.json")
@@ -10,23 +13,40 @@ VALERTS_STATE_PATH = os.path.join(DATA_DIR, "valerts_state.json")
 # --- CARGA Y GUARDADO BÁSICO ---
 
 def load_json(path):
-    if not os.path.exists(path): return {}
-    try:
-        with open(path, 'r', encoding='utf-8') as f: return json.load(f)
+    # Caché por mtime/tamaño (incluye escrituras diferidas pendientes); copia mutable
+    try: return load_json_cached(path)
+    except Exception: return {}
+
+def _load_ro(path):
+    # Objeto compartido de la caché: solo lectura
+    try: return load_json_readonly(path)
     except Exception: return {}
 
 def save_json(path, data):
-    try:
-        temp = f"{path}.tmp"
-        with open(temp, 'w', encoding='utf-8') as f: json.dump(data, f, indent=4)
-        os.replace(temp, path)
+    # Escritura diferida (write-behind): agrupa los guardados del loop
+    try: schedule_json_write(path, data, indent=4)
     except Exception as e: print(f"Error guardando {path}: {e}")
 
 # --- SUSCRIPCIONES (SUBS) ---
 
+def _extract_valerts_pairs(subs):
+    for uid, user_symbols in subs.items():
+        if not isinstance(user_symbols, dict): continue
+        for sym, tfs in user_symbols.items():
+            if isinstance(tfs, list):
+                for tf in tfs: yield (sym, tf), uid
+
+# Índice invertido (symbol, tf) -> {uid}; se reconstruye al recargar el JSON
+_VALERTS_INDEX = SubscriptionIndex(_extract_valerts_pairs)
+
+def _load_subs():
+    subs = _load_ro(VALERTS_SUBS_PATH)
+    _VALERTS_INDEX.sync(subs)
+    return subs
+
 def is_valerts_subscribed(user_id, symbol, timeframe="4h"):
     """Verifica si un usuario está suscrito a un par y timeframe específicos."""
-    subs = load_json(VALERTS_SUBS_PATH)
+    subs = _load_ro(VALERTS_SUBS_PATH)
     uid = str(user_id)
     
     # Estructura: uid -> symbol -> [lista_tfs]
@@ -38,7 +58,8 @@ def is_valerts_subscribed(user_id, symbol, timeframe="4h"):
 
 def toggle_valerts_subscription(user_id, symbol, timeframe="4h"):
     """Activa/Desactiva suscripción y devuelve el nuevo estado (True/False)."""
-    subs = load_json(VALERTS_SUBS_PATH)
+    _load_subs()                           # Índice al día
+    subs = load_json(VALERTS_SUBS_PATH)    # Copia que se modifica y se guarda
     uid = str(user_id)
     
     if uid not in subs: subs[uid] = {}
@@ -54,32 +75,29 @@ def toggle_valerts_subscription(user_id, symbol, timeframe="4h"):
         # Limpieza: Si el usuario no sigue nada de esa moneda, borramos la key
         if not subs[uid][symbol]: 
             del subs[uid][symbol]
+        _VALERTS_INDEX.discard((symbol, timeframe), uid)
     else:
         subs[uid][symbol].append(timeframe)
         res = True
+        _VALERTS_INDEX.add((symbol, timeframe), uid)
         
     save_json(VALERTS_SUBS_PATH, subs)
     return res
 
 def get_valerts_subscribers(symbol, timeframe):
-    """Devuelve lista de usuarios suscritos a Moneda + TF."""
-    subs = load_json(VALERTS_SUBS_PATH)
-    users = []
-    for uid, user_symbols in subs.items():
-        if symbol in user_symbols:
-            # Verificamos que el TF esté en la lista del usuario
-            if isinstance(user_symbols[symbol], list) and timeframe in user_symbols[symbol]:
-                users.append(uid)
-    return users
+    """Devuelve lista de usuarios suscritos a Moneda + TF (O(1) vía índice)."""
+    _load_subs()
+    return list(_VALERTS_INDEX.get((symbol, timeframe)))
 
 def get_active_symbols():
     """Lista única de monedas que tienen AL MENOS una suscripción activa."""
-    subs = load_json(VALERTS_SUBS_PATH)
-    active = set()
-    for user_data in subs.values():
-        for sym in user_data.keys():
-            active.add(sym)
-    return sorted(list(active))
+    _load_subs()
+    return sorted({sym for sym, _tf in _VALERTS_INDEX.keys()})
+
+def get_active_valerts_pairs():
+    """Pares (symbol, tf) con al menos un suscriptor, sin recorrer usuarios."""
+    _load_subs()
+    return sorted(_VALERTS_INDEX.keys())
 
 # --- ESTADO (STATE) - CRÍTICO PARA EL LOOP ---
 
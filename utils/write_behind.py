@@ -0,0 +1,270 @@
+# utils/write_behind.py
+# Persistencia diferida (write-behind) para documentos JSON calientes.
+#
+# Los loops y handlers marcan un documento como "sucio" con schedule_json_write();
+# un hilo de fondo lo vuelca a disco (tmp + os.replace) como mucho una vez por
+# ventana. Varias escrituras del mismo fichero dentro de la ventana se funden en
+# una sola. Mientras haya una escritura pendiente, get_pending() devuelve el
+# objeto en memoria para que las lecturas no vean una versión vieja del disco.
+
+import atexit
+import json
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from core.config import WRITE_BEHIND_WINDOW
+from utils.logger import logger
+
+
+class WriteBehindManager:
+    """Cola de documentos sucios con volcado atómico desde un hilo daemon."""
+
+    def __init__(self, window: float = 2.0):
+        self.window = max(0.0, float(window))
+        self._lock = threading.Condition()
+        self._io_lock = threading.Lock()
+        # Por hilo: profundidad dentro del manager y callbacks aplazados (defer_if_busy)
+        self._local = threading.local()
+        # path -> {"data", "dump_kwargs", "since", "version"}
+        self._dirty: dict[str, dict] = {}
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._listeners = []
+        # Métricas
+        self.marks = 0
+        self.writes = 0
+        self.errors = 0
+
+    # ─── API ──────────────────────────────────────────────────────────────────
+
+    def schedule(self, path: str, data, **dump_kwargs) -> None:
+        """Marca `path` como sucio con `data`. No toca el disco."""
+        with self._busy(), self._lock:
+            entry = self._dirty.get(path)
+            if entry is None:
+                self._dirty[path] = {
+                    "data": data, "dump_kwargs": dump_kwargs,
+                    "since": time.monotonic(), "version": 0,
+                }
+            else:
+                # Coalescencia: se conserva 'since' para no aplazar el volcado
+                entry["data"] = data
+                entry["dump_kwargs"] = dump_kwargs
+                entry["version"] += 1
+            self.marks += 1
+            self._ensure_thread()
+            self._lock.notify()
+
+    def get_pending(self, path: str, default=None):
+        """Objeto pendiente de escribir para `path`, o `default` si no hay."""
+        with self._busy(), self._lock:
+            entry = self._dirty.get(path)
+        return default if entry is None else entry["data"]
+
+    def flush(self, path: str | None = None) -> None:
+        """Vuelca ya (sincrónicamente) un documento o todos los pendientes."""
+        with self._busy():
+            with self._lock:
+                paths = [path] if path is not None else list(self._dirty)
+            for p in paths:
+                self._write(p)
+
+    def add_listener(self, fn) -> None:
+        """fn(path, data) se llama tras cada volcado completado."""
+        self._listeners.append(fn)
+
+    def defer_if_busy(self, fn) -> bool:
+        """
+        Si este hilo está dentro del manager (con un lock tomado o a mitad de
+        un volcado), aplaza fn() hasta que salga y devuelve True. Lo usa el
+        handler de señales: volcar en ese punto se bloquearía en el lock que
+        ya tiene el hilo, y relanzar la señal cortaría la escritura en curso.
+        """
+        if not getattr(self._local, "depth", 0):
+            return False
+        self._local.deferred.append(fn)
+        return True
+
+    def stats(self) -> dict:
+        with self._busy(), self._lock:
+            pending = len(self._dirty)
+        return {
+            "window_s": self.window, "pending": pending,
+            "marks": self.marks, "writes": self.writes, "errors": self.errors,
+        }
+
+    def stop(self) -> None:
+        """Detiene el hilo y vuelca todo lo pendiente."""
+        with self._busy(), self._lock:
+            self._stopping = True
+            self._lock.notify()
+        self.flush()
+
+    # ─── INTERNOS ─────────────────────────────────────────────────────────────
+
+    @contextmanager
+    def _busy(self):
+        """Marca al hilo dentro del manager; al salir del todo ejecuta lo aplazado."""
+        local = self._local
+        if not getattr(local, "depth", 0):
+            local.depth, local.deferred = 0, []
+        local.depth += 1
+        try:
+            yield
+        finally:
+            local.depth -= 1
+            if local.depth == 0 and local.deferred:
+                deferred, local.deferred = local.deferred, []
+                for fn in deferred:
+                    fn()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                if not self._dirty:
+                    self._lock.wait()
+                    continue
+                now = time.monotonic()
+                oldest = min(e["since"] for e in self._dirty.values())
+                wait = oldest + self.window - now
+                if wait > 0:
+                    self._lock.wait(wait)
+                    continue
+                due = [p for p, e in self._dirty.items() if e["since"] + self.window <= now]
+            for p in due:
+                self._write(p)
+
+    def _write(self, path: str) -> None:
+        with self._busy(), self._io_lock:
+            self._write_locked(path)
+
+    def _write_locked(self, path: str) -> None:
+        with self._lock:
+            entry = self._dirty.get(path)
+            if entry is None:
+                return
+            data, dump_kwargs = entry["data"], entry["dump_kwargs"]
+            version = entry["version"]
+
+        try:
+            # Se serializa fuera del lock; si otro hilo muta el dict a la vez,
+            # json.dumps lanza RuntimeError y se reintenta en la próxima ventana.
+            payload = json.dumps(data, **dump_kwargs)
+        except RuntimeError:
+            with self._lock:
+                if path in self._dirty:
+                    self._dirty[path]["since"] = time.monotonic()
+            return
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"❌ [WriteBehind] No se pudo serializar {path}: {e}")
+            with self._lock:
+                if self._dirty.get(path) is entry:
+                    del self._dirty[path]
+            return
+
+        try:
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+            self.writes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"❌ [WriteBehind] Error escribiendo {path}: {e}")
+            with self._lock:
+                if path in self._dirty:
+                    self._dirty[path]["since"] = time.monotonic()
+            return
+
+        with self._lock:
+            # Solo se limpia si nadie volvió a marcarlo mientras escribíamos
+            current = self._dirty.get(path)
+            if current is entry and current["version"] == version:
+                del self._dirty[path]
+            else:
+                return
+
+        for fn in self._listeners:
+            try:
+                fn(path, data)
+            except Exception:
+                pass
+
+
+# ─── INSTANCIA GLOBAL ─────────────────────────────────────────────────────────
+write_behind = WriteBehindManager(WRITE_BEHIND_WINDOW)
+
+
+def schedule_json_write(path: str, data, **dump_kwargs) -> None:
+    write_behind.schedule(path, data, **dump_kwargs)
+
+
+def get_pending(path: str, default=None):
+    return write_behind.get_pending(path, default)
+
+
+def add_write_listener(fn) -> None:
+    write_behind.add_listener(fn)
+
+
+def flush_all() -> None:
+    write_behind.flush()
+
+
+atexit.register(write_behind.stop)
+
+_PREV_HANDLERS: dict = {}
+
+
+def _signal_flush(signum, frame):
+    # Señal a mitad de una operación del manager en este hilo: se repite al
+    # terminarla, así el volcado en curso acaba antes de relanzar la señal
+    if write_behind.defer_if_busy(lambda: _signal_flush(signum, frame)):
+        return
+    try:
+        flush_all()
+    except Exception:
+        pass
+    prev = _PREV_HANDLERS.get(signum)
+    if callable(prev):
+        prev(signum, frame)
+    elif prev == signal.SIG_DFL:
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+
+def install_signal_flush(signals=None) -> None:
+    """
+    Vuelca los pendientes al recibir señales (encadena el handler previo).
+    Debe llamarse desde el hilo principal. Con Application.run_polling, PTB
+    toma SIGINT/SIGTERM y el volcado lo hace post_shutdown (bbalert.py);
+    esto cubre el resto (SIGHUP, scripts sin PTB).
+    """
+    if signals is None:
+        signals = [signal.SIGTERM, signal.SIGINT]
+        if hasattr(signal, "SIGHUP"):
+            signals.append(signal.SIGHUP)
+    for sig in signals:
+        try:
+            prev = signal.getsignal(sig)
+            if prev is _signal_flush:
+                continue
+            _PREV_HANDLERS[sig] = prev
+            signal.signal(sig, _signal_flush)
+        except (ValueError, OSError):
+            # No estamos en el hilo principal o la señal no existe aquí
+            continue
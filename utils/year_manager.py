@@ -7,6 +7,7 @@ import math
 from datetime import datetime, date
 from typing import Optional
 from core.config import YEAR_QUOTES_PATH, YEAR_SUBS_PATH
+from utils.json_cache import load_json_cached, invalidate_json
 from core.i18n import _
 
 # --- GESTIÓN DE FRASES (QUOTES) ---
@@ -269,11 +270,9 @@ def get_daily_quote():
 # --- GESTIÓN DE SUSCRIPCIONES ---
 
 def load_subs():
-    if not os.path.exists(YEAR_SUBS_PATH):
-        return {}
+    # Cacheado por mtime/tamaño: el loop lo consulta cada minuto
     try:
-        with open(YEAR_SUBS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json_cached(YEAR_SUBS_PATH)
     except Exception:
         return {}
 
@@ -283,6 +282,8 @@ def save_subs(subs_data):
             json.dump(subs_data, f, indent=4, ensure_ascii=False)
     except Exception as e:
         print(f"Error guardando subs de año: {e}")
+    finally:
+        invalidate_json(YEAR_SUBS_PATH)
 
 def update_user_sub(user_id, hour):
     """